@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AuditLog
+from .models import AuditLog, ArchiveAudit
 
 
 @admin.register(AuditLog)
@@ -24,3 +24,15 @@ class AuditLogAdmin(admin.ModelAdmin):
 
 
 
+
+
+@admin.register(ArchiveAudit)
+class ArchiveAuditAdmin(admin.ModelAdmin):
+    list_display = ['mois', 'nb_entrees', 'debut', 'fin', 'fichier', 'mis_a_jour_le']
+    readonly_fields = ['mois', 'fichier', 'nb_entrees', 'debut', 'fin', 'mis_a_jour_le']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,4 +1,8 @@
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class AuditConfig(AppConfig):
@@ -6,8 +10,11 @@ class AuditConfig(AppConfig):
     name = 'audit'
     verbose_name = 'Audit et Traçabilité'
 
-
-
-
-
-
+    def ready(self):
+        # Les archives contiennent tout le journal d'audit : jamais sous /media/
+        dossier = Path(settings.AUDIT_ARCHIVES_DIR).resolve()
+        media = Path(settings.MEDIA_ROOT).resolve()
+        if dossier == media or media in dossier.parents:
+            raise ImproperlyConfigured(
+                f"AUDIT_ARCHIVES_DIR ({dossier}) ne doit pas se trouver dans MEDIA_ROOT ({media})"
+            )
@@ -0,0 +1,496 @@
+"""
+Archivage et rétention du journal d'audit.
+
+Les entrées plus anciennes que l'horizon de rétention (AUDIT_RETENTION_JOURS)
+sont déplacées par lots dans un fichier JSONL compressé par mois
+(AUDIT_ARCHIVES_DIR/AAAA-MM.jsonl.gz, hors de MEDIA_ROOT), puis supprimées
+de la table.
+Chaque lot est ajouté comme un membre gzip distinct : un fichier n'est jamais
+réécrit. L'index ArchiveAudit indique les mois archivés et leur plage.
+
+Si le processus s'arrête entre l'écriture d'un lot et la suppression en base,
+le lot est réécrit au passage suivant : la lecture dédoublonne sur l'id.
+
+La consultation (`lire_archives`, `JournauxCombines`) permet à l'API d'audit
+de servir les périodes anciennes comme si les entrées étaient encore en base.
+Les archives sont lues mois par mois, du plus récent au plus ancien, et
+seulement jusqu'à la page demandée.
+"""
+import gzip
+import json
+import os
+import sys
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import groupby
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog, ArchiveAudit
+
+CHAMPS_ARCHIVES = [
+    'id', 'action', 'user_id', 'user__username', 'content_type_id', 'object_id',
+    'model_name', 'object_repr', 'changes', 'ip_address', 'user_agent',
+    'timestamp', 'metadata',
+]
+
+# Taille des IN (...) de suppression, sous la limite de paramètres de SQLite
+LOT_SUPPRESSION = 500
+
+# Lecture des archives : taille des blocs lus, et taille maximale (octets,
+# estimée) des index de membres gardés en mémoire par processus
+BLOC_LECTURE = 64 * 1024
+TAILLE_CACHE_INDEX = 1024 * 1024
+
+_index_membres = OrderedDict()  # chemin -> (mtime_ns, taille, membres, fin, octets)
+_verrou_index = threading.Lock()
+
+
+def dossier_archives():
+    """Dossier des fichiers d'archive (AUDIT_ARCHIVES_DIR, vérifié hors de MEDIA_ROOT par audit/apps.py)"""
+    return Path(settings.AUDIT_ARCHIVES_DIR)
+
+
+def chemin_archive(archive):
+    """Chemin du fichier d'une archive (ArchiveAudit.fichier est un nom de fichier)"""
+    return dossier_archives() / Path(archive.fichier).name
+
+
+def horizon_retention(jours=None):
+    """Date avant laquelle les entrées sont archivées"""
+    if jours is None:
+        jours = getattr(settings, 'AUDIT_RETENTION_JOURS', 365)
+    return timezone.now() - timedelta(days=jours)
+
+
+def _mois(timestamp):
+    return timezone.localtime(timestamp).date().replace(day=1)
+
+
+def _json_defaut(valeur):
+    # isoformat complet : DjangoJSONEncoder tronque les microsecondes
+    if isinstance(valeur, datetime):
+        return valeur.isoformat()
+    return str(valeur)
+
+
+def _ecrire_lot(mois, lignes):
+    """Ajoute un lot au fichier du mois (nouveau membre gzip) et le force sur disque"""
+    dossier = dossier_archives()
+    dossier.mkdir(parents=True, exist_ok=True)
+    chemin = dossier / f"{mois:%Y-%m}.jsonl.gz"
+    with open(chemin, 'ab') as brut:
+        with gzip.GzipFile(fileobj=brut, mode='wb') as fichier:
+            for ligne in lignes:
+                fichier.write(json.dumps(ligne, default=_json_defaut, ensure_ascii=False).encode('utf-8'))
+                fichier.write(b'\n')
+        brut.flush()
+        os.fsync(brut.fileno())
+    return chemin
+
+
+def _indexer(mois, chemin, lignes):
+    """Met à jour l'index ArchiveAudit du mois (dans la transaction de suppression)"""
+    debut = min(ligne['timestamp'] for ligne in lignes)
+    fin = max(ligne['timestamp'] for ligne in lignes)
+    relatif = chemin.name
+    archive = ArchiveAudit.objects.select_for_update().filter(mois=mois).first()
+    if archive is None:
+        ArchiveAudit.objects.create(mois=mois, fichier=relatif, nb_entrees=len(lignes), debut=debut, fin=fin)
+        return
+    archive.fichier = relatif
+    archive.nb_entrees += len(lignes)
+    archive.debut = min(archive.debut, debut)
+    archive.fin = max(archive.fin, fin)
+    archive.save(update_fields=['fichier', 'nb_entrees', 'debut', 'fin', 'mis_a_jour_le'])
+
+
+def archiver(avant=None, taille_lot=5000, simulation=False, journal=None):
+    """Déplace les entrées antérieures à `avant` vers les archives mensuelles
+
+    Traite les entrées par lots de `taille_lot` (du plus ancien au plus
+    récent) : écriture du lot dans les fichiers des mois concernés, puis mise
+    à jour de l'index et suppression en base dans une même transaction.
+    Retourne le nombre d'entrées archivées (ou à archiver en simulation).
+    """
+    if avant is None:
+        avant = horizon_retention()
+    anciennes = AuditLog.objects.filter(timestamp__lt=avant)
+    if simulation:
+        return anciennes.count()
+
+    total = 0
+    while True:
+        lot = list(anciennes.order_by('timestamp', 'id').values(*CHAMPS_ARCHIVES)[:taille_lot])
+        if not lot:
+            break
+
+        fichiers = [(mois, _ecrire_lot(mois, lignes), lignes)
+                    for mois, lignes in ((m, list(g)) for m, g in groupby(lot, key=lambda l: _mois(l['timestamp'])))]
+
+        ids = [ligne['id'] for ligne in lot]
+        with transaction.atomic():
+            for mois, chemin, lignes in fichiers:
+                _indexer(mois, chemin, lignes)
+            # Documents de recherche retirés et AuditLog marqué modifié à la validation
+            # (signal post_delete, une fois par transaction)
+            for i in range(0, len(ids), LOT_SUPPRESSION):
+                AuditLog.objects.filter(pk__in=ids[i:i + LOT_SUPPRESSION]).delete()
+
+        total += len(lot)
+        if journal:
+            journal(f"{total} entrée(s) archivée(s), jusqu'au {timezone.localtime(lot[-1]['timestamp']):%d/%m/%Y %H:%M}")
+    return total
+
+
+def _vers_journal(ligne):
+    """Instance AuditLog non enregistrée reconstruite depuis une ligne d'archive"""
+    journal = AuditLog(
+        id=ligne['id'],
+        action=ligne['action'],
+        content_type_id=ligne.get('content_type_id'),
+        object_id=ligne.get('object_id'),
+        model_name=ligne.get('model_name') or '',
+        object_repr=ligne.get('object_repr') or '',
+        changes=ligne.get('changes') or {},
+        ip_address=ligne.get('ip_address'),
+        user_agent=ligne.get('user_agent') or '',
+        timestamp=parse_datetime(ligne['timestamp']),
+        metadata=ligne.get('metadata') or {},
+    )
+    # Utilisateur tel qu'il était à l'archivage, sans requête supplémentaire
+    if ligne.get('user_id'):
+        journal.user = User(id=ligne['user_id'], username=ligne.get('user__username') or '')
+    journal.archive = True
+    return journal
+
+
+def _timestamp(texte):
+    return parse_datetime(json.loads(texte)['timestamp'])
+
+
+def _parcourir_membres(chemin, depart=0):
+    """Membres gzip complets du fichier à partir de la position `depart`
+
+    Retourne ([(premier timestamp, dernier timestamp, position, longueur)],
+    position de fin du dernier membre complet). Chaque membre est un lot trié
+    par timestamp (voir `archiver`) : seules sa première et sa dernière ligne
+    sont décodées. Un membre incomplet (écriture en cours) termine le parcours.
+    """
+    membres = []
+    position = depart
+    with open(chemin, 'rb') as brut:
+        brut.seek(depart)
+        suite = b''
+        while True:
+            decompresseur = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            longueur = 0
+            premiere = derniere = None
+            reste = b''
+            while not decompresseur.eof:
+                bloc = suite or brut.read(BLOC_LECTURE)
+                suite = b''
+                if not bloc:
+                    break
+                lignes = (reste + decompresseur.decompress(bloc)).split(b'\n')
+                if decompresseur.eof:
+                    suite = decompresseur.unused_data
+                longueur += len(bloc) - len(suite)
+                reste = lignes.pop()
+                lignes = [ligne for ligne in lignes if ligne]
+                if lignes:
+                    premiere = premiere or lignes[0]
+                    derniere = lignes[-1]
+            if not decompresseur.eof:
+                break
+            if reste:
+                premiere, derniere = premiere or reste, reste
+            if premiere is not None:
+                membres.append((_timestamp(premiere), _timestamp(derniere), position, longueur))
+            position += longueur
+    return membres, position
+
+
+def _membres(chemin):
+    """Index des membres d'un fichier d'archive, gardé en mémoire tant qu'il ne change pas
+
+    Les fichiers ne font que grandir : un fichier agrandi n'est parcouru qu'à
+    partir de la fin du dernier membre connu. Les index (quelques dizaines
+    d'octets par lot archivé) sont limités à TAILLE_CACHE_INDEX octets par
+    processus, les moins récemment lus étant oubliés.
+    """
+    etat = os.stat(chemin)
+    with _verrou_index:
+        connu = _index_membres.pop(chemin, None)
+    if connu is not None and connu[:2] == (etat.st_mtime_ns, etat.st_size):
+        _, _, membres, fin, octets = connu
+    else:
+        membres, depart = ((), 0) if connu is None or etat.st_size < connu[1] else (connu[2], connu[3])
+        nouveaux, fin = _parcourir_membres(chemin, depart)
+        membres = membres + tuple(nouveaux)
+        octets = sys.getsizeof(membres) + sum(
+            sys.getsizeof(membre) + sys.getsizeof(membre[0]) * 2 for membre in membres
+        )
+    with _verrou_index:
+        _index_membres[chemin] = (etat.st_mtime_ns, etat.st_size, membres, fin, octets)
+        total = sum(entree[4] for entree in _index_membres.values())
+        while total > TAILLE_CACHE_INDEX and len(_index_membres) > 1:
+            total -= _index_membres.popitem(last=False)[1][4]
+    return membres
+
+
+def _lignes_archive(chemin, debut=None, fin=None):
+    """(timestamp, ligne) d'un fichier d'archive, lus en flux
+
+    Seuls les membres (lots) dont la plage recoupe [debut, fin] sont
+    décompressés, un à la fois : la pagination relit la période à chaque page
+    sans garder les archives décodées en mémoire.
+    """
+    with open(chemin, 'rb') as brut:
+        for premier, dernier, position, longueur in _membres(chemin):
+            if (debut is not None and dernier < debut) or (fin is not None and premier > fin):
+                continue
+            brut.seek(position)
+            with gzip.GzipFile(fileobj=BytesIO(brut.read(longueur))) as membre:
+                for texte in membre:
+                    ligne = json.loads(texte)
+                    yield parse_datetime(ligne['timestamp']), ligne
+
+
+def archives_pour_periode(debut=None, fin=None):
+    """Archives dont la plage recoupe [debut, fin]"""
+    archives = ArchiveAudit.objects.all()
+    if debut is not None:
+        archives = archives.filter(fin__gte=debut)
+    if fin is not None:
+        archives = archives.filter(debut__lte=fin)
+    return archives
+
+
+def _sans_accents(texte):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texte.lower()) if not unicodedata.combining(c))
+
+
+def _correspond(ligne, termes):
+    """Équivalent de la recherche plein texte (préfixes, sans accents) pour une ligne archivée"""
+    mots = _sans_accents(' '.join(
+        str(ligne.get(champ) or '') for champ in ('object_repr', 'model_name', 'user__username')
+    )).split()
+    return all(any(mot.startswith(terme) for mot in mots) for terme in map(_sans_accents, termes))
+
+
+def _entrees_mois(archive, debut, fin, filtres, exclus):
+    """Entrées archivées d'un mois retenues par les filtres, triées par (-timestamp, -id)"""
+    action, model_name, user_id, recherche, termes = filtres
+    chemin = chemin_archive(archive)
+    if not chemin.exists():
+        return []
+
+    vus = set(exclus)
+    entrees = []
+    for timestamp, ligne in _lignes_archive(str(chemin), debut, fin):
+        if (debut is not None and timestamp < debut) or (fin is not None and timestamp > fin):
+            continue
+        if ligne['id'] in vus:
+            continue
+        if action and ligne['action'] != action:
+            continue
+        if model_name and ligne.get('model_name') != model_name:
+            continue
+        if user_id and str(ligne.get('user_id')) != str(user_id):
+            continue
+        if recherche and not any(
+            recherche in (ligne.get(champ) or '').lower()
+            for champ in ('object_repr', 'user__username', 'ip_address')
+        ):
+            continue
+        if termes and not _correspond(ligne, termes):
+            continue
+        vus.add(ligne['id'])
+        entrees.append((timestamp, ligne['id'], ligne))
+
+    entrees.sort(key=lambda e: e[:2], reverse=True)
+    return entrees
+
+
+class EntreesArchivees:
+    """Entrées archivées d'une période, triées par (-timestamp, -id), lues à la demande
+
+    Les mois sont parcourus du plus récent au plus ancien ; chaque fichier
+    n'est lu que quand la position demandée l'atteint, et seul le dernier
+    mois lu reste en mémoire. Le nombre d'entrées de chaque mois est retenu :
+    après un `count()`, une page profonde ne relit que les mois qu'elle
+    recouvre. Se découpe comme une liste (triplets (timestamp, id, ligne)).
+    """
+
+    def __init__(self, archives, debut, fin, filtres):
+        # Les mois ne se recouvrent pas : l'ordre des mois est celui des entrées
+        self.archives = sorted(archives, key=lambda archive: archive.mois, reverse=True)
+        self.debut = debut
+        self.fin = fin
+        self.filtres = filtres
+        self.exclus = frozenset()
+        self._nombres = {}
+        self._dernier = (None, None)
+
+    @property
+    def plus_recente(self):
+        """Borne supérieure des timestamps archivés (index ArchiveAudit, sans lire les fichiers)"""
+        return max((archive.fin for archive in self.archives), default=None)
+
+    def exclure(self, ids):
+        """Ignore les entrées dont l'id est dans `ids` (encore présentes en base)"""
+        self.exclus = frozenset(ids)
+        self._nombres = {}
+        self._dernier = (None, None)
+
+    def _mois(self, index):
+        if self._dernier[0] != index:
+            entrees = _entrees_mois(self.archives[index], self.debut, self.fin, self.filtres, self.exclus)
+            self._nombres[index] = len(entrees)
+            self._dernier = (index, entrees)
+        return self._dernier[1]
+
+    def _nombre(self, index):
+        if index not in self._nombres:
+            self._mois(index)
+        return self._nombres[index]
+
+    def count(self):
+        return sum(self._nombre(index) for index in range(len(self.archives)))
+
+    __len__ = count
+
+    def __bool__(self):
+        return any(self._nombre(index) for index in range(len(self.archives)))
+
+    def __iter__(self):
+        for index in range(len(self.archives)):
+            yield from self._mois(index)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        debut, fin = index.start or 0, index.stop
+        resultats = []
+        position = 0
+        for mois in range(len(self.archives)):
+            if fin is not None and position >= fin:
+                break
+            nombre = self._nombres.get(mois)
+            if nombre is not None and position + nombre <= debut:
+                position += nombre
+                continue
+            entrees = self._mois(mois)
+            resultats += entrees[max(debut - position, 0):None if fin is None else max(fin - position, 0)]
+            position += len(entrees)
+        return resultats
+
+    def apres(self, position, nombre):
+        """Les `nombre` premières entrées strictement après la clé (timestamp, id) `position`"""
+        resultats = []
+        for index, archive in enumerate(self.archives):
+            if len(resultats) >= nombre:
+                break
+            # Mois entièrement plus récent que la position : rien à lire
+            if position is not None and archive.debut > position[0]:
+                continue
+            entrees = self._mois(index)
+            if position is not None:
+                entrees = [entree for entree in entrees if entree[:2] < position]
+            resultats += entrees[:nombre - len(resultats)]
+        return resultats
+
+
+def lire_archives(debut=None, fin=None, action=None, model_name=None, user_id=None, recherche=None, termes=None, archives=None):
+    """Entrées archivées de la période, filtrées, triées par (-timestamp, -id)
+
+    Les filtres reprennent ceux de l'API d'audit : action, model_name,
+    utilisateur (id), recherche sur object_repr, nom d'utilisateur et IP, et
+    termes de recherche plein texte (les archives ne sont pas indexées).
+    Retourne une séquence paresseuse (`EntreesArchivees`) de triplets
+    (timestamp, id, ligne) ; `_vers_journal` construit l'instance AuditLog
+    d'une ligne.
+    """
+    if archives is None:
+        archives = archives_pour_periode(debut, fin)
+    filtres = (action, model_name, user_id, (recherche or '').lower(), termes)
+    return EntreesArchivees(list(archives), debut, fin, filtres)
+
+
+class JournauxCombines:
+    """Entrées en base suivies des entrées archivées, triées par (-timestamp, -id)
+
+    Les entrées archivées sont toutes antérieures à l'horizon de rétention,
+    donc plus anciennes que celles restées en base : la séquence est la
+    concaténation du queryset et des archives (résultat de `lire_archives`).
+    Pendant un archivage, un lot écrit dans les fichiers mais pas encore
+    supprimé est présent des deux côtés : seule l'entrée en base est gardée.
+    Elle se découpe et se compte comme un queryset pour la pagination par
+    numéro de page, et fournit `apres()` pour la pagination par clé
+    (depenses.pagination). Les archives ne sont lues que si la page atteint
+    la fin des entrées en base, et seules les entrées archivées effectivement
+    retournées sont converties en instances AuditLog.
+    """
+    model = AuditLog
+
+    def __init__(self, queryset, archives):
+        self.queryset = queryset.order_by('-timestamp', '-id')
+        self.archives = archives
+        self._nb_en_base = None
+        # Seules les entrées en base pas plus récentes que la dernière archivée peuvent coïncider
+        if archives.plus_recente is not None:
+            archives.exclure(
+                self.queryset.filter(timestamp__lte=archives.plus_recente).order_by().values_list('id', flat=True)
+            )
+
+    def _en_base(self):
+        if self._nb_en_base is None:
+            self._nb_en_base = self.queryset.count()
+        return self._nb_en_base
+
+    def count(self):
+        return self._en_base() + self.archives.count()
+
+    __len__ = count
+
+    def iterator(self, chunk_size=2000):
+        yield from self.queryset.iterator(chunk_size=chunk_size)
+        for _, _, ligne in self.archives:
+            yield _vers_journal(ligne)
+
+    __iter__ = iterator
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        debut, fin = index.start or 0, index.stop
+        en_base = self._en_base()
+        resultats = list(self.queryset[debut:en_base if fin is None else min(fin, en_base)]) if debut < en_base else []
+        if fin is None or fin > en_base:
+            resultats += [
+                _vers_journal(ligne)
+                for _, _, ligne in self.archives[max(debut - en_base, 0):None if fin is None else fin - en_base]
+            ]
+        return resultats
+
+    def apres(self, condition, valeurs, nombre):
+        """Les `nombre` entrées suivant la position (timestamp, id) `valeurs`"""
+        queryset = self.queryset.filter(condition) if condition is not None else self.queryset
+        resultats = list(queryset[:nombre])
+        if len(resultats) < nombre:
+            position = tuple(valeurs) if valeurs is not None else None
+            resultats += [
+                _vers_journal(ligne)
+                for _, _, ligne in self.archives.apres(position, nombre - len(resultats))
+            ]
+        return resultats
@@ -0,0 +1,47 @@
+"""
+Archivage du journal d'audit au-delà de l'horizon de rétention.
+
+Usage:
+    python manage.py archiver_audit                  # horizon AUDIT_RETENTION_JOURS
+    python manage.py archiver_audit --jours 180 --lot 2000
+    python manage.py archiver_audit --simulation     # compte sans rien déplacer
+
+Les entrées sont déplacées par lots dans AUDIT_ARCHIVES_DIR/AAAA-MM.jsonl.gz
+(voir audit/archives.py) ; l'API d'audit continue de les servir lorsque la
+période demandée les recouvre. À lancer périodiquement (cron).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from audit.archives import archiver, dossier_archives, horizon_retention
+
+
+class Command(BaseCommand):
+    help = "Déplace les journaux d'audit plus anciens que l'horizon de rétention vers les archives mensuelles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, help="Horizon de rétention en jours (défaut: AUDIT_RETENTION_JOURS)")
+        parser.add_argument('--lot', type=int, default=5000, help="Nombre d'entrées déplacées par lot")
+        parser.add_argument('--simulation', action='store_true', help="Compter les entrées à archiver sans les déplacer")
+
+    def handle(self, *args, **options):
+        if options['jours'] is not None and options['jours'] < 0:
+            raise CommandError("--jours doit être positif")
+        if options['lot'] <= 0:
+            raise CommandError("--lot doit être strictement positif")
+
+        debut = time.perf_counter()
+        avant = horizon_retention(options['jours'])
+        self.stdout.write(f"Horizon: entrées antérieures au {timezone.localtime(avant):%d/%m/%Y %H:%M}")
+
+        if options['simulation']:
+            nombre = archiver(avant, simulation=True)
+            self.stdout.write(f"{nombre} entrée(s) à archiver")
+            return
+
+        total = archiver(avant, taille_lot=options['lot'], journal=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} entrée(s) archivée(s) dans {dossier_archives()} en {time.perf_counter() - debut:.1f} s"
+        ))
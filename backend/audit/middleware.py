@@ -1,21 +1,65 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.deprecation import MiddlewareMixin
 from .models import AuditLog
 from django.contrib.contenttypes.models import ContentType
 
+logger = logging.getLogger(__name__)
+
+# Entrées d'audit créées pendant la requête en cours (None hors requête)
+_journaux_requete = ContextVar('journaux_requete', default=None)
+
+
+def enregistrer_lot_journaux(journaux):
+    """Documents de recherche des entrées d'audit créées et estampille AuditLog, une fois par lot
+
+    Le nom d'utilisateur vient de l'utilisateur passé à la création
+    (log_audit) : l'entrée ne le recharge pas.
+    """
+    from depenses.estampilles import marquer_modifie
+    from depenses.recherche import indexer_en_masse
+
+    indexer_en_masse('audit', journaux, charger=False)
+    marquer_modifie(AuditLog._meta.label)
+
 
-class AuditMiddleware:
+def journal_cree(journal):
+    """Entrée d'audit enregistrée : traitée en fin de requête, ou à la validation hors requête"""
+    journaux = _journaux_requete.get()
+    if journaux is None:
+        from depenses.travaux_differes import accumuler
+
+        accumuler(('journaux_audit',), enregistrer_lot_journaux, [journal])
+    else:
+        # Ajoutée à la validation : une entrée annulée n'est pas indexée
+        transaction.on_commit(partial(journaux.append, journal))
+
+
+class AuditMiddleware(MiddlewareMixin):
     """Middleware pour capturer automatiquement les actions utilisateur"""
-    
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
+    def process_request(self, request):
         # Stocker la requête pour utilisation dans les vues
         request._audit_context = {
             'ip_address': self.get_client_ip(request),
             'user_agent': request.META.get('HTTP_USER_AGENT', ''),
         }
-        
-        response = self.get_response(request)
+        _journaux_requete.set([])
+
+    def process_response(self, request, response):
+        # Entrées d'audit de la requête indexées et signalées en une fois
+        journaux = _journaux_requete.get()
+        _journaux_requete.set(None)
+        if journaux:
+            enregistrer_lot_journaux(journaux)
         return response
 
     def get_client_ip(self, request):
@@ -27,6 +71,178 @@ class AuditMiddleware:
         return ip
 
 
+class CollecteurRequetes:
+    """Compte les requêtes SQL d'une requête HTTP et leur durée cumulée"""
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+        self.instructions = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.nombre += 1
+            self.instructions[sql] += 1
+
+    def plus_repetees(self, limite=5):
+        """Instructions SQL exécutées plusieurs fois (signe de N+1)"""
+        return [(sql, nombre) for sql, nombre in self.instructions.most_common(limite) if nombre > 1]
+
+
+def _percentile(valeurs_triees, rang):
+    if not valeurs_triees:
+        return 0
+    index = min(len(valeurs_triees) - 1, max(0, int(round(rang / 100 * len(valeurs_triees))) - 1))
+    return valeurs_triees[index]
+
+
+class StatistiquesPerformance:
+    """Derniers échantillons par route, conservés en mémoire du processus
+
+    Chaque worker gunicorn a ses propres statistiques ; elles sont perdues au
+    redémarrage.
+    """
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._routes = {}
+
+    def enregistrer(self, route, duree_ms, duree_bd_ms, nb_requetes, taille):
+        taille_max = getattr(settings, 'PERFORMANCE_ECHANTILLONS', 500)
+        with self._verrou:
+            echantillons = self._routes.get(route)
+            if echantillons is None:
+                echantillons = self._routes[route] = deque(maxlen=taille_max)
+            echantillons.append((duree_ms, duree_bd_ms, nb_requetes, taille))
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._routes.clear()
+
+    def resume(self):
+        """Percentiles par route, triés par p95 décroissant"""
+        with self._verrou:
+            routes = {route: list(echantillons) for route, echantillons in self._routes.items()}
+
+        resultat = []
+        for route, echantillons in routes.items():
+            durees = sorted(e[0] for e in echantillons)
+            durees_bd = sorted(e[1] for e in echantillons)
+            requetes = sorted(e[2] for e in echantillons)
+            tailles = [e[3] for e in echantillons]
+            resultat.append({
+                'route': route,
+                'nb_echantillons': len(echantillons),
+                'duree_ms': {
+                    'p50': _percentile(durees, 50),
+                    'p90': _percentile(durees, 90),
+                    'p95': _percentile(durees, 95),
+                    'p99': _percentile(durees, 99),
+                    'max': durees[-1],
+                },
+                'duree_bd_ms': {
+                    'p50': _percentile(durees_bd, 50),
+                    'p95': _percentile(durees_bd, 95),
+                },
+                'requetes': {
+                    'p50': _percentile(requetes, 50),
+                    'p95': _percentile(requetes, 95),
+                    'max': requetes[-1],
+                },
+                'taille_moyenne': round(sum(tailles) / len(tailles)),
+            })
+        resultat.sort(key=lambda r: r['duree_ms']['p95'], reverse=True)
+        return resultat
+
+
+statistiques_performance = StatistiquesPerformance()
+
+
+class PerformanceMiddleware:
+    """Instrumentation par requête : requêtes SQL, temps BD, temps total, taille
+
+    Ajoute un en-tête Server-Timing, journalise les requêtes lentes avec les
+    instructions SQL les plus répétées, et alimente statistiques_performance
+    (exposées par /api/audit/performance/).
+
+    Sous ASGI avec une chaîne async, les requêtes SQL s'exécutent dans les
+    threads de sync_to_async, hors de portée de execute_wrapper : seuls le
+    temps total et la taille sont mesurés.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.actif = getattr(settings, 'PERFORMANCE_INSTRUMENTATION', True)
+        self.asynchrone = iscoroutinefunction(get_response)
+        if self.asynchrone:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asynchrone:
+            return self.__acall__(request)
+        if not self.actif:
+            return self.get_response(request)
+
+        collecteur = CollecteurRequetes()
+        debut = time.perf_counter()
+        with connection.execute_wrapper(collecteur):
+            response = self.get_response(request)
+        return self.mesurer(request, response, debut, collecteur)
+
+    async def __acall__(self, request):
+        if not self.actif:
+            return await self.get_response(request)
+
+        debut = time.perf_counter()
+        response = await self.get_response(request)
+        return self.mesurer(request, response, debut, CollecteurRequetes())
+
+    def mesurer(self, request, response, debut, collecteur):
+        duree_ms = round((time.perf_counter() - debut) * 1000, 1)
+        duree_bd_ms = round(collecteur.duree * 1000, 1)
+
+        if response.streaming:
+            taille = int(response.get('Content-Length') or 0)
+        else:
+            taille = len(response.content)
+
+        if self.asynchrone:
+            response['Server-Timing'] = f'app;dur={duree_ms}'
+        else:
+            response['Server-Timing'] = (
+                f'db;dur={duree_bd_ms};desc="{collecteur.nombre} requetes SQL", '
+                f'app;dur={duree_ms}'
+            )
+
+        # Regrouper par vue plutôt que par chemin (identifiants dans l'URL)
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match:
+            route = f"{request.method} {resolver_match.view_name or resolver_match.route}"
+        else:
+            route = f"{request.method} {request.path}"
+        statistiques_performance.enregistrer(route, duree_ms, duree_bd_ms, collecteur.nombre, taille)
+
+        seuil_ms = getattr(settings, 'PERFORMANCE_SEUIL_LENT_MS', 1000)
+        seuil_requetes = getattr(settings, 'PERFORMANCE_SEUIL_REQUETES', 50)
+        if duree_ms >= seuil_ms or collecteur.nombre >= seuil_requetes:
+            repetees = '\n'.join(
+                f"    {nombre}x {sql[:300]}" for sql, nombre in collecteur.plus_repetees()
+            )
+            logger.warning(
+                f"Requête lente {request.method} {request.get_full_path()} -> {response.status_code}: "
+                f"{duree_ms} ms dont {duree_bd_ms} ms BD, {collecteur.nombre} requêtes SQL, {taille} octets"
+                + (f"\n  SQL répétées:\n{repetees}" if repetees else '')
+            )
+
+        return response
+
+
 def log_audit(action, user, obj=None, changes=None, metadata=None):
     """Fonction utilitaire pour créer une entrée d'audit"""
     if obj is None:
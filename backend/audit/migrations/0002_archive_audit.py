@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois archivé', unique=True)),
+                ('fichier', models.CharField(help_text='Chemin relatif à MEDIA_ROOT', max_length=255)),
+                ('nb_entrees', models.PositiveIntegerField(default=0)),
+                ('debut', models.DateTimeField(help_text='Plus ancienne entrée archivée')),
+                ('fin', models.DateTimeField(help_text='Plus récente entrée archivée')),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Archive d'audit",
+                'verbose_name_plural': "Archives d'audit",
+                'ordering': ['-mois'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:05
+
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deplacer_archives(apps, schema_editor):
+    """Déplace les archives de MEDIA_ROOT vers AUDIT_ARCHIVES_DIR (fichier = nom seul)"""
+    dossier = Path(settings.AUDIT_ARCHIVES_DIR)
+    for archive in apps.get_model('audit', 'ArchiveAudit').objects.all():
+        ancien = Path(settings.MEDIA_ROOT) / archive.fichier
+        nouveau = dossier / ancien.name
+        if ancien.exists() and not nouveau.exists():
+            dossier.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(ancien), str(nouveau))
+        archive.fichier = ancien.name
+        archive.save(update_fields=['fichier'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_archive_audit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archiveaudit',
+            name='fichier',
+            field=models.CharField(help_text='Nom du fichier dans AUDIT_ARCHIVES_DIR', max_length=255),
+        ),
+        migrations.RunPython(deplacer_archives, migrations.RunPython.noop),
+    ]
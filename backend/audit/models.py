@@ -42,3 +42,26 @@ class AuditLog(models.Model):
     def __str__(self):
         return f"{self.get_action_display()} - {self.model_name} - {self.timestamp}"
 
+
+
+class ArchiveAudit(models.Model):
+    """Index des archives mensuelles du journal d'audit (voir audit/archives.py)
+
+    Les entrées plus anciennes que AUDIT_RETENTION_JOURS sont déplacées dans
+    un fichier JSONL compressé par mois sous AUDIT_ARCHIVES_DIR ; cette table indique
+    quels mois sont archivés et la plage de dates qu'ils couvrent.
+    """
+    mois = models.DateField(unique=True, help_text="Premier jour du mois archivé")
+    fichier = models.CharField(max_length=255, help_text="Nom du fichier dans AUDIT_ARCHIVES_DIR")
+    nb_entrees = models.PositiveIntegerField(default=0)
+    debut = models.DateTimeField(help_text="Plus ancienne entrée archivée")
+    fin = models.DateTimeField(help_text="Plus récente entrée archivée")
+    mis_a_jour_le = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Archive d'audit"
+        verbose_name_plural = "Archives d'audit"
+        ordering = ['-mois']
+
+    def __str__(self):
+        return f"Archive audit {self.mois:%Y-%m} ({self.nb_entrees} entrées)"
@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Categorie, SousCategorie, Prevision, Operation, Imputation,
     Plat, Menu, MenuPlat, FenetreCommande, RegleSubvention, Commande, CommandeLigne, Facture, UserPermission,
-    ExtraRestauration
+    ExtraRestauration, EmailSortant, RestaurationJournaliere, RestaurationJournaliereTotal,
+    OperationJournaliere, TacheExport
 )
 
 
@@ -130,6 +131,30 @@ class FactureAdmin(admin.ModelAdmin):
     readonly_fields = ['numero_facture', 'total_commandes', 'total_brut', 'total_subvention', 'total_net', 'total_supplement', 'genere_le', 'modifie_le']
 
 
+@admin.register(RestaurationJournaliere)
+class RestaurationJournaliereAdmin(admin.ModelAdmin):
+    list_display = ['date', 'plat', 'nb_commandes', 'nb_portions', 'montant_brut', 'montant_subvention', 'montant_net', 'montant_supplement']
+    list_filter = ['date']
+    date_hierarchy = 'date'
+    raw_id_fields = ['plat']
+    readonly_fields = ['mis_a_jour_le']
+
+
+@admin.register(RestaurationJournaliereTotal)
+class RestaurationJournaliereTotalAdmin(admin.ModelAdmin):
+    list_display = ['date', 'nb_commandes', 'nb_portions', 'montant_brut', 'montant_subvention', 'montant_net', 'montant_supplement']
+    date_hierarchy = 'date'
+    readonly_fields = ['mis_a_jour_le']
+
+
+@admin.register(OperationJournaliere)
+class OperationJournaliereAdmin(admin.ModelAdmin):
+    list_display = ['date', 'categorie', 'nb_operations', 'montant_total']
+    list_filter = ['date', 'categorie']
+    date_hierarchy = 'date'
+    readonly_fields = ['mis_a_jour_le']
+
+
 @admin.register(ExtraRestauration)
 class ExtraRestaurationAdmin(admin.ModelAdmin):
     list_display = ['date_operation', 'type_extra', 'nom_personne', 'plat_nom', 'quantite', 'prix_unitaire', 'montant_total', 'created_by', 'created_at']
@@ -163,3 +188,19 @@ class UserPermissionAdmin(admin.ModelAdmin):
     raw_id_fields = ['utilisateur']
 
 
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    list_display = ['destinataire', 'sujet', 'statut', 'tentatives', 'prochaine_tentative', 'envoye_le', 'created_at']
+    list_filter = ['statut', 'created_at']
+    search_fields = ['destinataire', 'sujet']
+    raw_id_fields = ['commande']
+    readonly_fields = ['created_at', 'envoye_le', 'reserve_le', 'derniere_erreur']
+
+
+@admin.register(TacheExport)
+class TacheExportAdmin(admin.ModelAdmin):
+    list_display = ['id', 'type_export', 'demandeur', 'statut', 'nom_fichier', 'taille', 'created_at', 'termine_le']
+    list_filter = ['statut', 'type_export', 'created_at']
+    search_fields = ['demandeur__username', 'nom_fichier']
+    raw_id_fields = ['demandeur']
+    readonly_fields = ['cle', 'created_at', 'demarre_le', 'termine_le', 'erreur']
@@ -0,0 +1,272 @@
+"""
+Agrégats journaliers de restauration (RestaurationJournaliere) et des
+opérations de dépense (OperationJournaliere).
+
+Une journée est recalculée entièrement à partir des commandes validées dès
+qu'une commande entre dans l'état « validée », en sort, ou qu'une de ses
+lignes change. Le recalcul est planifié à la validation de la transaction
+(une seule fois par date et par transaction) ; les lectures faites dans la
+même transaction (factures) le déclenchent immédiatement.
+
+Les factures, le rapport mensuel et le tableau de bord cantine lisent ces
+agrégats : au plus une ligne par jour et par plat (RestaurationJournaliere)
+et une ligne de total par jour (RestaurationJournaliereTotal). Les opérations suivent
+le même principe (une ligne par jour et par catégorie), lues par les séries
+temporelles du tableau de bord (series.py).
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from . import travaux_differes
+from .estampilles import marquer_modifie
+
+CENTIMES = Decimal('0.01')
+# Prix effectif plafonné (voir CommandeLigne.prix_effectif)
+PRIX_PLAFOND = Decimal('30000.00')
+# Seuil des suppléments facturés (voir Facture.calculer_totaux)
+SEUIL_SUPPLEMENT_FACTURE = Decimal('50000')
+
+
+def _modeles(modeles):
+    if modeles is not None:
+        return modeles
+    from .models import Commande, CommandeLigne, RestaurationJournaliere, RestaurationJournaliereTotal
+    return Commande, CommandeLigne, RestaurationJournaliere, RestaurationJournaliereTotal
+
+
+def calculer_jour(commandes, lignes):
+    """Calcule les lignes d'agrégat d'une journée
+
+    Args:
+        commandes: dicts (id, montant_brut, montant_subvention, montant_net) des commandes validées
+        lignes: dicts (commande_id, plat_id, quantite, prix_unitaire) de leurs lignes
+
+    Returns:
+        (total du jour ou None, liste de dicts par plat). La subvention d'une
+        commande est répartie entre ses lignes au prorata du montant, l'arrondi
+        étant porté par la dernière ligne.
+    """
+    if not commandes:
+        return None, []
+
+    lignes_par_commande = defaultdict(list)
+    for ligne in lignes:
+        lignes_par_commande[ligne['commande_id']].append(ligne)
+
+    par_plat = defaultdict(lambda: {
+        'commandes': set(),
+        'nb_portions': 0,
+        'montant_brut': Decimal('0.00'),
+        'montant_subvention': Decimal('0.00'),
+        'montant_supplement': Decimal('0.00'),
+    })
+    total = {
+        'nb_commandes': len(commandes),
+        'nb_portions': 0,
+        'montant_brut': Decimal('0.00'),
+        'montant_subvention': Decimal('0.00'),
+        'montant_net': Decimal('0.00'),
+        'montant_supplement': Decimal('0.00'),
+    }
+
+    for commande in commandes:
+        total['montant_brut'] += commande['montant_brut']
+        total['montant_subvention'] += commande['montant_subvention']
+        total['montant_net'] += commande['montant_net']
+
+        lignes_commande = lignes_par_commande.get(commande['id'], [])
+        montants = [ligne['quantite'] * min(ligne['prix_unitaire'], PRIX_PLAFOND) for ligne in lignes_commande]
+        brut_lignes = sum(montants, Decimal('0.00'))
+        reste_subvention = commande['montant_subvention']
+
+        for index, (ligne, montant) in enumerate(zip(lignes_commande, montants)):
+            if index == len(lignes_commande) - 1:
+                part_subvention = reste_subvention
+            elif brut_lignes:
+                part_subvention = (commande['montant_subvention'] * montant / brut_lignes).quantize(CENTIMES, ROUND_HALF_UP)
+            else:
+                part_subvention = Decimal('0.00')
+            reste_subvention -= part_subvention
+
+            supplement = Decimal('0.00')
+            if ligne['prix_unitaire'] >= SEUIL_SUPPLEMENT_FACTURE:
+                supplement = (ligne['prix_unitaire'] - PRIX_PLAFOND) * ligne['quantite']
+
+            agregat = par_plat[ligne['plat_id']]
+            agregat['commandes'].add(commande['id'])
+            agregat['nb_portions'] += ligne['quantite']
+            agregat['montant_brut'] += montant
+            agregat['montant_subvention'] += part_subvention
+            agregat['montant_supplement'] += supplement
+
+            total['nb_portions'] += ligne['quantite']
+            total['montant_supplement'] += supplement
+
+    resultat = []
+    for plat_id, agregat in par_plat.items():
+        resultat.append({
+            'plat_id': plat_id,
+            'nb_commandes': len(agregat['commandes']),
+            'nb_portions': agregat['nb_portions'],
+            'montant_brut': agregat['montant_brut'],
+            'montant_subvention': agregat['montant_subvention'],
+            'montant_net': agregat['montant_brut'] - agregat['montant_subvention'],
+            'montant_supplement': agregat['montant_supplement'],
+        })
+    return total, resultat
+
+
+def rafraichir_jour(jour, modeles=None):
+    """Recalcule les agrégats d'une journée à partir des commandes validées
+
+    `modeles` permet de passer les modèles historiques depuis une migration.
+    """
+    Commande, CommandeLigne, RestaurationJournaliere, RestaurationJournaliereTotal = _modeles(modeles)
+
+    # Lectures et réécriture dans la même transaction
+    with transaction.atomic():
+        commandes = list(
+            Commande.objects.filter(date_commande=jour, etat='validee').order_by('id').values(
+                'id', 'montant_brut', 'montant_subvention', 'montant_net'
+            )
+        )
+        lignes = [
+            {
+                'commande_id': ligne['commande_id'],
+                'plat_id': ligne['menu_plat__plat_id'],
+                'quantite': ligne['quantite'],
+                'prix_unitaire': ligne['prix_unitaire'],
+            }
+            for ligne in CommandeLigne.objects.filter(
+                commande__date_commande=jour, commande__etat='validee'
+            ).order_by('commande_id', 'id').values(
+                'commande_id', 'menu_plat__plat_id', 'quantite', 'prix_unitaire'
+            )
+        ]
+
+        total, par_plat = calculer_jour(commandes, lignes)
+        RestaurationJournaliere.objects.filter(date=jour).delete()
+        RestaurationJournaliere.objects.bulk_create([
+            RestaurationJournaliere(date=jour, **valeurs) for valeurs in par_plat
+        ])
+        RestaurationJournaliereTotal.objects.filter(date=jour).delete()
+        if total is not None:
+            RestaurationJournaliereTotal.objects.create(date=jour, **total)
+        if modeles is None:
+            marquer_modifie(RestaurationJournaliere._meta.label, RestaurationJournaliereTotal._meta.label)
+
+
+def planifier_rafraichissement(jour):
+    """Planifie le recalcul d'une journée (une seule fois par transaction)"""
+    if jour is not None:
+        travaux_differes.planifier(('restauration', jour), rafraichir_jour, jour)
+
+
+def agregat_du_jour(jour):
+    """Retourne le total du jour (ou None), en appliquant un recalcul en attente"""
+    from .models import RestaurationJournaliereTotal
+
+    en_attente = travaux_differes.en_attente(('restauration', jour))
+    if en_attente:
+        en_attente()
+    return RestaurationJournaliereTotal.objects.filter(date=jour).first()
+
+
+def reconstruire(debut=None, fin=None, modeles=None):
+    """Recalcule tous les agrégats (éventuellement sur une période)
+
+    Returns:
+        Nombre de journées recalculées
+    """
+    Commande, CommandeLigne, RestaurationJournaliere, RestaurationJournaliereTotal = _modeles(modeles)
+
+    commandes = Commande.objects.filter(etat='validee')
+    agregats = RestaurationJournaliereTotal.objects.all()
+    if debut:
+        commandes = commandes.filter(date_commande__gte=debut)
+        agregats = agregats.filter(date__gte=debut)
+    if fin:
+        commandes = commandes.filter(date_commande__lte=fin)
+        agregats = agregats.filter(date__lte=fin)
+
+    # Jours avec commandes validées + jours déjà agrégés (à vider si besoin)
+    jours = set(commandes.order_by().values_list('date_commande', flat=True).distinct())
+    jours |= set(agregats.order_by().values_list('date', flat=True).distinct())
+
+    for jour in sorted(jours):
+        rafraichir_jour(jour, modeles)
+    return len(jours)
+
+
+# Opérations de dépense
+
+def _modeles_operations(modeles):
+    if modeles is not None:
+        return modeles
+    from .models import Operation, OperationJournaliere
+    return Operation, OperationJournaliere
+
+
+def rafraichir_jour_operations(jour, modeles=None):
+    """Recalcule les agrégats d'une journée d'opérations (une ligne par catégorie)"""
+    Operation, OperationJournaliere = _modeles_operations(modeles)
+
+    par_categorie = Operation.objects.filter(date_operation=jour).order_by().values('categorie_id').annotate(
+        nb_operations=Count('id'),
+        montant_total=Sum('montant_depense'),
+    )
+    with transaction.atomic():
+        OperationJournaliere.objects.filter(date=jour).delete()
+        OperationJournaliere.objects.bulk_create([
+            OperationJournaliere(date=jour, **valeurs) for valeurs in par_categorie
+        ])
+        if modeles is None:
+            marquer_modifie(OperationJournaliere._meta.label)
+
+
+def planifier_rafraichissement_operations(jour):
+    """Planifie le recalcul d'une journée d'opérations (une seule fois par transaction)"""
+    if jour is not None:
+        travaux_differes.planifier(('operations', jour), rafraichir_jour_operations, jour)
+
+
+def reconstruire_operations(debut=None, fin=None, modeles=None):
+    """Recalcule les agrégats d'opérations (éventuellement sur une période)
+
+    Une requête groupée par (jour, catégorie) et une insertion en masse.
+
+    Returns:
+        Nombre de lignes d'agrégat créées
+    """
+    Operation, OperationJournaliere = _modeles_operations(modeles)
+
+    operations = Operation.objects.all()
+    agregats = OperationJournaliere.objects.all()
+    if debut:
+        operations = operations.filter(date_operation__gte=debut)
+        agregats = agregats.filter(date__gte=debut)
+    if fin:
+        operations = operations.filter(date_operation__lte=fin)
+        agregats = agregats.filter(date__lte=fin)
+
+    lignes = [
+        OperationJournaliere(
+            date=valeurs['date_operation'],
+            categorie_id=valeurs['categorie_id'],
+            nb_operations=valeurs['nb_operations'],
+            montant_total=valeurs['montant_total'],
+        )
+        for valeurs in operations.order_by().values('date_operation', 'categorie_id').annotate(
+            nb_operations=Count('id'),
+            montant_total=Sum('montant_depense'),
+        )
+    ]
+    with transaction.atomic():
+        agregats.delete()
+        OperationJournaliere.objects.bulk_create(lignes, batch_size=2000)
+        if modeles is None:
+            marquer_modifie(OperationJournaliere._meta.label)
+    return len(lignes)
@@ -1,4 +1,9 @@
+import warnings
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class DepensesConfig(AppConfig):
@@ -8,4 +13,25 @@ class DepensesConfig(AppConfig):
 
     def ready(self):
         import depenses.signals  # noqa
+        import suivi_depense.sqlite_pragmas  # noqa
+
+        # Les exports ne sont servis qu'à leur demandeur : jamais sous /media/
+        dossier = Path(settings.EXPORTS_DIR).resolve()
+        media = Path(settings.MEDIA_ROOT).resolve()
+        if dossier == media or media in dossier.parents:
+            raise ImproperlyConfigured(
+                f"EXPORTS_DIR ({dossier}) ne doit pas se trouver dans MEDIA_ROOT ({media})"
+            )
+
+        # Compteurs des limitations (depenses/throttling.py) en mémoire locale :
+        # un compteur par worker, limites multipliées par leur nombre
+        if not settings.DEBUG:
+            from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+            from django.core.cache.backends.locmem import LocMemCache
 
+            if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+                warnings.warn(
+                    "Le cache par défaut est LocMemCache : les limitations des endpoints publics "
+                    "sont comptées par worker. Définir REDIS_URL ou CACHE_DIR.",
+                    RuntimeWarning
+                )
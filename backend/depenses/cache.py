@@ -0,0 +1,160 @@
+"""
+Cache partagé des réponses calculées (menus publics, rapports, permissions).
+
+Le cache Django (CACHES, voir settings) est commun aux workers en fichiers ou
+Redis ; la mémoire locale du développement est propre à chaque processus.
+
+Clés : `depenses:<espace>:<empreinte des paramètres>`. Chaque entrée garde les
+estampilles (voir estampilles.py) des modèles dont elle dépend : une
+modification de l'un d'eux rend l'entrée obsolète sans suppression explicite,
+pour une requête SQL par lecture (celle de l'ETag).
+
+Contre l'afflux de recalculs (midi, publication du menu) :
+- un seul recalcul à la fois par clé (verrou `cache.add`, atomique en mémoire
+  locale et Redis, au mieux en fichiers) ;
+- entrée expirée mais aux mêmes estampilles : servie telle quelle pendant
+  `delai_perime` aux autres requêtes le temps du recalcul (stale-while-revalidate) ;
+- entrée absente ou obsolète : les autres requêtes attendent le recalcul
+  (ATTENTE_MAX) plutôt que de servir des données antérieures à une
+  modification, puis calculent elles-mêmes si le verrou n'est pas libéré.
+
+`action_en_cache` applique ce cache aux actions de ViewSet et aux vues
+@api_view (données des réponses 200 uniquement).
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpRequest
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+PREFIXE = 'depenses'
+DUREE_PAR_DEFAUT = 300       # secondes de fraîcheur
+DELAI_PERIME = 60            # secondes pendant lesquelles une entrée expirée reste servie
+DUREE_VERROU = 30            # durée maximale d'un recalcul (secondes)
+ATTENTE_MAX = 2.0            # attente d'un recalcul en cours (secondes)
+INTERVALLE_ATTENTE = 0.05
+
+
+def versions(modeles):
+    """Estampilles des modèles (libellés app_label.Model), 0 pour un modèle jamais modifié"""
+    if not modeles:
+        return {}
+    from .models import EstampilleModele
+
+    trouvees = dict(EstampilleModele.objects.filter(modele__in=modeles).values_list('modele', 'version'))
+    return {modele: trouvees.get(modele, 0) for modele in modeles}
+
+
+def cle(espace, *parametres):
+    """Clé d'un espace de noms pour des paramètres quelconques (convertis en texte)"""
+    empreinte = hashlib.md5('|'.join(str(parametre) for parametre in parametres).encode('utf-8')).hexdigest()
+    return f'{PREFIXE}:{espace}:{empreinte}'
+
+
+def _verrouiller(cle_entree):
+    jeton = uuid.uuid4().hex
+    return jeton if cache.add(f'{cle_entree}:calcul', jeton, DUREE_VERROU) else None
+
+
+def _deverrouiller(cle_entree, jeton):
+    # Non atomique : au pire le verrou d'un recalcul suivant est levé plus tôt
+    if cache.get(f'{cle_entree}:calcul') == jeton:
+        cache.delete(f'{cle_entree}:calcul')
+
+
+def _calculer(cle_entree, estampilles, calculer, duree, delai_perime):
+    valeur = calculer()
+    cache.set(
+        cle_entree,
+        {'valeur': valeur, 'versions': estampilles, 'frais_jusqua': time.time() + duree},
+        duree + delai_perime
+    )
+    return valeur
+
+
+def memoriser(espace, parametres, modeles, calculer, duree=DUREE_PAR_DEFAUT, delai_perime=DELAI_PERIME):
+    """Valeur de `calculer()` en cache pour (espace, parametres)
+
+    Args:
+        espace: espace de noms de la clé (ex. 'menu_public')
+        parametres: séquence des paramètres qui distinguent les entrées
+        modeles: libellés des modèles dont une modification invalide l'entrée
+        calculer: fonction sans argument retournant une valeur sérialisable (pickle)
+        duree: fraîcheur de l'entrée (secondes)
+        delai_perime: durée supplémentaire pendant laquelle l'entrée expirée
+            est servie le temps de son recalcul
+    """
+    cle_entree = cle(espace, *parametres)
+    estampilles = versions(modeles)
+    entree = cache.get(cle_entree)
+
+    if entree is not None and entree['versions'] == estampilles:
+        if time.time() < entree['frais_jusqua']:
+            return entree['valeur']
+        jeton = _verrouiller(cle_entree)
+        if jeton is None:
+            return entree['valeur']  # recalcul en cours ailleurs
+        try:
+            return _calculer(cle_entree, estampilles, calculer, duree, delai_perime)
+        finally:
+            _deverrouiller(cle_entree, jeton)
+
+    jeton = _verrouiller(cle_entree)
+    if jeton is None:
+        limite = time.monotonic() + ATTENTE_MAX
+        while time.monotonic() < limite:
+            time.sleep(INTERVALLE_ATTENTE)
+            entree = cache.get(cle_entree)
+            if entree is not None and entree['versions'] == estampilles:
+                return entree['valeur']
+        return calculer()
+    try:
+        return _calculer(cle_entree, estampilles, calculer, duree, delai_perime)
+    finally:
+        _deverrouiller(cle_entree, jeton)
+
+
+class _ReponseNonMemorisee(Exception):
+    def __init__(self, reponse):
+        self.reponse = reponse
+
+
+def action_en_cache(espace, modeles, duree=DUREE_PAR_DEFAUT, delai_perime=DELAI_PERIME,
+                    par_utilisateur=False, variantes=None):
+    """Décorateur : données des réponses 200 d'une vue en cache partagé
+
+    La clé reprend l'URL complète (paramètres de chemin et de requête), l'id
+    de l'utilisateur si `par_utilisateur`, et `variantes(request)` pour ce qui
+    ne figure pas dans l'URL (ex. la date du jour). Les autres réponses
+    (400, 404...) ne sont pas mises en cache.
+
+        @action(detail=False, methods=['get'])
+        @action_en_cache('rapport_mensuel', ('depenses.Operation', 'depenses.Prevision'))
+        def mensuel(self, request): ...
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            parametres = [request.build_absolute_uri()]
+            if par_utilisateur:
+                parametres.append(request.user.pk)
+            if variantes is not None:
+                parametres.append(variantes(request))
+
+            def calculer():
+                reponse = vue(*args, **kwargs)
+                if reponse.status_code != 200:
+                    raise _ReponseNonMemorisee(reponse)
+                return reponse.data
+
+            try:
+                return Response(memoriser(espace, parametres, modeles, calculer, duree, delai_perime))
+            except _ReponseNonMemorisee as e:
+                return e.reponse
+        return enveloppe
+    return decorateur
@@ -0,0 +1,166 @@
+"""
+Menu public et commandes publiques des employés (sans authentification).
+
+Logique commune aux vues DRF (views.py, serveur WSGI) et aux vues async
+(views_async.py, serveur ASGI) : recherche du menu publié, menu sérialisé en
+cache partagé, création de la commande en brouillon.
+
+La facture journalière (PDF reportlab) n'est plus régénérée dans la
+transaction de la commande : elle tenait le verrou d'écriture de la base et
+le worker pendant tout le rendu. La tâche regenerer_facture (tasks.py) est
+planifiée après validation, une seule fois par date tant qu'une
+régénération de cette date n'a pas démarré.
+"""
+import hashlib
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .cache import memoriser
+from .models import Commande, CommandeLigne, Menu, MenuPlat
+from .serializers import CommandeSerializer, MenuSerializer
+
+MODELES_MENU = ('depenses.Menu', 'depenses.MenuPlat', 'depenses.Plat', 'depenses.Commande', 'depenses.CommandeLigne')
+
+
+class ErreurCommande(Exception):
+    """Requête publique refusée (message renvoyé tel quel, avec son statut HTTP)"""
+
+    def __init__(self, message, statut=400):
+        super().__init__(message)
+        self.statut = statut
+
+
+def menu_publie(token):
+    """Menu publié de ce token, ou du jour si token='aujourdhui'"""
+    if token == 'aujourdhui':
+        try:
+            return Menu.objects.get(date_menu=date.today(), publication_at__isnull=False)
+        except Menu.DoesNotExist:
+            raise ErreurCommande('Aucun menu publié pour aujourd\'hui', 404)
+    try:
+        return Menu.objects.get(token_public=token, publication_at__isnull=False)
+    except Menu.DoesNotExist:
+        raise ErreurCommande('Menu non trouvé ou non publié', 404)
+
+
+def donnees_menu_public(token, request):
+    """Menu publié sérialisé, en cache partagé (stock restant compris)"""
+    def calculer():
+        return MenuSerializer(menu_publie(token), context={'request': request}).data
+
+    # Le lien public dépend du schéma de la requête, le menu du jour de la date
+    parametres = [token, request.scheme, date.today() if token == 'aujourdhui' else '']
+    return memoriser('menu_public', parametres, MODELES_MENU, calculer, duree=60)
+
+
+def creer_commande_publique(menu, donnees):
+    """Crée la commande en brouillon d'un employé et retourne les données de la réponse
+
+    Les commandes publiques sont en brouillon : le gestionnaire les valide
+    (l'email de confirmation est envoyé à la validation).
+    """
+    nom_employe = donnees.get('nom_employe', '')
+    email_employe = donnees.get('email_employe', '')
+    lignes_data = donnees.get('lignes', [])
+
+    if not nom_employe:
+        raise ErreurCommande('Le nom de l\'employé est requis')
+    if not lignes_data:
+        raise ErreurCommande('Aucune ligne de commande')
+
+    try:
+        with transaction.atomic():
+            # Créer un utilisateur unique pour chaque commande (basé sur nom + email + date + timestamp)
+            timestamp = int(time.time() * 1000)  # millisecondes pour plus d'unicité
+            identifiant = hashlib.md5(f"{nom_employe}_{email_employe}_{menu.date_menu}_{timestamp}".encode()).hexdigest()[:12]
+            username_unique = f'commande_{menu.date_menu.strftime("%Y%m%d")}_{identifiant}'
+
+            # Stocker l'email réel si fourni, sinon utiliser un email généré
+            email_final = email_employe.strip() if email_employe and email_employe.strip() else f'{identifiant}@commande.local'
+
+            user_anonyme = User.objects.create(
+                username=username_unique,
+                email=email_final,
+                first_name=nom_employe,
+                is_active=True
+            )
+
+            # Plusieurs personnes peuvent commander le même jour
+            commande = Commande.objects.create(
+                utilisateur=user_anonyme,
+                date_commande=menu.date_menu,
+                etat='brouillon'  # En attente de validation par le gestionnaire
+            )
+
+            # Subvention de 30000 GNF uniquement sur le 1er plat (1 seule unite)
+            # Les autres plats sont au prix complet
+            total_supplement = Decimal('0.00')
+            plats_avec_supplement = []
+            subvention_utilisee = False
+
+            for ligne_data in lignes_data:
+                menu_plat_id = ligne_data.get('menu_plat_id')
+                quantite = int(ligne_data.get('quantite', 1))
+
+                try:
+                    menu_plat = MenuPlat.objects.get(pk=menu_plat_id, menu=menu)
+                except MenuPlat.DoesNotExist:
+                    raise ErreurCommande(f"MenuPlat {menu_plat_id} non trouvé")
+
+                stock_restant = menu_plat.get_stock_restant()
+                if stock_restant is not None and quantite > stock_restant:
+                    raise ErreurCommande(f"Stock insuffisant pour {menu_plat.plat.nom}")
+
+                CommandeLigne.objects.create(
+                    commande=commande,
+                    menu_plat=menu_plat,
+                    quantite=quantite,
+                    prix_unitaire=menu_plat.prix_jour
+                )
+
+                for _ in range(quantite):
+                    if not subvention_utilisee:
+                        # Premier plat: subvention de max 30000 GNF
+                        subvention = min(menu_plat.prix_jour, Decimal('30000.00'))
+                        total_supplement += menu_plat.prix_jour - subvention
+                        subvention_utilisee = True
+                    else:
+                        # Autres plats: prix complet a payer
+                        total_supplement += menu_plat.prix_jour
+
+                if menu_plat.prix_jour > 30000 or quantite > 1 or len(lignes_data) > 1:
+                    plats_avec_supplement.append({
+                        'plat': menu_plat.plat.nom,
+                        'prix_reel': float(menu_plat.prix_jour),
+                        'quantite': quantite
+                    })
+
+            commande.calculer_montants()
+            commande.save()
+
+            planifier_facture(commande.date_commande)
+
+            response_data = CommandeSerializer(commande).data
+    except (ErreurCommande, ValueError) as e:
+        raise ErreurCommande(str(e))
+    except Exception as e:
+        raise ErreurCommande(f'Erreur: {str(e)}', 500)
+
+    response_data['supplement_info'] = {
+        'total_supplement': float(total_supplement),
+        'plats_avec_supplement': plats_avec_supplement,
+        'message_supplement': f"Vous devez payer un supplément de {total_supplement:,.0f} GNF en espèces" if total_supplement > 0 else None
+    }
+    response_data['en_attente_validation'] = True
+    return response_data
+
+
+def planifier_facture(date_facture):
+    """Régénère la facture du jour en arrière-plan une fois la transaction validée"""
+    from .tasks import planifier, regenerer_facture
+
+    planifier(regenerer_facture, date_facture.isoformat(), cle=f'facture:{date_facture.isoformat()}')
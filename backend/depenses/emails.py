@@ -0,0 +1,149 @@
+"""
+File d'envoi des emails (outbox).
+
+Les vues n'envoient plus d'emails directement : elles enregistrent un
+EmailSortant une fois la transaction validée et planifient la tâche
+envoyer_emails (depenses/tasks.py), qui vide la file en réutilisant une
+seule connexion SMTP par lot, avec nouvelles tentatives espacées. La
+commande `python manage.py envoyer_emails` fait de même sans worker Celery.
+
+Chaque email est réservé avant l'envoi par une mise à jour conditionnelle
+(en_attente -> envoi) : deux envois concurrents (tâches, commande) ne
+l'envoient pas deux fois. Un email resté réservé par un envoi interrompu est
+remis en attente après EMAIL_OUTBOX_DELAI_BLOCAGE minutes.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailSortant
+
+logger = logging.getLogger(__name__)
+
+
+def mettre_en_file(destinataire, sujet, message_texte, message_html='', commande=None):
+    """Ajoute un email à la file d'envoi lorsque la transaction courante est validée
+
+    Hors d'un bloc atomique, l'email est ajouté immédiatement. Si la transaction
+    est annulée, aucun email n'est mis en file.
+    """
+    def _creer():
+        from .tasks import envoyer_emails, planifier
+
+        EmailSortant.objects.create(
+            destinataire=destinataire,
+            sujet=sujet[:255],
+            message_texte=message_texte,
+            message_html=message_html or '',
+            commande=commande,
+        )
+        planifier(envoyer_emails, cle='envoyer_emails')
+
+    transaction.on_commit(_creer)
+
+
+def delai_nouvelle_tentative(tentatives):
+    """Délai avant la prochaine tentative (backoff exponentiel plafonné)"""
+    delai_base = getattr(settings, 'EMAIL_OUTBOX_DELAI_BASE', 60)
+    delai_max = getattr(settings, 'EMAIL_OUTBOX_DELAI_MAX', 3600)
+    return timedelta(seconds=min(delai_base * 2 ** max(tentatives - 1, 0), delai_max))
+
+
+def _enregistrer_echec(email, erreur):
+    """Incrémente les tentatives et replanifie l'email, ou le passe en échec définitif"""
+    max_tentatives = getattr(settings, 'EMAIL_OUTBOX_MAX_TENTATIVES', 5)
+    email.tentatives += 1
+    email.derniere_erreur = str(erreur)[:2000]
+    email.reserve_le = None
+    if email.tentatives >= max_tentatives:
+        email.statut = 'echec'
+        logger.error(f"Email #{email.id} abandonné après {email.tentatives} tentatives: {erreur}")
+    else:
+        email.statut = 'en_attente'
+        email.prochaine_tentative = timezone.now() + delai_nouvelle_tentative(email.tentatives)
+        logger.warning(f"Email #{email.id} non envoyé (tentative {email.tentatives}): {erreur}")
+    email.save(update_fields=['tentatives', 'derniere_erreur', 'reserve_le', 'statut', 'prochaine_tentative'])
+
+
+def relancer_emails_bloques():
+    """Remet en attente les emails réservés par un envoi interrompu"""
+    delai = getattr(settings, 'EMAIL_OUTBOX_DELAI_BLOCAGE', 15)  # minutes
+    return EmailSortant.objects.filter(
+        statut='envoi',
+        reserve_le__lt=timezone.now() - timedelta(minutes=delai)
+    ).update(statut='en_attente', reserve_le=None)
+
+
+def _reserver(limite):
+    """Passe jusqu'à `limite` emails dus à « envoi » (sûr avec plusieurs envois concurrents)"""
+    maintenant = timezone.now()
+    reserves = []
+    candidats = EmailSortant.objects.filter(
+        statut='en_attente',
+        prochaine_tentative__lte=maintenant
+    ).order_by('prochaine_tentative', 'id').values_list('id', flat=True)[:limite]
+    for email_id in list(candidats):
+        if EmailSortant.objects.filter(id=email_id, statut='en_attente').update(statut='envoi', reserve_le=maintenant):
+            reserves.append(email_id)
+    return list(EmailSortant.objects.filter(id__in=reserves).order_by('prochaine_tentative', 'id'))
+
+
+def envoyer_emails_en_attente(limite=50):
+    """Envoie les emails dus en réutilisant une seule connexion SMTP
+
+    Retourne un tuple (nombre envoyés, nombre en échec).
+    """
+    relancer_emails_bloques()
+    emails = _reserver(limite)
+    if not emails:
+        return 0, 0
+
+    connexion = get_connection(fail_silently=False)
+    try:
+        connexion.open()
+    except Exception as e:
+        # Serveur SMTP injoignable : tout le lot est replanifié
+        for email in emails:
+            _enregistrer_echec(email, e)
+        return 0, len(emails)
+
+    envoyes = 0
+    echecs = 0
+    expediteur = settings.DEFAULT_FROM_EMAIL or 'support@csig.edu.gn'
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.sujet,
+                body=email.message_texte,
+                from_email=expediteur,
+                to=[email.destinataire],
+                connection=connexion,
+            )
+            if email.message_html:
+                message.attach_alternative(email.message_html, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                _enregistrer_echec(email, e)
+                echecs += 1
+                # Repartir d'une connexion propre pour les emails suivants
+                connexion.close()
+                try:
+                    connexion.open()
+                except Exception:
+                    pass
+                continue
+
+            email.statut = 'envoye'
+            email.envoye_le = timezone.now()
+            email.reserve_le = None
+            email.save(update_fields=['statut', 'envoye_le', 'reserve_le'])
+            envoyes += 1
+    finally:
+        connexion.close()
+
+    return envoyes, echecs
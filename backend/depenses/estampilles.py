@@ -0,0 +1,93 @@
+"""
+Estampilles de modification par modèle et GET conditionnels.
+
+Chaque modèle suivi a un compteur (EstampilleModele) incrémenté à la
+validation de toute transaction qui crée, modifie ou supprime une de ses
+instances (signaux, voir depenses/signals.py ; une seule incrémentation par
+modèle et par transaction). Les écritures en masse qui contournent les
+signaux (bulk_create, update, SQL direct) appellent `marquer_modifie`.
+
+Les listes de l'API calculent un ETag à partir des compteurs des modèles
+qu'elles affichent, de l'utilisateur et de l'URL complète : une seule requête
+SQL. Une requête If-None-Match inchangée reçoit un 304 sans exécuter ni
+sérialiser la liste (ListeConditionnelleMixin, `reponse_conditionnelle`).
+
+L'incrémentation a lieu après la validation : entre les deux, un ETag peut
+annoncer l'ancienne version avec des données déjà nouvelles (recalcul de
+trop au passage suivant), jamais l'inverse.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import travaux_differes
+
+
+def incrementer(modele):
+    """Incrémente immédiatement le compteur du modèle (libellé app_label.Model)"""
+    from .models import EstampilleModele
+
+    if EstampilleModele.objects.filter(modele=modele).update(version=F('version') + 1, modifie_le=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            EstampilleModele.objects.create(modele=modele, version=1)
+    except IntegrityError:
+        # Créé entre-temps par une écriture concurrente
+        EstampilleModele.objects.filter(modele=modele).update(version=F('version') + 1, modifie_le=timezone.now())
+
+
+def marquer_modifie(*modeles):
+    """Planifie l'incrémentation des compteurs (une seule fois par modèle et par transaction)"""
+    for modele in modeles:
+        travaux_differes.planifier(('estampille', modele), incrementer, modele)
+
+
+def etag(request, modeles):
+    """ETag d'une réponse dépendant des `modeles` (libellés), de l'utilisateur et de l'URL"""
+    from .models import EstampilleModele
+
+    versions = dict(
+        EstampilleModele.objects.filter(modele__in=modeles).values_list('modele', 'version')
+    )
+    utilisateur = getattr(request, 'user', None)
+    brut = '|'.join([
+        request.build_absolute_uri(),
+        str(getattr(utilisateur, 'pk', None)),
+        *(f"{modele}:{versions.get(modele, 0)}" for modele in sorted(modeles)),
+    ])
+    return f'"{hashlib.md5(brut.encode("utf-8")).hexdigest()}"'
+
+
+def reponse_conditionnelle(request, modeles, construire):
+    """Réponse 304 si l'ETag du client est à jour, sinon `construire()` avec ETag"""
+    valeur = etag(request, modeles)
+    reponse = get_conditional_response(request, etag=valeur)
+    if reponse is None:
+        reponse = construire()
+        if reponse.status_code != 200:
+            return reponse
+    reponse['ETag'] = valeur
+    # Le navigateur garde la réponse mais la revalide à chaque fois
+    patch_cache_control(reponse, private=True, no_cache=True)
+    return reponse
+
+
+class ListeConditionnelleMixin:
+    """list() conditionnel (ETag / If-None-Match) pour un ViewSet
+
+    `modeles_etag` liste les modèles (libellés app_label.Model) dont une
+    modification change le contenu de la liste, y compris ceux des
+    serializers imbriqués et ceux qui décident de la visibilité.
+    """
+    modeles_etag = ()
+
+    def list(self, request, *args, **kwargs):
+        return reponse_conditionnelle(
+            request,
+            self.modeles_etag,
+            lambda: super(ListeConditionnelleMixin, self).list(request, *args, **kwargs)
+        )
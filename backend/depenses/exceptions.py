@@ -1,3 +1,4 @@
+from rest_framework.exceptions import Throttled
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 import logging
@@ -12,16 +13,17 @@ def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
 
     if response is not None:
-        # Log the error
-        logger.error(
-            f"API Error: {exc.__class__.__name__}",
-            extra={
-                'status_code': response.status_code,
-                'detail': str(exc),
-                'view': context.get('view').__class__.__name__,
-            }
-        )
-        
+        # Log the error (except throttled requests: an abusive client would flood the logs)
+        if not isinstance(exc, Throttled):
+            logger.error(
+                f"API Error: {exc.__class__.__name__}",
+                extra={
+                    'status_code': response.status_code,
+                    'detail': str(exc),
+                    'view': context.get('view').__class__.__name__,
+                }
+            )
+
         # Customize response format
         if isinstance(response.data, dict):
             response.data = {
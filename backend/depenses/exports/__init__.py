@@ -0,0 +1,17 @@
+"""
+Génération des fichiers d'export (Excel, PDF, ...) partagée par les vues.
+
+Les modules de rendu (excel, pdf, pdf_restauration) importent openpyxl et
+reportlab : les vues les importent dans les actions d'export, jamais au
+chargement du module, pour ne pas alourdir le démarrage des workers.
+"""
+
+# Nombre d'objets lus par requête SQL
+TAILLE_LOT = 2000
+
+
+def iterer_par_lots(objets, taille=TAILLE_LOT):
+    """Itère un QuerySet (ou une séquence qui fournit iterator()) sans cache de résultats"""
+    if hasattr(objets, 'iterator'):
+        return objets.iterator(chunk_size=taille)
+    return iter(objets)
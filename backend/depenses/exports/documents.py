@@ -0,0 +1,277 @@
+"""
+Documents d'export produits à partir des paramètres de requête.
+
+Chaque producteur (PRODUCTEURS, par type d'export de TacheExport) sélectionne
+les données selon les paramètres, écrit le document dans un fichier ouvert
+en binaire et retourne (nom du fichier, type de contenu). Les actions
+d'export des vues (`reponse_document`) et les exports en arrière-plan
+(taches.py) appellent les mêmes producteurs : mêmes filtres, même rendu.
+
+Comme pdf.py et excel.py, ce module n'est importé qu'au moment d'un export.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from django.http import FileResponse
+from rest_framework.response import Response
+
+from . import iterer_par_lots
+from ..models import LotTickets, Operation, Prevision
+
+TYPE_PDF = 'application/pdf'
+TYPE_CSV = 'text/csv; charset=utf-8'
+
+LIBELLES_ACTIONS_AUDIT = {
+    'create': 'Création',
+    'update': 'Modification',
+    'delete': 'Suppression',
+    'validate': 'Validation',
+    'export': 'Export',
+    'import': 'Import',
+}
+
+
+class ParametresInvalides(ValueError):
+    """Paramètres d'export refusés (format, objet introuvable...)"""
+
+
+def _horodatage():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _ecrire_csv(fichier, entetes, lignes):
+    """CSV ; séparé par des points-virgules, avec BOM pour Excel"""
+    texte = io.TextIOWrapper(fichier, encoding='utf-8', newline='')
+    texte.write('\ufeff')
+    writer = csv.writer(texte, delimiter=';')
+    writer.writerow(entetes)
+    writer.writerows(lignes)
+    texte.flush()
+    texte.detach()
+
+
+def operations_filtrees(parametres):
+    """Opérations filtrées par date_debut, date_fin et categorie"""
+    operations = Operation.objects.select_related('categorie', 'sous_categorie', 'created_by')
+    date_debut = parametres.get('date_debut')
+    date_fin = parametres.get('date_fin')
+    categorie_id = parametres.get('categorie')
+    if date_debut:
+        operations = operations.filter(date_operation__gte=date_debut)
+    if date_fin:
+        operations = operations.filter(date_operation__lte=date_fin)
+    if categorie_id:
+        operations = operations.filter(categorie_id=categorie_id)
+    return operations
+
+
+def operations_csv(parametres, fichier):
+    _ecrire_csv(fichier, [
+        'ID', 'Date Opération', 'Jour', 'Semaine ISO', 'Catégorie', 'Code Catégorie',
+        'Sous-Catégorie', 'Unités', 'Prix Unitaire', 'Montant Dépensé',
+        'Description', 'Créé par', 'Créé le'
+    ], (
+        [
+            op.id, op.date_operation, op.jour, op.semaine_iso,
+            op.categorie.nom, op.categorie.code,
+            op.sous_categorie.nom if op.sous_categorie else '',
+            op.unites, op.prix_unitaire, op.montant_depense,
+            op.description, op.created_by.username if op.created_by else '',
+            op.created_at
+        ]
+        for op in iterer_par_lots(operations_filtrees(parametres))
+    ))
+    return 'operations.csv', TYPE_CSV
+
+
+def operations_excel(parametres, fichier):
+    from .excel import TYPE_XLSX, ecrire_classeur
+
+    entetes = [
+        'ID', 'Date Opération', 'Jour', 'Semaine ISO', 'Catégorie', 'Code Catégorie',
+        'Sous-Catégorie', 'Unités', 'Prix Unitaire (GNF)', 'Montant Dépensé (GNF)',
+        'Description', 'Créé par', 'Créé le'
+    ]
+    largeurs = [8, 15, 10, 12, 25, 12, 20, 10, 18, 18, 30, 15, 20]
+    # Données, lues par lots et écrites en flux (openpyxl write_only)
+    lignes = (
+        [
+            op.id,
+            op.date_operation.strftime('%Y-%m-%d') if op.date_operation else '',
+            op.jour,
+            op.semaine_iso,
+            op.categorie.nom if op.categorie else '',
+            op.categorie.code if op.categorie else '',
+            op.sous_categorie.nom if op.sous_categorie else '',
+            float(op.unites),
+            float(op.prix_unitaire),
+            float(op.montant_depense),
+            op.description or '',
+            op.created_by.username if op.created_by else '',
+            op.created_at.strftime('%Y-%m-%d %H:%M:%S') if op.created_at else '',
+        ]
+        for op in iterer_par_lots(operations_filtrees(parametres))
+    )
+    ecrire_classeur(fichier, "Opérations", entetes, lignes, largeurs)
+    return f'operations_{_horodatage()}.xlsx', TYPE_XLSX
+
+
+def operations_pdf(parametres, fichier):
+    from .pdf import document_operations
+
+    document_operations(
+        fichier,
+        operations_filtrees(parametres).order_by('-date_operation'),
+        parametres.get('date_debut'),
+        parametres.get('date_fin'),
+        parametres.get('categorie')
+    )
+    return f'operations_{_horodatage()}.pdf', TYPE_PDF
+
+
+def previsions_csv(parametres, fichier):
+    previsions = Prevision.objects.select_related('categorie', 'sous_categorie', 'created_by')
+    mois = parametres.get('mois')
+    if mois:
+        previsions = previsions.filter(mois__startswith=mois)
+    _ecrire_csv(fichier, [
+        'ID', 'Mois', 'Catégorie', 'Code Catégorie', 'Sous-Catégorie',
+        'Montant Prévu', 'Statut', 'Montant Imputé', 'Solde Restant',
+        'Créé par', 'Créé le'
+    ], (
+        [
+            prev.id, prev.mois, prev.categorie.nom, prev.categorie.code,
+            prev.sous_categorie.nom if prev.sous_categorie else '',
+            prev.montant_prevu, prev.get_statut_display(),
+            prev.montant_impute, prev.solde_restant,
+            prev.created_by.username if prev.created_by else '',
+            prev.created_at
+        ]
+        for prev in previsions
+    ))
+    return 'previsions.csv', TYPE_CSV
+
+
+def _rapport_mensuel(parametres):
+    from ..rapports import rapport_mensuel_en_cache
+
+    mois = parametres.get('mois')
+    if not mois:
+        raise ParametresInvalides('Paramètre mois requis')
+    try:
+        return mois, rapport_mensuel_en_cache(mois)
+    except ValueError:
+        raise ParametresInvalides('Format de date invalide')
+
+
+def rapport_pdf(parametres, fichier):
+    from .pdf import document_rapport_mensuel
+
+    mois, rapport_data = _rapport_mensuel(parametres)
+    document_rapport_mensuel(fichier, mois, rapport_data)
+    return f'rapport_{mois}.pdf', TYPE_PDF
+
+
+def rapport_excel(parametres, fichier):
+    from .excel import TYPE_XLSX, classeur_rapport_mensuel
+
+    mois, rapport_data = _rapport_mensuel(parametres)
+    classeur_rapport_mensuel(fichier, mois, rapport_data)
+    return f'rapport_{mois}.xlsx', TYPE_XLSX
+
+
+def _journaux_audit(parametres):
+    from audit.views import journaux_exportes
+
+    try:
+        return journaux_exportes(parametres)
+    except ValueError:
+        raise ParametresInvalides('Paramètre user invalide')
+
+
+def audit_excel(parametres, fichier):
+    from .excel import TYPE_XLSX, ecrire_classeur
+
+    entetes = ['Timestamp', 'Action', 'Utilisateur', 'Modèle', 'Objet', 'IP', 'User Agent']
+    largeurs = [20, 15, 15, 15, 40, 15, 30]
+    # Lues par lots (utilisateur joint) et écrites en flux (openpyxl write_only)
+    lignes = (
+        [
+            log.timestamp.strftime('%d/%m/%Y %H:%M:%S'),
+            LIBELLES_ACTIONS_AUDIT.get(log.action, log.action),
+            log.user.username if log.user else '-',
+            log.model_name or '-',
+            log.object_repr or '-',
+            log.ip_address or '-',
+            log.user_agent or '-',
+        ]
+        for log in iterer_par_lots(_journaux_audit(parametres))
+    )
+    ecrire_classeur(fichier, "Journaux d'Audit", entetes, lignes, largeurs)
+    return f'journaux_audit_{_horodatage()}.xlsx', TYPE_XLSX
+
+
+def audit_pdf(parametres, fichier):
+    from .pdf import document_journaux_audit
+
+    document_journaux_audit(fichier, _journaux_audit(parametres), parametres)
+    return f'journaux_audit_{_horodatage()}.pdf', TYPE_PDF
+
+
+def planche_tickets(lot, fichier):
+    """Planche des tickets disponibles d'un lot déjà chargé"""
+    from .pdf_restauration import document_tickets
+
+    document_tickets(fichier, lot, lot.tickets.filter(statut='disponible'))
+    return f'tickets_{lot.nom}_{lot.id}.pdf', TYPE_PDF
+
+
+def tickets_pdf(parametres, fichier):
+    try:
+        lot = LotTickets.objects.get(pk=parametres.get('pk'))
+    except (LotTickets.DoesNotExist, ValueError):
+        raise ParametresInvalides('Lot de tickets introuvable')
+    return planche_tickets(lot, fichier)
+
+
+PRODUCTEURS = {
+    'operations_pdf': operations_pdf,
+    'operations_excel': operations_excel,
+    'operations_csv': operations_csv,
+    'previsions_csv': previsions_csv,
+    'rapport_pdf': rapport_pdf,
+    'rapport_excel': rapport_excel,
+    'audit_pdf': audit_pdf,
+    'audit_excel': audit_excel,
+    'tickets_pdf': tickets_pdf,
+}
+
+
+def produire(type_export, parametres, fichier):
+    """Écrit le document `type_export` dans `fichier`, retourne (nom du fichier, type de contenu)"""
+    return PRODUCTEURS[type_export](parametres, fichier)
+
+
+def reponse_fichier(ecrire):
+    """FileResponse du document écrit par `ecrire(fichier)` dans un fichier temporaire, ou réponse 400
+
+    `ecrire` retourne (nom du fichier, type de contenu) comme les producteurs.
+    """
+    fichier = tempfile.TemporaryFile()
+    try:
+        nom, type_contenu = ecrire(fichier)
+        fichier.seek(0)
+    except ParametresInvalides as e:
+        fichier.close()
+        return Response({'error': str(e)}, status=400)
+    except Exception:
+        fichier.close()
+        raise
+    return FileResponse(fichier, as_attachment=True, filename=nom, content_type=type_contenu)
+
+
+def reponse_document(type_export, parametres):
+    """FileResponse du document `type_export`, ou réponse 400 si les paramètres sont refusés"""
+    return reponse_fichier(lambda fichier: produire(type_export, parametres, fichier))
@@ -0,0 +1,113 @@
+"""
+Export Excel en flux.
+
+Le classeur est écrit en mode write_only d'openpyxl : chaque ligne est
+sérialisée dès qu'elle est ajoutée, sans garder de cellules en mémoire.
+Les objets sont lus par lots (`iterator(chunk_size=...)`), les clés
+étrangères devant être jointes en amont (select_related). Le fichier est
+produit dans un fichier temporaire puis servi par FileResponse, qui le lit
+par blocs et le ferme (donc le supprime) en fin de réponse (voir
+exports/documents.py).
+
+Comme exports/pdf.py, ce module (et openpyxl) n'est importé par les vues
+qu'au moment d'un export.
+"""
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ENTETE_FOND = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+ENTETE_POLICE = Font(bold=True, color="FFFFFF", size=11)
+ENTETE_ALIGNEMENT = Alignment(horizontal='center', vertical='center')
+
+
+def ecrire_classeur(fichier, titre, entetes, lignes, largeurs=None):
+    """Écrit un classeur d'une feuille (en-têtes stylés puis `lignes`) dans `fichier`
+
+    `lignes` est un itérable de listes de valeurs, consommé une seule fois.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titre[:31])
+
+    # En mode write_only, les largeurs doivent être fixées avant la première ligne
+    for index, largeur in enumerate(largeurs or [], 1):
+        ws.column_dimensions[get_column_letter(index)].width = largeur
+
+    ligne_entete = []
+    for entete in entetes:
+        cellule = WriteOnlyCell(ws, value=entete)
+        cellule.fill = ENTETE_FOND
+        cellule.font = ENTETE_POLICE
+        cellule.alignment = ENTETE_ALIGNEMENT
+        ligne_entete.append(cellule)
+    ws.append(ligne_entete)
+
+    for ligne in lignes:
+        ws.append(ligne)
+
+    wb.save(fichier)
+
+
+def classeur_rapport_mensuel(fichier, mois, rapport_data):
+    """Rapport mensuel : indicateurs généraux et tableau par catégorie"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = f"Rapport {mois}"
+    
+    # Styles
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    title_font = Font(bold=True, size=14)
+    
+    # Titre
+    ws['A1'] = f"Rapport Mensuel - {mois}"
+    ws['A1'].font = title_font
+    ws.merge_cells('A1:B1')
+    
+    # Informations générales
+    row = 3
+    info_labels = ['Période', 'Total Dépenses', 'Total Prévu', 'Écart Global', 'Nombre d\'opérations', 'Moyenne Journalière']
+    info_values = [
+        f"{rapport_data['date_debut']} au {rapport_data['date_fin']}",
+        f"{rapport_data['total_depenses']:,.2f} GNF",
+        f"{rapport_data['total_prevu']:,.2f} GNF",
+        f"{rapport_data['ecart_global']:,.2f} GNF",
+        str(rapport_data['nombre_operations']),
+        f"{rapport_data['moyenne_journaliere']:,.2f} GNF"
+    ]
+    
+    for label, value in zip(info_labels, info_values):
+        ws[f'A{row}'] = label
+        ws[f'B{row}'] = value
+        ws[f'A{row}'].font = Font(bold=True)
+        row += 1
+    
+    # Tableau des catégories
+    row += 2
+    headers = ['Catégorie', 'Total Dépense', 'Montant Prévu', 'Écart', 'Nb Opérations']
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=row, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+    
+    row += 1
+    for cat in rapport_data['categories']:
+        ws.cell(row=row, column=1, value=f"{cat['categorie_code']} - {cat['categorie_nom']}")
+        ws.cell(row=row, column=2, value=f"{cat['total_depense']:,.2f} GNF")
+        ws.cell(row=row, column=3, value=f"{cat['montant_prevu']:,.2f} GNF")
+        ws.cell(row=row, column=4, value=f"{cat['ecart']:,.2f} GNF")
+        ws.cell(row=row, column=5, value=cat['nombre_operations'])
+        row += 1
+    
+    # Ajuster la largeur des colonnes
+    ws.column_dimensions['A'].width = 30
+    ws.column_dimensions['B'].width = 15
+    ws.column_dimensions['C'].width = 15
+    ws.column_dimensions['D'].width = 15
+    ws.column_dimensions['E'].width = 15
+    
+    wb.save(fichier)
@@ -0,0 +1,430 @@
+"""
+Rendu PDF des exports : opérations, rapport mensuel, journaux d'audit.
+
+reportlab n'est importé qu'avec ce module, chargé par les actions d'export
+au moment de l'appel : les workers ne paient pas cet import au démarrage
+(voir `python manage.py benchmark_demarrage`). Chaque fonction écrit le
+document dans `fichier` (réponse HTTP, fichier ouvert ou chemin) ; logo et
+styles viennent de exports/ressources_pdf.py, chargés une fois par processus.
+
+Au-delà de settings.PDF_SEUIL_CANEVAS lignes, le tableau n'est plus un Table
+platypus mais est dessiné directement sur le canevas, page par page
+(exports/pdf_tableau.py).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from . import iterer_par_lots
+from .pdf_tableau import ecrire_tableau
+from .ressources_pdf import en_tete_logo, feuille_styles
+
+# Colonnes des tableaux : (en-tête, largeur, alignement)
+COLONNES_OPERATIONS = [
+    ('Date', 1*inch, 'LEFT'),
+    ('Catégorie', 1.5*inch, 'LEFT'),
+    ('Sous-Cat.', 1*inch, 'LEFT'),
+    ('Unités', 0.8*inch, 'RIGHT'),
+    ('Prix Unit.', 1.1*inch, 'RIGHT'),
+    ('Montant', 1.1*inch, 'RIGHT'),
+    ('Description', 1.5*inch, 'LEFT'),
+]
+COLONNES_CATEGORIES = [
+    ('Catégorie', 2*inch, 'CENTER'),
+    ('Total Dépense', 1.5*inch, 'CENTER'),
+    ('Montant Prévu', 1.5*inch, 'CENTER'),
+    ('Écart', 1.5*inch, 'CENTER'),
+    ('Nb Opérations', 1*inch, 'CENTER'),
+]
+COLONNES_AUDIT = [
+    ('Timestamp', 1.2*inch, 'CENTER'),
+    ('Action', 1*inch, 'LEFT'),
+    ('Utilisateur', 1*inch, 'LEFT'),
+    ('Modèle', 1*inch, 'LEFT'),
+    ('Objet', 2.5*inch, 'LEFT'),
+    ('IP', 1*inch, 'LEFT'),
+]
+
+ACTION_LABELS = {
+    'create': 'Création',
+    'update': 'Modification',
+    'delete': 'Suppression',
+    'validate': 'Validation',
+    'export': 'Export',
+    'import': 'Import',
+}
+
+
+def clean_text(text, max_length=50):
+    """Nettoie et encode correctement le texte pour le PDF"""
+    if text is None:
+        return '-'
+    # Convertir en string et nettoyer
+    text = str(text)
+    # Remplacer les caractères problématiques
+    text = text.replace('\x00', '')  # Supprimer les null bytes
+    text = text.replace('\n', ' ')  # Remplacer les retours à la ligne
+    text = text.replace('\r', ' ')  # Remplacer les retours chariot
+    # Encoder en UTF-8 et décoder pour s'assurer que c'est valide
+    try:
+        text = text.encode('utf-8', errors='ignore').decode('utf-8')
+    except:
+        text = text.encode('ascii', errors='ignore').decode('ascii')
+    # Limiter la longueur pour éviter les problèmes d'affichage
+    text = text.strip()
+    if len(text) > max_length:
+        # Tronquer à un espace pour éviter de couper au milieu d'un mot
+        truncated = text[:max_length]
+        last_space = truncated.rfind(' ')
+        if last_space > max_length * 0.7:  # Si on trouve un espace dans les 70% derniers caractères
+            text = truncated[:last_space] + '...'
+        else:
+            text = truncated + '...'
+    return text
+
+
+def format_montant(montant):
+    """Formate un montant Decimal en string propre"""
+    try:
+        if montant is None:
+            return '-'
+        # Convertir en Decimal si nécessaire
+        if isinstance(montant, (int, float)):
+            montant = Decimal(str(montant))
+        # Formater avec séparateur de milliers
+        return f"{montant:,.0f} GNF"
+    except Exception as e:
+        print(f"Erreur formatage montant: {e}, valeur: {montant}")
+        return str(montant) if montant else '-'
+
+
+def clean_ip(ip_address):
+    """Nettoie et valide l'adresse IP"""
+    if not ip_address:
+        return '-'
+    try:
+        ip_str = str(ip_address).strip()
+        # Vérifier que ce n'est pas None ou une valeur invalide
+        if not ip_str or ip_str == 'None' or ip_str.lower() == 'none':
+            return '-'
+        # Vérifier que ça ressemble à une IP (contient des points ou des deux-points)
+        if '.' in ip_str or ':' in ip_str:
+            # Limiter la longueur (IPv6 peut être long)
+            if len(ip_str) > 45:
+                return ip_str[:42] + '...'
+            return ip_str
+        else:
+            # Si ça ne ressemble pas à une IP, retourner '-'
+            return '-'
+    except Exception:
+        return '-'
+
+
+def ligne_operation(op):
+    return [
+        op.date_operation.strftime('%d/%m/%Y') if op.date_operation else '-',
+        clean_text(op.categorie.nom if op.categorie else '-', max_length=25),
+        clean_text(op.sous_categorie.nom if op.sous_categorie else '-', max_length=20),
+        f"{float(op.unites):,.2f}",
+        format_montant(op.prix_unitaire),
+        format_montant(op.montant_depense),
+        clean_text(op.description or '-', max_length=40)
+    ]
+
+
+def ligne_categorie(cat):
+    return [
+        f"{cat['categorie_code']} - {cat['categorie_nom']}",
+        f"{cat['total_depense']:,.2f} GNF",
+        f"{cat['montant_prevu']:,.2f} GNF",
+        f"{cat['ecart']:,.2f} GNF",
+        str(cat['nombre_operations'])
+    ]
+
+
+def ligne_audit(log):
+    return [
+        log.timestamp.strftime('%d/%m/%Y\n%H:%M:%S'),
+        clean_text(ACTION_LABELS.get(log.action, log.action), max_length=15),
+        clean_text(log.user.username if log.user else '-', max_length=20),
+        clean_text(log.model_name or '-', max_length=20),
+        clean_text(log.object_repr or '-', max_length=50),
+        clean_ip(log.ip_address)
+    ]
+
+
+def document_operations(fichier, operations, date_debut=None, date_fin=None, categorie_id=None):
+    """Liste des opérations : en-tête, filtres appliqués, détail et totaux"""
+    doc = SimpleDocTemplate(fichier, pagesize=A4)
+    elements = []
+    styles = feuille_styles()
+    nombre = operations.count()
+    
+    # En-tête avec logo
+    header_table = en_tete_logo("<b>CSIG</b><br/>OPÉRATIONS")
+    if header_table is not None:
+        elements.append(header_table)
+    else:
+        title = Paragraph("CSIG - OPÉRATIONS", styles['TitleCentered'])
+        elements.append(title)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Informations de l'export
+    info_data = [
+        ['Date d\'export:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Nombre d\'opérations:', str(nombre)],
+    ]
+    if date_debut:
+        info_data.append(['Date début:', date_debut])
+    if date_fin:
+        info_data.append(['Date fin:', date_fin])
+    if categorie_id:
+        try:
+            from ..models import Categorie
+            categorie = Categorie.objects.get(pk=categorie_id)
+            info_data.append(['Catégorie:', categorie.nom])
+        except:
+            pass
+    
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Tableau des opérations
+    elements.append(Paragraph("<b>DÉTAILS DES OPÉRATIONS</b>", styles['Heading2Left']))
+    elements.append(Spacer(1, 0.1*inch))
+    
+    # Au-delà du seuil, le tableau est dessiné sur le canevas (opérations lues par lots)
+    sur_canevas = nombre > settings.PDF_SEUIL_CANEVAS
+    avant_tableau = len(elements)
+    if not sur_canevas:
+        # Préparer les données du tableau
+        table_data = [[entete for entete, _, _ in COLONNES_OPERATIONS]]
+    
+        for op in operations:
+            table_data.append(ligne_operation(op))
+    
+        # Créer le tableau avec largeurs ajustées
+        audit_table = Table(table_data, colWidths=[largeur for _, largeur, _ in COLONNES_OPERATIONS])
+        audit_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (3, 0), (5, -1), 'RIGHT'),  # Colonnes numériques alignées à droite (Unités, Prix, Montant)
+            ('ALIGN', (6, 0), (6, -1), 'LEFT'),  # Description alignée à gauche
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ('WORDWRAP', (0, 0), (-1, -1)),  # Permettre le retour à la ligne
+        ]))
+    
+        elements.append(audit_table)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Totaux
+    if nombre:
+        if sur_canevas:
+            total_montant = operations.aggregate(total=Sum('montant_depense'))['total'] or 0
+        else:
+            total_montant = sum(op.montant_depense for op in operations)
+        total_data = [
+            ['Total des opérations:', str(nombre)],
+            ['Total montant dépensé:', f"{total_montant:,.0f} GNF"],
+        ]
+        total_table = Table(total_data, colWidths=[3*inch, 3*inch])
+        total_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
+        ]))
+        elements.append(total_table)
+    
+    # Pied de page
+    elements.append(Spacer(1, 0.3*inch))
+    footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}"
+    footer = Paragraph(footer_text, styles['Footer'])
+    elements.append(footer)
+    
+    # Construire le PDF
+    if sur_canevas:
+        lignes = (ligne_operation(op) for op in iterer_par_lots(operations))
+        ecrire_tableau(fichier, COLONNES_OPERATIONS, lignes,
+                       avant=elements[:avant_tableau], apres=elements[avant_tableau:])
+    else:
+        doc.build(elements)
+
+
+def document_rapport_mensuel(fichier, mois, rapport_data):
+    """Rapport mensuel : indicateurs généraux et tableau par catégorie"""
+    doc = SimpleDocTemplate(fichier, pagesize=A4)
+    elements = []
+    styles = feuille_styles()
+    
+    # Titre
+    title = Paragraph(f"Rapport Mensuel - {mois}", styles['Title'])
+    elements.append(title)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Informations générales
+    info_data = [
+        ['Période', f"{rapport_data['date_debut']} au {rapport_data['date_fin']}"],
+        ['Total Dépenses', f"{rapport_data['total_depenses']:,.2f} GNF"],
+        ['Total Prévu', f"{rapport_data['total_prevu']:,.2f} GNF"],
+        ['Écart Global', f"{rapport_data['ecart_global']:,.2f} GNF"],
+        ['Nombre d\'opérations', str(rapport_data['nombre_operations'])],
+        ['Moyenne Journalière', f"{rapport_data['moyenne_journaliere']:,.2f} GNF"],
+    ]
+    
+    info_table = Table(info_data, colWidths=[2*inch, 3*inch])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.grey),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Tableau des catégories (sur le canevas au-delà du seuil)
+    if len(rapport_data['categories']) > settings.PDF_SEUIL_CANEVAS:
+        lignes = (ligne_categorie(cat) for cat in rapport_data['categories'])
+        ecrire_tableau(fichier, COLONNES_CATEGORIES, lignes, avant=elements, fond_entete=colors.darkblue)
+        return
+    
+    cat_data = [[entete for entete, _, _ in COLONNES_CATEGORIES]]
+    
+    for cat in rapport_data['categories']:
+        cat_data.append(ligne_categorie(cat))
+    
+    cat_table = Table(cat_data, colWidths=[largeur for _, largeur, _ in COLONNES_CATEGORIES])
+    cat_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+    ]))
+    elements.append(cat_table)
+    
+    doc.build(elements)
+
+
+def document_journaux_audit(fichier, journaux, filtres):
+    """Journaux d'audit : en-tête, filtres appliqués (paramètres de requête) et détail"""
+    doc = SimpleDocTemplate(fichier, pagesize=A4)
+    elements = []
+    styles = feuille_styles()
+    nombre = journaux.count()
+    
+    # En-tête avec logo
+    header_table = en_tete_logo("<b>CSIG</b><br/>JOURNAUX D'AUDIT")
+    if header_table is not None:
+        elements.append(header_table)
+    else:
+        title = Paragraph("CSIG - JOURNAUX D'AUDIT", styles['TitleCentered'])
+        elements.append(title)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Informations de l'export
+    info_data = [
+        ['Date d\'export:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
+        ['Nombre d\'entrées:', str(nombre)],
+    ]
+    if filtres.get('action'):
+        info_data.append(['Action filtrée:', filtres.get('action')])
+    if filtres.get('model_name'):
+        info_data.append(['Modèle filtré:', filtres.get('model_name')])
+    if filtres.get('timestamp_after'):
+        info_data.append(['Date début:', filtres.get('timestamp_after')])
+    if filtres.get('timestamp_before'):
+        info_data.append(['Date fin:', filtres.get('timestamp_before')])
+    
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Tableau des journaux
+    elements.append(Paragraph("<b>DÉTAILS DES JOURNAUX D'AUDIT</b>", styles['Heading2Left']))
+    elements.append(Spacer(1, 0.1*inch))
+    
+    # Au-delà du seuil, le tableau est dessiné sur le canevas (journaux lus par lots)
+    sur_canevas = nombre > settings.PDF_SEUIL_CANEVAS
+    avant_tableau = len(elements)
+    if not sur_canevas:
+        # Préparer les données du tableau
+        table_data = [[entete for entete, _, _ in COLONNES_AUDIT]]
+    
+        for log in journaux:
+            table_data.append(ligne_audit(log))
+    
+        # Créer le tableau
+        audit_table = Table(table_data, colWidths=[largeur for _, largeur, _ in COLONNES_AUDIT])
+        audit_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),  # Timestamp centré
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ]))
+    
+        elements.append(audit_table)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Pied de page
+    footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}"
+    footer = Paragraph(footer_text, styles['Footer'])
+    elements.append(footer)
+    
+    # Construire le PDF
+    if sur_canevas:
+        lignes = (ligne_audit(log) for log in iterer_par_lots(journaux))
+        ecrire_tableau(fichier, COLONNES_AUDIT, lignes,
+                       avant=elements[:avant_tableau], apres=elements[avant_tableau:])
+    else:
+        doc.build(elements)
@@ -0,0 +1,363 @@
+"""
+Rendu PDF de la restauration : factures journalières et planches de tickets.
+
+Comme exports/pdf.py, ce module (et reportlab) n'est chargé qu'à la première
+génération de facture ou impression de tickets. Logo et styles : voir
+exports/ressources_pdf.py.
+"""
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from ..models import Commande
+from .ressources_pdf import en_tete_logo, feuille_styles, logo
+
+
+def generer_pdf_facture(facture):
+    """Génère le PDF d'une facture sous MEDIA_ROOT/factures/ et retourne son chemin"""
+    # Créer le répertoire si nécessaire
+    media_root = settings.MEDIA_ROOT if hasattr(settings, 'MEDIA_ROOT') else 'media'
+    factures_dir = os.path.join(media_root, 'factures')
+    os.makedirs(factures_dir, exist_ok=True)
+    
+    # Nom du fichier
+    filename = f'facture_{facture.date_facture.strftime("%Y%m%d")}.pdf'
+    filepath = os.path.join(factures_dir, filename)
+    
+    # Créer le document PDF avec encodage UTF-8
+    doc = SimpleDocTemplate(filepath, pagesize=A4)
+    elements = []
+    styles = feuille_styles()
+    
+    # Récupérer les commandes de la date
+    commandes = Commande.objects.filter(
+        date_commande=facture.date_facture,
+        etat='validee'
+    ).select_related('utilisateur').prefetch_related('lignes__menu_plat__plat')
+    
+    # En-tête avec logo et nom de l'entreprise
+    header_table = en_tete_logo("<b>CSIG</b><br/>FACTURE JOURNALIÈRE - RESTAURATION")
+    if header_table is not None:
+        elements.append(header_table)
+    else:
+        # Si le logo n'existe pas, utiliser seulement le texte
+        company_name = Paragraph("<b>CSIG</b>", styles['Heading1'])
+        company_name.hAlign = 'CENTER'
+        elements.append(company_name)
+        title = Paragraph(f"<b>FACTURE JOURNALIÈRE - RESTAURATION</b>", styles['Title'])
+        title.hAlign = 'CENTER'
+        elements.append(title)
+    
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Informations de la facture
+    info_data = [
+        ['Numéro de facture:', facture.numero_facture],
+        ['Date:', facture.date_facture.strftime('%d/%m/%Y')],
+        ['Nombre de commandes:', str(facture.total_commandes)],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Détails des commandes - Un seul tableau pour toutes les commandes
+    elements.append(Paragraph("<b>DÉTAILS DES COMMANDES</b>", styles['Heading2']))
+    elements.append(Spacer(1, 0.1*inch))
+    
+    # Créer un seul tableau avec toutes les commandes (sans colonne supplément)
+    all_lignes_data = [['Commande', 'Plat', 'Quantité', 'Prix unitaire', 'Montant']]
+    
+    # Fonction pour nettoyer et encoder correctement les chaînes
+    def clean_text(text):
+        """Nettoie et encode correctement le texte pour le PDF"""
+        if text is None:
+            return ''
+        # Convertir en string et nettoyer
+        text = str(text)
+        # Remplacer les caractères problématiques
+        text = text.replace('\x00', '')  # Supprimer les null bytes
+        # Encoder en UTF-8 et décoder pour s'assurer que c'est valide
+        try:
+            text = text.encode('utf-8', errors='ignore').decode('utf-8')
+        except:
+            text = text.encode('ascii', errors='ignore').decode('ascii')
+        return text.strip()
+    
+    for commande in commandes:
+        # Utiliser le nom (first_name) ou username, nettoyé
+        nom_utilisateur = ''
+        if commande.utilisateur:
+            nom_utilisateur = commande.utilisateur.first_name or commande.utilisateur.username or 'Anonyme'
+        else:
+            nom_utilisateur = 'Anonyme'
+        
+        nom_utilisateur = clean_text(nom_utilisateur)
+        commande_label = f"#{commande.id} - {nom_utilisateur}"
+        
+        # Total de la commande (limité à 30 000 GNF par plat)
+        total_commande = Decimal('0.00')
+        
+        # Lignes de la commande
+        for ligne in commande.lignes.all():
+            # Limiter le prix unitaire à 30 000 GNF pour la facture
+            prix_unitaire_facture = min(ligne.prix_unitaire, Decimal('30000.00'))
+            montant_ligne_facture = prix_unitaire_facture * ligne.quantite
+            total_commande += montant_ligne_facture
+            
+            # Nettoyer le nom du plat
+            nom_plat = clean_text(ligne.menu_plat.plat.nom if ligne.menu_plat and ligne.menu_plat.plat else 'Plat inconnu')
+            
+            all_lignes_data.append([
+                clean_text(commande_label),
+                nom_plat,
+                str(ligne.quantite),
+                f"{prix_unitaire_facture:,.0f} GNF",
+                f"{montant_ligne_facture:,.0f} GNF"
+            ])
+        
+        # Ajouter la ligne TOTAL pour cette commande
+        all_lignes_data.append([
+            clean_text(f"TOTAL #{commande.id}"),
+            '',
+            '',
+            '',
+            f"{total_commande:,.0f} GNF"
+        ])
+        # Ligne vide pour séparer les commandes
+        all_lignes_data.append(['', '', '', '', ''])
+    
+    # Créer le tableau unique avec tous les styles (5 colonnes au lieu de 6)
+    table_styles = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ]
+    
+    # Identifier les lignes TOTAL et leur appliquer le style gras
+    # Parcourir toutes les lignes et identifier celles qui commencent par "TOTAL"
+    for row_idx in range(1, len(all_lignes_data)):
+        if len(all_lignes_data[row_idx]) > 0 and str(all_lignes_data[row_idx][0]).startswith('TOTAL'):
+            table_styles.append(('FONTNAME', (0, row_idx), (-1, row_idx), 'Helvetica-Bold'))
+            table_styles.append(('BACKGROUND', (0, row_idx), (-1, row_idx), colors.lightgrey))
+    
+    all_cmd_table = Table(all_lignes_data, colWidths=[2*inch, 2.5*inch, 0.7*inch, 1.2*inch, 1.2*inch])
+    all_cmd_table.setStyle(TableStyle(table_styles))
+    
+    elements.append(all_cmd_table)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Totaux généraux (sans suppléments, limité à 30 000 GNF par plat)
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph("<b>RÉCAPITULATIF</b>", styles['Heading2']))
+    
+    # Calculer le total facturé (limité à 30 000 GNF par plat)
+    total_facture_brut = Decimal('0.00')
+    for commande in commandes:
+        for ligne in commande.lignes.all():
+            prix_unitaire_facture = min(ligne.prix_unitaire, Decimal('30000.00'))
+            total_facture_brut += prix_unitaire_facture * ligne.quantite
+    
+    # La subvention reste la même (basée sur 30 000 GNF max)
+    total_facture_net = total_facture_brut - facture.total_subvention
+    
+    total_data = [
+        ['Total Brut (limité à 30 000 GNF/plat):', f"{total_facture_brut:,.0f} GNF"],
+        ['Total Subvention:', f"-{facture.total_subvention:,.0f} GNF"],
+        ['Total Net:', f"{total_facture_net:,.0f} GNF"],
+    ]
+    total_table = Table(total_data, colWidths=[3*inch, 3*inch])
+    total_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -2), 'Helvetica'),  # Lignes normales
+        ('FONTNAME', (1, -1), (1, -1), 'Helvetica-Bold'),  # Dernière ligne en gras
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
+    ]))
+    elements.append(total_table)
+    
+    # Pied de page (sans balises HTML)
+    elements.append(Spacer(1, 0.3*inch))
+    footer_text = f"Facture générée le {timezone.now().strftime('%d/%m/%Y à %H:%M')}"
+    footer = Paragraph(footer_text, styles['NormalCentered'])
+    elements.append(footer)
+    
+    # Construire le PDF
+    doc.build(elements)
+    
+    return filepath
+
+
+def document_tickets(fichier, lot, tickets):
+    """Planche de tickets du lot (4 par ligne), avec QR code du code unique"""
+    doc = SimpleDocTemplate(fichier, pagesize=A4)
+    elements = []
+    styles = feuille_styles()
+
+    # En-tête (logo + titre)
+    header_logo = logo(55, 55) or ''
+
+    titre = Paragraph(f"<b>Tickets de Repas - {lot.nom}</b>", styles['Title'])
+    header = Table([[header_logo, titre]], colWidths=[70, 470])
+    header.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+        ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    elements.append(header)
+    elements.append(Spacer(1, 10))
+    
+    # Info du lot
+    info = Paragraph(
+        f"Date de génération: {lot.created_at.strftime('%d/%m/%Y %H:%M')}<br/>"
+        f"Nombre de tickets: {tickets.count()}<br/>"
+        f"Date de validité: {lot.date_validite.strftime('%d/%m/%Y') if lot.date_validite else 'Illimitée'}",
+        styles['Normal']
+    )
+    elements.append(info)
+    elements.append(Spacer(1, 24))
+    
+    csig_blue = colors.HexColor('#0B3D91')
+
+    # Tickets en grille (4 par ligne), fond blanc
+    ticket_data = []
+    row = []
+
+    ticket_w = 132
+    ticket_h = 132
+
+    for ticket in tickets:
+        # QR Code avec le code unique
+        qr_widget = QrCodeWidget(ticket.code_unique)
+        qr_size = 42
+        qr_drawing = Drawing(qr_size, qr_size)
+        qr_drawing.add(qr_widget)
+        bounds = qr_widget.getBounds()
+        width = bounds[2] - bounds[0]
+        height = bounds[3] - bounds[1]
+        if width and height:
+            qr_drawing.scale(qr_size / width, qr_size / height)
+
+        logo_small = logo(18, 18) or ''
+
+        header_line = Table(
+            [[logo_small, Paragraph("<font color='#0B3D91'><b>TICKET REPAS</b></font>", styles['Normal'])]],
+            colWidths=[20, ticket_w - 20],
+        )
+        header_line.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ]))
+
+        code_p = Paragraph(
+            f"<font size='10'><b>{ticket.code_unique}</b></font>",
+            styles['Normal']
+        )
+        lot_p = Paragraph(
+            f"<font size='7'>Lot: {lot.nom}</font>",
+            styles['Normal']
+        )
+        exp_p = Paragraph(
+            f"<font size='7'>Valide jusqu'au: {ticket.expires_at.strftime('%d/%m/%Y %H:%M') if ticket.expires_at else '-'}</font>",
+            styles['Normal']
+        )
+
+        qr_box = Table([[qr_drawing]], colWidths=[54], rowHeights=[54])
+        qr_box.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, 0), colors.white),
+            ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
+            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+            ('LEFTPADDING', (0, 0), (0, 0), 2),
+            ('RIGHTPADDING', (0, 0), (0, 0), 2),
+            ('TOPPADDING', (0, 0), (0, 0), 2),
+            ('BOTTOMPADDING', (0, 0), (0, 0), 2),
+        ]))
+
+        ticket_box = Table(
+            [[header_line], [code_p], [lot_p], [exp_p], [qr_box]],
+            colWidths=[ticket_w],
+            rowHeights=[18, 16, 12, 12, 60],
+        )
+        ticket_box.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0, colors.white),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 4), (0, 4), 'CENTER'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('LINEBELOW', (0, 0), (0, 0), 1, csig_blue),
+        ]))
+
+        outer = Table([[ticket_box]], colWidths=[ticket_w], rowHeights=[ticket_h])
+        outer.setStyle(TableStyle([
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ]))
+
+        row.append(outer)
+        if len(row) == 4:
+            ticket_data.append(row)
+            row = []
+
+    if row:
+        while len(row) < 4:
+            row.append('')
+        ticket_data.append(row)
+
+    if ticket_data:
+        tickets_table = Table(ticket_data, colWidths=[ticket_w] * 4)
+        tickets_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+        ]))
+        elements.append(tickets_table)
+    
+    doc.build(elements)
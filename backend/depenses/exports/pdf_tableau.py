@@ -0,0 +1,195 @@
+"""
+Tableaux PDF volumineux dessinés directement sur le canevas reportlab.
+
+Un Table platypus mesure toutes ses cellules avant de se découper en pages,
+puis se redécoupe à chaque page : au-delà de quelques milliers de lignes,
+l'export PDF des opérations ou des journaux d'audit prenait des dizaines de
+secondes et gardait toutes les lignes en mémoire. Ici la mise en page est
+fixe : largeurs de colonnes calculées une fois (réduites à la largeur utile
+si besoin), hauteur de ligne donnée par le nombre de lignes de texte de la
+cellule la plus haute, textes trop longs tronqués à la largeur de la
+colonne. Les lignes sont consommées une à une (QuerySet lu par lots) et
+chaque page est terminée (showPage) dès qu'elle est pleine, l'en-tête du
+tableau étant répété en haut de chaque page.
+
+exports/pdf.py bascule sur ce rendu au-delà de settings.PDF_SEUIL_CANEVAS
+lignes ; le reste du document (logo, informations, totaux, pied de page)
+reste composé de flowables platypus, placés un à un sur le canevas.
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+# Marges du tableau ; les flowables gardent celles de SimpleDocTemplate
+MARGE = 0.5*inch
+MARGE_DOCUMENT = inch
+
+POLICE = 'Helvetica'
+POLICE_ENTETE = 'Helvetica-Bold'
+TAILLE = 8
+TAILLE_ENTETE = 9
+INTERLIGNE = 1.2
+
+# Marges intérieures des cellules (valeurs par défaut de platypus)
+MARGE_CELLULE_H = 6
+MARGE_CELLULE_V = 3
+MARGE_BAS_ENTETE = 12
+
+FOND_ENTETE = colors.grey
+TEXTE_ENTETE = colors.whitesmoke
+FONDS_LIGNES = (colors.white, colors.lightgrey)
+
+
+@lru_cache(maxsize=4096)
+def ajuster(texte, largeur, police=POLICE, taille=TAILLE):
+    """(texte, largeur en points) de `texte` tronqué (avec '...') pour tenir dans `largeur`
+
+    En cache : dates, catégories et montants se répètent d'une ligne à l'autre.
+    """
+    largeur_texte = stringWidth(texte, police, taille)
+    if largeur_texte <= largeur:
+        return texte, largeur_texte
+    # Première coupe à la proportion, puis caractère par caractère
+    texte = texte[:int(len(texte) * largeur / largeur_texte)]
+    while texte and stringWidth(texte + '...', police, taille) > largeur:
+        texte = texte[:-1]
+    texte = texte.rstrip() + '...'
+    return texte, stringWidth(texte, police, taille)
+
+
+class _Page:
+    """Position courante sur le canevas et lignes du tableau de la page en cours"""
+
+    def __init__(self, canevas):
+        self.canevas = canevas
+        self.largeur, self.hauteur = A4
+        self.numero = 1
+        self.y = self.hauteur - MARGE_DOCUMENT
+        self.x_colonnes = []  # abscisses des bords de colonnes du tableau
+        self.bords = []  # ordonnées des bords de lignes du tableau de la page
+
+    @property
+    def largeur_utile(self):
+        return self.largeur - 2*MARGE
+
+    def nouvelle(self):
+        self.terminer_page()
+        self.canevas.showPage()
+        self.numero += 1
+        self.y = self.hauteur - MARGE
+
+    def terminer_page(self):
+        """Grille du tableau de la page et numéro de page"""
+        self.tracer_grille()
+        self.canevas.setFont(POLICE, TAILLE)
+        self.canevas.setFillColor(colors.black)
+        self.canevas.drawCentredString(self.largeur / 2, MARGE / 2, f"Page {self.numero}")
+
+    def tracer_grille(self):
+        if len(self.bords) < 2:
+            self.bords = []
+            return
+        c = self.canevas
+        haut, bas = self.bords[0], self.bords[-1]
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        for y in self.bords:
+            c.line(self.x_colonnes[0], y, self.x_colonnes[-1], y)
+        for x in self.x_colonnes:
+            c.line(x, haut, x, bas)
+        self.bords = []
+
+    def placer(self, flowable):
+        """Dessine un flowable platypus comme dans le cadre de SimpleDocTemplate
+
+        Sur une nouvelle page s'il ne tient pas ; centré s'il est moins large que le cadre
+        (tableaux, comme hAlign='CENTER').
+        """
+        largeur_cadre = self.largeur - 2*MARGE_DOCUMENT
+        largeur, hauteur = flowable.wrapOn(self.canevas, largeur_cadre, self.hauteur)
+        if self.y - hauteur < MARGE and self.y < self.hauteur - MARGE:
+            self.nouvelle()
+        flowable.drawOn(self.canevas, MARGE_DOCUMENT + (largeur_cadre - largeur) / 2, self.y - hauteur)
+        self.y -= hauteur
+
+
+def ecrire_tableau(fichier, colonnes, lignes, avant=(), apres=(), fond_entete=FOND_ENTETE):
+    """Écrit dans `fichier` un document PDF : flowables `avant`, tableau, flowables `apres`
+
+    - colonnes : liste de (en-tête, largeur en points, alignement 'LEFT', 'RIGHT' ou 'CENTER') ;
+    - lignes : itérable de listes de chaînes, consommé une seule fois ('\\n' : plusieurs lignes) ;
+    - avant, apres : flowables platypus courts (en-tête, informations, totaux, pied de page).
+    """
+    canevas = Canvas(fichier, pagesize=A4)
+    page = _Page(canevas)
+    for flowable in avant:
+        page.placer(flowable)
+
+    # Largeurs calculées une fois, réduites proportionnellement à la largeur utile
+    largeurs = [largeur for _, largeur, _ in colonnes]
+    echelle = min(1, page.largeur_utile / sum(largeurs))
+    largeurs = [largeur * echelle for largeur in largeurs]
+    x_colonnes = [MARGE + (page.largeur_utile - sum(largeurs)) / 2]
+    for largeur in largeurs:
+        x_colonnes.append(x_colonnes[-1] + largeur)
+    page.x_colonnes = x_colonnes
+    largeurs_texte = [largeur - 2*MARGE_CELLULE_H for largeur in largeurs]
+    alignements = [alignement for _, _, alignement in colonnes]
+    entetes = [ajuster(entete, largeur, POLICE_ENTETE, TAILLE_ENTETE)
+               for (entete, _, _), largeur in zip(colonnes, largeurs_texte)]
+    interligne = TAILLE * INTERLIGNE
+    hauteur_entete = TAILLE_ENTETE * INTERLIGNE + MARGE_CELLULE_V + MARGE_BAS_ENTETE
+
+    def ecrire(textes, haut, police, taille, couleur):
+        """Textes d'une ligne du tableau, en un seul objet texte PDF"""
+        objet = canevas.beginText()
+        objet.setFont(police, taille)
+        objet.setFillColor(couleur)
+        for x, largeur, alignement, texte in zip(x_colonnes, largeurs, alignements, textes):
+            y = haut - MARGE_CELLULE_V - taille
+            for ligne, largeur_ligne in texte:
+                if alignement == 'RIGHT':
+                    objet.setTextOrigin(x + largeur - MARGE_CELLULE_H - largeur_ligne, y)
+                elif alignement == 'CENTER':
+                    objet.setTextOrigin(x + (largeur - largeur_ligne) / 2, y)
+                else:
+                    objet.setTextOrigin(x + MARGE_CELLULE_H, y)
+                objet.textOut(ligne)
+                y -= taille * INTERLIGNE
+        canevas.drawText(objet)
+
+    def ligne_entete():
+        page.bords = [page.y, page.y - hauteur_entete]
+        canevas.setFillColor(fond_entete)
+        canevas.rect(x_colonnes[0], page.y - hauteur_entete, x_colonnes[-1] - x_colonnes[0], hauteur_entete,
+                     stroke=0, fill=1)
+        ecrire([[entete] for entete in entetes], page.y, POLICE_ENTETE, TAILLE_ENTETE, TEXTE_ENTETE)
+        page.y -= hauteur_entete
+
+    if page.y - hauteur_entete - interligne - 2*MARGE_CELLULE_V < MARGE:
+        page.nouvelle()
+    ligne_entete()
+    for index, ligne in enumerate(lignes):
+        textes = [
+            [ajuster(morceau, largeur) for morceau in str(valeur).split('\n')]
+            for valeur, largeur in zip(ligne, largeurs_texte)
+        ]
+        hauteur = max(len(texte) for texte in textes) * interligne + 2*MARGE_CELLULE_V
+        if page.y - hauteur < MARGE:
+            page.nouvelle()
+            ligne_entete()
+        canevas.setFillColor(FONDS_LIGNES[index % 2])
+        canevas.rect(x_colonnes[0], page.y - hauteur, x_colonnes[-1] - x_colonnes[0], hauteur, stroke=0, fill=1)
+        ecrire(textes, page.y, POLICE, TAILLE, colors.black)
+        page.y -= hauteur
+        page.bords.append(page.y)
+    page.tracer_grille()
+
+    for flowable in apres:
+        page.placer(flowable)
+    page.terminer_page()
+    canevas.save()
@@ -0,0 +1,136 @@
+"""
+Ressources partagées des rendus PDF (exports/pdf.py, exports/pdf_restauration.py).
+
+Le logo CSIG (PNG 2048x2048 avec transparence) était cherché sur le disque
+puis décodé, converti et compressé en pleine résolution à chaque rendu, et
+pour chaque ticket d'une planche. Il est résolu et décodé une fois par
+processus puis réduit à sa taille d'affichage (LOGO_DPI) ; chaque rendu
+relit ce PNG réduit, quelques Kio.
+
+La feuille de styles (styles reportlab et styles CSIG) est construite une
+fois par processus : les rendus en dérivent des styles, sans la modifier.
+
+Comme les modules de rendu, ce module importe reportlab et n'est chargé qu'au
+premier export.
+"""
+import logging
+import math
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, Table, TableStyle
+
+logger = logging.getLogger(__name__)
+
+# Résolution du logo dans les documents (points/pouce x LOGO_DPI / 72 pixels)
+LOGO_DPI = 200
+
+
+@lru_cache(maxsize=None)
+def chemin_logo():
+    """Chemin du logo CSIG (racine du projet, frontend, backend ou staticfiles), None si absent"""
+    project_root = settings.BASE_DIR.parent
+    for chemin in (
+        project_root / 'logocsig.png',
+        project_root / 'frontend' / 'src' / 'assets' / 'logocsig.png',
+        settings.BASE_DIR / 'logocsig.png',
+    ):
+        if chemin.exists():
+            return str(chemin)
+    return finders.find('depenses/assets/logocsig.png')
+
+
+@lru_cache(maxsize=None)
+def _logo_decode():
+    from PIL import Image as ImagePIL
+
+    chemin = chemin_logo()
+    if chemin is None:
+        return None
+    try:
+        with ImagePIL.open(chemin) as image:
+            image.load()
+            return image.copy()
+    except Exception as e:
+        logger.warning(f"Logo {chemin} illisible: {e}")
+        return None
+
+
+@lru_cache(maxsize=8)
+def _logo_png(pixels):
+    """PNG du logo réduit à `pixels` de côté au plus"""
+    from PIL import Image as ImagePIL
+
+    image = _logo_decode().copy()
+    image.thumbnail((pixels, pixels), ImagePIL.LANCZOS)
+    sortie = BytesIO()
+    image.save(sortie, format='PNG')
+    return sortie.getvalue()
+
+
+def logo(largeur, hauteur):
+    """Logo CSIG aux dimensions données (points), ou None s'il est introuvable"""
+    if _logo_decode() is None:
+        return None
+    pixels = math.ceil(max(largeur, hauteur) * LOGO_DPI / 72)
+    return Image(BytesIO(_logo_png(pixels)), width=largeur, height=hauteur)
+
+
+@lru_cache(maxsize=None)
+def feuille_styles():
+    """Styles reportlab de base et styles CSIG, partagés : ne pas les modifier"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='TitleCentered',
+        parent=styles['Title'],
+        fontSize=16,
+        leading=20,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    styles.add(ParagraphStyle(
+        name='Heading2Left',
+        parent=styles['Heading2'],
+        fontSize=12,
+        leading=14,
+        alignment=TA_LEFT,
+        fontName='Helvetica-Bold'
+    ))
+    styles.add(ParagraphStyle(
+        name='Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        alignment=TA_CENTER,
+        fontName='Helvetica'
+    ))
+    styles.add(ParagraphStyle(
+        name='NormalCentered',
+        parent=styles['Normal'],
+        alignment=TA_CENTER
+    ))
+    return styles
+
+
+def en_tete_logo(titre):
+    """En-tête logo CSIG + titre (balisage Paragraph), ou None sans logo"""
+    image = logo(1.5*inch, 1.5*inch)
+    if image is None:
+        return None
+    en_tete = Table([[image, Paragraph(titre, feuille_styles()['Title'])]], colWidths=[2*inch, 4*inch])
+    en_tete.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    return en_tete
+
+
+def vider_caches():
+    """Oublie le logo et les styles chargés (logo remplacé, réglages modifiés)"""
+    for fonction in (chemin_logo, _logo_decode, _logo_png, feuille_styles):
+        fonction.cache_clear()
@@ -0,0 +1,196 @@
+"""
+Exports en tâche de fond.
+
+L'API enregistre une TacheExport (type + paramètres de requête) et répond
+immédiatement avec son identifiant. La tâche est planifiée à la validation
+de la transaction (tâche Celery traiter_export, voir depenses/tasks.py) ; la
+commande `python manage.py traiter_exports` reste disponible pour vider la
+file sans worker Celery. Le fichier produit est rangé dans le stockage
+privé EXPORTS_DIR (hors de MEDIA_ROOT), servi uniquement au demandeur par
+/api/exports/<id>/telecharger/.
+
+Le worker appelle le producteur du type d'export (exports/documents.py) avec
+les paramètres enregistrés : mêmes filtres et même rendu que les actions
+d'export des vues, sans rejouer de requête HTTP.
+
+Une demande identique (même demandeur, type et paramètres) à une tâche
+encore en attente ou en cours retourne cette tâche au lieu d'en créer une
+autre : `cle_active` porte l'empreinte de la demande tant que la tâche est
+active (contrainte unique simple, NULL une fois la tâche terminée).
+"""
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import TacheExport
+
+logger = logging.getLogger(__name__)
+
+# Paramètres obligatoires par type d'export
+PARAMETRES_REQUIS = {
+    'rapport_pdf': ['mois'],
+    'rapport_excel': ['mois'],
+    'tickets_pdf': ['pk'],
+}
+
+STATUTS_ACTIFS = ('en_attente', 'en_cours')
+
+
+class ErreurExport(Exception):
+    """Le producteur a refusé la demande (paramètres invalides, demandeur inactif...)"""
+
+
+def cle_export(demandeur_id, type_export, parametres):
+    """Empreinte d'une demande d'export (paramètres triés)"""
+    brut = json.dumps([demandeur_id, type_export, parametres], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(brut.encode('utf-8')).hexdigest()
+
+
+def demander_export(type_export, parametres, demandeur):
+    """Crée la tâche d'export, ou retourne la tâche identique encore active
+
+    Retourne un tuple (tâche, créée).
+    """
+    if type_export not in dict(TacheExport.TYPE_CHOICES):
+        raise ValueError(f"Type d'export inconnu: {type_export}")
+    parametres = {str(cle): str(valeur) for cle, valeur in (parametres or {}).items()}
+    manquants = [nom for nom in PARAMETRES_REQUIS.get(type_export, []) if not parametres.get(nom)]
+    if manquants:
+        raise ValueError(f"Paramètres requis pour {type_export}: {', '.join(manquants)}")
+    cle = cle_export(demandeur.id, type_export, parametres)
+
+    for essai in range(2):
+        existante = TacheExport.objects.filter(cle_active=cle).first()
+        if existante:
+            return existante, False
+        try:
+            with transaction.atomic():
+                tache = TacheExport.objects.create(
+                    type_export=type_export,
+                    parametres=parametres,
+                    cle=cle,
+                    cle_active=cle,
+                    demandeur=demandeur,
+                )
+        except IntegrityError:
+            # Demande identique créée entre-temps par une requête concurrente (relue au second
+            # essai, sauf si elle s'est terminée entre-temps : la création est alors retentée)
+            if essai:
+                raise
+            continue
+        break
+
+    from ..tasks import planifier, traiter_export
+
+    planifier(traiter_export, tache.id)
+    return tache, True
+
+
+def executer_tache(tache):
+    """Produit le document de la tâche (exports/documents.py) et enregistre le fichier"""
+    from .documents import ParametresInvalides, produire
+
+    if not tache.demandeur.is_active:
+        raise ErreurExport("Demandeur désactivé")
+
+    with tempfile.TemporaryFile() as temporaire:
+        try:
+            nom, type_contenu = produire(tache.type_export, tache.parametres, temporaire)
+        except ParametresInvalides as e:
+            raise ErreurExport(str(e))
+        temporaire.seek(0)
+        tache.fichier.save(f"{tache.id}_{nom}", File(temporaire), save=False)
+
+    tache.nom_fichier = nom
+    tache.type_contenu = type_contenu
+    tache.taille = tache.fichier.size
+
+
+def _reserver(limite):
+    """Passe jusqu'à `limite` tâches en attente à « en cours » (sûr avec plusieurs workers)"""
+    reservees = []
+    candidates = TacheExport.objects.filter(statut='en_attente').order_by('created_at', 'id').values_list('id', flat=True)[:limite]
+    for tache_id in list(candidates):
+        if TacheExport.objects.filter(id=tache_id, statut='en_attente').update(statut='en_cours', demarre_le=timezone.now()):
+            reservees.append(tache_id)
+    return TacheExport.objects.filter(id__in=reservees).select_related('demandeur').order_by('created_at', 'id')
+
+
+def _traiter(tache):
+    """Exécute une tâche réservée et enregistre son résultat, retourne True si terminée"""
+    try:
+        executer_tache(tache)
+    except Exception as e:
+        if isinstance(e, ErreurExport):
+            logger.warning(f"Export #{tache.id} ({tache.type_export}) refusé: {e}")
+        else:
+            logger.exception(f"Export #{tache.id} ({tache.type_export}) en échec")
+        tache.statut = 'echec'
+        tache.cle_active = None
+        tache.erreur = str(e)[:2000]
+        tache.termine_le = timezone.now()
+        tache.save(update_fields=['statut', 'cle_active', 'erreur', 'termine_le'])
+        return False
+
+    tache.statut = 'termine'
+    tache.cle_active = None
+    tache.termine_le = timezone.now()
+    tache.save(update_fields=['statut', 'cle_active', 'fichier', 'nom_fichier', 'type_contenu', 'taille', 'termine_le'])
+    return True
+
+
+def traiter_exports_en_attente(limite=5):
+    """Exécute les tâches en attente
+
+    Retourne un tuple (nombre terminées, nombre en échec).
+    """
+    terminees = 0
+    echecs = 0
+    for tache in _reserver(limite):
+        if _traiter(tache):
+            terminees += 1
+        else:
+            echecs += 1
+    return terminees, echecs
+
+
+def traiter_export(tache_id):
+    """Exécute une tâche précise si elle est encore en attente (tâche Celery, voir depenses/tasks.py)
+
+    Retourne None si la tâche a déjà été réservée par un autre worker.
+    """
+    if not TacheExport.objects.filter(id=tache_id, statut='en_attente').update(statut='en_cours', demarre_le=timezone.now()):
+        return None
+    return _traiter(TacheExport.objects.select_related('demandeur').get(id=tache_id))
+
+
+def relancer_taches_bloquees():
+    """Remet en attente les tâches « en cours » abandonnées par un worker arrêté"""
+    delai = getattr(settings, 'EXPORTS_DELAI_BLOCAGE', 30)  # minutes
+    return TacheExport.objects.filter(
+        statut='en_cours',
+        demarre_le__lt=timezone.now() - timedelta(minutes=delai)
+    ).update(statut='en_attente', demarre_le=None)
+
+
+def purger_exports_expires():
+    """Supprime les tâches terminées (et leurs fichiers) au-delà de EXPORTS_CONSERVATION heures"""
+    heures = getattr(settings, 'EXPORTS_CONSERVATION', 24)
+    expirees = TacheExport.objects.filter(
+        statut__in=['termine', 'echec'],
+        termine_le__lt=timezone.now() - timedelta(hours=heures)
+    )
+    nombre = 0
+    for tache in expirees.iterator():
+        if tache.fichier:
+            tache.fichier.delete(save=False)
+        tache.delete()
+        nombre += 1
+    return nombre
@@ -1,5 +1,6 @@
 import django_filters
 from .models import Operation, Prevision
+from .recherche import filtrer
 
 
 class OperationFilter(django_filters.FilterSet):
@@ -8,11 +9,16 @@ class OperationFilter(django_filters.FilterSet):
     sous_categorie = django_filters.NumberFilter(field_name='sous_categorie_id')
     semaine_iso = django_filters.NumberFilter()
     description = django_filters.CharFilter(lookup_expr='icontains')
+    # Recherche plein texte (description, catégorie, sous-catégorie), sans LIKE '%...%'
+    recherche = django_filters.CharFilter(method='filtrer_recherche')
 
     class Meta:
         model = Operation
         fields = ['date_operation', 'categorie', 'sous_categorie', 'semaine_iso', 'description']
 
+    def filtrer_recherche(self, queryset, name, value):
+        return filtrer(queryset, 'operation', value)
+
 
 class PrevisionFilter(django_filters.FilterSet):
     mois = django_filters.DateFilter()
@@ -0,0 +1,411 @@
+"""
+Import CSV en flux des opérations et des prévisions.
+
+Le fichier envoyé est lu ligne à ligne (csv.DictReader sur l'upload, jamais
+chargé en entier), chaque ligne est validée et convertie, puis les lignes
+valides sont écrites par lots de TAILLE_LOT avec bulk_create / bulk_update.
+Une ligne invalide est signalée (« Ligne N: ... ») sans bloquer les autres ;
+un lot refusé par la base est annulé seul (point de sauvegarde). L'import
+entier est une transaction : un fichier illisible en cours de route
+n'importe rien.
+
+bulk_create ne déclenche ni save() ni les signaux : chaque lot reproduit ce
+que faisait l'import ligne à ligne — champs calculés d'Operation, imputation
+automatique sur la prévision du mois, journaux d'audit (création, mise à jour
+et import), documents de recherche, agrégats journaliers et estampilles.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from audit.models import AuditLog
+
+from . import recherche
+from .agregats import planifier_rafraichissement_operations
+from .estampilles import marquer_modifie
+from .models import Categorie, SousCategorie, Prevision, Operation, Imputation
+
+TAILLE_LOT = 1000
+DELIMITEUR = ';'
+# Erreurs détaillées dans la réponse (les suivantes sont seulement comptées)
+MAX_ERREURS = 10
+
+COLONNES_OPERATIONS = ['Date Opération', 'Catégorie', 'Unités', 'Prix Unitaire', 'Montant Dépensé']
+COLONNES_PREVISIONS = ['Mois', 'Catégorie', 'Montant Prévu']
+
+# Formats acceptés en plus de l'ISO (AAAA-MM-JJ, éventuellement suivi de l'heure)
+FORMATS_DATE = ('%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m')
+
+
+class ErreurImport(Exception):
+    """Fichier inexploitable (colonnes manquantes, encodage, CSV mal formé)"""
+
+
+def lire_csv(fichier, colonnes_requises):
+    """(numéro de ligne, ligne) du fichier envoyé, lu en flux
+
+    Les en-têtes et les valeurs sont débarrassés des espaces, une cellule vide
+    vaut None. Lève ErreurImport si des colonnes requises manquent ou si le
+    fichier ne se décode pas.
+    """
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+    try:
+        lecteur = csv.DictReader(texte, delimiter=DELIMITEUR)
+        try:
+            colonnes = [colonne.strip() for colonne in lecteur.fieldnames or []]
+            manquantes = [colonne for colonne in colonnes_requises if colonne not in colonnes]
+            if manquantes:
+                raise ErreurImport(f'Colonnes manquantes: {", ".join(manquantes)}')
+            lecteur.fieldnames = colonnes
+            for ligne in lecteur:
+                yield lecteur.line_num, {
+                    cle: (valeur.strip() or None) if isinstance(valeur, str) else None
+                    for cle, valeur in ligne.items() if cle is not None
+                }
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ErreurImport(f"Erreur lors de la lecture du fichier (ligne {lecteur.line_num + 1}): {e}")
+    finally:
+        # Rendre l'upload intact (TextIOWrapper le fermerait)
+        texte.detach()
+
+
+def _date(ligne, colonne):
+    valeur = ligne.get(colonne)
+    if not valeur:
+        raise ValueError(f"{colonne}: valeur manquante")
+    try:
+        return date.fromisoformat(valeur[:10])
+    except ValueError:
+        pass
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.strptime(valeur, format_date).date()
+        except ValueError:
+            pass
+    raise ValueError(f"{colonne}: date invalide « {valeur} »")
+
+
+def _decimal(ligne, colonne, modele, champ):
+    """Valeur validée par le champ du modèle (chiffres, minimum ; virgule décimale acceptée)"""
+    valeur = ligne.get(colonne)
+    if isinstance(valeur, str):
+        valeur = valeur.replace('\u00a0', '').replace(' ', '').replace(',', '.')
+    try:
+        return modele._meta.get_field(champ).clean(valeur, None)
+    except ValidationError as e:
+        raise ValueError(f"{colonne}: {' '.join(e.messages)}")
+
+
+class ResultatImport:
+    """Compteurs et premières erreurs d'un import"""
+
+    def __init__(self):
+        self.importees = 0
+        self.erreurs = []
+        self.nb_erreurs = 0
+
+    def erreur(self, message):
+        self.nb_erreurs += 1
+        if len(self.erreurs) < MAX_ERREURS:
+            self.erreurs.append(message)
+
+    def comme_dict(self):
+        return {
+            'imported': self.importees,
+            'errors': self.erreurs,
+            'total_errors': self.nb_erreurs,
+        }
+
+
+class ImportCSV:
+    """Lecture en flux, conversion ligne à ligne et écriture par lots
+
+    Les sous-classes définissent `colonnes`, `convertir(ligne)` (lève
+    ValueError pour une ligne invalide) et `ecrire(objets)` (un lot de
+    lignes converties, dans un point de sauvegarde).
+    """
+    colonnes = []
+
+    def __init__(self, utilisateur=None, taille_lot=TAILLE_LOT):
+        self.utilisateur = utilisateur
+        self.taille_lot = taille_lot
+        self.resultat = ResultatImport()
+        self._categories = {}
+        self._sous_categories = {}
+
+    def importer(self, fichier):
+        with transaction.atomic():
+            lot = []
+            for numero, ligne in lire_csv(fichier, self.colonnes):
+                try:
+                    lot.append((numero, self.convertir(ligne)))
+                except ValueError as e:
+                    self.resultat.erreur(f"Ligne {numero}: {e}")
+                if len(lot) >= self.taille_lot:
+                    self._ecrire_lot(lot)
+                    lot = []
+            if lot:
+                self._ecrire_lot(lot)
+            self.terminer()
+        return self.resultat.comme_dict()
+
+    def _ecrire_lot(self, lot):
+        try:
+            with transaction.atomic():
+                self.ecrire([objet for _, objet in lot])
+        except DatabaseError as e:
+            for numero, _ in lot:
+                self.resultat.erreur(f"Ligne {numero}: {e}")
+            return
+        self.resultat.importees += len(lot)
+
+    def terminer(self):
+        """Travail de fin d'import, dans la transaction"""
+
+    # Référentiel : résolu une fois par import, créé s'il n'existe pas
+
+    def categorie(self, ligne):
+        code = ligne.get('Code Catégorie') or ligne.get('Catégorie')
+        if not code:
+            raise ValueError("Catégorie: valeur manquante")
+        code = code[:20]
+        if code not in self._categories:
+            self._categories[code], _ = Categorie.objects.get_or_create(
+                code=code,
+                defaults={'nom': ligne.get('Catégorie') or code}
+            )
+        return self._categories[code]
+
+    def sous_categorie(self, categorie, nom):
+        if not nom:
+            return None
+        cle = (categorie.pk, nom[:100])
+        if cle not in self._sous_categories:
+            self._sous_categories[cle], _ = SousCategorie.objects.get_or_create(
+                categorie=categorie,
+                nom=nom[:100]
+            )
+        return self._sous_categories[cle]
+
+    # Écriture en masse
+
+    def creer(self, modele, objets, **auteur):
+        """bulk_create garantissant les clés primaires (MySQL ne les renvoie pas)
+
+        Sans retour des clés, elles sont relues au-delà de la dernière clé vue
+        avant l'insertion ; `auteur` (ex. created_by=utilisateur) restreint la
+        relecture aux lignes de cet import. Nos lignes y sont toujours
+        visibles, dans l'ordre d'insertion : si la relecture en compte
+        d'autres (import concurrent validé entre-temps), les clés ne peuvent
+        pas être attribuées sûrement et le lot est refusé (DatabaseError,
+        annulé par son point de sauvegarde).
+        """
+        if not objets:
+            return []
+        if connection.features.can_return_rows_from_bulk_insert:
+            return modele.objects.bulk_create(objets, batch_size=self.taille_lot)
+        dernier_pk = modele.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        crees = modele.objects.bulk_create(objets, batch_size=self.taille_lot)
+        relus = list(
+            modele.objects.filter(pk__gt=dernier_pk, **auteur).order_by('pk').values_list('pk', flat=True)
+        )
+        if len(relus) != len(crees):
+            raise DatabaseError(
+                f"{modele._meta.verbose_name} : {len(relus)} clés relues pour {len(crees)} lignes insérées "
+                "(écriture concurrente), lot annulé"
+            )
+        for objet, pk in zip(crees, relus):
+            objet.pk = pk
+        return crees
+
+    def journaliser(self, journaux):
+        """Entrées d'audit (action, utilisateur, objet, métadonnées) créées et indexées en masse"""
+        entrees = [
+            AuditLog(
+                action=action,
+                user=utilisateur,
+                content_type=ContentType.objects.get_for_model(objet.__class__),
+                object_id=objet.pk,
+                model_name=objet.__class__.__name__,
+                object_repr=str(objet),
+                changes={},
+                metadata=metadata or {},
+            )
+            for action, utilisateur, objet, metadata in journaux
+            if utilisateur is not None
+        ]
+        if not entrees:
+            return
+        if len({entree.user_id for entree in entrees}) == 1:
+            entrees = self.creer(AuditLog, entrees, user=entrees[0].user)
+        else:
+            entrees = self.creer(AuditLog, entrees)
+        recherche.indexer_en_masse('audit', entrees)
+        marquer_modifie(AuditLog._meta.label)
+
+
+class ImportOperations(ImportCSV):
+    """Opérations : champs calculés comme Operation.save(), imputation automatique"""
+    colonnes = COLONNES_OPERATIONS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._soldes = {}
+        self._jours = set()
+
+    def convertir(self, ligne):
+        categorie = self.categorie(ligne)
+        sous_categorie = self.sous_categorie(categorie, ligne.get('Sous-Catégorie'))
+        date_operation = _date(ligne, 'Date Opération')
+        unites = _decimal(ligne, 'Unités', Operation, 'unites')
+        prix_unitaire = _decimal(ligne, 'Prix Unitaire', Operation, 'prix_unitaire')
+        montant = (unites * prix_unitaire).quantize(Decimal('0.01'))
+        try:
+            Operation._meta.get_field('montant_depense').clean(montant, None)
+        except ValidationError as e:
+            raise ValueError(f"Montant: {' '.join(e.messages)}")
+        return Operation(
+            date_operation=date_operation,
+            jour=date_operation.day,
+            semaine_iso=date_operation.isocalendar()[1],
+            categorie=categorie,
+            sous_categorie=sous_categorie,
+            unites=unites,
+            prix_unitaire=prix_unitaire,
+            montant_depense=montant,
+            description=(ligne.get('Description') or '')[:500],
+            created_by=self.utilisateur
+        )
+
+    def _previsions(self, operations):
+        """Prévision du mois de chaque opération (comme create_imputation_if_needed)"""
+        mois = {operation.date_operation.replace(day=1) for operation in operations}
+        categories = {operation.categorie_id for operation in operations}
+        previsions = {}
+        candidates = Prevision.objects.filter(mois__in=mois, categorie_id__in=categories).select_related(
+            'categorie', 'sous_categorie'
+        ).annotate(
+            total_impute=Coalesce(Sum('imputations__montant_impute'), Value(Decimal('0.00')), output_field=DecimalField())
+        ).order_by('pk')
+        for prevision in candidates:
+            previsions.setdefault((prevision.mois, prevision.categorie_id, prevision.sous_categorie_id), prevision)
+            # Solde suivi en mémoire pendant l'import (les imputations du lot ne sont pas encore relues)
+            self._soldes.setdefault(prevision.pk, prevision.montant_prevu - prevision.total_impute)
+        return previsions
+
+    def ecrire(self, operations):
+        operations = self.creer(Operation, operations, created_by=self.utilisateur)
+        self._jours.update(operation.date_operation for operation in operations)
+
+        imputations = {}
+        if self.utilisateur is not None:
+            previsions = self._previsions(operations)
+            for operation in operations:
+                prevision = previsions.get(
+                    (operation.date_operation.replace(day=1), operation.categorie_id, operation.sous_categorie_id)
+                )
+                if prevision:
+                    montant = min(operation.montant_depense, self._soldes[prevision.pk])
+                    self._soldes[prevision.pk] -= montant
+                    imputations[operation.pk] = Imputation(
+                        operation=operation,
+                        prevision=prevision,
+                        montant_impute=montant,
+                        created_by=self.utilisateur
+                    )
+            self.creer(Imputation, list(imputations.values()), created_by=self.utilisateur)
+
+        recherche.indexer_en_masse('operation', operations)
+        marquer_modifie(Operation._meta.label)
+
+        # Dans l'ordre de l'import ligne à ligne : création, imputation, import
+        journaux = []
+        for operation in operations:
+            journaux.append(('create', self.utilisateur, operation, None))
+            if operation.pk in imputations:
+                journaux.append(('create', self.utilisateur, imputations[operation.pk], None))
+            journaux.append(('import', self.utilisateur, operation, {'source': 'csv'}))
+        self.journaliser(journaux)
+
+    def terminer(self):
+        for jour in sorted(self._jours):
+            planifier_rafraichissement_operations(jour)
+
+
+class ImportPrevisions(ImportCSV):
+    """Prévisions : création, ou mise à jour du montant d'une prévision existante"""
+    colonnes = COLONNES_PREVISIONS
+
+    STATUTS = {
+        **{code: code for code, _ in Prevision.STATUT_CHOICES},
+        **{libelle.lower(): code for code, libelle in Prevision.STATUT_CHOICES},
+    }
+
+    def convertir(self, ligne):
+        categorie = self.categorie(ligne)
+        sous_categorie = self.sous_categorie(categorie, ligne.get('Sous-Catégorie'))
+        statut = ligne.get('Statut') or 'draft'
+        if statut.lower() not in self.STATUTS:
+            raise ValueError(f"Statut: valeur inconnue « {statut} »")
+        return {
+            'mois': _date(ligne, 'Mois').replace(day=1),
+            'categorie': categorie,
+            'sous_categorie': sous_categorie,
+            'montant_prevu': _decimal(ligne, 'Montant Prévu', Prevision, 'montant_prevu'),
+            'statut': self.STATUTS[statut.lower()],
+        }
+
+    def ecrire(self, lignes):
+        existantes = {
+            (prevision.mois, prevision.categorie_id, prevision.sous_categorie_id): prevision
+            for prevision in Prevision.objects.filter(
+                mois__in={ligne['mois'] for ligne in lignes},
+                categorie_id__in={ligne['categorie'].pk for ligne in lignes},
+            ).select_related('categorie', 'sous_categorie', 'created_by')
+        }
+
+        nouvelles = {}
+        modifiees = {}
+        operations = []
+        for ligne in lignes:
+            cle = (ligne['mois'], ligne['categorie'].pk, ligne['sous_categorie'].pk if ligne['sous_categorie'] else None)
+            if cle in existantes or cle in nouvelles:
+                prevision = existantes.get(cle) or nouvelles[cle]
+                prevision.montant_prevu = ligne['montant_prevu']
+                if prevision.pk:
+                    modifiees[prevision.pk] = prevision
+                operations.append(('update', prevision))
+            else:
+                prevision = nouvelles[cle] = Prevision(**ligne, created_by=self.utilisateur)
+                operations.append(('create', prevision))
+
+        self.creer(Prevision, list(nouvelles.values()), created_by=self.utilisateur)
+        maintenant = timezone.now()
+        for prevision in modifiees.values():
+            prevision.updated_at = maintenant
+        Prevision.objects.bulk_update(list(modifiees.values()), ['montant_prevu', 'updated_at'], batch_size=self.taille_lot)
+        marquer_modifie(Prevision._meta.label)
+
+        journaux = []
+        for action, prevision in operations:
+            journaux.append((action, prevision.created_by, prevision, None))
+            journaux.append(('import', self.utilisateur, prevision, {'source': 'csv'}))
+        self.journaliser(journaux)
+
+
+def importer_operations(fichier, utilisateur=None):
+    """Importe les opérations d'un fichier CSV (séparateur ;) et retourne le résultat"""
+    return ImportOperations(utilisateur).importer(fichier)
+
+
+def importer_previsions(fichier, utilisateur=None):
+    """Importe les prévisions d'un fichier CSV (séparateur ;) et retourne le résultat"""
+    return ImportPrevisions(utilisateur).importer(fichier)
@@ -0,0 +1,370 @@
+"""
+Génération d'un jeu de données déterministe pour les benchmarks.
+
+Toutes les lignes sont créées avec bulk_create (sans signaux) à partir d'une
+graine fixe et d'une date de départ fixe : deux générations avec les mêmes
+paramètres produisent les mêmes données. Les agrégats journaliers de
+restauration sont reconstruits à la fin.
+
+Les lignes générées sont reconnaissables (préfixes `bench_`, `BENCH`,
+« benchmark », numéros de facture `BENCH-FACT-…`) et peuvent être supprimées
+avec purger_jeu_donnees(), qui ne touche pas aux lignes réelles.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from audit.models import AuditLog
+
+from . import recherche
+from .agregats import reconstruire, reconstruire_operations
+from .estampilles import marquer_modifie
+from .models import (
+    Categorie, SousCategorie, Prevision, Operation, Imputation,
+    Plat, Menu, MenuPlat, RegleSubvention, Commande, CommandeLigne, Facture,
+    RestaurationJournaliereTotal, UserPermission, LotTickets, TicketRepas
+)
+
+VOLUMES_PAR_DEFAUT = {
+    'utilisateurs': 20,
+    'categories': 5,
+    'sous_categories': 3,        # par catégorie
+    'mois': 12,                  # mois d'opérations et de prévisions
+    'operations_par_jour': 3,
+    'plats': 8,
+    'plats_par_menu': 4,
+    'jours_commandes': 30,       # menus quotidiens avec commandes
+    'lots_tickets': 3,
+    'tickets_par_lot': 50,
+    'audit': 500,
+}
+
+DATE_DEBUT_PAR_DEFAUT = date(2025, 1, 1)
+MOT_DE_PASSE = 'benchmark'
+PREFIXE_TOKEN = 'bench'
+PREFIXE_FACTURE = 'BENCH-'
+SOURCE_AUDIT = 'jeu_donnees'
+TAILLE_LOT = 1000
+
+
+def _creer_en_masse(modele, objets, taille_lot=TAILLE_LOT):
+    """bulk_create garantissant les clés primaires (MySQL ne les renvoie pas, relues et comptées)"""
+    if not objets:
+        return []
+    dernier_pk = modele.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    crees = modele.objects.bulk_create(objets, batch_size=taille_lot)
+    # bulk_create ne déclenche pas les signaux : ETag des listes à invalider
+    marquer_modifie(modele._meta.label)
+    if crees[0].pk is None:
+        crees = list(modele.objects.filter(pk__gt=dernier_pk).order_by('pk'))
+        if len(crees) != len(objets):
+            raise DatabaseError(
+                f"{modele._meta.verbose_name} : {len(crees)} lignes relues pour {len(objets)} insérées "
+                "(écriture concurrente)"
+            )
+    return crees
+
+
+def _ajouter_mois(jour, nb_mois):
+    mois = jour.month - 1 + nb_mois
+    return date(jour.year + mois // 12, mois % 12 + 1, 1)
+
+
+def _moment(jour, rng):
+    """Datetime aware aléatoire dans la journée"""
+    return timezone.make_aware(datetime.combine(jour, time(8, 0)) + timedelta(seconds=rng.randrange(10 * 3600)))
+
+
+def generer_jeu_donnees(volumes=None, graine=42, date_debut=DATE_DEBUT_PAR_DEFAUT, journal=None):
+    """Crée le jeu de données et retourne le nombre de lignes créées par modèle
+
+    Args:
+        volumes: dict partiel surchargeant VOLUMES_PAR_DEFAUT
+        graine: graine du générateur aléatoire
+        date_debut: premier jour des opérations, menus et commandes
+        journal: fonction appelée avec un message de progression (optionnel)
+    """
+    volumes = {**VOLUMES_PAR_DEFAUT, **(volumes or {})}
+    rng = random.Random(graine)
+    journal = journal or (lambda message: None)
+    date_debut = date_debut.replace(day=1)
+    date_fin_operations = _ajouter_mois(date_debut, volumes['mois']) - timedelta(days=1)
+    comptes = {}
+
+    with transaction.atomic():
+        # Utilisateurs : un administrateur puis des agents
+        admin = User(username='bench_admin', email='bench_admin@example.com', is_staff=True, is_superuser=True)
+        admin.set_password(MOT_DE_PASSE)
+        # Même hash pour tous : set_password est coûteux
+        mot_de_passe = admin.password
+        utilisateurs = _creer_en_masse(User, [admin] + [
+            User(
+                username=f'bench_agent_{i:04d}',
+                email=f'bench_agent_{i:04d}@example.com',
+                first_name='Agent',
+                last_name=f'{i:04d}',
+                password=mot_de_passe
+            )
+            for i in range(volumes['utilisateurs'])
+        ])
+        admin, agents = utilisateurs[0], utilisateurs[1:]
+        _creer_en_masse(UserPermission, [
+            UserPermission(utilisateur=agent, fonctionnalite=fonctionnalite, peut_creer=True)
+            for agent in agents
+            for fonctionnalite in ('dashboard', 'operations', 'restauration_commandes')
+        ])
+        comptes['utilisateurs'] = len(utilisateurs)
+        journal(f"{len(utilisateurs)} utilisateurs")
+
+        # Référentiel budgétaire
+        categories = _creer_en_masse(Categorie, [
+            Categorie(nom=f'Catégorie benchmark {i}', code=f'BENCH{i:02d}', description='Jeu de données benchmark')
+            for i in range(volumes['categories'])
+        ])
+        sous_categories = _creer_en_masse(SousCategorie, [
+            SousCategorie(categorie=categorie, nom=f'Sous-catégorie {j}')
+            for categorie in categories
+            for j in range(volumes['sous_categories'])
+        ])
+        cibles = [(sc.categorie_id, sc.id) for sc in sous_categories] or [(c.id, None) for c in categories]
+
+        # Prévisions mensuelles (une par sous-catégorie et par mois)
+        previsions = _creer_en_masse(Prevision, [
+            Prevision(
+                mois=_ajouter_mois(date_debut, m),
+                categorie_id=categorie_id,
+                sous_categorie_id=sous_categorie_id,
+                montant_prevu=Decimal(rng.randrange(5_000_000, 50_000_000, 100_000)),
+                statut='validated',
+                created_by=admin
+            )
+            for m in range(volumes['mois'])
+            for categorie_id, sous_categorie_id in cibles
+        ])
+        previsions_par_cle = {(p.mois, p.categorie_id, p.sous_categorie_id): p for p in previsions}
+        journal(f"{len(categories)} catégories, {len(sous_categories)} sous-catégories, {len(previsions)} prévisions")
+
+        # Opérations quotidiennes (champs calculés comme Operation.save) et imputations
+        operations = []
+        jour = date_debut
+        while jour <= date_fin_operations:
+            for _ in range(volumes['operations_par_jour']):
+                categorie_id, sous_categorie_id = rng.choice(cibles)
+                unites = Decimal(rng.randint(1, 20))
+                prix_unitaire = Decimal(rng.randrange(1_000, 200_000, 500))
+                operations.append(Operation(
+                    date_operation=jour,
+                    jour=jour.day,
+                    semaine_iso=jour.isocalendar()[1],
+                    categorie_id=categorie_id,
+                    sous_categorie_id=sous_categorie_id,
+                    unites=unites,
+                    prix_unitaire=prix_unitaire,
+                    montant_depense=unites * prix_unitaire,
+                    description=f'Dépense benchmark {len(operations)}',
+                    created_by=rng.choice(utilisateurs)
+                ))
+            jour += timedelta(days=1)
+        operations = _creer_en_masse(Operation, operations)
+        imputations = []
+        for operation in operations:
+            prevision = previsions_par_cle.get(
+                (operation.date_operation.replace(day=1), operation.categorie_id, operation.sous_categorie_id)
+            )
+            if prevision:
+                imputations.append(Imputation(
+                    operation=operation,
+                    prevision=prevision,
+                    montant_impute=operation.montant_depense,
+                    created_by=operation.created_by
+                ))
+        imputations = _creer_en_masse(Imputation, imputations)
+        comptes.update({
+            'categories': len(categories),
+            'sous_categories': len(sous_categories),
+            'previsions': len(previsions),
+            'operations': len(operations),
+            'imputations': len(imputations),
+        })
+        journal(f"{len(operations)} opérations, {len(imputations)} imputations")
+
+        # Restauration : plats, menus quotidiens, commandes
+        plats = _creer_en_masse(Plat, [
+            Plat(
+                nom=f'Plat benchmark {i}',
+                categorie_restau='Dejeuner',
+                prix_standard=Decimal(rng.choice([15_000, 20_000, 25_000, 30_000, 45_000, 60_000]))
+            )
+            for i in range(volumes['plats'])
+        ])
+        jours_commandes = [date_debut + timedelta(days=i) for i in range(volumes['jours_commandes'])]
+        menus = _creer_en_masse(Menu, [
+            Menu(date_menu=jour, publication_at=_moment(jour, rng), token_public=f'{PREFIXE_TOKEN}{jour:%Y%m%d}{graine:08d}')
+            for jour in jours_commandes
+        ])
+        menu_plats = _creer_en_masse(MenuPlat, [
+            MenuPlat(menu=menu, plat=plat, prix_jour=plat.prix_standard, ordre=ordre)
+            for menu in menus
+            for ordre, plat in enumerate(rng.sample(plats, min(volumes['plats_par_menu'], len(plats))))
+        ])
+        menu_plats_par_menu = {}
+        for menu_plat in menu_plats:
+            menu_plats_par_menu.setdefault(menu_plat.menu_id, []).append(menu_plat)
+
+        if jours_commandes:
+            RegleSubvention.objects.create(
+                type_subvention='POURCENT',
+                valeur=Decimal('50'),
+                effectif_de=jours_commandes[0],
+                effectif_a=jours_commandes[-1]
+            )
+
+        commandes = []
+        choix = []
+        for menu in menus:
+            for agent in agents:
+                menu_plat = rng.choice(menu_plats_par_menu[menu.id])
+                brut = min(menu_plat.prix_jour, Decimal('30000.00'))
+                subvention = (brut / 2).quantize(Decimal('0.01'))
+                commandes.append(Commande(
+                    utilisateur=agent,
+                    date_commande=menu.date_menu,
+                    etat=rng.choices(['validee', 'brouillon', 'annulee'], weights=[8, 1, 1])[0],
+                    montant_brut=brut,
+                    montant_subvention=subvention,
+                    montant_net=brut - subvention,
+                ))
+                choix.append(menu_plat)
+        commandes = _creer_en_masse(Commande, commandes)
+        lignes = _creer_en_masse(CommandeLigne, [
+            CommandeLigne(commande=commande, menu_plat=menu_plat, quantite=1, prix_unitaire=menu_plat.prix_jour)
+            for commande, menu_plat in zip(commandes, choix)
+        ])
+        if jours_commandes:
+            reconstruire(jours_commandes[0], jours_commandes[-1])
+        # Factures journalières (sans PDF) à partir des agrégats
+        factures = _creer_en_masse(Facture, [
+            Facture(
+                date_facture=agregat.date,
+                numero_facture=PREFIXE_FACTURE + Facture.generer_numero(agregat.date),
+                total_commandes=agregat.nb_commandes,
+                total_brut=agregat.montant_brut,
+                total_subvention=agregat.montant_subvention,
+                total_net=agregat.montant_net,
+                total_supplement=agregat.montant_supplement
+            )
+            for agregat in RestaurationJournaliereTotal.objects.filter(
+                date__in=jours_commandes
+            ).order_by('date')
+        ])
+        comptes.update({
+            'plats': len(plats),
+            'menus': len(menus),
+            'commandes': len(commandes),
+            'lignes_commande': len(lignes),
+            'factures': len(factures),
+        })
+        journal(f"{len(menus)} menus, {len(commandes)} commandes")
+
+        # Lots de tickets
+        lots = _creer_en_masse(LotTickets, [
+            LotTickets(
+                nom=f'Lot benchmark {i}',
+                nombre_tickets=volumes['tickets_par_lot'],
+                date_validite=date_debut + timedelta(days=30 * (i + 1)),
+                created_by=admin
+            )
+            for i in range(volumes['lots_tickets'])
+        ])
+        tickets = []
+        for lot in lots:
+            for _ in range(volumes['tickets_par_lot']):
+                utilise = rng.random() < 0.3
+                tickets.append(TicketRepas(
+                    code_unique=f'TKT-{date_debut.year}-{len(tickets):08X}',
+                    lot=lot,
+                    statut='utilise' if utilise else 'disponible',
+                    date_utilisation=_moment(lot.date_validite, rng) if utilise else None,
+                    utilisateur_beneficiaire=rng.choice(agents).username if utilise and agents else ''
+                ))
+        tickets = _creer_en_masse(TicketRepas, tickets)
+        comptes.update({'lots_tickets': len(lots), 'tickets': len(tickets)})
+        journal(f"{len(lots)} lots, {len(tickets)} tickets")
+
+        # Historique d'audit, réparti sur la période des opérations
+        type_operation = ContentType.objects.get_for_model(Operation)
+        nb_jours = (date_fin_operations - date_debut).days + 1
+        journaux = []
+        jours_audit = []
+        for i in range(volumes['audit']):
+            operation = operations[i % len(operations)] if operations else None
+            journaux.append(AuditLog(
+                action=rng.choices(['create', 'update', 'delete', 'export'], weights=[5, 3, 1, 1])[0],
+                user=rng.choice(utilisateurs),
+                content_type=type_operation if operation else None,
+                object_id=operation.pk if operation else None,
+                model_name='Operation',
+                object_repr=str(operation.pk if operation else i),
+                changes={'montant_depense': str(operation.montant_depense)} if operation else {},
+                ip_address=f'10.0.{i // 250 % 256}.{i % 250 + 1}',
+                user_agent='benchmark',
+                metadata={'source': SOURCE_AUDIT}
+            ))
+            jours_audit.append(date_debut + timedelta(days=rng.randrange(nb_jours)))
+        journaux = _creer_en_masse(AuditLog, journaux)
+        # auto_now_add impose l'instant présent : répartir ensuite par jour
+        pks_par_jour = {}
+        for journal_audit, jour in zip(journaux, jours_audit):
+            pks_par_jour.setdefault(jour, []).append(journal_audit.pk)
+        for jour, pks in pks_par_jour.items():
+            AuditLog.objects.filter(pk__in=pks).update(timestamp=_moment(jour, rng))
+        comptes['audit'] = len(journaux)
+        journal(f"{len(journaux)} entrées d'audit")
+
+    # bulk_create ne déclenche pas les signaux des agrégats ni de l'indexation
+    comptes['agregats_operations'] = reconstruire_operations()
+    journal(f"{comptes['agregats_operations']} agrégats journaliers d'opérations")
+    comptes['index_recherche'] = recherche.reconstruire()
+    journal(f"{comptes['index_recherche']} documents de recherche")
+
+    return comptes
+
+
+def purger_jeu_donnees():
+    """Supprime les données générées par generer_jeu_donnees
+
+    Returns:
+        Nombre total de lignes supprimées (cascades comprises)
+    """
+    with transaction.atomic():
+        jours_commandes = list(
+            Menu.objects.filter(token_public__startswith=PREFIXE_TOKEN).values_list('date_menu', flat=True)
+        )
+        supprimes = 0
+        supprimes += AuditLog.objects.filter(metadata__source=SOURCE_AUDIT).delete()[0]
+        supprimes += LotTickets.objects.filter(nom__startswith='Lot benchmark').delete()[0]
+        # Factures générées seulement : des factures réelles peuvent porter les mêmes dates
+        supprimes += Facture.objects.filter(numero_facture__startswith=PREFIXE_FACTURE).delete()[0]
+        # Commandes, lignes et permissions suivent les utilisateurs
+        supprimes += User.objects.filter(username__startswith='bench_').delete()[0]
+        supprimes += Menu.objects.filter(token_public__startswith=PREFIXE_TOKEN).delete()[0]
+        supprimes += Plat.objects.filter(nom__startswith='Plat benchmark').delete()[0]
+        # Les opérations protègent leur catégorie : les supprimer d'abord
+        supprimes += Operation.objects.filter(categorie__code__startswith='BENCH').delete()[0]
+        supprimes += Categorie.objects.filter(code__startswith='BENCH').delete()[0]
+        if jours_commandes:
+            # Règle créée pour la période des commandes générées
+            supprimes += RegleSubvention.objects.filter(
+                type_subvention='POURCENT',
+                valeur=Decimal('50'),
+                effectif_de=min(jours_commandes),
+                effectif_a=max(jours_commandes)
+            ).delete()[0]
+            reconstruire(min(jours_commandes), max(jours_commandes))
+        supprimes += recherche.nettoyer_orphelins()
+    return supprimes
@@ -0,0 +1,375 @@
+"""
+Test de charge des endpoints publics : employés simultanés, serveur WSGI contre ASGI.
+
+Usage:
+    python manage.py benchmark_charge_publique                  # 200 employés, wsgi puis asgi
+    python manage.py benchmark_charge_publique --employes 100 --tours 5
+    python manage.py benchmark_charge_publique --serveurs asgi --workers 5
+    python manage.py benchmark_charge_publique --abus 50                 # + client abusif
+    python manage.py benchmark_charge_publique --abus 50 --sans-limitation
+    python manage.py benchmark_charge_publique --ip-partagee             # employés derrière un NAT
+
+Chaque employé affiche le menu public puis passe une commande
+(GET restauration/public/menu/<token>/, POST restauration/public/commander/<token>/),
+`--tours` fois, tous en même temps. Chaque serveur est mesuré dans un
+processus neuf (SERVEUR_ASGI choisit les vues et les middlewares au
+démarrage), sur une base de test (fichier temporaire en SQLite) remplie avec
+le jeu de données de depenses/jeu_donnees.py, sans réseau ni analyse HTTP :
+- wsgi : gestionnaire WSGI de Django, `--workers` requêtes à la fois
+  (workers sync de gunicorn_config.py, les autres attendent leur tour) ;
+- asgi : application ASGI de Django (asgi.py), toutes les requêtes
+  concurrentes dans la boucle d'événements, comme un worker uvicorn.
+Chaque employé a sa propre adresse IP, ou tous la même avec `--ip-partagee`
+(NAT d'un bureau : les limites par IP ne doivent pas refuser leurs
+commandes). Avec `--abus N`, un client abusif
+(une seule adresse IP) enchaîne en plus des commandes sur N connexions
+simultanées pendant toute la mesure : les limites de débit (throttling.py,
+plafond par menu, et limite par IP si THROTTLE_COMMANDE_PUBLIQUE_IP est
+définie) lui répondent 429 sans occuper les workers, `--sans-limitation` les
+désactive pour comparer.
+Résultat : requêtes par seconde, erreurs, réponses 429 et latences
+p50/p95/max (attente comprise) par endpoint.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+SERVEURS = ('wsgi', 'asgi')
+IP_ABUSIVE = '10.66.0.1'
+IP_BUREAU = '10.0.0.1'
+LIMITES = ('THROTTLE_MENU_PUBLIC_IP', 'THROTTLE_COMMANDE_PUBLIQUE_IP', 'THROTTLE_COMMANDE_PUBLIQUE_MENU')
+ENDPOINTS = ('menu', 'commande', 'abus')
+
+VOLUMES = {
+    'utilisateurs': 5,
+    'mois': 1,
+    'jours_commandes': 3,
+    'lots_tickets': 1,
+    'tickets_par_lot': 10,
+    'audit': 50,
+}
+
+
+def _centile(valeurs, centile):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * centile / 100))]
+
+
+def _corps_commande(numero, tour, menu_plat_id):
+    return json.dumps({
+        'nom_employe': f'Employé {numero}-{tour}',
+        'lignes': [{'menu_plat_id': menu_plat_id, 'quantite': 1}],
+    }).encode('utf-8')
+
+
+def _ip_employe(numero, partagee=False):
+    if partagee:
+        return IP_BUREAU
+    return f'10.0.{numero // 250}.{numero % 250 + 1}'
+
+
+def appeler_wsgi(handler, methode, chemin, corps=b'', ip='127.0.0.1'):
+    """Requête complète par l'interface WSGI, retourne le statut HTTP"""
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {
+        'REQUEST_METHOD': methode,
+        'PATH_INFO': chemin,
+        'REMOTE_ADDR': ip,
+        'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(corps)),
+        'wsgi.input': BytesIO(corps),
+    }
+    setup_testing_defaults(environ)
+    statut = []
+    reponse = handler(environ, lambda status, headers, exc_info=None: statut.append(status))
+    try:
+        for _ in reponse:
+            pass
+    finally:
+        reponse.close()
+    return int(statut[0].split()[0])
+
+
+async def appeler_asgi(application, methode, chemin, corps=b'', ip='127.0.0.1'):
+    """Requête complète par l'interface ASGI, retourne le statut HTTP"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': methode,
+        'scheme': 'http',
+        'path': chemin,
+        'raw_path': chemin.encode('utf-8'),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(corps)).encode('ascii')),
+        ],
+        'client': (ip, 0),
+        'server': ('localhost', 80),
+    }
+    recu = False
+
+    async def receive():
+        nonlocal recu
+        if not recu:
+            recu = True
+            return {'type': 'http.request', 'body': corps, 'more_body': False}
+        await asyncio.Future()  # le client ne se déconnecte pas
+
+    statut = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statut.append(message['status'])
+
+    await application(scope, receive, send)
+    return statut[0]
+
+
+class Mesures:
+    """Latences, réponses 429 et erreurs par endpoint, partagées entre employés"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.latences = {endpoint: [] for endpoint in ENDPOINTS}
+        self.limitees = dict.fromkeys(ENDPOINTS, 0)
+        self.erreurs = dict.fromkeys(ENDPOINTS, 0)
+
+    def enregistrer(self, endpoint, debut, statut, attendu):
+        with self.verrou:
+            if statut == attendu:
+                self.latences[endpoint].append((time.perf_counter() - debut) * 1000)
+            elif statut == 429:
+                self.limitees[endpoint] += 1
+            else:
+                self.erreurs[endpoint] += 1
+
+    def resume(self, duree):
+        return {
+            endpoint: {
+                'ok': len(latences),
+                'limitees': self.limitees[endpoint],
+                'erreurs': self.erreurs[endpoint],
+                'par_seconde': len(latences) / duree,
+                'p50': _centile(latences, 50),
+                'p95': _centile(latences, 95),
+                'max': max(latences, default=0),
+            }
+            for endpoint, latences in self.latences.items()
+        } | {
+            'duree_s': duree,
+            'total_par_seconde': (len(self.latences['menu']) + len(self.latences['commande'])) / duree,
+        }
+
+
+class Command(BaseCommand):
+    help = "Test de charge des endpoints publics (menu, commande) : serveur WSGI contre ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employes', type=int, default=200, help="Employés simultanés")
+        parser.add_argument('--tours', type=int, default=3, help="Menu + commande par employé")
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1,
+                            help="Requêtes simultanées en WSGI (workers sync de gunicorn_config.py)")
+        parser.add_argument('--serveurs', type=str, default=','.join(SERVEURS), help="Serveurs mesurés (wsgi,asgi)")
+        parser.add_argument('--abus', type=int, default=0, help="Connexions simultanées d'un client abusif (même IP)")
+        parser.add_argument('--sans-limitation', action='store_true', help="Désactive les limites de débit (THROTTLE_*)")
+        parser.add_argument('--ip-partagee', action='store_true', help="Tous les employés derrière une même IP (NAT)")
+        parser.add_argument('--processus-mesure', action='store_true', help="(interne) mesure dans ce processus")
+
+    def handle(self, *args, **options):
+        serveurs = [serveur.strip() for serveur in options['serveurs'].split(',') if serveur.strip()]
+        inconnus = set(serveurs) - set(SERVEURS)
+        if inconnus:
+            raise CommandError(f"Serveurs inconnus: {', '.join(sorted(inconnus))}")
+
+        if options['processus_mesure']:
+            self.stdout.write(json.dumps(self._mesurer(serveurs[0], options)))
+            return
+
+        resultats = {}
+        for serveur in serveurs:
+            self.stdout.write(f"  {serveur}: {options['employes']} employés x {options['tours']} tours...")
+            resultats[serveur] = self._lancer_processus(serveur, options)
+        self._afficher(resultats, options)
+
+    def _lancer_processus(self, serveur, options):
+        """Mesure dans un processus neuf, SERVEUR_ASGI fixé avant le chargement des réglages"""
+        resultat = subprocess.run(
+            [
+                sys.executable, sys.argv[0], 'benchmark_charge_publique', '--processus-mesure',
+                '--serveurs', serveur, '--employes', str(options['employes']),
+                '--tours', str(options['tours']), '--workers', str(options['workers']),
+                '--abus', str(options['abus']),
+                *(['--ip-partagee'] if options['ip_partagee'] else []),
+            ],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'SERVEUR_ASGI': str(serveur == 'asgi'),
+                **(dict.fromkeys(LIMITES, '') if options['sans_limitation'] else {}),
+            },
+            capture_output=True,
+            text=True,
+        )
+        if resultat.returncode != 0:
+            raise CommandError(f"Échec de la mesure {serveur}:\n{resultat.stderr[-2000:]}")
+        return json.loads(resultat.stdout.strip().splitlines()[-1])
+
+    def _mesurer(self, serveur, options):
+        from depenses.jeu_donnees import generer_jeu_donnees
+        from depenses.models import Menu
+        from depenses.tasks import attendre_taches
+
+        if settings.SERVEUR_ASGI != (serveur == 'asgi'):
+            raise CommandError(f"SERVEUR_ASGI={settings.SERVEUR_ASGI} incompatible avec la mesure {serveur}")
+
+        with tempfile.TemporaryDirectory() as dossier, override_settings(MEDIA_ROOT=dossier):
+            setup_test_environment()
+            nom_base = connection.settings_dict['NAME']
+            test = connection.settings_dict.setdefault('TEST', {})
+            if connection.vendor == 'sqlite':
+                test['NAME'] = str(Path(dossier) / 'charge.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                generer_jeu_donnees(volumes=VOLUMES)
+                menu = Menu.objects.filter(publication_at__isnull=False).order_by('date_menu').first()
+                menu_plat = menu.menu_plats.first()
+                menu_plat.stock_max = None  # pas de rupture pendant la charge
+                menu_plat.save()
+                chemins = (
+                    f'/api/restauration/public/menu/{menu.token_public}/',
+                    f'/api/restauration/public/commander/{menu.token_public}/',
+                )
+                connections.close_all()
+                if serveur == 'wsgi':
+                    return self._charge_wsgi(chemins, menu_plat.pk, options)
+                return asyncio.run(self._charge_asgi(chemins, menu_plat.pk, options))
+            finally:
+                attendre_taches()
+                connections.close_all()
+                connection.creation.destroy_test_db(nom_base, verbosity=0)
+                teardown_test_environment()
+
+    def _charge_wsgi(self, chemins, menu_plat_id, options):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        handler = WSGIHandler()
+        mesures = Mesures()
+        workers = ThreadPoolExecutor(options['workers'])
+        depart = threading.Barrier(options['employes'] + options['abus'])
+        fin = threading.Event()
+
+        def employe(numero):
+            ip = _ip_employe(numero, options['ip_partagee'])
+            depart.wait()
+            for tour in range(options['tours']):
+                debut = time.perf_counter()
+                statut = workers.submit(appeler_wsgi, handler, 'GET', chemins[0], b'', ip).result()
+                mesures.enregistrer('menu', debut, statut, 200)
+                debut = time.perf_counter()
+                corps = _corps_commande(numero, tour, menu_plat_id)
+                statut = workers.submit(appeler_wsgi, handler, 'POST', chemins[1], corps, ip).result()
+                mesures.enregistrer('commande', debut, statut, 201)
+
+        def abus(numero):
+            depart.wait()
+            tour = 0
+            while not fin.is_set():
+                debut = time.perf_counter()
+                corps = _corps_commande(f'abus{numero}', tour, menu_plat_id)
+                statut = workers.submit(appeler_wsgi, handler, 'POST', chemins[1], corps, IP_ABUSIVE).result()
+                mesures.enregistrer('abus', debut, statut, 201)
+                tour += 1
+
+        employes = [threading.Thread(target=employe, args=(numero,)) for numero in range(options['employes'])]
+        abusifs = [threading.Thread(target=abus, args=(numero,)) for numero in range(options['abus'])]
+        debut = time.perf_counter()
+        for thread in employes + abusifs:
+            thread.start()
+        for thread in employes:
+            thread.join()
+        duree = time.perf_counter() - debut
+        fin.set()
+        for thread in abusifs:
+            thread.join()
+        workers.shutdown()
+        return mesures.resume(duree)
+
+    async def _charge_asgi(self, chemins, menu_plat_id, options):
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+        mesures = Mesures()
+        fin = asyncio.Event()
+
+        async def employe(numero):
+            ip = _ip_employe(numero, options['ip_partagee'])
+            for tour in range(options['tours']):
+                debut = time.perf_counter()
+                statut = await appeler_asgi(application, 'GET', chemins[0], b'', ip)
+                mesures.enregistrer('menu', debut, statut, 200)
+                debut = time.perf_counter()
+                corps = _corps_commande(numero, tour, menu_plat_id)
+                statut = await appeler_asgi(application, 'POST', chemins[1], corps, ip)
+                mesures.enregistrer('commande', debut, statut, 201)
+
+        async def abus(numero):
+            tour = 0
+            while not fin.is_set():
+                debut = time.perf_counter()
+                corps = _corps_commande(f'abus{numero}', tour, menu_plat_id)
+                statut = await appeler_asgi(application, 'POST', chemins[1], corps, IP_ABUSIVE)
+                mesures.enregistrer('abus', debut, statut, 201)
+                tour += 1
+
+        abusifs = [asyncio.create_task(abus(numero)) for numero in range(options['abus'])]
+        debut = time.perf_counter()
+        await asyncio.gather(*(employe(numero) for numero in range(options['employes'])))
+        duree = time.perf_counter() - debut
+        fin.set()
+        await asyncio.gather(*abusifs)
+        return mesures.resume(duree)
+
+    def _afficher(self, resultats, options):
+        limitation = 'sans limitation' if options['sans_limitation'] else 'limites de débit actives'
+        adresses = 'une IP partagée' if options['ip_partagee'] else 'une IP chacun'
+        self.stdout.write(
+            f"\n{options['employes']} employés ({adresses}), {options['tours']} tours, {options['workers']} workers WSGI, "
+            f"client abusif: {options['abus']} connexions ({limitation})"
+            f"\n{'Serveur':<8} {'Endpoint':<9} {'OK':>6} {'429':>6} {'Err.':>5} {'req/s':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        for serveur, resultat in resultats.items():
+            for endpoint in ENDPOINTS:
+                mesure = resultat[endpoint]
+                if endpoint == 'abus' and not options['abus']:
+                    continue
+                self.stdout.write(
+                    f"{serveur:<8} {endpoint:<9} {mesure['ok']:>6} {mesure['limitees']:>6} {mesure['erreurs']:>5} "
+                    f"{mesure['par_seconde']:>7.1f} {mesure['p50']:>8.0f} {mesure['p95']:>8.0f} {mesure['max']:>8.0f}"
+                )
+            self.stdout.write(
+                f"{serveur:<8} {'employés':<9} {'':>6} {'':>6} {'':>5} {resultat['total_par_seconde']:>7.1f} "
+                f"({resultat['duree_s']:.1f} s)"
+            )
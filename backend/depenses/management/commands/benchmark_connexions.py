@@ -0,0 +1,175 @@
+"""
+Benchmark de la latence par requête avec et sans connexions persistantes.
+
+Usage:
+    python manage.py benchmark_connexions                 # 500 requêtes par mode
+    python manage.py benchmark_connexions --requetes 2000 --age 120
+    python manage.py benchmark_connexions --modes sans,verifiee
+
+Mesure utile en mode MySQL (USE_SQLITE=False, serveur MySQL/MariaDB local ou
+distant) : l'ouverture d'une connexion y coûte l'aller-retour réseau, le TLS,
+l'authentification et l'init_command. Une base de test est créée (comme pour
+`manage.py test` ; fichier temporaire en SQLite, dont la base de test en
+mémoire ne ferme jamais sa connexion) et remplie avec le jeu de données de
+depenses/jeu_donnees.py (volumes réduits). Des requêtes GET passent ensuite
+par le gestionnaire WSGI de Django — avec les signaux request_started et
+request_finished qui ferment ou réutilisent la connexion, contrairement au
+client de test — pour chaque mode :
+- sans : CONN_MAX_AGE=0, une connexion par requête ;
+- persistante : CONN_MAX_AGE=--age, sans vérification ;
+- verifiee : CONN_MAX_AGE=--age et CONN_HEALTH_CHECKS (réglage par défaut).
+Résultat : connexions ouvertes, latences moyenne, p50, p95 et max.
+"""
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+MODES = ('sans', 'persistante', 'verifiee')
+ECHAUFFEMENT = 20
+
+VOLUMES = {
+    'utilisateurs': 5,
+    'mois': 1,
+    'jours_commandes': 3,
+    'lots_tickets': 1,
+    'tickets_par_lot': 10,
+    'audit': 50,
+}
+
+
+def _centile(valeurs, centile):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * centile / 100))]
+
+
+class CompteurConnexions:
+    """Compte les connexions ouvertes (signal connection_created)"""
+
+    def __init__(self):
+        self.nombre = 0
+
+    def __call__(self, sender, connection, **kwargs):
+        self.nombre += 1
+
+
+class Command(BaseCommand):
+    help = "Compare la latence par requête avec et sans connexions persistantes (CONN_MAX_AGE, CONN_HEALTH_CHECKS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=500, help="Requêtes mesurées par mode")
+        parser.add_argument('--age', type=int, default=60, help="CONN_MAX_AGE des modes persistants (secondes)")
+        parser.add_argument('--modes', type=str, default=','.join(MODES), help="Modes mesurés (sans,persistante,verifiee)")
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        inconnus = set(modes) - set(MODES)
+        if inconnus:
+            raise CommandError(f"Modes inconnus: {', '.join(sorted(inconnus))}")
+        if connection.vendor != 'mysql':
+            self.stdout.write(self.style.WARNING(
+                f"Base {connection.vendor} : ouvrir une connexion y est peu coûteux, mesure représentative en MySQL"
+            ))
+
+        reglages = {
+            'sans': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+            'persistante': {'CONN_MAX_AGE': options['age'], 'CONN_HEALTH_CHECKS': False},
+            'verifiee': {'CONN_MAX_AGE': options['age'], 'CONN_HEALTH_CHECKS': True},
+        }
+        initiaux = {cle: connection.settings_dict.get(cle) for cle in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+
+        with tempfile.TemporaryDirectory() as dossier:
+            setup_test_environment()
+            nom_base = connection.settings_dict['NAME']
+            test = connection.settings_dict.setdefault('TEST', {})
+            nom_test = test.get('NAME')
+            if connection.vendor == 'sqlite':
+                test['NAME'] = str(Path(dossier) / 'connexions.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                requetes = self._preparer()
+                resultats = {}
+                for mode in modes:
+                    self.stdout.write(f"  {mode} {reglages[mode]}...")
+                    connection.close()
+                    connection.settings_dict.update(reglages[mode])
+                    resultats[mode] = self._mesurer(requetes, options['requetes'])
+            finally:
+                connection.close()
+                connection.settings_dict.update(initiaux)
+                connection.creation.destroy_test_db(nom_base, verbosity=0)
+                test['NAME'] = nom_test
+                teardown_test_environment()
+        self._afficher(resultats)
+
+    def _preparer(self):
+        """Jeu de données et requêtes GET à rejouer (publique et authentifiées)"""
+        from django.contrib.auth.models import User
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from depenses.jeu_donnees import generer_jeu_donnees
+        from depenses.models import Menu
+
+        generer_jeu_donnees(volumes=VOLUMES)
+        menu = Menu.objects.filter(publication_at__isnull=False).order_by('date_menu').first()
+        jeton = f"Bearer {AccessToken.for_user(User.objects.get(username='bench_admin'))}"
+        return [
+            (f'/api/restauration/public/menu/{menu.token_public}/', None),
+            ('/api/categories/', jeton),
+            ('/api/operations/', jeton),
+        ]
+
+    def _mesurer(self, requetes, nombre):
+        handler = WSGIHandler()
+        compteur = CompteurConnexions()
+        latences = []
+        for i in range(ECHAUFFEMENT + nombre):
+            if i == ECHAUFFEMENT:
+                connection_created.connect(compteur)
+            chemin, jeton = requetes[i % len(requetes)]
+            debut = time.perf_counter()
+            statut = self._appeler(handler, chemin, jeton)
+            if i >= ECHAUFFEMENT:
+                latences.append((time.perf_counter() - debut) * 1000)
+            if not statut.startswith('200'):
+                connection_created.disconnect(compteur)
+                raise CommandError(f"{chemin}: {statut}")
+        connection_created.disconnect(compteur)
+        return {'connexions': compteur.nombre, 'latences': latences}
+
+    @staticmethod
+    def _appeler(handler, chemin, jeton):
+        """Requête complète par l'interface WSGI (signaux de début et de fin inclus)"""
+        environ = {'PATH_INFO': chemin, 'HTTP_HOST': 'localhost', 'wsgi.input': BytesIO()}
+        if jeton:
+            environ['HTTP_AUTHORIZATION'] = jeton
+        setup_testing_defaults(environ)
+        statut = []
+        reponse = handler(environ, lambda status, headers, exc_info=None: statut.append(status))
+        try:
+            for _ in reponse:
+                pass
+        finally:
+            reponse.close()  # request_finished : fermeture ou conservation de la connexion
+        return statut[0]
+
+    def _afficher(self, resultats):
+        self.stdout.write(
+            f"\n{'Mode':<12} {'Requêtes':>9} {'Connexions':>11} {'moy. ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        for mode, resultat in resultats.items():
+            latences = resultat['latences']
+            self.stdout.write(
+                f"{mode:<12} {len(latences):>9} {resultat['connexions']:>11} "
+                f"{sum(latences) / len(latences):>8.2f} {_centile(latences, 50):>8.2f} "
+                f"{_centile(latences, 95):>8.2f} {max(latences):>8.2f}"
+            )
@@ -0,0 +1,139 @@
+"""
+Benchmark de non-régression du temps d'import au démarrage d'un worker.
+
+Usage:
+    python manage.py benchmark_demarrage                   # compare au budget
+    python manage.py benchmark_demarrage --update-budget   # réécrit le budget
+    python manage.py benchmark_demarrage --essais 9 --top 30
+
+Chaque essai lance un interpréteur neuf avec `python -X importtime` qui
+importe suivi_depense.wsgi puis charge les URLs (donc toutes les vues), comme
+un worker gunicorn avant sa première requête. La durée retenue est la médiane
+des essais. La commande échoue si un module lourd réservé aux exports
+(pandas, reportlab, openpyxl : voir depenses/exports/) ou aux tâches (celery :
+voir depenses/tasks.py) est importé au démarrage, si le nombre de modules
+importés dépasse le budget, ou si la durée dépasse le budget de plus de la
+tolérance (depenses/benchmarks/budget_demarrage.json).
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+FICHIER_BUDGET = Path(__file__).resolve().parents[2] / 'benchmarks' / 'budget_demarrage.json'
+
+CODE_DEMARRAGE = (
+    "import suivi_depense.wsgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+# Modules importés uniquement à la demande par les exports, imports CSV et tâches (depenses/tasks.py)
+MODULES_INTERDITS = ['pandas', 'numpy', 'reportlab', 'openpyxl', 'celery', 'kombu']
+
+# Écart de durée toléré par rapport au budget (machines et charges différentes)
+TOLERANCE = 0.3
+
+LIGNE_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def analyser_importtime(sortie):
+    """Modules importés d'une sortie `-X importtime`
+
+    Retourne une liste de (module, propre_us, cumule_us, profondeur) dans
+    l'ordre de fin d'import.
+    """
+    modules = []
+    for ligne in sortie.splitlines():
+        trouve = LIGNE_IMPORTTIME.match(ligne)
+        if trouve:
+            propre, cumule, indentation, module = trouve.groups()
+            modules.append((module, int(propre), int(cumule), (len(indentation) - 1) // 2))
+    return modules
+
+
+def mesurer_demarrage():
+    """Un démarrage dans un interpréteur neuf : (durée totale en ms, modules importés)"""
+    resultat = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODE_DEMARRAGE],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+    )
+    if resultat.returncode != 0:
+        raise CommandError(f"Échec du démarrage:\n{resultat.stderr[-2000:]}")
+    modules = analyser_importtime(resultat.stderr)
+    total_us = sum(cumule for _, _, cumule, profondeur in modules if profondeur == 0)
+    return total_us / 1000, modules
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps d'import au démarrage (suivi_depense.wsgi et vues) et compare au budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update-budget', action='store_true', help="Réécrire le budget avec les mesures actuelles")
+        parser.add_argument('--essais', type=int, default=5, help="Nombre de démarrages mesurés (médiane)")
+        parser.add_argument('--top', type=int, default=15, help="Nombre de modules les plus coûteux affichés")
+        parser.add_argument('--budget', type=str, default=str(FICHIER_BUDGET), help="Fichier JSON du budget")
+
+    def handle(self, *args, **options):
+        durees = []
+        modules = []
+        for _ in range(max(options['essais'], 1)):
+            duree, modules = mesurer_demarrage()
+            durees.append(duree)
+
+        mesure = {
+            'duree_ms': round(statistics.median(durees), 1),
+            'modules': len(modules),
+            'interdits': sorted({
+                module for module, _, _, _ in modules
+                if module.split('.')[0] in MODULES_INTERDITS
+            }),
+        }
+        self._afficher(mesure, durees, modules, options['top'])
+        self._comparer(mesure, Path(options['budget']), options['update_budget'])
+
+    def _afficher(self, mesure, durees, modules, top):
+        self.stdout.write(f"\n{'Module':<50} {'propre ms':>10} {'cumulé ms':>10}")
+        for module, propre, cumule, _ in sorted(modules, key=lambda m: m[1], reverse=True)[:top]:
+            self.stdout.write(f"{module:<50} {propre / 1000:>10.1f} {cumule / 1000:>10.1f}")
+        self.stdout.write(
+            f"\nDémarrage: {mesure['duree_ms']} ms (médiane de {len(durees)} essais, "
+            f"min {min(durees):.1f}, max {max(durees):.1f}), {mesure['modules']} modules"
+        )
+
+    def _comparer(self, mesure, fichier, mise_a_jour):
+        if mesure['interdits']:
+            raise CommandError(
+                "Modules lourds importés au démarrage (à importer dans la fonction qui les utilise):\n  "
+                + "\n  ".join(mesure['interdits'][:20])
+            )
+
+        if mise_a_jour:
+            budget = {'duree_ms': mesure['duree_ms'], 'modules': mesure['modules'], 'tolerance': TOLERANCE}
+            fichier.parent.mkdir(parents=True, exist_ok=True)
+            fichier.write_text(json.dumps(budget, indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"\nBudget mis à jour: {fichier}"))
+            return
+
+        if not fichier.exists():
+            raise CommandError(f"Budget introuvable: {fichier} (lancer avec --update-budget)")
+        budget = json.loads(fichier.read_text(encoding='utf-8'))
+
+        depassements = []
+        limite = budget['duree_ms'] * (1 + budget.get('tolerance', TOLERANCE))
+        if mesure['duree_ms'] > limite:
+            depassements.append(f"durée: {mesure['duree_ms']} ms (budget {budget['duree_ms']} ms, limite {limite:.1f} ms)")
+        if mesure['modules'] > budget['modules']:
+            depassements.append(f"modules: {mesure['modules']} (budget {budget['modules']})")
+        if depassements:
+            raise CommandError("Budget de démarrage dépassé:\n  " + "\n  ".join(depassements))
+        self.stdout.write(self.style.SUCCESS("\nLe démarrage respecte le budget"))
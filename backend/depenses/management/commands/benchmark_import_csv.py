@@ -0,0 +1,237 @@
+"""
+Benchmark de l'import CSV des opérations : lecture en flux contre pandas.
+
+Usage:
+    python manage.py benchmark_import_csv                    # 100 000 lignes, lecture et import
+    python manage.py benchmark_import_csv --lignes 20000 --phases import
+    python manage.py benchmark_import_csv --implementations flux
+
+Un fichier CSV d'opérations au format de l'export (séparateur ;) est généré
+dans un fichier temporaire, puis chaque phase est mesurée pour les deux
+implémentations :
+- lecture : analyse et conversion des lignes, sans base de données
+  (pandas.read_csv + iterrows contre depenses.imports_csv.lire_csv) ;
+- import : import complet dans une base de test (comme `manage.py test`),
+  ligne à ligne avec Operation.objects.create et les signaux (ancienne
+  implémentation de OperationViewSet.import_csv) contre l'import par lots.
+Pour chaque mesure : durée et débit (lignes/s). La lecture est rejouée sous
+tracemalloc pour son pic mémoire Python (DataFrame entier contre un lot) ;
+l'import, trop long pour être rejoué, donne le nombre de requêtes SQL.
+"""
+import csv
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from depenses.imports_csv import COLONNES_OPERATIONS, ImportOperations, lire_csv
+
+from .benchmark_requetes import CompteurRequetes
+
+PHASES = ('lecture', 'import')
+IMPLEMENTATIONS = ('pandas', 'flux')
+NB_CATEGORIES = 5
+
+
+def generer_csv(fichier, lignes, graine=42):
+    """Écrit `lignes` opérations au format de l'export CSV (texte, séparateur ;)"""
+    rng = random.Random(graine)
+    ecrivain = csv.writer(fichier, delimiter=';')
+    ecrivain.writerow(COLONNES_OPERATIONS + ['Code Catégorie', 'Sous-Catégorie', 'Description'])
+    debut = date(2025, 1, 1)
+    for i in range(lignes):
+        numero = rng.randrange(NB_CATEGORIES)
+        unites = rng.randint(1, 20)
+        prix = Decimal(rng.randrange(1_000, 200_000, 500))
+        ecrivain.writerow([
+            debut + timedelta(days=i * 365 // max(lignes, 1)),
+            f'Catégorie import {numero}',
+            unites,
+            prix,
+            unites * prix,
+            f'IMPORT{numero:02d}',
+            f'Sous-catégorie {rng.randrange(3)}',
+            f'Dépense importée {i}',
+        ])
+
+
+def lecture_pandas(chemin):
+    """Analyse et conversion comme l'ancienne implémentation (sans écriture)"""
+    import pandas as pd
+
+    with open(chemin, 'rb') as fichier:
+        df = pd.read_csv(fichier, delimiter=';', encoding='utf-8-sig')
+    nombre = 0
+    for _, row in df.iterrows():
+        (row.get('Code Catégorie') or row.get('Catégorie'))[:20]
+        if pd.notna(row.get('Sous-Catégorie')):
+            row['Sous-Catégorie'][:100]
+        pd.to_datetime(row['Date Opération']).date()
+        float(row['Unités'])
+        float(row['Prix Unitaire'])
+        row.get('Description', '')[:500]
+        nombre += 1
+    return nombre
+
+
+def lecture_flux(chemin):
+    """Analyse et conversion de l'import en flux (sans écriture)"""
+    import_operations = ImportOperations()
+    # Référentiel fictif : seule la lecture est mesurée
+    import_operations.categorie = lambda ligne: None
+    import_operations.sous_categorie = lambda categorie, nom: None
+    nombre = 0
+    with open(chemin, 'rb') as fichier:
+        for _, ligne in lire_csv(fichier, COLONNES_OPERATIONS):
+            import_operations.convertir(ligne)
+            nombre += 1
+    return nombre
+
+
+def import_pandas(chemin, utilisateur):
+    """Ancienne implémentation de OperationViewSet.import_csv (ligne à ligne)"""
+    import pandas as pd
+
+    from audit.middleware import log_audit
+    from depenses.models import Categorie, SousCategorie, Operation
+
+    with open(chemin, 'rb') as fichier:
+        df = pd.read_csv(fichier, delimiter=';', encoding='utf-8-sig')
+    imported = 0
+    errors = []
+    for index, row in df.iterrows():
+        try:
+            categorie_code = row.get('Code Catégorie') or row.get('Catégorie')
+            categorie, _ = Categorie.objects.get_or_create(
+                code=categorie_code[:20],
+                defaults={'nom': row.get('Catégorie', categorie_code)}
+            )
+            sous_categorie = None
+            if pd.notna(row.get('Sous-Catégorie')):
+                sous_categorie, _ = SousCategorie.objects.get_or_create(
+                    categorie=categorie,
+                    nom=row['Sous-Catégorie'][:100]
+                )
+            operation = Operation.objects.create(
+                date_operation=pd.to_datetime(row['Date Opération']).date(),
+                categorie=categorie,
+                sous_categorie=sous_categorie,
+                unites=float(row['Unités']),
+                prix_unitaire=float(row['Prix Unitaire']),
+                description=row.get('Description', '')[:500],
+                created_by=utilisateur
+            )
+            imported += 1
+            log_audit('import', utilisateur, operation, metadata={'source': 'csv'})
+        except Exception as e:
+            errors.append(f"Ligne {index + 2}: {str(e)}")
+    return imported
+
+
+def import_flux(chemin, utilisateur):
+    """Import par lots de depenses.imports_csv"""
+    with open(chemin, 'rb') as fichier:
+        return ImportOperations(utilisateur).importer(fichier)['imported']
+
+
+class Command(BaseCommand):
+    help = "Compare l'import CSV en flux à l'ancienne implémentation pandas (durée, mémoire, requêtes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=100_000, help="Nombre de lignes du fichier généré")
+        parser.add_argument('--phases', type=str, default=','.join(PHASES), help="Phases mesurées (lecture,import)")
+        parser.add_argument('--implementations', type=str, default=','.join(IMPLEMENTATIONS),
+                            help="Implémentations mesurées (pandas,flux ; l'import pandas est lent)")
+        parser.add_argument('--graine', type=int, default=42, help="Graine du fichier généré")
+
+    def handle(self, *args, **options):
+        phases = self._liste(options['phases'], PHASES)
+        implementations = self._liste(options['implementations'], IMPLEMENTATIONS)
+        if 'pandas' in implementations:
+            try:
+                import pandas  # noqa
+            except ImportError:
+                raise CommandError("pandas n'est plus une dépendance : l'installer pour la référence, ou --implementations flux")
+        fonctions = {
+            'lecture': {'pandas': lecture_pandas, 'flux': lecture_flux},
+            'import': {'pandas': import_pandas, 'flux': import_flux},
+        }
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8-sig', newline='') as fichier:
+            generer_csv(fichier, options['lignes'], options['graine'])
+            fichier.flush()
+            self.stdout.write(f"Fichier: {options['lignes']} lignes")
+
+            mesures = []
+            if 'lecture' in phases:
+                for implementation in implementations:
+                    mesures.append(self._mesurer('lecture', implementation, fonctions['lecture'][implementation], fichier.name))
+            if 'import' in phases:
+                mesures.extend(self._mesurer_import(fichier.name, {i: fonctions['import'][i] for i in implementations}))
+
+        self._afficher(mesures)
+
+    @staticmethod
+    def _liste(valeur, possibles):
+        elements = [element.strip() for element in valeur.split(',') if element.strip()]
+        inconnus = set(elements) - set(possibles)
+        if inconnus:
+            raise CommandError(f"Valeurs inconnues: {', '.join(sorted(inconnus))} (possibles: {', '.join(possibles)})")
+        return elements
+
+    def _mesurer_import(self, chemin, fonctions):
+        from django.contrib.auth.models import User
+
+        setup_test_environment()
+        nom_base = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            utilisateur = User.objects.create_user('bench_import', password='benchmark')
+            return [
+                self._mesurer('import', implementation, fonction, chemin, utilisateur, requetes=True, memoire=False)
+                for implementation, fonction in fonctions.items()
+            ]
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            teardown_test_environment()
+
+    def _mesurer(self, phase, implementation, fonction, *args, requetes=False, memoire=True):
+        self.stdout.write(f"  {phase} ({implementation})...")
+        compteur = CompteurRequetes()
+        debut = time.perf_counter()
+        with connection.execute_wrapper(compteur):
+            lignes = fonction(*args)
+        duree = time.perf_counter() - debut
+
+        # Mémoire mesurée à part : tracemalloc ralentit fortement l'exécution
+        pic = None
+        if memoire:
+            tracemalloc.start()
+            fonction(*args)
+            _, pic = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return {
+            'phase': phase,
+            'implementation': implementation,
+            'lignes': lignes,
+            'duree_s': duree,
+            'debit': lignes / duree if duree else 0,
+            'memoire_mo': pic / 1024 / 1024 if pic is not None else None,
+            'requetes': compteur.nombre if requetes else None,
+        }
+
+    def _afficher(self, mesures):
+        self.stdout.write(f"\n{'Phase':<10} {'Impl.':<8} {'Lignes':>8} {'s':>9} {'lignes/s':>10} {'Mo':>8} {'Req.':>9}")
+        for mesure in mesures:
+            memoire = '' if mesure['memoire_mo'] is None else f"{mesure['memoire_mo']:.1f}"
+            requetes = '' if mesure['requetes'] is None else mesure['requetes']
+            self.stdout.write(
+                f"{mesure['phase']:<10} {mesure['implementation']:<8} {mesure['lignes']:>8} "
+                f"{mesure['duree_s']:>9.2f} {mesure['debit']:>10.0f} {memoire:>8} {requetes:>9}"
+            )
@@ -0,0 +1,151 @@
+"""
+Benchmark des rendus PDF : rendus par seconde et taille des documents.
+
+Usage:
+    python manage.py benchmark_pdf                     # 5 rendus par document
+    python manage.py benchmark_pdf --rendus 20 --documents facture,tickets
+    python manage.py benchmark_pdf --lignes 5000 --documents operations,audit --seuil 0
+
+Une base de test est créée (comme pour `manage.py test`, fichier temporaire en
+SQLite) et remplie avec le jeu de données de depenses/jeu_donnees.py, les
+factures sont écrites dans un MEDIA_ROOT temporaire. Documents mesurés, dans
+un même processus comme un worker qui enchaîne les exports :
+- facture : facture journalière (generer_pdf_facture) du jour le plus chargé ;
+- operations : liste des opérations (`--lignes` premières) ;
+- audit : journaux d'audit (`--lignes` premiers) ;
+- tickets : planche de tickets d'un lot (logo et QR code par ticket).
+Le premier rendu de chaque document (chargement des modules, du logo et des
+styles) est compté à part : « premier ms ». `--seuil` remplace
+PDF_SEUIL_CANEVAS : 0 force le tableau dessiné sur le canevas, une valeur
+supérieure à `--lignes` force le Table platypus.
+"""
+import math
+import statistics
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+DOCUMENTS = ('facture', 'operations', 'audit', 'tickets')
+
+VOLUMES = {
+    'utilisateurs': 40,
+    'mois': 2,
+    'jours_commandes': 3,
+    'lots_tickets': 1,
+    'tickets_par_lot': 80,
+    'audit': 300,
+}
+
+
+class Command(BaseCommand):
+    help = "Mesure les rendus PDF par seconde (facture, opérations, audit, tickets)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rendus', type=int, default=5, help="Rendus mesurés par document (après le premier)")
+        parser.add_argument('--lignes', type=int, default=200, help="Lignes des listes d'opérations et d'audit")
+        parser.add_argument('--documents', type=str, default=','.join(DOCUMENTS),
+                            help="Documents mesurés (facture,operations,audit,tickets)")
+        parser.add_argument('--seuil', type=int, default=None,
+                            help="PDF_SEUIL_CANEVAS pendant la mesure (défaut: réglage courant)")
+
+    def handle(self, *args, **options):
+        documents = [document.strip() for document in options['documents'].split(',') if document.strip()]
+        inconnus = set(documents) - set(DOCUMENTS)
+        if inconnus:
+            raise CommandError(f"Documents inconnus: {', '.join(sorted(inconnus))}")
+
+        reglages = {}
+        if options['seuil'] is not None:
+            reglages['PDF_SEUIL_CANEVAS'] = options['seuil']
+
+        with tempfile.TemporaryDirectory() as dossier, override_settings(MEDIA_ROOT=dossier, **reglages):
+            setup_test_environment()
+            nom_base = connection.settings_dict['NAME']
+            test = connection.settings_dict.setdefault('TEST', {})
+            nom_test = test.get('NAME')
+            if connection.vendor == 'sqlite':
+                test['NAME'] = str(Path(dossier) / 'pdf.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                rendus = self._preparer(options['lignes'])
+                resultats = {}
+                for document in documents:
+                    self.stdout.write(f"  {document}...")
+                    resultats[document] = self._mesurer(rendus[document], options['rendus'])
+            finally:
+                connection.close()
+                connection.creation.destroy_test_db(nom_base, verbosity=0)
+                test['NAME'] = nom_test
+                teardown_test_environment()
+        self._afficher(resultats)
+
+    def _preparer(self, lignes):
+        """Fonctions de rendu sans argument, chacune retournant la taille du PDF produit"""
+        from audit.models import AuditLog
+        from depenses.jeu_donnees import generer_jeu_donnees
+        from depenses.models import Facture, LotTickets, Operation
+
+        # Assez d'opérations (environ 60 jours) et de journaux pour `lignes`
+        generer_jeu_donnees(volumes={
+            **VOLUMES,
+            'operations_par_jour': max(3, math.ceil(lignes / 59)),
+            'audit': max(VOLUMES['audit'], lignes),
+        })
+        facture = Facture.objects.order_by('-total_commandes', 'date_facture').first()
+        ids_operations = list(Operation.objects.order_by('-date_operation', 'id').values_list('id', flat=True)[:lignes])
+        ids_audit = list(AuditLog.objects.order_by('-timestamp').values_list('id', flat=True)[:lignes])
+        lot = LotTickets.objects.first()
+
+        def facture_pdf():
+            from depenses.exports.pdf_restauration import generer_pdf_facture
+            return Path(generer_pdf_facture(facture)).stat().st_size
+
+        def operations_pdf():
+            from depenses.exports.pdf import document_operations
+            sortie = BytesIO()
+            document_operations(sortie, Operation.objects.filter(id__in=ids_operations).select_related(
+                'categorie', 'sous_categorie').order_by('-date_operation', 'id'))
+            return sortie.tell()
+
+        def audit_pdf():
+            from depenses.exports.pdf import document_journaux_audit
+            sortie = BytesIO()
+            document_journaux_audit(sortie, AuditLog.objects.filter(id__in=ids_audit).select_related(
+                'user').order_by('-timestamp'), {})
+            return sortie.tell()
+
+        def tickets_pdf():
+            from depenses.exports.pdf_restauration import document_tickets
+            sortie = BytesIO()
+            document_tickets(sortie, lot, lot.tickets.filter(statut='disponible'))
+            return sortie.tell()
+
+        return {'facture': facture_pdf, 'operations': operations_pdf, 'audit': audit_pdf, 'tickets': tickets_pdf}
+
+    def _mesurer(self, rendre, nombre):
+        debut = time.perf_counter()
+        taille = rendre()
+        premier = (time.perf_counter() - debut) * 1000
+        durees = []
+        for _ in range(nombre):
+            debut = time.perf_counter()
+            rendre()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return {'premier': premier, 'durees': durees, 'taille': taille}
+
+    def _afficher(self, resultats):
+        self.stdout.write(
+            f"\n{'Document':<11} {'premier ms':>11} {'moy. ms':>8} {'méd. ms':>8} {'rendus/s':>9} {'Taille Kio':>11}"
+        )
+        for document, resultat in resultats.items():
+            durees = resultat['durees'] or [resultat['premier']]
+            moyenne = sum(durees) / len(durees)
+            self.stdout.write(
+                f"{document:<11} {resultat['premier']:>11.0f} {moyenne:>8.0f} {statistics.median(durees):>8.0f} "
+                f"{1000 / moyenne:>9.2f} {resultat['taille'] / 1024:>11.0f}"
+            )
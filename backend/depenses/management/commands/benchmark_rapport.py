@@ -0,0 +1,171 @@
+"""
+Benchmark du rapport mensuel de restauration.
+
+Usage:
+    python manage.py benchmark_rapport
+    python manage.py benchmark_rapport --utilisateurs 300 --repetitions 5
+
+Un mois de commandes synthétiques est créé dans une transaction annulée à la
+fin : la base n'est pas modifiée. Compare l'ancien calcul (boucles Python)
+au rapport lu dans les agrégats journaliers (depenses/rapports.py), et mesure
+la reconstruction de ces agrégats.
+"""
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from depenses.agregats import reconstruire
+from depenses.models import Commande, CommandeLigne, Menu, MenuPlat, Plat
+from depenses.rapports import rapport_restauration
+
+
+class _Annulation(Exception):
+    pass
+
+
+class _CompteurRequetes:
+    """Compte les requêtes exécutées (sans la limite du journal de requêtes Django)"""
+
+    def __init__(self):
+        self.nombre = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.nombre += 1
+        return execute(sql, params, many, context)
+
+
+def rapport_historique(mois_debut, mois_fin):
+    """Ancienne implémentation de CommandeViewSet.rapport (référence)"""
+    commandes = Commande.objects.filter(
+        date_commande__gte=mois_debut,
+        date_commande__lte=mois_fin,
+        etat='validee'
+    )
+    total_brut = sum(c.montant_brut for c in commandes)
+    total_subvention = sum(c.montant_subvention for c in commandes)
+    total_net = sum(c.montant_net for c in commandes)
+    nb_commandes = commandes.count()
+    nb_plats = sum(sum(l.quantite for l in c.lignes.all()) for c in commandes)
+    top_plats = CommandeLigne.objects.filter(
+        commande__in=commandes
+    ).values(
+        'menu_plat__plat__nom'
+    ).annotate(
+        total_quantite=Sum('quantite')
+    ).order_by('-total_quantite')[:10]
+    return {
+        'nb_commandes': nb_commandes,
+        'nb_plats': nb_plats,
+        'total_brut': total_brut,
+        'total_subvention': total_subvention,
+        'total_net': total_net,
+        'top_plats': list(top_plats),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare le rapport mensuel restauration (boucles Python vs agrégats SQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--utilisateurs', type=int, default=200, help="Nombre d'utilisateurs commandant chaque jour")
+        parser.add_argument('--plats', type=int, default=8, help="Nombre de plats au menu chaque jour")
+        parser.add_argument('--repetitions', type=int, default=3, help="Nombre de mesures par implémentation")
+        parser.add_argument('--graine', type=int, default=42, help="Graine du générateur aléatoire")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                mois_debut, mois_fin = self._generer_mois(options)
+                self._mesurer('historique', rapport_historique, mois_debut, mois_fin, options['repetitions'])
+                self._mesurer('agrégats', rapport_restauration, mois_debut, mois_fin, options['repetitions'])
+                raise _Annulation()
+        except _Annulation:
+            self.stdout.write("Données synthétiques supprimées (transaction annulée)")
+
+    def _generer_mois(self, options):
+        rng = random.Random(options['graine'])
+        # Mois sans menu existant, loin dans le futur
+        mois_debut = date(2099, 1, 1)
+        mois_fin = date(2099, 1, 31)
+
+        plats = [
+            Plat.objects.create(
+                nom=f"Plat benchmark {i}",
+                categorie_restau='Dejeuner',
+                prix_standard=Decimal(rng.choice([20000, 25000, 30000, 45000]))
+            )
+            for i in range(options['plats'])
+        ]
+        utilisateurs = User.objects.bulk_create([
+            User(username=f"benchmark_rapport_{i}")
+            for i in range(options['utilisateurs'])
+        ])
+        if not utilisateurs[0].pk:
+            # Backends sans récupération des clés (MySQL)
+            utilisateurs = list(User.objects.filter(username__startswith='benchmark_rapport_').order_by('id'))
+
+        jours = [mois_debut + timedelta(days=i) for i in range((mois_fin - mois_debut).days + 1)]
+        menus = [Menu.objects.create(date_menu=jour) for jour in jours]
+        MenuPlat.objects.bulk_create([
+            MenuPlat(menu=menu, plat=plat, prix_jour=plat.prix_standard, ordre=i)
+            for menu in menus for i, plat in enumerate(plats)
+        ])
+        menu_plats = {}
+        for menu_plat in MenuPlat.objects.filter(menu__in=menus):
+            menu_plats.setdefault(menu_plat.menu_id, []).append(menu_plat)
+
+        commandes = []
+        choix = []
+        for menu in menus:
+            for utilisateur in utilisateurs:
+                menu_plat = rng.choice(menu_plats[menu.id])
+                prix = min(menu_plat.prix_jour, Decimal('30000.00'))
+                subvention = (prix * Decimal('0.5')).quantize(Decimal('0.01'))
+                commandes.append(Commande(
+                    utilisateur=utilisateur,
+                    date_commande=menu.date_menu,
+                    etat='validee',
+                    montant_brut=prix,
+                    montant_subvention=subvention,
+                    montant_net=prix - subvention,
+                ))
+                choix.append(menu_plat)
+        Commande.objects.bulk_create(commandes, batch_size=500)
+        if not commandes[0].pk:
+            commandes = list(Commande.objects.filter(
+                date_commande__gte=mois_debut, date_commande__lte=mois_fin
+            ).order_by('date_commande', 'utilisateur_id'))
+        CommandeLigne.objects.bulk_create([
+            CommandeLigne(commande=commande, menu_plat=menu_plat, quantite=1, prix_unitaire=menu_plat.prix_jour)
+            for commande, menu_plat in zip(commandes, choix)
+        ], batch_size=500)
+
+        self.stdout.write(f"{len(commandes)} commandes synthétiques du {mois_debut} au {mois_fin}")
+
+        # bulk_create ne déclenche pas les signaux : construire les agrégats du mois
+        requetes = _CompteurRequetes()
+        with connection.execute_wrapper(requetes):
+            debut = time.perf_counter()
+            nb_jours = reconstruire(mois_debut, mois_fin)
+            duree = time.perf_counter() - debut
+        self.stdout.write(f"Agrégats de {nb_jours} jours reconstruits en {duree * 1000:.1f} ms ({requetes.nombre} requêtes)")
+        return mois_debut, mois_fin
+
+    def _mesurer(self, nom, fonction, mois_debut, mois_fin, repetitions):
+        durees = []
+        for _ in range(repetitions):
+            requetes = _CompteurRequetes()
+            with connection.execute_wrapper(requetes):
+                debut = time.perf_counter()
+                resultat = fonction(mois_debut, mois_fin)
+                durees.append(time.perf_counter() - debut)
+        self.stdout.write(
+            f"{nom:<12} {min(durees) * 1000:9.1f} ms  {requetes.nombre:6d} requêtes  "
+            f"{resultat['nb_commandes']} commandes, {resultat['nb_plats']} plats, net {resultat['total_net']}"
+        )
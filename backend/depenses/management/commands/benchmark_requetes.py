@@ -0,0 +1,196 @@
+"""
+Benchmark de non-régression des requêtes SQL par endpoint.
+
+Usage:
+    python manage.py benchmark_requetes                   # compare au budget
+    python manage.py benchmark_requetes --update-budget   # réécrit le budget
+    python manage.py benchmark_requetes --filtre restauration
+
+Une base de test est créée (comme pour `manage.py test`), remplie avec le jeu
+de données déterministe de depenses/jeu_donnees.py, puis chaque endpoint GET
+du routeur de depenses/urls.py (listes, détails, actions, audit et exports)
+est appelé en administrateur. Pour chaque endpoint : nombre de requêtes,
+durée et pic mémoire (tracemalloc). La commande échoue si un endpoint dépasse
+le nombre de requêtes du budget versionné (depenses/benchmarks/budget_requetes.json).
+"""
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+FICHIER_BUDGET = Path(__file__).resolve().parents[2] / 'benchmarks' / 'budget_requetes.json'
+
+# Paramètres des actions qui exigent des filtres (dates du jeu de données)
+PARAMETRES_ACTIONS = {
+    'mois': '2025-01',
+    'date_debut': '2025-01-01',
+    'date_fin': '2025-01-31',
+    'from': '2025-01-01',
+    'to': '2025-01-31',
+    'date': '2025-01-15',
+    'code': 'TKT-2025-00000000',
+}
+
+
+class CompteurRequetes:
+    """Compte les requêtes SQL exécutées (wrapper d'exécution Django)"""
+
+    def __init__(self):
+        self.nombre = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.nombre += 1
+        return execute(sql, params, many, context)
+
+
+def lister_endpoints():
+    """Endpoints GET du routeur API, avec l'URL à appeler
+
+    Retourne une liste de (nom, url, paramètres). Les détails utilisent le
+    premier objet du queryset de la vue ; seules les actions de liste
+    reçoivent les paramètres de PARAMETRES_ACTIONS (ils filtreraient get_object).
+    """
+    from depenses.urls import router
+
+    endpoints = []
+    for prefixe, viewset, basename in router.registry:
+        base = f'/api/{prefixe}/'
+        queryset = getattr(viewset, 'queryset', None)
+        objet = queryset.model.objects.order_by('pk').first() if queryset is not None else None
+
+        if hasattr(viewset, 'list'):
+            endpoints.append((f'{basename}-list', base, {}))
+        if objet is not None and hasattr(viewset, 'retrieve'):
+            endpoints.append((f'{basename}-detail', f'{base}{objet.pk}/', {}))
+
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping:
+                continue
+            if action.detail:
+                if objet is None:
+                    continue
+                endpoints.append((f'{basename}-{action.url_name}', f'{base}{objet.pk}/{action.url_path}/', {}))
+            else:
+                endpoints.append((f'{basename}-{action.url_name}', f'{base}{action.url_path}/', PARAMETRES_ACTIONS))
+
+    # Routes hors routeur
+    from depenses.models import Menu
+    menu = Menu.objects.exclude(token_public__isnull=True).order_by('date_menu').first()
+    if menu:
+        endpoints.append(('menu-public', f'/api/restauration/public/menu/{menu.token_public}/', {}))
+    endpoints.append(('statistiques-restauration', '/api/restauration/statistiques/', {'mois': PARAMETRES_ACTIONS['mois']}))
+    endpoints.append(('recherche', '/api/recherche/', {'q': 'benchmark'}))
+    return endpoints
+
+
+class Command(BaseCommand):
+    help = "Mesure requêtes SQL, durée et mémoire de chaque endpoint API et compare au budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update-budget', action='store_true', help="Réécrire le budget avec les mesures actuelles")
+        parser.add_argument('--filtre', type=str, default='', help="Ne mesurer que les endpoints dont le nom contient ce texte")
+        parser.add_argument('--graine', type=int, default=42, help="Graine du jeu de données")
+        parser.add_argument('--budget', type=str, default=str(FICHIER_BUDGET), help="Fichier JSON du budget")
+
+    def handle(self, *args, **options):
+        from depenses.jeu_donnees import generer_jeu_donnees
+
+        setup_test_environment()
+        nom_base = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write("Génération du jeu de données...")
+            generer_jeu_donnees(graine=options['graine'], journal=lambda m: self.stdout.write(f"  {m}"))
+            mesures = self._mesurer(options['filtre'])
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            teardown_test_environment()
+
+        self._afficher(mesures)
+        self._comparer(mesures, Path(options['budget']), options['update_budget'], bool(options['filtre']))
+
+    def _mesurer(self, filtre):
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='bench_admin'))
+
+        mesures = {}
+        for nom, url, params in lister_endpoints():
+            if filtre not in nom:
+                continue
+            # Premier appel à blanc : imports paresseux et référentiels en mémoire
+            self._appeler(client, url, params)
+
+            compteur = CompteurRequetes()
+            debut = time.perf_counter()
+            with connection.execute_wrapper(compteur):
+                reponse = self._appeler(client, url, params)
+            duree = time.perf_counter() - debut
+
+            # Mémoire mesurée à part : tracemalloc ralentit fortement l'exécution
+            tracemalloc.start()
+            self._appeler(client, url, params)
+            _, pic = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            mesures[nom] = {
+                'url': url,
+                'statut': reponse.status_code,
+                'requetes': compteur.nombre,
+                'duree_ms': round(duree * 1000, 1),
+                'memoire_ko': round(pic / 1024),
+            }
+        return mesures
+
+    @staticmethod
+    def _appeler(client, url, params):
+        reponse = client.get(url, params)
+        # Consommer les réponses en flux dans la mesure
+        if getattr(reponse, 'streaming', False):
+            b''.join(reponse.streaming_content)
+        return reponse
+
+    def _afficher(self, mesures):
+        self.stdout.write(f"\n{'Endpoint':<45} {'HTTP':>4} {'Req.':>6} {'ms':>9} {'Ko':>8}")
+        for nom, mesure in mesures.items():
+            self.stdout.write(
+                f"{nom:<45} {mesure['statut']:>4} {mesure['requetes']:>6} "
+                f"{mesure['duree_ms']:>9.1f} {mesure['memoire_ko']:>8}"
+            )
+
+    def _comparer(self, mesures, fichier, mise_a_jour, partiel):
+        if mise_a_jour:
+            budget = {}
+            if partiel and fichier.exists():
+                budget = json.loads(fichier.read_text(encoding='utf-8'))
+            budget.update({nom: mesure['requetes'] for nom, mesure in mesures.items()})
+            fichier.parent.mkdir(parents=True, exist_ok=True)
+            fichier.write_text(json.dumps(dict(sorted(budget.items())), indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"\nBudget mis à jour: {fichier}"))
+            return
+
+        if not fichier.exists():
+            raise CommandError(f"Budget introuvable: {fichier} (lancer avec --update-budget)")
+        budget = json.loads(fichier.read_text(encoding='utf-8'))
+
+        depassements = []
+        for nom, mesure in mesures.items():
+            if nom not in budget:
+                self.stdout.write(self.style.WARNING(f"{nom}: absent du budget ({mesure['requetes']} requêtes)"))
+            elif mesure['requetes'] > budget[nom]:
+                depassements.append(f"{nom}: {mesure['requetes']} requêtes (budget {budget[nom]})")
+            elif mesure['requetes'] < budget[nom]:
+                self.stdout.write(f"{nom}: {mesure['requetes']} requêtes, sous le budget ({budget[nom]})")
+        erreurs = [nom for nom, mesure in mesures.items() if mesure['statut'] >= 500]
+
+        if erreurs:
+            depassements.extend(f"{nom}: erreur HTTP {mesures[nom]['statut']}" for nom in erreurs)
+        if depassements:
+            raise CommandError("Budget de requêtes dépassé:\n  " + "\n  ".join(depassements))
+        self.stdout.write(self.style.SUCCESS("\nTous les endpoints respectent le budget de requêtes"))
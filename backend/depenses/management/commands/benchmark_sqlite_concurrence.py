@@ -0,0 +1,214 @@
+"""
+Benchmark de concurrence SQLite : commandes publiques et lectures de rapports en parallèle.
+
+Usage:
+    python manage.py benchmark_sqlite_concurrence
+    python manage.py benchmark_sqlite_concurrence --ecrivains 8 --lecteurs 4 --duree 20
+    python manage.py benchmark_sqlite_concurrence --profils reglages
+
+Pour chaque profil — réglages par défaut de Django (journal « delete »,
+synchronous=full, attente de 5 s), SQLITE_PRAGMAS, puis SQLITE_PRAGMAS en
+WAL (à activer seulement sur disque local) — une base fichier
+temporaire est créée et migrée, le jeu de données de depenses/jeu_donnees.py
+(volumes réduits) y est chargé, puis des threads, chacun avec sa connexion
+SQLite, envoient pendant `--duree` secondes :
+- des commandes publiques (POST restauration/public/commander/<token>/, la
+  facture journalière étant régénérée en arrière-plan) ;
+- des lectures (statistiques de la cantine, rapport mensuel des commandes,
+  liste des opérations).
+Résultat par profil et par type de requête : réussites, échecs « database is
+locked », autres erreurs, débit et latences p50/p95/max.
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+# Réglages par défaut de Django : pas de PRAGMA, sqlite3.connect(timeout=5)
+PROFILS = {
+    'django': {'journal_mode': 'delete', 'synchronous': 'full', 'busy_timeout': 5000},
+    'reglages': None,  # SQLITE_PRAGMAS
+    'wal': None,  # SQLITE_PRAGMAS, journal_mode=wal et synchronous=normal
+}
+
+VOLUMES = {
+    'utilisateurs': 10,
+    'mois': 2,
+    'operations_par_jour': 10,
+    'jours_commandes': 5,
+    'lots_tickets': 1,
+    'tickets_par_lot': 10,
+    'audit': 200,
+}
+
+
+class Statistiques:
+    """Latences et issues des requêtes d'un type, partagées entre threads"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.latences = []
+        self.verrouillees = 0
+        self.erreurs = 0
+        self.derniere_erreur = ''
+
+    def enregistrer(self, duree, issue, detail=''):
+        with self.verrou:
+            if issue == 'ok':
+                self.latences.append(duree)
+            elif issue == 'verrou':
+                self.verrouillees += 1
+            else:
+                self.erreurs += 1
+                self.derniere_erreur = detail[:200]
+
+
+def _centile(valeurs, centile):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * centile / 100))]
+
+
+def _issue(reponse):
+    if 200 <= reponse.status_code < 300:
+        return 'ok', ''
+    contenu = reponse.content.decode('utf-8', errors='replace')
+    return ('verrou' if 'locked' in contenu else 'erreur'), f"HTTP {reponse.status_code}: {contenu}"
+
+
+class Command(BaseCommand):
+    help = "Mesure commandes publiques et lectures concurrentes sur une base SQLite fichier, par profil de PRAGMA"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecrivains', type=int, default=6, help="Threads passant des commandes publiques")
+        parser.add_argument('--lecteurs', type=int, default=4, help="Threads lisant les rapports")
+        parser.add_argument('--duree', type=float, default=15, help="Durée de chaque mesure (secondes)")
+        parser.add_argument('--profils', type=str, default=','.join(PROFILS), help="Profils mesurés (django,reglages,wal)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Benchmark réservé à SQLite (USE_SQLITE=True)")
+        profils = [profil.strip() for profil in options['profils'].split(',') if profil.strip()]
+        inconnus = set(profils) - set(PROFILS)
+        if inconnus:
+            raise CommandError(f"Profils inconnus: {', '.join(sorted(inconnus))}")
+
+        resultats = {}
+        for profil in profils:
+            pragmas = PROFILS[profil] or settings.SQLITE_PRAGMAS
+            if profil == 'wal':
+                pragmas = {**pragmas, 'journal_mode': 'wal', 'synchronous': 'normal'}
+            self.stdout.write(f"Profil {profil}: {pragmas}")
+            resultats[profil] = self._mesurer_profil(pragmas, options)
+        self._afficher(resultats, options['duree'])
+
+    def _mesurer_profil(self, pragmas, options):
+        from depenses.jeu_donnees import generer_jeu_donnees
+        from depenses.tasks import attendre_taches
+
+        with tempfile.TemporaryDirectory() as dossier, override_settings(
+            SQLITE_PRAGMAS=pragmas, MEDIA_ROOT=dossier, PERFORMANCE_INSTRUMENTATION=False
+        ):
+            setup_test_environment()
+            nom_base = connection.settings_dict['NAME']
+            test = connection.settings_dict.setdefault('TEST', {})
+            nom_test = test.get('NAME')
+            test['NAME'] = str(Path(dossier) / 'concurrence.sqlite3')
+            connections.close_all()
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                generer_jeu_donnees(volumes=VOLUMES)
+                connection.close()
+                return self._lancer(options)
+            finally:
+                attendre_taches()
+                connections.close_all()
+                connection.creation.destroy_test_db(nom_base, verbosity=0)
+                test['NAME'] = nom_test
+                teardown_test_environment()
+
+    def _lancer(self, options):
+        from django.contrib.auth.models import User
+        from depenses.models import Menu
+
+        menu = Menu.objects.filter(publication_at__isnull=False).order_by('date_menu').first()
+        menu_plat_id = menu.menu_plats.values_list('id', flat=True).first()
+        admin = User.objects.get(username='bench_admin')
+        mois = menu.date_menu.strftime('%Y-%m')
+        lectures = [
+            ('/api/restauration/statistiques/', {'mois': mois}),
+            ('/api/restauration/commandes/rapport/', {'mois': mois}),
+            ('/api/operations/', {}),
+        ]
+        connection.close()
+
+        statistiques = {'commande': Statistiques(), 'lecture': Statistiques()}
+        fin = time.perf_counter() + options['duree']
+        depart = threading.Barrier(options['ecrivains'] + options['lecteurs'])
+
+        def ecrivain(numero):
+            from rest_framework.test import APIClient
+
+            client = APIClient()
+            depart.wait()
+            compteur = 0
+            while time.perf_counter() < fin:
+                compteur += 1
+                self._appeler(statistiques['commande'], lambda: client.post(
+                    f'/api/restauration/public/commander/{menu.token_public}/',
+                    {'nom_employe': f'Bench {numero}-{compteur}', 'lignes': [{'menu_plat_id': menu_plat_id, 'quantite': 1}]},
+                    format='json', HTTP_HOST='localhost'
+                ))
+            connections.close_all()
+
+        def lecteur(numero):
+            from rest_framework.test import APIClient
+
+            client = APIClient()
+            client.force_authenticate(admin)
+            depart.wait()
+            compteur = numero
+            while time.perf_counter() < fin:
+                url, params = lectures[compteur % len(lectures)]
+                compteur += 1
+                self._appeler(statistiques['lecture'], lambda: client.get(url, params, HTTP_HOST='localhost'))
+            connections.close_all()
+
+        threads = [threading.Thread(target=ecrivain, args=(i,)) for i in range(options['ecrivains'])]
+        threads += [threading.Thread(target=lecteur, args=(i,)) for i in range(options['lecteurs'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statistiques
+
+    @staticmethod
+    def _appeler(statistiques, requete):
+        debut = time.perf_counter()
+        try:
+            issue, detail = _issue(requete())
+        except Exception as e:
+            issue, detail = ('verrou' if 'locked' in str(e) else 'erreur'), repr(e)
+        statistiques.enregistrer(time.perf_counter() - debut, issue, detail)
+
+    def _afficher(self, resultats, duree):
+        self.stdout.write(
+            f"\n{'Profil':<10} {'Requêtes':<9} {'OK':>6} {'Verrou':>7} {'Err.':>5} {'req/s':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        for profil, statistiques in resultats.items():
+            for type_requete, stats in statistiques.items():
+                latences = [latence * 1000 for latence in stats.latences]
+                self.stdout.write(
+                    f"{profil:<10} {type_requete:<9} {len(latences):>6} {stats.verrouillees:>7} {stats.erreurs:>5} "
+                    f"{len(latences) / duree:>7.1f} {_centile(latences, 50):>8.0f} {_centile(latences, 95):>8.0f} "
+                    f"{max(latences, default=0):>8.0f}"
+                )
+                if stats.derniere_erreur:
+                    self.stdout.write(f"{'':<10} dernière erreur: {stats.derniere_erreur}")
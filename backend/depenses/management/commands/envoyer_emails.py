@@ -0,0 +1,47 @@
+"""
+Worker d'envoi des emails en file d'attente.
+
+Usage:
+    python manage.py envoyer_emails              # boucle continue
+    python manage.py envoyer_emails --une-fois   # un seul passage (cron)
+
+Chaque email est réservé avant l'envoi (statut « envoi ») : plusieurs
+workers ne l'envoient pas deux fois. Avec un worker Celery
+(CELERY_BROKER_URL), la tâche envoyer_emails et sa planification périodique
+(beat) remplacent cette commande.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from depenses.emails import envoyer_emails_en_attente
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente (file EmailSortant) avec nouvelles tentatives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help="Vider la file une seule fois puis quitter")
+        parser.add_argument('--lot', type=int, default=50, help="Nombre d'emails envoyés par connexion SMTP")
+        parser.add_argument('--intervalle', type=float, default=10, help="Pause (secondes) quand la file est vide")
+
+    def handle(self, *args, **options):
+        lot = options['lot']
+        try:
+            while True:
+                close_old_connections()
+                envoyes, echecs = envoyer_emails_en_attente(limite=lot)
+                if envoyes or echecs:
+                    self.stdout.write(f"{envoyes} email(s) envoyé(s), {echecs} échec(s)")
+
+                if options['une_fois']:
+                    # Continuer tant que des lots complets sont traités avec succès
+                    if envoyes + echecs < lot or envoyes == 0:
+                        break
+                    continue
+
+                if envoyes + echecs < lot:
+                    time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker d'envoi")
@@ -0,0 +1,97 @@
+"""
+Génération de données volumineuses pour le profilage.
+
+Usage:
+    python manage.py generate_load_data
+    python manage.py generate_load_data --utilisateurs 500 --annees 3 --audit 200000
+    python manage.py generate_load_data --purger            # supprime les données générées
+
+Les données sont créées par bulk_create à partir d'une graine fixe (voir
+depenses/jeu_donnees.py) : deux exécutions avec les mêmes options produisent
+les mêmes volumes et les mêmes valeurs. À utiliser sur une base de
+développement, jamais en production.
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils import timezone
+
+from depenses.jeu_donnees import generer_jeu_donnees, purger_jeu_donnees
+
+
+class Command(BaseCommand):
+    help = "Génère un volume réaliste de données (opérations, commandes, tickets, audit) pour le profilage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--utilisateurs', type=int, default=200, help="Nombre d'agents (en plus de bench_admin)")
+        parser.add_argument('--annees', type=int, default=2, help="Années d'opérations et de prévisions mensuelles")
+        parser.add_argument('--operations-par-jour', type=int, default=20, help="Opérations de dépense par jour")
+        parser.add_argument('--categories', type=int, default=10, help="Nombre de catégories")
+        parser.add_argument('--sous-categories', type=int, default=4, help="Sous-catégories par catégorie")
+        parser.add_argument('--plats', type=int, default=20, help="Nombre de plats au référentiel")
+        parser.add_argument('--plats-par-menu', type=int, default=5, help="Plats proposés chaque jour")
+        parser.add_argument('--jours-commandes', type=int, default=120, help="Jours de menus avec commandes de tous les agents")
+        parser.add_argument('--lots-tickets', type=int, default=20, help="Nombre de lots de tickets")
+        parser.add_argument('--tickets-par-lot', type=int, default=100, help="Tickets par lot")
+        parser.add_argument('--audit', type=int, default=50000, help="Entrées d'historique d'audit")
+        parser.add_argument('--date-debut', type=str, help="Premier jour généré (YYYY-MM-DD, défaut: il y a --annees ans)")
+        parser.add_argument('--graine', type=int, default=42, help="Graine du générateur aléatoire")
+        parser.add_argument('--purger', action='store_true', help="Supprimer les données générées précédemment puis quitter")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+
+        if options['purger']:
+            supprimes = purger_jeu_donnees()
+            self.stdout.write(self.style.SUCCESS(
+                f"{supprimes} ligne(s) supprimée(s) en {time.perf_counter() - debut:.1f} s"
+            ))
+            return
+
+        if options['date_debut']:
+            try:
+                date_debut = datetime.strptime(options['date_debut'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Format de --date-debut invalide (attendu: YYYY-MM-DD)")
+        else:
+            aujourd_hui = timezone.now().date()
+            date_debut = aujourd_hui.replace(year=aujourd_hui.year - options['annees'], day=1)
+
+        volumes = {
+            'utilisateurs': options['utilisateurs'],
+            'categories': options['categories'],
+            'sous_categories': options['sous_categories'],
+            'mois': options['annees'] * 12,
+            'operations_par_jour': options['operations_par_jour'],
+            'plats': options['plats'],
+            'plats_par_menu': options['plats_par_menu'],
+            'jours_commandes': options['jours_commandes'],
+            'lots_tickets': options['lots_tickets'],
+            'tickets_par_lot': options['tickets_par_lot'],
+            'audit': options['audit'],
+        }
+
+        def journal(message):
+            self.stdout.write(f"[{time.perf_counter() - debut:7.1f} s] {message}")
+
+        try:
+            comptes = generer_jeu_donnees(
+                volumes=volumes,
+                graine=options['graine'],
+                date_debut=date_debut,
+                journal=journal
+            )
+        except IntegrityError as e:
+            raise CommandError(
+                f"Conflit avec des données existantes ({e}). "
+                "Lancer d'abord --purger ou choisir une autre --date-debut."
+            )
+
+        total = sum(comptes.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} ligne(s) créée(s) en {time.perf_counter() - debut:.1f} s"
+        ))
+        for modele, nombre in comptes.items():
+            self.stdout.write(f"  {modele:<16} {nombre}")
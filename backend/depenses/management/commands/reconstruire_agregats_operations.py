@@ -0,0 +1,28 @@
+"""
+Reconstruction des agrégats journaliers des opérations de dépense.
+
+Usage:
+    python manage.py reconstruire_agregats_operations
+    python manage.py reconstruire_agregats_operations --debut 2026-01-01 --fin 2026-01-31
+
+À lancer après un import massif d'opérations (bulk_create, SQL direct)
+qui ne déclenche pas les signaux de mise à jour.
+"""
+from django.core.management.base import BaseCommand
+
+from depenses.agregats import reconstruire_operations
+from depenses.management.commands.reconstruire_agregats_restauration import _date
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats journaliers des opérations (OperationJournaliere)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=str, help="Première date à recalculer (YYYY-MM-DD)")
+        parser.add_argument('--fin', type=str, help="Dernière date à recalculer (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        debut = _date(options['debut']) if options['debut'] else None
+        fin = _date(options['fin']) if options['fin'] else None
+        nb_lignes = reconstruire_operations(debut, fin)
+        self.stdout.write(self.style.SUCCESS(f"{nb_lignes} agrégat(s) journalier(s) d'opérations recalculé(s)"))
@@ -0,0 +1,36 @@
+"""
+Reconstruction des agrégats journaliers de restauration.
+
+Usage:
+    python manage.py reconstruire_agregats_restauration
+    python manage.py reconstruire_agregats_restauration --debut 2026-01-01 --fin 2026-01-31
+
+À lancer après un import massif de commandes (bulk_create, SQL direct)
+qui ne déclenche pas les signaux de mise à jour.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from depenses.agregats import reconstruire
+
+
+def _date(valeur):
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Date invalide: {valeur} (format attendu: YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats journaliers de restauration (RestaurationJournaliere)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=str, help="Première date à recalculer (YYYY-MM-DD)")
+        parser.add_argument('--fin', type=str, help="Dernière date à recalculer (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        debut = _date(options['debut']) if options['debut'] else None
+        fin = _date(options['fin']) if options['fin'] else None
+        nb_jours = reconstruire(debut, fin)
+        self.stdout.write(self.style.SUCCESS(f"Agrégats recalculés pour {nb_jours} jour(s)"))
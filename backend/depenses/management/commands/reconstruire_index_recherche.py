@@ -0,0 +1,31 @@
+"""
+Reconstruction de l'index de recherche plein texte.
+
+Usage:
+    python manage.py reconstruire_index_recherche
+    python manage.py reconstruire_index_recherche --types operation categorie
+
+À lancer après un import en masse (bulk_create, SQL direct) qui contourne les
+signaux d'indexation ; l'indexation courante est incrémentale (depenses/signals.py).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from depenses.recherche import SOURCES, moteur, reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte (opérations, catégories, extras, audit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', nargs='+', choices=list(SOURCES), help="Types d'objets à réindexer (défaut: tous)")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        with transaction.atomic():
+            total = reconstruire(types=options['types'], journal=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} document(s) indexé(s) en {time.perf_counter() - debut:.1f} s (moteur: {moteur().nom})"
+        ))
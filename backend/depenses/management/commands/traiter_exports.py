@@ -0,0 +1,57 @@
+"""
+Worker des exports en arrière-plan.
+
+Usage:
+    python manage.py traiter_exports              # boucle continue
+    python manage.py traiter_exports --une-fois   # un seul passage (cron)
+
+Chaque tâche est réservée avant exécution (passage atomique de « en attente »
+à « en cours ») : plusieurs workers peuvent tourner en parallèle. Les tâches
+abandonnées par un worker arrêté sont remises en attente après
+EXPORTS_DELAI_BLOCAGE minutes, et les fichiers sont supprimés après
+EXPORTS_CONSERVATION heures. Avec un worker Celery, les tâches traiter_export
+et maintenance_exports (depenses/tasks.py) font ce travail.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from depenses.exports.taches import (
+    purger_exports_expires, relancer_taches_bloquees, traiter_exports_en_attente
+)
+
+
+class Command(BaseCommand):
+    help = "Exécute les exports en attente (TacheExport) et purge les fichiers expirés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help="Traiter la file une seule fois puis quitter")
+        parser.add_argument('--lot', type=int, default=5, help="Nombre de tâches réservées par passage")
+        parser.add_argument('--intervalle', type=float, default=5, help="Pause (secondes) quand la file est vide")
+
+    def handle(self, *args, **options):
+        lot = options['lot']
+        try:
+            while True:
+                close_old_connections()
+                relancees = relancer_taches_bloquees()
+                if relancees:
+                    self.stdout.write(f"{relancees} tâche(s) bloquée(s) remise(s) en attente")
+                purgees = purger_exports_expires()
+                if purgees:
+                    self.stdout.write(f"{purgees} export(s) expiré(s) supprimé(s)")
+
+                terminees, echecs = traiter_exports_en_attente(limite=lot)
+                if terminees or echecs:
+                    self.stdout.write(f"{terminees} export(s) terminé(s), {echecs} échec(s)")
+
+                if options['une_fois']:
+                    if terminees + echecs < lot:
+                        break
+                    continue
+
+                if terminees + echecs < lot:
+                    time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker d'export")
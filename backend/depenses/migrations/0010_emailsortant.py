@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0009_lottickets_alter_userpermission_fonctionnalite_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinataire', models.EmailField(max_length=254)),
+                ('sujet', models.CharField(max_length=255)),
+                ('message_texte', models.TextField()),
+                ('message_html', models.TextField(blank=True)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('envoye', 'Envoyé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('tentatives', models.PositiveIntegerField(default=0, help_text="Nombre de tentatives d'envoi effectuées")),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now, help_text="Date à partir de laquelle l'email peut être envoyé")),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('envoye_le', models.DateTimeField(blank=True, null=True)),
+                ('commande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='depenses.commande')),
+            ],
+            options={
+                'verbose_name': 'Email sortant',
+                'verbose_name_plural': 'Emails sortants',
+                'ordering': ['prochaine_tentative', 'id'],
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='depenses_em_statut_67c09f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0010_emailsortant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurationJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nb_commandes', models.IntegerField(default=0)),
+                ('nb_portions', models.IntegerField(default=0)),
+                ('montant_brut', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_subvention', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_net', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_supplement', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True)),
+                ('plat', models.ForeignKey(blank=True, help_text='NULL pour le total de la journée', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agregats_journaliers', to='depenses.plat')),
+            ],
+            options={
+                'verbose_name': 'Agrégat Restauration Journalier',
+                'verbose_name_plural': 'Agrégats Restauration Journaliers',
+                'ordering': ['date', 'plat'],
+                'indexes': [models.Index(fields=['date'], name='depenses_re_date_318f86_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='restaurationjournaliere',
+            constraint=models.UniqueConstraint(fields=('date', 'plat'), name='restauration_journaliere_date_plat'),
+        ),
+        migrations.AddConstraint(
+            model_name='restaurationjournaliere',
+            constraint=models.UniqueConstraint(condition=models.Q(('plat__isnull', True)), fields=('date',), name='restauration_journaliere_total_jour'),
+        ),
+        # Agrégats construits par 0018 (avec la table des totaux)
+    ]
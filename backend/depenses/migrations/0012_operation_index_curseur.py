@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0011_restaurationjournaliere'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['-date_operation', '-created_at', 'id'], name='operation_curseur_idx'),
+        ),
+    ]
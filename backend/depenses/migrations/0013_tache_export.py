@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('depenses', '0012_operation_index_curseur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_export', models.CharField(choices=[('operations_pdf', 'Opérations (PDF)'), ('operations_excel', 'Opérations (Excel)'), ('operations_csv', 'Opérations (CSV)'), ('previsions_csv', 'Prévisions (CSV)'), ('rapport_pdf', 'Rapport mensuel (PDF)'), ('rapport_excel', 'Rapport mensuel (Excel)'), ('audit_pdf', "Journaux d'audit (PDF)"), ('audit_excel', "Journaux d'audit (Excel)")], max_length=50)),
+                ('parametres', models.JSONField(blank=True, default=dict, help_text="Paramètres de requête de l'export")),
+                ('cle', models.CharField(help_text='Empreinte demandeur + type + paramètres (dédoublonnage)', max_length=64)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('fichier', models.FileField(blank=True, null=True, upload_to='exports/')),
+                ('nom_fichier', models.CharField(blank=True, max_length=255)),
+                ('type_contenu', models.CharField(blank=True, max_length=100)),
+                ('taille', models.PositiveBigIntegerField(default=0, help_text='Taille du fichier en octets')),
+                ('erreur', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('demarre_le', models.DateTimeField(blank=True, null=True)),
+                ('termine_le', models.DateTimeField(blank=True, null=True)),
+                ('demandeur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches_export', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Tâche d'export",
+                'verbose_name_plural': "Tâches d'export",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['statut', 'created_at'], name='depenses_ta_statut_73fade_idx'), models.Index(fields=['demandeur', '-created_at'], name='depenses_ta_demande_bbbea0_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tacheexport',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut__in', ['en_attente', 'en_cours'])), fields=('cle',), name='tache_export_active_unique'),
+        ),
+    ]
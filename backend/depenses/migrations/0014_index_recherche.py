@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+TABLE = 'depenses_indexrecherche'
+FTS = f'{TABLE}_fts'
+
+
+def creer_index_plein_texte(apps, schema_editor):
+    """Table FTS5 synchronisée par triggers (SQLite) ou index FULLTEXT (MySQL)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as curseur:
+            try:
+                curseur.execute(
+                    f"CREATE VIRTUAL TABLE {FTS} USING fts5(contenu, content='{TABLE}', "
+                    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                )
+            except Exception:
+                # SQLite compilé sans FTS5 : la recherche utilisera LIKE
+                return
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS}(rowid, contenu) VALUES (new.id, new.contenu); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS}({FTS}, rowid, contenu) VALUES ('delete', old.id, old.contenu); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS}({FTS}, rowid, contenu) VALUES ('delete', old.id, old.contenu); "
+            f"INSERT INTO {FTS}(rowid, contenu) VALUES (new.id, new.contenu); END"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX {TABLE}_contenu_ft (contenu)")
+
+
+def supprimer_index_plein_texte(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffixe in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_{suffixe}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS}")
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP INDEX {TABLE}_contenu_ft")
+
+
+def construire_index(apps, schema_editor):
+    from depenses.recherche import reconstruire
+
+    reconstruire(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0013_tache_export'),
+        ('audit', '0002_archive_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('operation', 'Opération'), ('categorie', 'Catégorie'), ('extra', 'Extra restauration'), ('audit', "Journal d'audit")], max_length=20)),
+                ('objet_id', models.PositiveBigIntegerField()),
+                ('contenu', models.TextField()),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Index de recherche',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='indexrecherche',
+            constraint=models.UniqueConstraint(fields=('type_objet', 'objet_id'), name='index_recherche_objet_unique'),
+        ),
+        migrations.RunPython(creer_index_plein_texte, supprimer_index_plein_texte),
+        migrations.RunPython(construire_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:55
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def construire_agregats(apps, schema_editor):
+    from depenses.agregats import reconstruire_operations
+
+    reconstruire_operations(modeles=(
+        apps.get_model('depenses', 'Operation'),
+        apps.get_model('depenses', 'OperationJournaliere'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0014_index_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('nb_operations', models.IntegerField(default=0)),
+                ('montant_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True)),
+                ('categorie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregats_journaliers', to='depenses.categorie')),
+            ],
+            options={
+                'verbose_name': 'Agrégat Opérations Journalier',
+                'verbose_name_plural': 'Agrégats Opérations Journaliers',
+                'ordering': ['date', 'categorie'],
+                'indexes': [models.Index(fields=['date'], name='depenses_op_date_681f9a_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='operationjournaliere',
+            constraint=models.UniqueConstraint(fields=('date', 'categorie'), name='operation_journaliere_date_categorie'),
+        ),
+        migrations.RunPython(construire_agregats, migrations.RunPython.noop),
+    ]
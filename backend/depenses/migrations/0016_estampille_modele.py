@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0015_operationjournaliere'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstampilleModele',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(help_text='Libellé app_label.Model', max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modifie_le', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Estampille de modèle',
+                'verbose_name_plural': 'Estampilles de modèles',
+            },
+        ),
+    ]
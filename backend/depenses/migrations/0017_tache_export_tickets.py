@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0016_estampille_modele'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tacheexport',
+            name='type_export',
+            field=models.CharField(choices=[('operations_pdf', 'Opérations (PDF)'), ('operations_excel', 'Opérations (Excel)'), ('operations_csv', 'Opérations (CSV)'), ('previsions_csv', 'Prévisions (CSV)'), ('rapport_pdf', 'Rapport mensuel (PDF)'), ('rapport_excel', 'Rapport mensuel (Excel)'), ('audit_pdf', "Journaux d'audit (PDF)"), ('audit_excel', "Journaux d'audit (Excel)"), ('tickets_pdf', 'Planche de tickets (PDF)')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:03
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def supprimer_totaux(apps, schema_editor):
+    # Les totaux (plat NULL) sont recalculés dans RestaurationJournaliereTotal
+    apps.get_model('depenses', 'RestaurationJournaliere').objects.filter(plat__isnull=True).delete()
+
+
+def construire_agregats(apps, schema_editor):
+    from depenses.agregats import reconstruire
+
+    reconstruire(modeles=(
+        apps.get_model('depenses', 'Commande'),
+        apps.get_model('depenses', 'CommandeLigne'),
+        apps.get_model('depenses', 'RestaurationJournaliere'),
+        apps.get_model('depenses', 'RestaurationJournaliereTotal'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0017_tache_export_tickets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurationJournaliereTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('nb_commandes', models.IntegerField(default=0)),
+                ('nb_portions', models.IntegerField(default=0)),
+                ('montant_brut', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_subvention', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_net', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('montant_supplement', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Total Restauration Journalier',
+                'verbose_name_plural': 'Totaux Restauration Journaliers',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='restaurationjournaliere',
+            name='restauration_journaliere_total_jour',
+        ),
+        migrations.RunPython(supprimer_totaux, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='restaurationjournaliere',
+            name='plat',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregats_journaliers', to='depenses.plat'),
+        ),
+        migrations.RunPython(construire_agregats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:07
+
+import shutil
+from pathlib import Path
+
+import depenses.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deplacer_exports(apps, schema_editor):
+    """Déplace les fichiers d'export existants de MEDIA_ROOT vers EXPORTS_DIR (même nom relatif)"""
+    for nom in apps.get_model('depenses', 'TacheExport').objects.exclude(fichier='').exclude(
+        fichier__isnull=True
+    ).values_list('fichier', flat=True):
+        ancien = Path(settings.MEDIA_ROOT) / nom
+        nouveau = Path(settings.EXPORTS_DIR) / nom
+        if ancien.exists() and not nouveau.exists():
+            nouveau.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(ancien), str(nouveau))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0018_restauration_journaliere_total'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tacheexport',
+            name='fichier',
+            field=models.FileField(blank=True, null=True, storage=depenses.models.stockage_exports, upload_to='exports/'),
+        ),
+        migrations.RunPython(deplacer_exports, migrations.RunPython.noop),
+    ]
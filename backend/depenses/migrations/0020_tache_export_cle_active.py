@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+def renseigner_cle_active(apps, schema_editor):
+    """Empreinte active pour la plus ancienne tâche active de chaque demande"""
+    TacheExport = apps.get_model('depenses', 'TacheExport')
+    vues = set()
+    for tache in TacheExport.objects.filter(statut__in=['en_attente', 'en_cours']).order_by('created_at', 'id'):
+        if tache.cle not in vues:
+            vues.add(tache.cle)
+            TacheExport.objects.filter(pk=tache.pk).update(cle_active=tache.cle)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0019_exports_prives'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='tacheexport',
+            name='tache_export_active_unique',
+        ),
+        migrations.AddField(
+            model_name='tacheexport',
+            name='cle_active',
+            field=models.CharField(blank=True, help_text='Empreinte tant que la tâche est en attente ou en cours, NULL ensuite (dédoublonnage)', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(renseigner_cle_active, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('depenses', '0020_tache_export_cle_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailsortant',
+            name='reserve_le',
+            field=models.DateTimeField(blank=True, help_text='Réservation par un envoi en cours (statut « envoi »)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='emailsortant',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('envoi', "En cours d'envoi"), ('envoye', 'Envoyé'), ('echec', 'Échec')], default='en_attente', max_length=20),
+        ),
+    ]
@@ -1,12 +1,17 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import MinValueValidator
 from django.db.models import Sum
 from django.utils import timezone
 from decimal import Decimal
 import calendar
+from collections import namedtuple
 from datetime import datetime
 
+from .referentiels import regles_subvention, fenetres_commande
+
 
 class Categorie(models.Model):
     """Catégorie principale des dépenses"""
@@ -130,11 +135,19 @@ class Operation(models.Model):
             models.Index(fields=['date_operation']),
             models.Index(fields=['categorie', 'sous_categorie']),
             models.Index(fields=['semaine_iso']),
+            models.Index(fields=['-date_operation', '-created_at', 'id'], name='operation_curseur_idx'),
         ]
 
     def __str__(self):
         return f"{self.date_operation} - {self.categorie.code} - {self.montant_depense} GNF"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser la date chargée pour recalculer aussi l'ancien jour (agrégats journaliers)
+        instance._date_initiale = instance.__dict__.get('date_operation')
+        return instance
+
     def save(self, *args, **kwargs):
         """Calcul automatique du montant dépensé et extraction du jour/semaine"""
         # Calcul automatique du montant
@@ -351,6 +364,9 @@ class MenuPlat(models.Model):
         return max(0, self.stock_max - total_commandes)
 
 
+EvaluationFenetre = namedtuple('EvaluationFenetre', ['ouverte', 'heure_limite', 'configuree'])
+
+
 class FenetreCommande(models.Model):
     """Configuration des fenêtres de commande par créneau"""
     CATEGORIE_RESTAU_CHOICES = [
@@ -373,56 +389,56 @@ class FenetreCommande(models.Model):
         return f"{self.get_categorie_restau_display()} - Limite: {self.heure_limite}"
     
     @classmethod
-    def est_dans_fenetre(cls, categorie_restau, date_commande=None, est_public=False):
-        """Vérifie si on est dans la fenêtre de commande pour un créneau
+    def evaluer(cls, categorie_restau, date_commande=None, est_public=False):
+        """Évalue la fenêtre de commande d'un créneau, sans requête en base
+        
+        Les fenêtres actives sont lues depuis la table en mémoire
+        (voir referentiels.py), invalidée à chaque modification.
         
         Args:
             categorie_restau: Catégorie de restauration
             date_commande: Date de la commande (par défaut: aujourd'hui)
             est_public: Si True, applique la restriction 13h00 GMT pour les commandes publiques
+        
+        Returns:
+            EvaluationFenetre(ouverte, heure_limite, configuree)
         """
-        from django.utils import timezone
         from datetime import time
         
+        maintenant = timezone.now()
         if date_commande is None:
-            date_commande = timezone.now().date()
+            date_commande = maintenant.date()
         
-        # Pour les commandes publiques, vérifier la limite de 13h00 GMT
         if est_public:
             # Heure limite pour les commandes publiques: 13h00 GMT
-            heure_limite_public = time(13, 0, 0)
-            heure_actuelle = timezone.now().time()
-            
-            # Si la date de commande est aujourd'hui
-            if date_commande == timezone.now().date():
-                return heure_actuelle <= heure_limite_public
-            # Si la date est dans le futur, on accepte
-            elif date_commande > timezone.now().date():
-                return True
-            # Si la date est dans le passé, on refuse
-            else:
-                return False
-        
-        # Pour les commandes authentifiées, appliquer la restriction horaire
-        # Limite par défaut: 13h00 GMT si aucune fenêtre n'est configurée
-        try:
-            fenetre = cls.objects.get(categorie_restau=categorie_restau, actif=True)
-            heure_limite = fenetre.heure_limite
-        except cls.DoesNotExist:
-            # Si pas de fenêtre configurée, utiliser la limite par défaut de 13h00 GMT
             heure_limite = time(13, 0, 0)
+            configuree = False
+        else:
+            # Pour les commandes authentifiées, limite de la fenêtre configurée
+            # ou 13h00 GMT par défaut si aucune fenêtre n'est configurée
+            heure_limite = fenetres_commande.heure_limite(categorie_restau)
+            configuree = heure_limite is not None
+            if not configuree:
+                heure_limite = time(13, 0, 0)
         
-        heure_actuelle = timezone.now().time()
-        
-        # Si la date de commande est aujourd'hui
-        if date_commande == timezone.now().date():
-            return heure_actuelle <= heure_limite
-        # Si la date est dans le futur, on accepte
-        elif date_commande > timezone.now().date():
-            return True
-        # Si la date est dans le passé, on refuse
+        # Aujourd'hui : selon l'heure ; futur : accepté ; passé : refusé
+        if date_commande == maintenant.date():
+            ouverte = maintenant.time() <= heure_limite
         else:
-            return False
+            ouverte = date_commande > maintenant.date()
+        
+        return EvaluationFenetre(ouverte, heure_limite, configuree)
+    
+    @classmethod
+    def est_dans_fenetre(cls, categorie_restau, date_commande=None, est_public=False):
+        """Vérifie si on est dans la fenêtre de commande pour un créneau
+        
+        Args:
+            categorie_restau: Catégorie de restauration
+            date_commande: Date de la commande (par défaut: aujourd'hui)
+            est_public: Si True, applique la restriction 13h00 GMT pour les commandes publiques
+        """
+        return cls.evaluer(categorie_restau, date_commande, est_public).ouverte
 
 
 class RegleSubvention(models.Model):
@@ -537,15 +553,23 @@ class Commande(models.Model):
     def __str__(self):
         return f"Commande {self.utilisateur.username} - {self.date_commande} ({self.etat})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser l'état chargé pour détecter les transitions (agrégats journaliers)
+        instance._etat_initial = instance.__dict__.get('etat')
+        instance._date_initiale = instance.__dict__.get('date_commande')
+        return instance
+    
     def calculer_montants(self):
         """Calcule les montants brut, subvention et net"""
-        lignes = self.lignes.all()
+        lignes = list(self.lignes.all())
         
         # Montant brut = somme de toutes les lignes
         self.montant_brut = sum(ligne.montant_ligne for ligne in lignes)
         
         # Calcul de la subvention (nécessite montant_brut)
-        self.montant_subvention = self._calculer_subvention(self.montant_brut)
+        self.montant_subvention = self._calculer_subvention(self.montant_brut, lignes)
         
         # Montant net = brut - subvention
         self.montant_net = self.montant_brut - self.montant_subvention
@@ -556,22 +580,19 @@ class Commande(models.Model):
             'net': self.montant_net
         }
     
-    def _calculer_subvention(self, montant_brut=None):
+    def _calculer_subvention(self, montant_brut=None, lignes=None):
         """Calcule la subvention selon les règles actives"""
         if montant_brut is None:
             montant_brut = self.montant_brut
         
-        # Récupérer la règle active pour la date de commande
-        regle = RegleSubvention.objects.filter(
-            actif=True,
-            effectif_de__lte=self.date_commande,
-            effectif_a__gte=self.date_commande
-        ).first()
+        # Règle active pour la date de commande (table en mémoire, sans requête)
+        regle = regles_subvention.regle_pour(self.date_commande)
         
         if not regle or regle.type_subvention == 'AUCUNE':
             return Decimal('0.00')
         
-        lignes = self.lignes.all()
+        if lignes is None:
+            lignes = self.lignes.all()
         nb_plats = sum(ligne.quantite for ligne in lignes)
         
         if regle.type_subvention == 'FIXE':
@@ -660,32 +681,253 @@ class Facture(models.Model):
         return f"FACT-{date_facture.strftime('%Y%m%d')}"
     
     def calculer_totaux(self):
-        """Calcule les totaux à partir des commandes de la date"""
-        from django.db.models import Sum, Count, Q
-        
-        commandes = Commande.objects.filter(
-            date_commande=self.date_facture,
-            etat='validee'
-        )
-        
-        self.total_commandes = commandes.count()
-        self.total_brut = commandes.aggregate(Sum('montant_brut'))['montant_brut__sum'] or Decimal('0.00')
-        self.total_subvention = commandes.aggregate(Sum('montant_subvention'))['montant_subvention__sum'] or Decimal('0.00')
-        self.total_net = commandes.aggregate(Sum('montant_net'))['montant_net__sum'] or Decimal('0.00')
-        
-        # Calculer le total des suppléments (différence entre prix réel et prix effectif pour plats >= 50000)
-        total_supplement = Decimal('0.00')
-        for commande in commandes:
-            for ligne in commande.lignes.all():
-                if ligne.prix_unitaire >= 50000:
-                    # Supplément = (prix réel - prix effectif) × quantité
-                    supplement = (ligne.prix_unitaire - ligne.prix_effectif) * ligne.quantite
-                    total_supplement += supplement
-        
-        self.total_supplement = total_supplement
+        """Calcule les totaux à partir de l'agrégat journalier de restauration"""
+        from .agregats import agregat_du_jour
+        
+        agregat = agregat_du_jour(self.date_facture)
+        
+        if agregat:
+            self.total_commandes = agregat.nb_commandes
+            self.total_brut = agregat.montant_brut
+            self.total_subvention = agregat.montant_subvention
+            self.total_net = agregat.montant_net
+            # Suppléments des plats >= 50000 (prix réel - prix effectif) × quantité
+            self.total_supplement = agregat.montant_supplement
+        else:
+            self.total_commandes = 0
+            self.total_brut = Decimal('0.00')
+            self.total_subvention = Decimal('0.00')
+            self.total_net = Decimal('0.00')
+            self.total_supplement = Decimal('0.00')
         self.save()
 
 
+class RestaurationJournaliere(models.Model):
+    """Agrégat journalier des commandes validées, par plat
+    
+    Le total de la journée est dans RestaurationJournaliereTotal. Maintenu par
+    les signaux des commandes (voir agregats.py) et reconstruit par
+    `python manage.py reconstruire_agregats_restauration`.
+    """
+    date = models.DateField()
+    plat = models.ForeignKey(
+        Plat,
+        on_delete=models.CASCADE,
+        related_name='agregats_journaliers'
+    )
+    nb_commandes = models.IntegerField(default=0)
+    nb_portions = models.IntegerField(default=0)
+    montant_brut = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_subvention = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_net = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_supplement = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    mis_a_jour_le = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Agrégat Restauration Journalier"
+        verbose_name_plural = "Agrégats Restauration Journaliers"
+        ordering = ['date', 'plat']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'plat'], name='restauration_journaliere_date_plat'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.plat.nom}"
+
+
+class RestaurationJournaliereTotal(models.Model):
+    """Total journalier des commandes validées (une ligne par jour)
+    
+    Maintenu avec RestaurationJournaliere (voir agregats.py).
+    """
+    date = models.DateField(unique=True)
+    nb_commandes = models.IntegerField(default=0)
+    nb_portions = models.IntegerField(default=0)
+    montant_brut = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_subvention = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_net = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    montant_supplement = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    mis_a_jour_le = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Total Restauration Journalier"
+        verbose_name_plural = "Totaux Restauration Journaliers"
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} - Total"
+
+
+class OperationJournaliere(models.Model):
+    """Agrégat journalier des opérations de dépense, par catégorie
+    
+    Maintenu par les signaux des opérations (voir agregats.py) et reconstruit
+    par `python manage.py reconstruire_agregats_operations`. Sert les séries
+    temporelles du tableau de bord (voir series.py).
+    """
+    date = models.DateField()
+    categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE, related_name='agregats_journaliers')
+    nb_operations = models.IntegerField(default=0)
+    montant_total = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    mis_a_jour_le = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Agrégat Opérations Journalier"
+        verbose_name_plural = "Agrégats Opérations Journaliers"
+        ordering = ['date', 'categorie']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'categorie'], name='operation_journaliere_date_categorie'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.categorie.code}"
+
+
+class EmailSortant(models.Model):
+    """File d'envoi des emails (outbox), vidée par la commande `envoyer_emails`"""
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('envoi', "En cours d'envoi"),
+        ('envoye', 'Envoyé'),
+        ('echec', 'Échec'),
+    ]
+
+    destinataire = models.EmailField(max_length=254)
+    sujet = models.CharField(max_length=255)
+    message_texte = models.TextField()
+    message_html = models.TextField(blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.PositiveIntegerField(default=0, help_text="Nombre de tentatives d'envoi effectuées")
+    prochaine_tentative = models.DateTimeField(default=timezone.now, help_text="Date à partir de laquelle l'email peut être envoyé")
+    derniere_erreur = models.TextField(blank=True)
+    reserve_le = models.DateTimeField(null=True, blank=True, help_text="Réservation par un envoi en cours (statut « envoi »)")
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    envoye_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Email sortant"
+        verbose_name_plural = "Emails sortants"
+        ordering = ['prochaine_tentative', 'id']
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative']),
+        ]
+
+    def __str__(self):
+        return f"{self.destinataire} - {self.sujet} ({self.statut})"
+
+
+def stockage_exports():
+    """Stockage privé des exports (EXPORTS_DIR, hors de MEDIA_ROOT) : servis uniquement par /api/exports/<id>/telecharger/"""
+    return FileSystemStorage(location=settings.EXPORTS_DIR)
+
+
+class TacheExport(models.Model):
+    """Export lourd exécuté hors requête par une tâche Celery ou la commande `traiter_exports` (voir depenses/exports/taches.py)"""
+    TYPE_CHOICES = [
+        ('operations_pdf', 'Opérations (PDF)'),
+        ('operations_excel', 'Opérations (Excel)'),
+        ('operations_csv', 'Opérations (CSV)'),
+        ('previsions_csv', 'Prévisions (CSV)'),
+        ('rapport_pdf', 'Rapport mensuel (PDF)'),
+        ('rapport_excel', 'Rapport mensuel (Excel)'),
+        ('audit_pdf', "Journaux d'audit (PDF)"),
+        ('audit_excel', "Journaux d'audit (Excel)"),
+        ('tickets_pdf', 'Planche de tickets (PDF)'),
+    ]
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
+    type_export = models.CharField(max_length=50, choices=TYPE_CHOICES)
+    parametres = models.JSONField(default=dict, blank=True, help_text="Paramètres de requête de l'export")
+    cle = models.CharField(max_length=64, help_text="Empreinte demandeur + type + paramètres (dédoublonnage)")
+    cle_active = models.CharField(
+        max_length=64, null=True, blank=True, unique=True,
+        help_text="Empreinte tant que la tâche est en attente ou en cours, NULL ensuite (dédoublonnage)"
+    )
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    demandeur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='taches_export')
+    fichier = models.FileField(upload_to='exports/', storage=stockage_exports, blank=True, null=True)
+    nom_fichier = models.CharField(max_length=255, blank=True)
+    type_contenu = models.CharField(max_length=100, blank=True)
+    taille = models.PositiveBigIntegerField(default=0, help_text="Taille du fichier en octets")
+    erreur = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    demarre_le = models.DateTimeField(null=True, blank=True)
+    termine_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tâche d'export"
+        verbose_name_plural = "Tâches d'export"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['statut', 'created_at']),
+            models.Index(fields=['demandeur', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_export_display()} #{self.id} ({self.statut})"
+
+
+class IndexRecherche(models.Model):
+    """Document de l'index de recherche plein texte (voir depenses/recherche.py)
+
+    Une ligne par objet indexé ; la table plein texte (FTS5 sous SQLite,
+    index FULLTEXT sous MySQL) est créée par migration sur la colonne contenu.
+    """
+    TYPE_CHOICES = [
+        ('operation', 'Opération'),
+        ('categorie', 'Catégorie'),
+        ('extra', 'Extra restauration'),
+        ('audit', "Journal d'audit"),
+    ]
+
+    type_objet = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    objet_id = models.PositiveBigIntegerField()
+    contenu = models.TextField()
+    mis_a_jour_le = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Index de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['type_objet', 'objet_id'], name='index_recherche_objet_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_objet} #{self.objet_id}"
+
+
+class EstampilleModele(models.Model):
+    """Compteur de modifications d'un modèle (ETag des listes, voir estampilles.py)"""
+    modele = models.CharField(max_length=100, unique=True, help_text="Libellé app_label.Model")
+    version = models.PositiveBigIntegerField(default=0)
+    modifie_le = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Estampille de modèle"
+        verbose_name_plural = "Estampilles de modèles"
+    
+    def __str__(self):
+        return f"{self.modele} v{self.version}"
+
+
 class UserPermission(models.Model):
     """Permissions personnalisées par utilisateur pour les fonctionnalités du menu"""
     FONCTIONNALITE_CHOICES = [
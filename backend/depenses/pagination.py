@@ -0,0 +1,109 @@
+"""
+Pagination par clé (keyset) activable par paramètre.
+
+Sans paramètre `curseur`, la pagination par numéro de page habituelle
+s'applique (COUNT + OFFSET). Avec `?curseur=` (vide pour la première page),
+les résultats sont triés selon `ordre_curseur` de la vue et la page suivante
+est obtenue par comparaison sur la dernière ligne lue : pas de COUNT, pas
+d'OFFSET, coût constant quelle que soit la profondeur.
+
+Les champs de `ordre_curseur` doivent être non nuls et se terminer par une
+clé unique (id) pour que l'ordre soit total. Une vue peut aussi paginer une
+séquence qui n'est pas un QuerySet si elle fournit `model` et
+`apres(condition, valeurs, nombre)`.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PaginationCurseur(PageNumberPagination):
+    """Pagination par numéro de page, ou par clé si `curseur` est fourni"""
+
+    cursor_query_param = 'curseur'
+    ordre_par_defaut = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.mode_curseur = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.mode_curseur = True
+        self.request = request
+        self.ordre = tuple(getattr(view, 'ordre_curseur', self.ordre_par_defaut))
+        taille = self.get_page_size(request)
+
+        curseur = request.query_params.get(self.cursor_query_param)
+        valeurs = self._decoder(curseur, queryset.model) if curseur else None
+        condition = self._apres(valeurs) if curseur else None
+
+        if hasattr(queryset, 'apres'):
+            # Séquence déjà triée selon ordre_curseur (ex. audit.archives.JournauxCombines)
+            resultats = queryset.apres(condition, valeurs, taille + 1)
+        else:
+            # L'ordre du curseur remplace tout ?ordering : il doit rester stable
+            queryset = queryset.order_by(*self.ordre)
+            if condition is not None:
+                queryset = queryset.filter(condition)
+            resultats = list(queryset[:taille + 1])
+        self.suivant = None
+        if len(resultats) > taille:
+            resultats = resultats[:taille]
+            self.suivant = self._encoder(resultats[-1])
+        return resultats
+
+    def get_paginated_response(self, data):
+        if not self.mode_curseur:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.mode_curseur:
+            return super().get_next_link()
+        if self.suivant is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.suivant)
+
+    def _champs(self):
+        return [(champ.lstrip('-'), champ.startswith('-')) for champ in self.ordre]
+
+    def _apres(self, valeurs):
+        """Q « strictement après » la position : (a, b, c) > (va, vb, vc) selon les sens de tri"""
+        condition = Q()
+        egalites = Q()
+        for (champ, descendant), valeur in zip(self._champs(), valeurs):
+            operateur = 'lt' if descendant else 'gt'
+            condition |= egalites & Q(**{f'{champ}__{operateur}': valeur})
+            egalites &= Q(**{champ: valeur})
+        return condition
+
+    def _encoder(self, instance):
+        valeurs = []
+        for champ, _ in self._champs():
+            valeur = getattr(instance, champ)
+            valeurs.append(valeur.isoformat() if hasattr(valeur, 'isoformat') else valeur)
+        brut = json.dumps(valeurs, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+    def _decoder(self, curseur, modele):
+        try:
+            brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+            valeurs = json.loads(brut)
+            champs = self._champs()
+            if not isinstance(valeurs, list) or len(valeurs) != len(champs):
+                raise ValueError
+            return [
+                modele._meta.get_field(champ).to_python(valeur)
+                for (champ, _), valeur in zip(champs, valeurs)
+            ]
+        except Exception:
+            raise NotFound('Curseur invalide')
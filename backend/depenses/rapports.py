@@ -0,0 +1,149 @@
+"""
+Rapports : rapport mensuel des dépenses, et rapports de restauration calculés
+à partir des agrégats journaliers.
+
+Les totaux sont lus dans RestaurationJournaliereTotal et RestaurationJournaliere
+(une ligne par jour, au plus une ligne par jour et par plat, voir agregats.py) : le nombre de requêtes et de lignes lues ne
+dépend pas du volume de commandes (voir `python manage.py benchmark_rapport`).
+"""
+import calendar
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from .cache import memoriser
+from .models import Operation, Prevision, RestaurationJournaliere, RestaurationJournaliereTotal
+
+# Modèles dont une modification invalide le rapport mensuel en cache
+MODELES_RAPPORT_MENSUEL = ('depenses.Operation', 'depenses.Prevision', 'depenses.Categorie')
+
+
+def rapport_mensuel(mois):
+    """Totaux, écarts aux prévisions et moyenne journalière des dépenses du mois (YYYY-MM)
+
+    Lève ValueError si `mois` n'est pas au format YYYY-MM.
+    """
+    mois_date = datetime.strptime(mois, '%Y-%m').date()
+    mois_date = mois_date.replace(day=1)
+
+    # Calculer le dernier jour du mois
+    dernier_jour = calendar.monthrange(mois_date.year, mois_date.month)[1]
+    date_fin = mois_date.replace(day=dernier_jour)
+
+    # Opérations du mois
+    operations = Operation.objects.filter(
+        date_operation__gte=mois_date,
+        date_operation__lte=date_fin
+    )
+
+    # Prévisions du mois
+    previsions = Prevision.objects.filter(mois=mois_date)
+
+    # Totaux par catégorie
+    totals_operations = operations.values('categorie__code', 'categorie__nom').annotate(
+        total=Sum('montant_depense'),
+        count=Count('id')
+    )
+
+    # Calcul des écarts
+    rapport_data = {
+        'mois': mois,
+        'date_debut': mois_date,
+        'date_fin': date_fin,
+        'total_depenses': operations.aggregate(Sum('montant_depense'))['montant_depense__sum'] or 0,
+        'total_prevu': previsions.aggregate(Sum('montant_prevu'))['montant_prevu__sum'] or 0,
+        'nombre_jours': dernier_jour,
+        'nombre_operations': operations.count(),
+        'moyenne_journaliere': 0,
+        'categories': []
+    }
+
+    # Calcul de la moyenne journalière
+    jours_avec_operations = operations.values('date_operation').distinct().count()
+    if jours_avec_operations > 0:
+        rapport_data['moyenne_journaliere'] = rapport_data['total_depenses'] / jours_avec_operations
+
+    # Détails par catégorie
+    for tot in totals_operations:
+        categorie_code = tot['categorie__code']
+        prevision_cat = previsions.filter(categorie__code=categorie_code).first()
+
+        categorie_data = {
+            'categorie_code': categorie_code,
+            'categorie_nom': tot['categorie__nom'],
+            'total_depense': tot['total'],
+            'nombre_operations': tot['count'],
+            'montant_prevu': prevision_cat.montant_prevu if prevision_cat else 0,
+            'ecart': 0
+        }
+
+        if prevision_cat:
+            categorie_data['ecart'] = tot['total'] - prevision_cat.montant_prevu
+
+        rapport_data['categories'].append(categorie_data)
+
+    # Écart global
+    rapport_data['ecart_global'] = rapport_data['total_depenses'] - rapport_data['total_prevu']
+    return rapport_data
+
+
+def rapport_mensuel_en_cache(mois):
+    """`rapport_mensuel(mois)` en cache partagé (API et exports), invalidé par MODELES_RAPPORT_MENSUEL"""
+    return memoriser('rapport_mensuel', [mois], MODELES_RAPPORT_MENSUEL, lambda: rapport_mensuel(mois))
+
+
+def rapport_restauration(date_debut, date_fin, nb_top_plats=10):
+    """Totaux, série journalière et plats les plus commandés des commandes validées
+
+    Deux requêtes : les totaux journaliers et le classement des plats.
+    """
+    jours = RestaurationJournaliereTotal.objects.filter(
+        date__gte=date_debut,
+        date__lte=date_fin
+    ).order_by('date')
+
+    par_jour = []
+    totaux = {
+        'nb_commandes': 0,
+        'nb_plats': 0,
+        'total_brut': Decimal('0.00'),
+        'total_subvention': Decimal('0.00'),
+        'total_net': Decimal('0.00'),
+        'total_supplement': Decimal('0.00'),
+    }
+    for jour in jours:
+        par_jour.append({
+            'date': jour.date,
+            'nb_commandes': jour.nb_commandes,
+            'nb_plats': jour.nb_portions,
+            'total_brut': jour.montant_brut,
+            'total_subvention': jour.montant_subvention,
+            'total_net': jour.montant_net,
+        })
+        totaux['nb_commandes'] += jour.nb_commandes
+        totaux['nb_plats'] += jour.nb_portions
+        totaux['total_brut'] += jour.montant_brut
+        totaux['total_subvention'] += jour.montant_subvention
+        totaux['total_net'] += jour.montant_net
+        totaux['total_supplement'] += jour.montant_supplement
+
+    top_plats = [
+        {
+            'menu_plat__plat__nom': plat['plat__nom'],
+            'total_quantite': plat['total_quantite'],
+        }
+        for plat in RestaurationJournaliere.objects.filter(
+            date__gte=date_debut,
+            date__lte=date_fin
+        ).order_by().values(
+            'plat__nom'
+        ).annotate(
+            total_quantite=Sum('nb_portions')
+        ).order_by('-total_quantite', 'plat__nom')[:nb_top_plats]
+    ]
+
+    totaux['par_jour'] = par_jour
+    totaux['top_plats'] = top_plats
+    return totaux
+
@@ -0,0 +1,324 @@
+"""
+Recherche plein texte sur les opérations, catégories, extras et journaux d'audit.
+
+Chaque objet indexé a un document IndexRecherche (type_objet, objet_id,
+contenu), maintenu à l'enregistrement par les signaux (depenses/signals.py)
+et reconstruit en masse par `python manage.py reconstruire_index_recherche`.
+
+Trois moteurs derrière la même interface, choisis selon la base :
+- SQLite : table virtuelle FTS5 (tokenizer unicode61 sans accents) tenue à
+  jour par triggers, classement bm25 ;
+- MySQL : index FULLTEXT InnoDB, MATCH ... AGAINST en mode booléen ;
+- sinon (ou si FTS5 est absent) : LIKE sur chaque terme, sans classement.
+
+Les termes sont combinés en ET et recherchés en préfixe (« carbu » trouve
+« carburant »).
+"""
+import re
+from itertools import islice
+
+from django.apps import apps as apps_globales
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+# type_objet -> (modèle, champs composant le contenu indexé)
+SOURCES = {
+    'operation': ('depenses.Operation', ['description', 'categorie__nom', 'categorie__code', 'sous_categorie__nom']),
+    'categorie': ('depenses.Categorie', ['nom', 'code', 'description']),
+    'extra': ('depenses.ExtraRestauration', ['nom_personne', 'plat_nom', 'description']),
+    'audit': ('audit.AuditLog', ['object_repr', 'model_name', 'user__username']),
+}
+
+TAILLE_LOT = 2000
+# Taille des IN (...) par lot, sous la limite de paramètres de SQLite
+LOT_IN = 500
+
+
+def termes_recherche(texte):
+    """Mots de la requête, en minuscules (ponctuation et opérateurs ignorés)"""
+    return re.findall(r'\w+', (texte or '').lower())[:10]
+
+
+def _contenu(valeurs, champs):
+    return ' '.join(str(valeurs[champ]) for champ in champs if valeurs.get(champ))
+
+
+def _valeurs_instance(instance, champs, charger=True):
+    """Valeurs des champs (relations a__b comprises) depuis une instance déjà chargée
+
+    charger=False : une relation absente du cache de l'instance donne None
+    plutôt qu'une requête.
+    """
+    valeurs = {}
+    for champ in champs:
+        valeur = instance
+        for partie in champ.split('__'):
+            if valeur is None:
+                break
+            if not charger:
+                champ_modele = valeur._meta.get_field(partie)
+                if champ_modele.is_relation and not champ_modele.is_cached(valeur):
+                    valeur = None
+                    break
+            valeur = getattr(valeur, partie, None)
+        valeurs[champ] = valeur
+    return valeurs
+
+
+# Maintenance incrémentale
+
+def indexer(type_objet, instance, nouveau=False):
+    """Crée ou met à jour le document d'un objet"""
+    from .models import IndexRecherche
+
+    _, champs = SOURCES[type_objet]
+    contenu = _contenu(_valeurs_instance(instance, champs), champs)
+    if nouveau:
+        IndexRecherche.objects.create(type_objet=type_objet, objet_id=instance.pk, contenu=contenu)
+    else:
+        IndexRecherche.objects.update_or_create(
+            type_objet=type_objet, objet_id=instance.pk, defaults={'contenu': contenu}
+        )
+
+
+def indexer_en_masse(type_objet, instances, charger=True):
+    """Crée les documents d'objets nouveaux, relations chargées (charger=False : sans requête)"""
+    from .models import IndexRecherche
+
+    _, champs = SOURCES[type_objet]
+    documents = [
+        IndexRecherche(
+            type_objet=type_objet,
+            objet_id=instance.pk,
+            contenu=_contenu(_valeurs_instance(instance, champs, charger), champs)
+        )
+        for instance in instances
+    ]
+    if len(documents) == 1:
+        # bulk_create ouvrirait une transaction (BEGIN, COMMIT) pour un seul INSERT
+        documents[0].save(force_insert=True)
+    else:
+        IndexRecherche.objects.bulk_create(documents, batch_size=TAILLE_LOT)
+
+
+def desindexer(type_objet, objet_ids):
+    """Supprime les documents des objets donnés"""
+    from .models import IndexRecherche
+
+    objet_ids = list(objet_ids)
+    for i in range(0, len(objet_ids), LOT_IN):
+        IndexRecherche.objects.filter(type_objet=type_objet, objet_id__in=objet_ids[i:i + LOT_IN]).delete()
+
+
+def reindexer_queryset(type_objet, queryset):
+    """Recalcule les documents d'un ensemble d'objets (ex. opérations d'une catégorie renommée)
+
+    Par lots de LOT_IN objets : lecture des documents existants puis un seul
+    UPDATE (bulk_update) par lot.
+    """
+    from .models import IndexRecherche
+
+    _, champs = SOURCES[type_objet]
+    valeurs = queryset.values('id', *champs).order_by().iterator(chunk_size=TAILLE_LOT)
+    maintenant = timezone.now()
+    while True:
+        lot = {ligne['id']: _contenu(ligne, champs) for ligne in islice(valeurs, LOT_IN)}
+        if not lot:
+            break
+        documents = list(IndexRecherche.objects.filter(type_objet=type_objet, objet_id__in=list(lot)).only('id', 'objet_id'))
+        for document in documents:
+            document.contenu = lot[document.objet_id]
+            document.mis_a_jour_le = maintenant
+        IndexRecherche.objects.bulk_update(documents, ['contenu', 'mis_a_jour_le'])
+
+
+def reconstruire(types=None, apps=None, journal=None):
+    """Reconstruit l'index des types donnés (tous par défaut), par lots
+
+    `apps` permet l'appel depuis une migration (modèles historiques).
+    Retourne le nombre de documents créés.
+    """
+    apps = apps or apps_globales
+    IndexRecherche = apps.get_model('depenses', 'IndexRecherche')
+
+    total = 0
+    for type_objet in types or SOURCES:
+        libelle_modele, champs = SOURCES[type_objet]
+        modele = apps.get_model(libelle_modele)
+        IndexRecherche.objects.filter(type_objet=type_objet).delete()
+
+        lot = []
+        nombre = 0
+        for valeurs in modele.objects.values('id', *champs).order_by().iterator(chunk_size=TAILLE_LOT):
+            lot.append(IndexRecherche(type_objet=type_objet, objet_id=valeurs['id'], contenu=_contenu(valeurs, champs)))
+            if len(lot) >= TAILLE_LOT:
+                IndexRecherche.objects.bulk_create(lot)
+                nombre += len(lot)
+                lot = []
+        if lot:
+            IndexRecherche.objects.bulk_create(lot)
+            nombre += len(lot)
+        total += nombre
+        if journal:
+            journal(f"index {type_objet}: {nombre} document(s)")
+    return total
+
+
+def nettoyer_orphelins():
+    """Supprime les documents dont l'objet n'existe plus (suppressions en masse)"""
+    from .models import IndexRecherche
+
+    supprimes = 0
+    for type_objet, (libelle_modele, _) in SOURCES.items():
+        modele = apps_globales.get_model(libelle_modele)
+        supprimes += IndexRecherche.objects.filter(type_objet=type_objet).exclude(
+            objet_id__in=modele.objects.values('id')
+        ).delete()[0]
+    return supprimes
+
+
+# Moteurs
+
+class MoteurLike:
+    """Repli sans index plein texte : LIKE '%terme%' sur chaque terme"""
+    nom = 'like'
+
+    def _documents(self, termes, types):
+        from .models import IndexRecherche
+
+        documents = IndexRecherche.objects.all()
+        for terme in termes:
+            documents = documents.filter(contenu__icontains=terme)
+        if types:
+            documents = documents.filter(type_objet__in=types)
+        return documents
+
+    def rechercher(self, termes, types, limite):
+        documents = self._documents(termes, types).order_by('-mis_a_jour_le', '-id')
+        return [(type_objet, objet_id, 1.0) for type_objet, objet_id in documents.values_list('type_objet', 'objet_id')[:limite]]
+
+    def sous_requete(self, termes, type_objet):
+        return self._documents(termes, [type_objet]).values('objet_id')
+
+
+class MoteurSQLite(MoteurLike):
+    """FTS5 : table virtuelle <table>_fts à contenu externe, classement bm25"""
+    nom = 'fts5'
+
+    @staticmethod
+    def _requete_fts(termes):
+        return ' '.join(f'"{terme}"*' for terme in termes)
+
+    def _tables(self):
+        from .models import IndexRecherche
+
+        table = IndexRecherche._meta.db_table
+        return table, f'{table}_fts'
+
+    def rechercher(self, termes, types, limite):
+        table, fts = self._tables()
+        sql = (
+            f'SELECT d.type_objet, d.objet_id, -bm25({fts}) AS score '
+            f'FROM {fts} JOIN {table} d ON d.id = {fts}.rowid '
+            f'WHERE {fts} MATCH %s'
+        )
+        params = [self._requete_fts(termes)]
+        if types:
+            sql += f" AND d.type_objet IN ({', '.join(['%s'] * len(types))})"
+            params += list(types)
+        sql += ' ORDER BY score DESC LIMIT %s'
+        params.append(limite)
+        with connection.cursor() as curseur:
+            curseur.execute(sql, params)
+            return curseur.fetchall()
+
+    def sous_requete(self, termes, type_objet):
+        table, fts = self._tables()
+        return RawSQL(
+            f'SELECT d.objet_id FROM {fts} JOIN {table} d ON d.id = {fts}.rowid '
+            f'WHERE {fts} MATCH %s AND d.type_objet = %s',
+            [self._requete_fts(termes), type_objet]
+        )
+
+
+class MoteurMySQL(MoteurLike):
+    """Index FULLTEXT InnoDB, MATCH ... AGAINST en mode booléen"""
+    nom = 'fulltext'
+
+    # innodb_ft_min_token_size : les mots plus courts ne sont pas indexés
+    TAILLE_MIN = 3
+
+    @staticmethod
+    def _requete_booleenne(termes):
+        return ' '.join(f'+{terme}*' for terme in termes)
+
+    def rechercher(self, termes, types, limite):
+        from .models import IndexRecherche
+
+        if any(len(terme) < self.TAILLE_MIN for terme in termes):
+            return super().rechercher(termes, types, limite)
+        table = IndexRecherche._meta.db_table
+        sql = (
+            f'SELECT type_objet, objet_id, MATCH(contenu) AGAINST (%s IN BOOLEAN MODE) AS score '
+            f'FROM {table} WHERE MATCH(contenu) AGAINST (%s IN BOOLEAN MODE)'
+        )
+        requete = self._requete_booleenne(termes)
+        params = [requete, requete]
+        if types:
+            sql += f" AND type_objet IN ({', '.join(['%s'] * len(types))})"
+            params += list(types)
+        sql += ' ORDER BY score DESC LIMIT %s'
+        params.append(limite)
+        with connection.cursor() as curseur:
+            curseur.execute(sql, params)
+            return curseur.fetchall()
+
+    def sous_requete(self, termes, type_objet):
+        from .models import IndexRecherche
+
+        if any(len(terme) < self.TAILLE_MIN for terme in termes):
+            return super().sous_requete(termes, type_objet)
+        return RawSQL(
+            f'SELECT objet_id FROM {IndexRecherche._meta.db_table} '
+            f'WHERE MATCH(contenu) AGAINST (%s IN BOOLEAN MODE) AND type_objet = %s',
+            [self._requete_booleenne(termes), type_objet]
+        )
+
+
+_moteurs = {}
+
+
+def moteur():
+    """Moteur adapté à la base courante (FTS5 seulement si la table virtuelle existe)"""
+    alias = connection.alias
+    if alias not in _moteurs:
+        if connection.vendor == 'sqlite':
+            from .models import IndexRecherche
+
+            fts = f'{IndexRecherche._meta.db_table}_fts'
+            _moteurs[alias] = MoteurSQLite() if fts in connection.introspection.table_names() else MoteurLike()
+        elif connection.vendor == 'mysql':
+            _moteurs[alias] = MoteurMySQL()
+        else:
+            _moteurs[alias] = MoteurLike()
+    return _moteurs[alias]
+
+
+def rechercher(texte, types=None, limite=20):
+    """Documents correspondant à `texte`, les plus pertinents d'abord
+
+    Retourne une liste de (type_objet, objet_id, score).
+    """
+    termes = termes_recherche(texte)
+    if not termes:
+        return []
+    return moteur().rechercher(termes, types, limite)
+
+
+def filtrer(queryset, type_objet, texte):
+    """Restreint un queryset aux objets dont le document correspond à `texte`"""
+    termes = termes_recherche(texte)
+    if not termes:
+        return queryset
+    return queryset.filter(id__in=moteur().sous_requete(termes, type_objet))
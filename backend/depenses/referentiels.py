@@ -0,0 +1,112 @@
+"""
+Référentiels en mémoire pour le chemin critique des commandes.
+
+Les règles de subvention et les fenêtres de commande changent rarement : elles sont chargées une fois par
+processus, invalidées à chaque enregistrement/suppression (voir signals.py) et
+rechargées au plus tard après REFERENTIELS_CACHE_TTL secondes, pour que les
+autres workers gunicorn voient aussi les modifications.
+"""
+import bisect
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+
+class ReferentielEnMemoire:
+    """Table chargée à la demande par `charger()`, invalidée explicitement ou après expiration"""
+
+    def __init__(self, charger):
+        self.charger = charger
+        self._donnees = None
+        self._charge_le = 0.0
+        self._generation = 0
+        self._verrou = threading.Lock()
+
+    def invalider(self):
+        self._generation += 1
+        self._donnees = None
+
+    def donnees(self):
+        ttl = getattr(settings, 'REFERENTIELS_CACHE_TTL', 60)
+        donnees = self._donnees
+        if donnees is not None and time.monotonic() - self._charge_le <= ttl:
+            return donnees
+
+        with self._verrou:
+            if self._donnees is not None and time.monotonic() - self._charge_le <= ttl:
+                return self._donnees
+            generation = self._generation
+            donnees = self.charger()
+            # Ne pas conserver un chargement concurrent d'une invalidation
+            if generation == self._generation:
+                self._donnees = donnees
+                self._charge_le = time.monotonic()
+            return donnees
+
+
+def charger_regles_subvention():
+    """(débuts, règles) des intervalles élémentaires des règles de subvention actives
+
+    Les périodes de validité sont découpées en intervalles élémentaires triés ;
+    chaque intervalle porte la règle qui s'applique (même priorité que
+    `RegleSubvention.Meta.ordering` : effectif_de le plus récent, puis la règle
+    la plus récemment créée).
+    """
+    from .models import RegleSubvention
+
+    # Ordre du modèle = ordre de priorité
+    regles = list(RegleSubvention.objects.filter(
+        actif=True,
+        effectif_de__isnull=False,
+        effectif_a__isnull=False
+    ))
+
+    bornes = sorted(
+        {r.effectif_de for r in regles} |
+        {r.effectif_a + timedelta(days=1) for r in regles}
+    )
+    debuts = []
+    applicables = []
+    for debut in bornes:
+        regle = next((r for r in regles if r.effectif_de <= debut <= r.effectif_a), None)
+        # Fusionner les intervalles consécutifs portant la même règle
+        if applicables and applicables[-1] is regle:
+            continue
+        debuts.append(debut)
+        applicables.append(regle)
+    return debuts, applicables
+
+
+def charger_fenetres_commande():
+    """Heures limites des fenêtres de commande actives, par créneau"""
+    from .models import FenetreCommande
+
+    return dict(
+        FenetreCommande.objects.filter(actif=True).values_list('categorie_restau', 'heure_limite')
+    )
+
+
+class TableReglesSubvention(ReferentielEnMemoire):
+    """Règles de subvention actives indexées par date (charger_regles_subvention), recherche par bisection"""
+
+    def regle_pour(self, date):
+        """Retourne la règle active pour une date, ou None"""
+        debuts, applicables = self.donnees()
+        index = bisect.bisect_right(debuts, date) - 1
+        if index < 0:
+            return None
+        return applicables[index]
+
+
+class TableFenetresCommande(ReferentielEnMemoire):
+    """Heures limites des fenêtres de commande actives, par créneau (charger_fenetres_commande)"""
+
+    def heure_limite(self, categorie_restau):
+        """Retourne l'heure limite du créneau, ou None si aucune fenêtre active"""
+        return self.donnees().get(categorie_restau)
+
+
+regles_subvention = TableReglesSubvention(charger_regles_subvention)
+fenetres_commande = TableFenetresCommande(charger_fenetres_commande)
@@ -3,7 +3,7 @@ from django.contrib.auth.models import User
 from .models import (
     Categorie, SousCategorie, Prevision, Operation, Imputation,
     Plat, Menu, MenuPlat, FenetreCommande, RegleSubvention, Commande, CommandeLigne, UserPermission,
-    ExtraRestauration, TicketRepas, LotTickets
+    ExtraRestauration, TicketRepas, LotTickets, TacheExport
 )
 
 
@@ -480,3 +480,27 @@ class LotTicketsCreateSerializer(serializers.Serializer):
     date_validite = serializers.DateField(required=False, allow_null=True)
 
 
+class TacheExportSerializer(serializers.ModelSerializer):
+    """Serializer pour les tâches d'export en arrière-plan"""
+    type_export_display = serializers.CharField(source='get_type_export_display', read_only=True)
+    url_telechargement = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TacheExport
+        fields = [
+            'id', 'type_export', 'type_export_display', 'parametres', 'statut',
+            'nom_fichier', 'taille', 'erreur', 'url_telechargement',
+            'created_at', 'demarre_le', 'termine_le'
+        ]
+        read_only_fields = fields
+    
+    def get_url_telechargement(self, obj):
+        if obj.statut != 'termine':
+            return None
+        return f'/api/exports/{obj.id}/telecharger/'
+
+
+class TacheExportCreateSerializer(serializers.Serializer):
+    """Serializer pour demander un export en arrière-plan"""
+    type_export = serializers.ChoiceField(choices=TacheExport.TYPE_CHOICES)
+    parametres = serializers.DictField(child=serializers.CharField(allow_blank=True), required=False, default=dict)
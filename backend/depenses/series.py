@@ -0,0 +1,114 @@
+"""
+Séries temporelles du tableau de bord, lues dans OperationJournaliere.
+
+Format colonnaire : un tableau `periodes` commun à toutes les séries et, par
+catégorie, des tableaux `montants` et `nombres` alignés sur lui (zéro pour
+une période sans opération). Les montants sont des nombres JSON, pas des
+chaînes Decimal : les graphiques les consomment tels quels.
+
+Regroupements : jour (AAAA-MM-JJ), semaine ISO (AAAA-Wss, l'année ISO évitant
+de confondre les semaines de deux années) et mois (AAAA-MM). Le volume lu
+dépend du nombre de jours et de catégories, pas du nombre d'opérations.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from .models import Categorie, OperationJournaliere
+
+PAS = ('jour', 'semaine', 'mois')
+
+
+def cle_periode(jour, pas):
+    """Libellé de la période contenant `jour`"""
+    if pas == 'jour':
+        return jour.isoformat()
+    if pas == 'mois':
+        return f"{jour:%Y-%m}"
+    annee, semaine, _ = jour.isocalendar()
+    return f"{annee}-W{semaine:02d}"
+
+
+def periodes(debut, fin, pas):
+    """Libellés des périodes couvrant [debut, fin], dans l'ordre"""
+    cles = []
+    jour = debut
+    while jour <= fin:
+        cle = cle_periode(jour, pas)
+        if not cles or cles[-1] != cle:
+            cles.append(cle)
+        jour += timedelta(days=1)
+    return cles
+
+
+def _agregats(debut, fin, categories):
+    agregats = OperationJournaliere.objects.filter(date__gte=debut, date__lte=fin)
+    if categories:
+        agregats = agregats.filter(categorie_id__in=categories)
+    return agregats
+
+
+def serie_operations(debut, fin, pas='jour', categories=None):
+    """Montants et nombres d'opérations par période et par catégorie
+
+    Args:
+        categories: ids des catégories à inclure (toutes celles qui ont des
+            opérations sur la période par défaut ; une catégorie demandée
+            sans opération a une série à zéro)
+
+    Returns:
+        dict colonnaire (periodes, series, total), en deux requêtes
+    """
+    if pas not in PAS:
+        raise ValueError(f"Pas inconnu: {pas}")
+
+    cles = periodes(debut, fin, pas)
+    position = {cle: index for index, cle in enumerate(cles)}
+    vide = lambda valeur: [valeur] * len(cles)
+
+    montants = {}
+    nombres = {}
+    total_montants = vide(Decimal('0.00'))
+    total_nombres = vide(0)
+    for categorie_id in categories or []:
+        montants[categorie_id] = vide(Decimal('0.00'))
+        nombres[categorie_id] = vide(0)
+
+    for jour, categorie_id, nb_operations, montant in _agregats(debut, fin, categories).values_list(
+        'date', 'categorie_id', 'nb_operations', 'montant_total'
+    ).order_by():
+        index = position[cle_periode(jour, pas)]
+        if categorie_id not in montants:
+            montants[categorie_id] = vide(Decimal('0.00'))
+            nombres[categorie_id] = vide(0)
+        montants[categorie_id][index] += montant
+        nombres[categorie_id][index] += nb_operations
+        total_montants[index] += montant
+        total_nombres[index] += nb_operations
+
+    libelles = {
+        categorie['id']: categorie
+        for categorie in Categorie.objects.filter(id__in=list(montants)).values('id', 'code', 'nom')
+    }
+    series = [
+        {
+            'categorie': categorie_id,
+            'code': libelles[categorie_id]['code'],
+            'nom': libelles[categorie_id]['nom'],
+            'montants': [float(montant) for montant in montants[categorie_id]],
+            'nombres': nombres[categorie_id],
+        }
+        for categorie_id in sorted(montants, key=lambda i: libelles.get(i, {}).get('code', ''))
+        if categorie_id in libelles
+    ]
+
+    return {
+        'pas': pas,
+        'debut': debut.isoformat(),
+        'fin': fin.isoformat(),
+        'periodes': cles,
+        'series': series,
+        'total': {
+            'montants': [float(montant) for montant in total_montants],
+            'nombres': total_nombres,
+        },
+    }
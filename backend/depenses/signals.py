@@ -1,7 +1,18 @@
+from functools import partial
+
 from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Operation, Prevision, Imputation
-from audit.middleware import log_audit
+from django.contrib.auth.models import User
+from .models import (
+    Operation, Prevision, Imputation, RegleSubvention, FenetreCommande, Commande, CommandeLigne,
+    Categorie, SousCategorie, ExtraRestauration, Plat, Menu, MenuPlat, UserPermission
+)
+from .agregats import planifier_rafraichissement, planifier_rafraichissement_operations
+from .referentiels import regles_subvention, fenetres_commande
+from . import estampilles, recherche, travaux_differes
+from audit.middleware import journal_cree, log_audit
+from audit.models import AuditLog
 
 
 @receiver(post_save, sender=Operation)
@@ -52,7 +63,152 @@ def log_imputation_save(sender, instance, created, **kwargs):
         log_audit(action, instance.created_by, instance)
 
 
+@receiver(post_save, sender=RegleSubvention)
+@receiver(post_delete, sender=RegleSubvention)
+def invalider_regles_subvention(sender, instance, **kwargs):
+    """Recharger la table des règles de subvention au prochain accès"""
+    regles_subvention.invalider()
+    # Invalider à nouveau après validation, un rechargement concurrent ayant pu lire l'ancien état
+    transaction.on_commit(regles_subvention.invalider)
+
+
+@receiver(post_save, sender=FenetreCommande)
+@receiver(post_delete, sender=FenetreCommande)
+def invalider_fenetres_commande(sender, instance, **kwargs):
+    """Recharger la table des fenêtres de commande au prochain accès"""
+    fenetres_commande.invalider()
+    transaction.on_commit(fenetres_commande.invalider)
+
+
+@receiver(post_save, sender=Commande)
+def rafraichir_agregats_commande(sender, instance, **kwargs):
+    """Recalculer l'agrégat du jour quand une commande entre dans l'état validée ou en sort"""
+    etat_initial = getattr(instance, '_etat_initial', None)
+    date_initiale = getattr(instance, '_date_initiale', None)
+    if instance.etat == 'validee' or etat_initial == 'validee':
+        planifier_rafraichissement(instance.date_commande)
+        if etat_initial == 'validee' and date_initiale and date_initiale != instance.date_commande:
+            planifier_rafraichissement(date_initiale)
+    instance._etat_initial = instance.etat
+    instance._date_initiale = instance.date_commande
+
+
+@receiver(post_delete, sender=Commande)
+def rafraichir_agregats_commande_supprimee(sender, instance, **kwargs):
+    """Retirer une commande validée supprimée de l'agrégat du jour"""
+    if instance.etat == 'validee' or getattr(instance, '_etat_initial', None) == 'validee':
+        planifier_rafraichissement(instance.date_commande)
+
+
+@receiver(post_save, sender=CommandeLigne)
+@receiver(post_delete, sender=CommandeLigne)
+def rafraichir_agregats_ligne(sender, instance, **kwargs):
+    """Recalculer l'agrégat du jour quand une ligne d'une commande validée change"""
+    try:
+        commande = instance.commande
+    except Commande.DoesNotExist:
+        return
+    if commande.etat == 'validee':
+        planifier_rafraichissement(commande.date_commande)
+
+
+@receiver(post_save, sender=Operation)
+def rafraichir_agregats_operation(sender, instance, **kwargs):
+    """Recalculer l'agrégat du jour de l'opération (et de son ancien jour si la date change)"""
+    planifier_rafraichissement_operations(instance.date_operation)
+    date_initiale = getattr(instance, '_date_initiale', None)
+    if date_initiale and date_initiale != instance.date_operation:
+        planifier_rafraichissement_operations(date_initiale)
+    instance._date_initiale = instance.date_operation
+
+
+@receiver(post_delete, sender=Operation)
+def rafraichir_agregats_operation_supprimee(sender, instance, **kwargs):
+    """Retirer l'opération supprimée de l'agrégat du jour"""
+    planifier_rafraichissement_operations(instance.date_operation)
+
+
+@receiver(post_save, sender=Operation)
+def indexer_operation(sender, instance, created, **kwargs):
+    """Mettre à jour le document de recherche de l'opération"""
+    recherche.indexer('operation', instance, nouveau=created)
+
+
+@receiver(post_save, sender=Categorie)
+def indexer_categorie(sender, instance, created, **kwargs):
+    """Indexer la catégorie ; son nom figure aussi dans le document de ses opérations"""
+    recherche.indexer('categorie', instance, nouveau=created)
+    if not created:
+        recherche.reindexer_queryset('operation', Operation.objects.filter(categorie=instance))
+
+
+@receiver(post_save, sender=SousCategorie)
+@receiver(post_delete, sender=SousCategorie)
+def reindexer_operations_sous_categorie(sender, instance, created=False, **kwargs):
+    """Le nom de la sous-catégorie (renommée ou supprimée) figure dans le document de ses opérations"""
+    if not created:
+        recherche.reindexer_queryset('operation', Operation.objects.filter(sous_categorie=instance))
+
 
+@receiver(post_save, sender=ExtraRestauration)
+def indexer_extra(sender, instance, created, **kwargs):
+    """Mettre à jour le document de recherche de l'extra"""
+    recherche.indexer('extra', instance, nouveau=created)
 
 
+@receiver(post_save, sender=AuditLog)
+def indexer_journal_audit(sender, instance, created, **kwargs):
+    """Indexer l'entrée d'audit et marquer AuditLog modifié : une fois par requête (voir audit/middleware.py)"""
+    if created:
+        journal_cree(instance)
+    else:
+        recherche.indexer('audit', instance)
+        estampilles.marquer_modifie(sender._meta.label)
 
+
+@receiver(post_delete, sender=AuditLog)
+def desindexer_journal_audit(sender, instance, **kwargs):
+    """Retirer les entrées supprimées (archivage, suppressions en masse) de l'index, par transaction"""
+    travaux_differes.accumuler(('desindexer_audit',), partial(recherche.desindexer, 'audit'), [instance.pk])
+    estampilles.marquer_modifie(sender._meta.label)
+
+
+@receiver(post_delete, sender=Operation)
+@receiver(post_delete, sender=Categorie)
+@receiver(post_delete, sender=ExtraRestauration)
+def desindexer_objet(sender, instance, **kwargs):
+    """Retirer l'objet supprimé de l'index de recherche"""
+    type_objet = {Operation: 'operation', Categorie: 'categorie', ExtraRestauration: 'extra'}[sender]
+    recherche.desindexer(type_objet, [instance.pk])
+
+
+@receiver(post_save, sender=Categorie)
+@receiver(post_delete, sender=Categorie)
+@receiver(post_save, sender=SousCategorie)
+@receiver(post_delete, sender=SousCategorie)
+@receiver(post_save, sender=Operation)
+@receiver(post_delete, sender=Operation)
+@receiver(post_save, sender=Prevision)
+@receiver(post_delete, sender=Prevision)
+@receiver(post_save, sender=Plat)
+@receiver(post_delete, sender=Plat)
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=MenuPlat)
+@receiver(post_delete, sender=MenuPlat)
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+@receiver(post_save, sender=CommandeLigne)
+@receiver(post_delete, sender=CommandeLigne)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def marquer_modele_modifie(sender, **kwargs):
+    """Incrémenter l'estampille du modèle (ETag des listes, voir estampilles.py)
+    
+    AuditLog est marqué par lot : une fois par requête pour les entrées
+    créées (audit/middleware.py), une fois par transaction pour les
+    suppressions (desindexer_journal_audit).
+    """
+    estampilles.marquer_modifie(sender._meta.label)
@@ -0,0 +1,169 @@
+"""
+Tâches en arrière-plan (Celery) : facture journalière, emails, exports.
+
+Les vues ne font plus ces traitements dans la requête : elles les planifient
+avec `planifier(tache, *args, cle=...)`, à la validation de la transaction
+courante (rien n'est planifié si elle est annulée). Selon les réglages :
+- CELERY_BROKER_URL : message au broker, exécuté par un worker Celery
+  (voir suivi_depense/celery.py) ;
+- CELERY_TASK_ALWAYS_EAGER : exécution immédiate dans le processus, erreurs
+  propagées (tests) ;
+- sinon : pool de threads du processus web (TACHES_POOL_TAILLE), pour le
+  développement et les hébergements sans Redis.
+
+Clé d'idempotence : une tâche planifiée avec `cle` ne l'est qu'une fois tant
+qu'elle n'a pas démarré (verrou `cache.add`, levé au plus tard après
+DUREE_IDEMPOTENCE si le message est perdu, aussitôt si le broker refuse le
+message : l'erreur est journalisée sans faire échouer la requête). La tâche libère sa clé en
+démarrant : une modification pendant l'exécution la replanifie. Les tâches
+peuvent être rejouées (acks tardifs) : la facture est recalculée, emails et
+exports sont réservés avant traitement.
+
+Ce module importe Celery : il est importé à la demande, pas au démarrage
+des workers web (voir benchmark_demarrage).
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from suivi_depense.celery import app
+
+logger = logging.getLogger(__name__)
+
+PREFIXE = 'depenses:tache'
+DUREE_IDEMPOTENCE = 300      # secondes
+DUREE_VERROU_EMAILS = 600    # durée maximale d'un envoi de la file (secondes)
+
+_pool = None
+_verrou_pool = threading.Lock()
+
+
+def planifier(tache, *args, cle=None):
+    """Planifie `tache(*args)` à la validation de la transaction courante
+
+    Hors d'un bloc atomique, la tâche est planifiée immédiatement. Avec `cle`,
+    une tâche de même clé qui n'a pas encore démarré couvre celle-ci.
+    """
+    transaction.on_commit(lambda: _soumettre(tache, args, cle))
+
+
+def _soumettre(tache, args, cle):
+    if cle is not None and not cache.add(f'{PREFIXE}:{cle}', 1, DUREE_IDEMPOTENCE):
+        return  # déjà planifiée, pas encore démarrée
+    kwargs = {'cle': cle} if cle is not None else {}
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        tache.apply_async(args, kwargs)
+        return
+    if settings.CELERY_BROKER_URL:
+        try:
+            tache.apply_async(args, kwargs)
+        except Exception:
+            # Broker injoignable : la transaction est déjà validée, la requête
+            # ne doit pas échouer. Clé libérée pour qu'une prochaine
+            # planification réessaie ; exports et emails restent en file
+            # (maintenance_exports, envoyer_emails).
+            liberer(cle)
+            logger.exception(f"Tâche {tache.name}{args} non transmise au broker")
+        return
+
+    global _pool
+    with _verrou_pool:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(settings.TACHES_POOL_TAILLE, thread_name_prefix='taches')
+        pool = _pool
+    pool.submit(_executer_localement, tache, args, kwargs)
+
+
+def _executer_localement(tache, args, kwargs):
+    close_old_connections()
+    try:
+        tache(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Tâche {tache.name}{args} en échec")
+    finally:
+        connections.close_all()
+
+
+def attendre_taches():
+    """Attend la fin des tâches du pool local (commandes de gestion, benchmarks)"""
+    global _pool
+    with _verrou_pool:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def liberer(cle):
+    """Libère la clé d'idempotence d'une tâche qui démarre"""
+    if cle is not None:
+        cache.delete(f'{PREFIXE}:{cle}')
+
+
+@app.task(name='depenses.regenerer_facture')
+def regenerer_facture(date_facture, cle=None):
+    """Recalcule la facture du jour (date ISO) et régénère son PDF"""
+    from .views import generer_facture_journaliere
+
+    liberer(cle)
+    generer_facture_journaliere(date.fromisoformat(date_facture))
+
+
+@app.task(name='depenses.envoyer_emails')
+def envoyer_emails(cle=None, limite=50):
+    """Vide la file d'envoi des emails (emails.py), un seul envoi à la fois
+
+    Le verrou du cache évite d'ouvrir plusieurs connexions SMTP à la fois ;
+    l'unicité de l'envoi repose sur la réservation de chaque email (emails.py).
+
+    Retourne un tuple (nombre envoyés, nombre en échec).
+    """
+    from .emails import envoyer_emails_en_attente
+    from .models import EmailSortant
+
+    liberer(cle)
+    envoyes = echecs = 0
+    while True:
+        jeton = uuid.uuid4().hex
+        if not cache.add(f'{PREFIXE}:envoi_emails', jeton, DUREE_VERROU_EMAILS):
+            # L'envoi en cours revérifie la file après avoir levé son verrou
+            return envoyes, echecs
+        try:
+            while True:
+                lot = envoyer_emails_en_attente(limite)
+                envoyes += lot[0]
+                echecs += lot[1]
+                if sum(lot) < limite:
+                    break
+        finally:
+            if cache.get(f'{PREFIXE}:envoi_emails') == jeton:
+                cache.delete(f'{PREFIXE}:envoi_emails')
+        # Emails mis en file pendant l'envoi, dont la tâche a trouvé le verrou pris
+        if not EmailSortant.objects.filter(statut='en_attente', prochaine_tentative__lte=timezone.now()).exists():
+            return envoyes, echecs
+
+
+@app.task(name='depenses.traiter_export')
+def traiter_export(tache_id, cle=None):
+    """Exécute une TacheExport (exports PDF/Excel/CSV, rapports, planches de tickets)"""
+    from .exports.taches import traiter_export as traiter
+
+    liberer(cle)
+    return traiter(tache_id)
+
+
+@app.task(name='depenses.maintenance_exports')
+def maintenance_exports(limite=5):
+    """Tâche périodique : relance les exports bloqués, traite la file et purge les fichiers expirés"""
+    from .exports.taches import purger_exports_expires, relancer_taches_bloquees, traiter_exports_en_attente
+
+    relancer_taches_bloquees()
+    resultat = traiter_exports_en_attente(limite)
+    purger_exports_expires()
+    return resultat
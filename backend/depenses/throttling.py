@@ -0,0 +1,138 @@
+"""
+Limitation de débit des endpoints publics de restauration (sans authentification).
+
+Sans limite, un client pouvait appeler commander_public en boucle : chaque
+appel crée un utilisateur et une commande et planifie la facture du jour,
+et occupe un worker pendant ce temps. Limites (DEFAULT_THROTTLE_RATES,
+voir settings.py) :
+- menu_public_ip : lectures du menu par adresse IP, plafond dimensionné pour
+  tout un bureau derrière une même adresse (le menu est servi du cache) ;
+- commande_publique_menu : commandes par menu, toutes adresses confondues
+  (plafond contre un abus, quelle que soit l'adresse ou l'en-tête
+  X-Forwarded-For) ;
+- commande_publique_ip : commandes par adresse IP et menu, désactivée par
+  défaut : derrière le NAT d'un bureau, tous les employés partagent une
+  adresse (voir `benchmark_charge_publique --ip-partagee`). À activer
+  seulement si les clients ont des adresses distinctes.
+
+Les compteurs sont dans le cache Django (CACHES), partagés entre workers en
+Redis ou en fichiers : un compteur par fenêtre fixe (la minute pour
+'60/min'), incrémenté par `cache.incr`, atomique en Redis et en mémoire
+locale. En fichiers, incr lit puis réécrit l'entrée : add et incr s'y font
+sous un verrou de fichier (django.core.files.locks) commun aux workers. La
+mémoire locale est propre à chaque processus : les limites y seraient
+multipliées par le nombre de workers (avertissement au démarrage hors DEBUG,
+voir depenses/apps.py).
+L'historique de SimpleRateThrottle (lecture puis écriture d'une liste)
+laissait passer les requêtes simultanées d'un même client. Une limite vide
+désactive le compteur. Une requête refusée par une limite n'est
+pas comptée par les suivantes : avec la limite par IP activée, un client
+abusif n'épuise pas le plafond du menu des autres employés.
+
+L'adresse IP est celle de DRF (REMOTE_ADDR, ou X-Forwarded-For selon
+NUM_PROXIES derrière un proxy).
+"""
+import os
+from types import SimpleNamespace
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Verrou des compteurs dans le dossier d'un cache en fichiers (ignoré par son nettoyage : pas .djcache)
+FICHIER_VERROU = 'limitations.lock'
+
+
+class LimitationPublique(SimpleRateThrottle):
+    """Compteur en cache par fenêtre fixe, ignoré si une limitation précédente a refusé la requête"""
+
+    def get_rate(self):
+        # Relu à chaque requête (override_settings) ; absente ou vide : pas de limite
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope) or None
+
+    def allow_request(self, request, view):
+        if self.rate is None or getattr(request, '_limitation_refusee', False):
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        fenetre = int(self.timer() // self.duration)
+        nombre = self.incrementer(f'{self.key}:{fenetre}')
+        if nombre <= self.num_requests:
+            return True
+        self.fin_fenetre = (fenetre + 1) * self.duration
+        request._limitation_refusee = True
+        return False
+
+    def incrementer(self, cle):
+        """Compteur de la fenêtre après incrémentation"""
+        # self.cache est le proxy django.core.cache.cache : backend réel pour isinstance
+        backend = caches[DEFAULT_CACHE_ALIAS] if self.cache is cache else self.cache
+        if not isinstance(backend, FileBasedCache):
+            return self._incrementer(cle)
+        # Cache en fichiers : incr non atomique, verrou entre workers
+        from django.core.files import locks
+
+        os.makedirs(backend._dir, exist_ok=True)
+        with open(os.path.join(backend._dir, FICHIER_VERROU), 'ab') as verrou:
+            locks.lock(verrou, locks.LOCK_EX)
+            try:
+                return self._incrementer(cle)
+            finally:
+                locks.unlock(verrou)
+
+    def _incrementer(self, cle):
+        self.cache.add(cle, 0, self.duration + 1)
+        try:
+            return self.cache.incr(cle)
+        except ValueError:
+            # Expirée entre add et incr
+            self.cache.set(cle, 1, self.duration + 1)
+            return 1
+
+    def wait(self):
+        return max(self.fin_fenetre - self.timer(), 0)
+
+    @staticmethod
+    def token_menu(view):
+        return getattr(view, 'kwargs', {}).get('token', '')
+
+
+class LimiteMenuPublicParIP(LimitationPublique):
+    scope = 'menu_public_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LimiteCommandeParIP(LimitationPublique):
+    scope = 'commande_publique_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': f'{self.get_ident(request)}:{self.token_menu(view)}'}
+
+
+class LimiteCommandeParMenu(LimitationPublique):
+    scope = 'commande_publique_menu'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.token_menu(view)}
+
+
+LIMITES_MENU_PUBLIC = [LimiteMenuPublicParIP]
+LIMITES_COMMANDE_PUBLIQUE = [LimiteCommandeParIP, LimiteCommandeParMenu]
+
+
+def attente_limitation(request, limitations, **kwargs):
+    """Pour les vues hors DRF (views_async.py) : secondes à attendre si une limite est atteinte, sinon None
+
+    `kwargs` : paramètres de l'URL (ex. token=...), comme ceux d'une vue DRF.
+    """
+    vue = SimpleNamespace(kwargs=kwargs)
+    for classe in limitations:
+        limitation = classe()
+        if not limitation.allow_request(request, vue):
+            return limitation.wait() or 0
+    return None
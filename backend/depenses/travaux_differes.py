@@ -0,0 +1,73 @@
+"""
+Travaux planifiés à la validation de la transaction, une seule fois par clé.
+
+`planifier(cle, fonction, *args)` enregistre l'appel par transaction.on_commit
+sauf si un appel de même clé est déjà en attente sur la connexion. Les appels
+en attente sont suivis dans un registre propre à la connexion (attribut de
+l'objet connexion, donc par thread), sans parcourir la liste interne de
+Django : un appel en est retiré quand il s'exécute, et disparaît de lui-même
+quand Django abandonne ses callbacks (annulation de la transaction ou d'un
+point de sauvegarde), le registre ne gardant que des références faibles.
+
+`accumuler(cle, fonction, elements)` regroupe des éléments en un seul appel
+`fonction(liste)` par transaction (ex. documents de recherche créés en masse).
+
+`en_attente(cle)` retourne l'appel en attente, que l'appelant peut exécuter
+tout de suite (lecture dans la même transaction) : il ne sera pas refait à
+la validation.
+"""
+import weakref
+
+from django.db import transaction
+
+
+def _registre(using=None):
+    connexion = transaction.get_connection(using)
+    registre = getattr(connexion, 'travaux_differes', None)
+    if registre is None:
+        registre = connexion.travaux_differes = weakref.WeakValueDictionary()
+    return registre
+
+
+class Travail:
+    """Appel planifié à la validation de la transaction, exécuté au plus une fois"""
+
+    def __init__(self, registre, cle, fonction, args):
+        self.registre = registre
+        self.cle = cle
+        self.fonction = fonction
+        self.args = args
+        self.fait = False
+
+    def __call__(self):
+        if self.fait:
+            return
+        self.fait = True
+        if self.registre.get(self.cle) is self:
+            del self.registre[self.cle]
+        self.fonction(*self.args)
+
+
+def en_attente(cle, using=None):
+    """Appel de clé `cle` en attente de validation sur la connexion, ou None"""
+    return _registre(using).get(cle)
+
+
+def planifier(cle, fonction, *args, using=None):
+    """Planifie `fonction(*args)` à la validation, sauf si `cle` est déjà en attente"""
+    registre = _registre(using)
+    if cle in registre:
+        return
+    travail = Travail(registre, cle, fonction, args)
+    registre[cle] = travail
+    # Hors transaction, on_commit exécute (et retire du registre) tout de suite
+    transaction.on_commit(travail, using=using)
+
+
+def accumuler(cle, fonction, elements, using=None):
+    """Planifie `fonction(liste)` à la validation, ou ajoute `elements` à la liste en attente"""
+    travail = en_attente(cle, using)
+    if travail is not None:
+        travail.args[0].extend(elements)
+    else:
+        planifier(cle, fonction, list(elements), using=using)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
@@ -5,11 +6,16 @@ from .views import (
     OperationViewSet, ImputationViewSet, RapportViewSet,
     PlatViewSet, MenuViewSet, MenuPlatViewSet, FenetreCommandeViewSet,
     RegleSubventionViewSet, CommandeViewSet, CommandeLigneViewSet, ExtraRestaurationViewSet,
-    LotTicketsViewSet, TicketRepasViewSet,
-    menu_public, commander_public, generer_facture, imprimer_facture
+    LotTicketsViewSet, TicketRepasViewSet, TacheExportViewSet,
+    menu_public, commander_public, generer_facture, imprimer_facture, statistiques_restauration,
+    recherche
 )
 from audit.views import AuditLogViewSet
 
+if settings.SERVEUR_ASGI:
+    # Vues publiques async sous ASGI (mêmes URL, mêmes réponses)
+    from .views_async import menu_public, commander_public  # noqa: F811
+
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'categories', CategorieViewSet)
@@ -19,6 +25,7 @@ router.register(r'operations', OperationViewSet)
 router.register(r'imputations', ImputationViewSet)
 router.register(r'rapports', RapportViewSet, basename='rapports')
 router.register(r'audit', AuditLogViewSet, basename='audit')
+router.register(r'exports', TacheExportViewSet, basename='exports')
 
 # Routes Restauration
 router.register(r'restauration/plats', PlatViewSet, basename='plats')
@@ -34,9 +41,12 @@ router.register(r'restauration/tickets', TicketRepasViewSet, basename='tickets')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('recherche/', recherche, name='recherche'),
     # Routes publiques pour commander sans authentification
     path('restauration/public/menu/<str:token>/', menu_public, name='menu-public'),
     path('restauration/public/commander/<str:token>/', commander_public, name='commander-public'),
+    # Statistiques du tableau de bord cantine
+    path('restauration/statistiques/', statistiques_restauration, name='statistiques-restauration'),
     # Routes pour les factures
     path('restauration/factures/<str:date_str>/', generer_facture, name='generer-facture'),
     path('restauration/factures/<str:date_str>/imprimer/', imprimer_facture, name='imprimer-facture'),
@@ -1,17 +1,17 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Sum, Avg, Count, Q
+from django.db.models import Sum, Avg, Count, Q, F
+from django.db.models.functions import ExtractIsoYear, ExtractWeek
 from django.db import transaction, IntegrityError
 from django.utils import timezone
 from datetime import datetime, timedelta
-import calendar
 from .models import (
     Categorie, SousCategorie, Prevision, Operation, Imputation,
     Plat, Menu, MenuPlat, FenetreCommande, RegleSubvention, Commande, CommandeLigne, Facture,
-    ExtraRestauration, TicketRepas, LotTickets
+    ExtraRestauration, TicketRepas, LotTickets, TacheExport, OperationJournaliere
 )
 from .serializers import (
     CategorieSerializer, SousCategorieSerializer, PrevisionSerializer,
@@ -19,28 +19,31 @@ from .serializers import (
     PlatSerializer, MenuSerializer, MenuPlatSerializer, FenetreCommandeSerializer,
     RegleSubventionSerializer, CommandeSerializer, CommandeLigneSerializer, CommandeCreateSerializer,
     UserSerializer, UserPermissionSerializer, ExtraRestaurationSerializer,
-    TicketRepasSerializer, LotTicketsSerializer, LotTicketsCreateSerializer
+    TicketRepasSerializer, LotTicketsSerializer, LotTicketsCreateSerializer,
+    TacheExportSerializer, TacheExportCreateSerializer
 )
 from django.contrib.auth.models import User
 from .filters import OperationFilter, PrevisionFilter
-import pandas as pd
-from django.http import HttpResponse, FileResponse
+from .pagination import PaginationCurseur
+from .estampilles import ListeConditionnelleMixin, reponse_conditionnelle
+from .cache import action_en_cache, memoriser
+from .commandes_publiques import (
+    ErreurCommande, creer_commande_publique, donnees_menu_public, menu_publie, planifier_facture
+)
+from django.http import FileResponse, JsonResponse
 from django.conf import settings
 import os
 from decimal import Decimal
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from django.contrib.staticfiles import finders
-from reportlab.graphics.barcode.qr import QrCodeWidget
-from reportlab.graphics.shapes import Drawing
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 from audit.middleware import log_audit
-import csv
-from django.core.mail import send_mail
+from audit.models import AuditLog
+from .emails import mettre_en_file
+from .referentiels import regles_subvention
+from .throttling import LIMITES_COMMANDE_PUBLIQUE, LIMITES_MENU_PUBLIC
+from .rapports import rapport_mensuel_en_cache, rapport_restauration
+from .exports.taches import demander_export
+from .imports_csv import ErreurImport, importer_operations, importer_previsions
+from . import recherche as recherche_plein_texte
+from . import series
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
@@ -97,6 +100,7 @@ class UserViewSet(viewsets.ModelViewSet):
         instance.delete()
     
     @action(detail=False, methods=['get'])
+    @action_en_cache('utilisateur_courant', ('auth.User', 'depenses.UserPermission'), par_utilisateur=True)
     def me(self, request):
         """Récupère les informations de l'utilisateur actuellement connecté"""
         from .models import UserPermission
@@ -122,10 +126,11 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(data)
 
 
-class CategorieViewSet(viewsets.ModelViewSet):
+class CategorieViewSet(ListeConditionnelleMixin, viewsets.ModelViewSet):
     queryset = Categorie.objects.all()
     serializer_class = CategorieSerializer
     permission_classes = [IsAuthenticated]
+    modeles_etag = ('depenses.Categorie',)
 
 
 class SousCategorieViewSet(viewsets.ModelViewSet):
@@ -181,34 +186,11 @@ class PrevisionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
         """Exporter les prévisions en CSV"""
-        previsions = self.queryset.all()
-        
-        mois = request.query_params.get('mois')
-        if mois:
-            previsions = previsions.filter(mois__startswith=mois)
-        
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="previsions.csv"'
-        response.write('\ufeff')
-        
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow([
-            'ID', 'Mois', 'Catégorie', 'Code Catégorie', 'Sous-Catégorie',
-            'Montant Prévu', 'Statut', 'Montant Imputé', 'Solde Restant',
-            'Créé par', 'Créé le'
-        ])
-        
-        for prev in previsions:
-            writer.writerow([
-                prev.id, prev.mois, prev.categorie.nom, prev.categorie.code,
-                prev.sous_categorie.nom if prev.sous_categorie else '',
-                prev.montant_prevu, prev.get_statut_display(),
-                prev.montant_impute, prev.solde_restant,
-                prev.created_by.username if prev.created_by else '',
-                prev.created_at
-            ])
+        from .exports.documents import reponse_document
+
+        response = reponse_document('previsions_csv', request.query_params)
         
-        if request.user.is_authenticated:
+        if request.user.is_authenticated and response.status_code == 200:
             log_audit('export', request.user, None, metadata={'type': 'previsions_csv'})
         
         return response
@@ -219,76 +201,28 @@ class PrevisionViewSet(viewsets.ModelViewSet):
         if 'file' not in request.FILES:
             return Response({'error': 'Fichier CSV requis'}, status=400)
         
-        file = request.FILES['file']
-        
         try:
-            df = pd.read_csv(file, delimiter=';', encoding='utf-8-sig')
-            
-            required_columns = ['Mois', 'Catégorie', 'Montant Prévu']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return Response({
-                    'error': f'Colonnes manquantes: {", ".join(missing_columns)}'
-                }, status=400)
-            
-            imported = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    categorie_code = row.get('Code Catégorie') or row.get('Catégorie')
-                    categorie, _ = Categorie.objects.get_or_create(
-                        code=categorie_code[:20],
-                        defaults={'nom': row.get('Catégorie', categorie_code)}
-                    )
-                    
-                    sous_categorie = None
-                    if pd.notna(row.get('Sous-Catégorie')):
-                        sous_categorie, _ = SousCategorie.objects.get_or_create(
-                            categorie=categorie,
-                            nom=row['Sous-Catégorie'][:100]
-                        )
-                    
-                    mois = pd.to_datetime(row['Mois']).date().replace(day=1)
-                    
-                    prevision, created = Prevision.objects.get_or_create(
-                        mois=mois,
-                        categorie=categorie,
-                        sous_categorie=sous_categorie,
-                        defaults={
-                            'montant_prevu': float(row['Montant Prévu']),
-                            'statut': row.get('Statut', 'draft'),
-                            'created_by': request.user if request.user.is_authenticated else None
-                        }
-                    )
-                    
-                    if not created:
-                        prevision.montant_prevu = float(row['Montant Prévu'])
-                        prevision.save()
-                    
-                    imported += 1
-                    
-                    if request.user.is_authenticated:
-                        log_audit('import', request.user, prevision, metadata={'source': 'csv'})
-                        
-                except Exception as e:
-                    errors.append(f"Ligne {index + 2}: {str(e)}")
-            
-            return Response({
-                'imported': imported,
-                'errors': errors[:10],
-                'total_errors': len(errors)
-            }, status=201 if imported > 0 else 400)
-            
+            resultat = importer_previsions(
+                request.FILES['file'],
+                request.user if request.user.is_authenticated else None
+            )
+        except ErreurImport as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             return Response({'error': f'Erreur lors de la lecture du fichier: {str(e)}'}, status=400)
+        
+        return Response(resultat, status=201 if resultat['imported'] > 0 else 400)
 
 
-class OperationViewSet(viewsets.ModelViewSet):
+class OperationViewSet(ListeConditionnelleMixin, viewsets.ModelViewSet):
     queryset = Operation.objects.all()
     serializer_class = OperationSerializer
     permission_classes = [IsAuthenticated]
+    modeles_etag = ('depenses.Operation', 'depenses.Categorie', 'depenses.SousCategorie', 'auth.User')
     filterset_class = OperationFilter
+    # ?curseur= : pagination par clé sur (-date_operation, -created_at, id), sans COUNT
+    pagination_class = PaginationCurseur
+    ordre_curseur = ('-date_operation', '-created_at', 'id')
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -330,12 +264,13 @@ class OperationViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
         
-        totals = self.queryset.filter(
-            date_operation__gte=date_debut,
-            date_operation__lte=date_fin
-        ).values('date_operation').annotate(
-            total=Sum('montant_depense'),
-            count=Count('id')
+        # Lu dans l'agrégat journalier : une ligne par jour et par catégorie
+        totals = OperationJournaliere.objects.filter(
+            date__gte=date_debut,
+            date__lte=date_fin
+        ).values(date_operation=F('date')).annotate(
+            total=Sum('montant_total'),
+            count=Sum('nb_operations')
         ).order_by('date_operation')
         
         return Response(list(totals))
@@ -355,131 +290,79 @@ class OperationViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
         
-        totals = self.queryset.filter(
-            date_operation__gte=date_debut,
-            date_operation__lte=date_fin
-        ).values('semaine_iso').annotate(
-            total=Sum('montant_depense'),
-            count=Count('id')
-        ).order_by('semaine_iso')
+        # Semaine ISO avec son année ISO : la semaine 1 de deux années ne se confond pas
+        totals = OperationJournaliere.objects.filter(
+            date__gte=date_debut,
+            date__lte=date_fin
+        ).annotate(
+            annee_iso=ExtractIsoYear('date'),
+            semaine_iso=ExtractWeek('date')
+        ).values('annee_iso', 'semaine_iso').annotate(
+            total=Sum('montant_total'),
+            count=Sum('nb_operations')
+        ).order_by('annee_iso', 'semaine_iso')
         
         return Response(list(totals))
 
     @action(detail=False, methods=['get'])
-    def export_csv(self, request):
-        """Exporter les opérations en CSV"""
-        operations = self.queryset.all()
-        
-        # Appliquer les filtres si présents
+    def serie_temporelle(self, request):
+        """Série temporelle colonnaire des dépenses par catégorie (tableau de bord)
+        
+        Paramètres : date_debut, date_fin (YYYY-MM-DD), pas (jour, semaine, mois ;
+        défaut jour), categories (ids séparés par des virgules, défaut toutes).
+        Réponse avec ETag : une requête If-None-Match inchangée reçoit un 304
+        sans calcul de la série.
+        """
         date_debut = request.query_params.get('date_debut')
         date_fin = request.query_params.get('date_fin')
-        categorie_id = request.query_params.get('categorie')
+        pas = request.query_params.get('pas', 'jour')
         
-        if date_debut:
-            operations = operations.filter(date_operation__gte=date_debut)
-        if date_fin:
-            operations = operations.filter(date_operation__lte=date_fin)
-        if categorie_id:
-            operations = operations.filter(categorie_id=categorie_id)
-        
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="operations.csv"'
-        response.write('\ufeff')  # BOM pour Excel UTF-8
-        
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow([
-            'ID', 'Date Opération', 'Jour', 'Semaine ISO', 'Catégorie', 'Code Catégorie',
-            'Sous-Catégorie', 'Unités', 'Prix Unitaire', 'Montant Dépensé',
-            'Description', 'Créé par', 'Créé le'
-        ])
-        
-        for op in operations:
-            writer.writerow([
-                op.id, op.date_operation, op.jour, op.semaine_iso,
-                op.categorie.nom, op.categorie.code,
-                op.sous_categorie.nom if op.sous_categorie else '',
-                op.unites, op.prix_unitaire, op.montant_depense,
-                op.description, op.created_by.username if op.created_by else '',
-                op.created_at
-            ])
+        if not date_debut or not date_fin:
+            return Response({'error': 'date_debut et date_fin requis'}, status=400)
+        try:
+            date_debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
+            date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Format de date invalide'}, status=400)
+        if date_fin < date_debut or (date_fin - date_debut).days > 3660:
+            return Response({'error': 'Période invalide (au plus 10 ans)'}, status=400)
+        if pas not in series.PAS:
+            return Response({'error': f"pas doit valoir {', '.join(series.PAS)}"}, status=400)
+        try:
+            categories = [int(c) for c in request.query_params.get('categories', '').split(',') if c]
+        except ValueError:
+            return Response({'error': 'categories doit être une liste d\'identifiants'}, status=400)
+        
+        # Agrégats recalculés à chaque changement d'opération : ETag sur leur estampille
+        return reponse_conditionnelle(
+            request,
+            ('depenses.OperationJournaliere', 'depenses.Categorie'),
+            lambda: JsonResponse(
+                series.serie_operations(date_debut, date_fin, pas, categories),
+                json_dumps_params={'separators': (',', ':')}
+            )
+        )
+
+    @action(detail=False, methods=['get'])
+    def export_csv(self, request):
+        """Exporter les opérations en CSV"""
+        from .exports.documents import reponse_document
+
+        response = reponse_document('operations_csv', request.query_params)
         
-        if request.user.is_authenticated:
+        if request.user.is_authenticated and response.status_code == 200:
             log_audit('export', request.user, None, metadata={'type': 'operations_csv'})
         
         return response
-
+    
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """Exporter les opérations en Excel"""
-        operations = self.get_queryset()
-        
-        # Appliquer les filtres si présents
-        date_debut = request.query_params.get('date_debut')
-        date_fin = request.query_params.get('date_fin')
-        categorie_id = request.query_params.get('categorie')
-        
-        if date_debut:
-            operations = operations.filter(date_operation__gte=date_debut)
-        if date_fin:
-            operations = operations.filter(date_operation__lte=date_fin)
-        if categorie_id:
-            operations = operations.filter(categorie_id=categorie_id)
-        
-        # Optimiser les requêtes
-        operations = operations.select_related('categorie', 'sous_categorie', 'created_by')
-        
-        # Créer le fichier Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Opérations"
-        
-        # Styles
-        from openpyxl.styles import PatternFill, Font, Alignment
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        
-        # En-têtes
-        headers = [
-            'ID', 'Date Opération', 'Jour', 'Semaine ISO', 'Catégorie', 'Code Catégorie',
-            'Sous-Catégorie', 'Unités', 'Prix Unitaire (GNF)', 'Montant Dépensé (GNF)',
-            'Description', 'Créé par', 'Créé le'
-        ]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Données
-        for row_idx, op in enumerate(operations, start=2):
-            ws.cell(row=row_idx, column=1, value=op.id)
-            ws.cell(row=row_idx, column=2, value=op.date_operation.strftime('%Y-%m-%d') if op.date_operation else '')
-            ws.cell(row=row_idx, column=3, value=op.jour)
-            ws.cell(row=row_idx, column=4, value=op.semaine_iso)
-            ws.cell(row=row_idx, column=5, value=op.categorie.nom if op.categorie else '')
-            ws.cell(row=row_idx, column=6, value=op.categorie.code if op.categorie else '')
-            ws.cell(row=row_idx, column=7, value=op.sous_categorie.nom if op.sous_categorie else '')
-            ws.cell(row=row_idx, column=8, value=float(op.unites))
-            ws.cell(row=row_idx, column=9, value=float(op.prix_unitaire))
-            ws.cell(row=row_idx, column=10, value=float(op.montant_depense))
-            ws.cell(row=row_idx, column=11, value=op.description or '')
-            ws.cell(row=row_idx, column=12, value=op.created_by.username if op.created_by else '')
-            ws.cell(row=row_idx, column=13, value=op.created_at.strftime('%Y-%m-%d %H:%M:%S') if op.created_at else '')
-        
-        # Ajuster la largeur des colonnes
-        column_widths = [8, 15, 10, 12, 25, 12, 20, 10, 18, 18, 30, 15, 20]
-        for col_idx, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + col_idx)].width = width
-        
-        # Réponse
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f'operations_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
+        from .exports.documents import reponse_document
+
+        response = reponse_document('operations_excel', request.query_params)
         
-        if request.user.is_authenticated:
+        if request.user.is_authenticated and response.status_code == 200:
             log_audit('export', request.user, None, metadata={'type': 'operations_excel'})
         
         return response
@@ -487,234 +370,11 @@ class OperationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def export_pdf(self, request):
         """Exporter les opérations en PDF"""
-        operations = self.get_queryset()
-        
-        # Appliquer les filtres si présents
-        date_debut = request.query_params.get('date_debut')
-        date_fin = request.query_params.get('date_fin')
-        categorie_id = request.query_params.get('categorie')
-        
-        if date_debut:
-            operations = operations.filter(date_operation__gte=date_debut)
-        if date_fin:
-            operations = operations.filter(date_operation__lte=date_fin)
-        if categorie_id:
-            operations = operations.filter(categorie_id=categorie_id)
-        
-        # Optimiser les requêtes
-        operations = operations.select_related('categorie', 'sous_categorie', 'created_by').order_by('-date_operation')
-        
-        # Créer le document PDF
-        response = HttpResponse(content_type='application/pdf')
-        filename = f'operations_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        doc = SimpleDocTemplate(response, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Styles personnalisés
-        from reportlab.lib.styles import ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-        styles.add(ParagraphStyle(
-            name='TitleCentered',
-            parent=styles['Title'],
-            fontSize=16,
-            leading=20,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        styles.add(ParagraphStyle(
-            name='Heading2Left',
-            parent=styles['Heading2'],
-            fontSize=12,
-            leading=14,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Fonction pour charger le logo CSIG
-        def get_logo_path():
-            project_root = settings.BASE_DIR.parent
-            logo_paths = [
-                str(project_root / 'logocsig.png'),
-                str(project_root / 'frontend' / 'src' / 'assets' / 'logocsig.png'),
-                str(settings.BASE_DIR / 'logocsig.png'),
-            ]
-            for path in logo_paths:
-                if os.path.exists(path):
-                    return path
-            return None
-        
-        # En-tête avec logo
-        logo_path = get_logo_path()
-        if logo_path:
-            try:
-                logo = Image(logo_path, width=1.5*inch, height=1.5*inch)
-                header_data = [[logo, Paragraph("<b>CSIG</b><br/>OPÉRATIONS", styles['Title'])]]
-                header_table = Table(header_data, colWidths=[2*inch, 4*inch])
-                header_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-                    ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ]))
-                elements.append(header_table)
-            except Exception as e:
-                print(f"Erreur lors du chargement du logo: {e}")
-                title = Paragraph("CSIG - OPÉRATIONS", styles['TitleCentered'])
-                elements.append(title)
-        else:
-            title = Paragraph("CSIG - OPÉRATIONS", styles['TitleCentered'])
-            elements.append(title)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Informations de l'export
-        info_data = [
-            ['Date d\'export:', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
-            ['Nombre d\'opérations:', str(operations.count())],
-        ]
-        if date_debut:
-            info_data.append(['Date début:', date_debut])
-        if date_fin:
-            info_data.append(['Date fin:', date_fin])
-        if categorie_id:
-            try:
-                from .models import Categorie
-                categorie = Categorie.objects.get(pk=categorie_id)
-                info_data.append(['Catégorie:', categorie.nom])
-            except:
-                pass
-        
-        info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(info_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Tableau des opérations
-        elements.append(Paragraph("<b>DÉTAILS DES OPÉRATIONS</b>", styles['Heading2Left']))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Fonction pour nettoyer le texte
-        def clean_text(text, max_length=50):
-            if text is None:
-                return '-'
-            text = str(text)
-            # Remplacer les caractères problématiques
-            text = text.replace('\x00', '')  # Supprimer les null bytes
-            text = text.replace('\n', ' ')  # Remplacer les retours à la ligne
-            text = text.replace('\r', ' ')  # Remplacer les retours chariot
-            # Encoder en UTF-8
-            try:
-                text = text.encode('utf-8', errors='ignore').decode('utf-8')
-            except:
-                text = text.encode('ascii', errors='ignore').decode('ascii')
-            # Limiter la longueur
-            text = text.strip()
-            if len(text) > max_length:
-                # Tronquer à un espace pour éviter de couper au milieu d'un mot
-                truncated = text[:max_length]
-                last_space = truncated.rfind(' ')
-                if last_space > max_length * 0.7:
-                    text = truncated[:last_space] + '...'
-                else:
-                    text = truncated + '...'
-            return text
-        
-        # Fonction pour formater les montants
-        def format_montant(montant):
-            """Formate un montant Decimal en string propre"""
-            try:
-                if montant is None:
-                    return '-'
-                # Convertir en Decimal si nécessaire
-                if isinstance(montant, (int, float)):
-                    montant = Decimal(str(montant))
-                # Formater avec séparateur de milliers
-                return f"{montant:,.0f} GNF"
-            except Exception as e:
-                print(f"Erreur formatage montant: {e}, valeur: {montant}")
-                return str(montant) if montant else '-'
-        
-        # Préparer les données du tableau
-        table_data = [['Date', 'Catégorie', 'Sous-Cat.', 'Unités', 'Prix Unit.', 'Montant', 'Description']]
-        
-        for op in operations:
-            table_data.append([
-                op.date_operation.strftime('%d/%m/%Y') if op.date_operation else '-',
-                clean_text(op.categorie.nom if op.categorie else '-', max_length=25),
-                clean_text(op.sous_categorie.nom if op.sous_categorie else '-', max_length=20),
-                f"{float(op.unites):,.2f}",
-                format_montant(op.prix_unitaire),
-                format_montant(op.montant_depense),
-                clean_text(op.description or '-', max_length=40)
-            ])
-        
-        # Créer le tableau avec largeurs ajustées
-        audit_table = Table(table_data, colWidths=[1*inch, 1.5*inch, 1*inch, 0.8*inch, 1.1*inch, 1.1*inch, 1.5*inch])
-        audit_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (3, 0), (5, -1), 'RIGHT'),  # Colonnes numériques alignées à droite (Unités, Prix, Montant)
-            ('ALIGN', (6, 0), (6, -1), 'LEFT'),  # Description alignée à gauche
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ('WORDWRAP', (0, 0), (-1, -1)),  # Permettre le retour à la ligne
-        ]))
-        
-        elements.append(audit_table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Totaux
-        if operations.exists():
-            total_montant = sum(op.montant_depense for op in operations)
-            total_data = [
-                ['Total des opérations:', str(operations.count())],
-                ['Total montant dépensé:', f"{total_montant:,.0f} GNF"],
-            ]
-            total_table = Table(total_data, colWidths=[3*inch, 3*inch])
-            total_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 11),
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-                ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
-            ]))
-            elements.append(total_table)
-        
-        # Pied de page
-        elements.append(Spacer(1, 0.3*inch))
-        footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}"
-        footer_style = ParagraphStyle(
-            name='Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        footer = Paragraph(footer_text, footer_style)
-        elements.append(footer)
-        
-        # Construire le PDF
-        doc.build(elements)
+        from .exports.documents import reponse_document
+
+        response = reponse_document('operations_pdf', request.query_params)
         
-        if request.user.is_authenticated:
+        if request.user.is_authenticated and response.status_code == 200:
             log_audit('export', request.user, None, metadata={'type': 'operations_pdf'})
         
         return response
@@ -725,67 +385,17 @@ class OperationViewSet(viewsets.ModelViewSet):
         if 'file' not in request.FILES:
             return Response({'error': 'Fichier CSV requis'}, status=400)
         
-        file = request.FILES['file']
-        
         try:
-            # Lire le CSV
-            df = pd.read_csv(file, delimiter=';', encoding='utf-8-sig')
-            
-            # Vérifier les colonnes requises
-            required_columns = ['Date Opération', 'Catégorie', 'Unités', 'Prix Unitaire', 'Montant Dépensé']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return Response({
-                    'error': f'Colonnes manquantes: {", ".join(missing_columns)}'
-                }, status=400)
-            
-            imported = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # Trouver ou créer la catégorie
-                    categorie_code = row.get('Code Catégorie') or row.get('Catégorie')
-                    categorie, _ = Categorie.objects.get_or_create(
-                        code=categorie_code[:20],
-                        defaults={'nom': row.get('Catégorie', categorie_code)}
-                    )
-                    
-                    # Trouver ou créer la sous-catégorie si présente
-                    sous_categorie = None
-                    if pd.notna(row.get('Sous-Catégorie')):
-                        sous_categorie, _ = SousCategorie.objects.get_or_create(
-                            categorie=categorie,
-                            nom=row['Sous-Catégorie'][:100]
-                        )
-                    
-                    # Créer l'opération
-                    operation = Operation.objects.create(
-                        date_operation=pd.to_datetime(row['Date Opération']).date(),
-                        categorie=categorie,
-                        sous_categorie=sous_categorie,
-                        unites=float(row['Unités']),
-                        prix_unitaire=float(row['Prix Unitaire']),
-                        description=row.get('Description', '')[:500],
-                        created_by=request.user if request.user.is_authenticated else None
-                    )
-                    
-                    imported += 1
-                    
-                    if request.user.is_authenticated:
-                        log_audit('import', request.user, operation, metadata={'source': 'csv'})
-                        
-                except Exception as e:
-                    errors.append(f"Ligne {index + 2}: {str(e)}")
-            
-            return Response({
-                'imported': imported,
-                'errors': errors[:10],  # Limiter à 10 erreurs
-                'total_errors': len(errors)
-            }, status=201 if imported > 0 else 400)
-            
+            resultat = importer_operations(
+                request.FILES['file'],
+                request.user if request.user.is_authenticated else None
+            )
+        except ErreurImport as e:
+            return Response({'error': str(e)}, status=400)
         except Exception as e:
             return Response({'error': f'Erreur lors de la lecture du fichier: {str(e)}'}, status=400)
+        
+        return Response(resultat, status=201 if resultat['imported'] > 0 else 400)
 
 
 class ImputationViewSet(viewsets.ModelViewSet):
@@ -868,253 +478,48 @@ class RapportViewSet(viewsets.ViewSet):
             return Response({'error': 'Paramètre mois requis (format: YYYY-MM)'}, status=400)
         
         try:
-            mois_date = datetime.strptime(mois, '%Y-%m').date()
-            mois_date = mois_date.replace(day=1)
+            # En cache partagé avec les exports PDF/Excel du rapport
+            return Response(rapport_mensuel_en_cache(mois))
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
-        
-        # Calculer le dernier jour du mois
-        dernier_jour = calendar.monthrange(mois_date.year, mois_date.month)[1]
-        date_fin = mois_date.replace(day=dernier_jour)
-        
-        # Opérations du mois
-        operations = Operation.objects.filter(
-            date_operation__gte=mois_date,
-            date_operation__lte=date_fin
-        )
-        
-        # Prévisions du mois
-        previsions = Prevision.objects.filter(mois=mois_date)
-        
-        # Totaux par catégorie
-        totals_operations = operations.values('categorie__code', 'categorie__nom').annotate(
-            total=Sum('montant_depense'),
-            count=Count('id')
-        )
-        
-        # Calcul des écarts
-        rapport_data = {
-            'mois': mois,
-            'date_debut': mois_date,
-            'date_fin': date_fin,
-            'total_depenses': operations.aggregate(Sum('montant_depense'))['montant_depense__sum'] or 0,
-            'total_prevu': previsions.aggregate(Sum('montant_prevu'))['montant_prevu__sum'] or 0,
-            'nombre_jours': dernier_jour,
-            'nombre_operations': operations.count(),
-            'moyenne_journaliere': 0,
-            'categories': []
-        }
-        
-        # Calcul de la moyenne journalière
-        jours_avec_operations = operations.values('date_operation').distinct().count()
-        if jours_avec_operations > 0:
-            rapport_data['moyenne_journaliere'] = rapport_data['total_depenses'] / jours_avec_operations
-        
-        # Détails par catégorie
-        for tot in totals_operations:
-            categorie_code = tot['categorie__code']
-            prevision_cat = previsions.filter(categorie__code=categorie_code).first()
-            
-            categorie_data = {
-                'categorie_code': categorie_code,
-                'categorie_nom': tot['categorie__nom'],
-                'total_depense': tot['total'],
-                'nombre_operations': tot['count'],
-                'montant_prevu': prevision_cat.montant_prevu if prevision_cat else 0,
-                'ecart': 0
-            }
-            
-            if prevision_cat:
-                categorie_data['ecart'] = tot['total'] - prevision_cat.montant_prevu
-            
-            rapport_data['categories'].append(categorie_data)
-        
-        # Écart global
-        rapport_data['ecart_global'] = rapport_data['total_depenses'] - rapport_data['total_prevu']
-        
-        return Response(rapport_data)
 
     @action(detail=False, methods=['get'])
     def export_pdf(self, request):
         """Exporter le rapport mensuel en PDF"""
-        mois = request.query_params.get('mois')
-        if not mois:
-            return Response({'error': 'Paramètre mois requis'}, status=400)
-        
-        # Générer le rapport
-        rapport_response = self.mensuel(request)
-        if rapport_response.status_code != 200:
-            return rapport_response
-        
-        rapport_data = rapport_response.data
-        
-        # Créer le PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="rapport_{mois}.pdf"'
-        
-        doc = SimpleDocTemplate(response, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Titre
-        title = Paragraph(f"Rapport Mensuel - {mois}", styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Informations générales
-        info_data = [
-            ['Période', f"{rapport_data['date_debut']} au {rapport_data['date_fin']}"],
-            ['Total Dépenses', f"{rapport_data['total_depenses']:,.2f} GNF"],
-            ['Total Prévu', f"{rapport_data['total_prevu']:,.2f} GNF"],
-            ['Écart Global', f"{rapport_data['ecart_global']:,.2f} GNF"],
-            ['Nombre d\'opérations', str(rapport_data['nombre_operations'])],
-            ['Moyenne Journalière', f"{rapport_data['moyenne_journaliere']:,.2f} GNF"],
-        ]
-        
-        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(info_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Tableau des catégories
-        cat_headers = ['Catégorie', 'Total Dépense', 'Montant Prévu', 'Écart', 'Nb Opérations']
-        cat_data = [cat_headers]
-        
-        for cat in rapport_data['categories']:
-            cat_data.append([
-                f"{cat['categorie_code']} - {cat['categorie_nom']}",
-                f"{cat['total_depense']:,.2f} GNF",
-                f"{cat['montant_prevu']:,.2f} GNF",
-                f"{cat['ecart']:,.2f} GNF",
-                str(cat['nombre_operations'])
-            ])
-        
-        cat_table = Table(cat_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch, 1*inch])
-        cat_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
-        elements.append(cat_table)
-        
-        doc.build(elements)
-        return response
+        from .exports.documents import reponse_document
+
+        return reponse_document('rapport_pdf', request.query_params)
 
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """Exporter le rapport mensuel en Excel"""
-        mois = request.query_params.get('mois')
-        if not mois:
-            return Response({'error': 'Paramètre mois requis'}, status=400)
-        
-        # Générer le rapport
-        rapport_response = self.mensuel(request)
-        if rapport_response.status_code != 200:
-            return rapport_response
-        
-        rapport_data = rapport_response.data
-        
-        # Créer le fichier Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"Rapport {mois}"
-        
-        # Styles
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        title_font = Font(bold=True, size=14)
-        
-        # Titre
-        ws['A1'] = f"Rapport Mensuel - {mois}"
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:B1')
-        
-        # Informations générales
-        row = 3
-        info_labels = ['Période', 'Total Dépenses', 'Total Prévu', 'Écart Global', 'Nombre d\'opérations', 'Moyenne Journalière']
-        info_values = [
-            f"{rapport_data['date_debut']} au {rapport_data['date_fin']}",
-            f"{rapport_data['total_depenses']:,.2f} GNF",
-            f"{rapport_data['total_prevu']:,.2f} GNF",
-            f"{rapport_data['ecart_global']:,.2f} GNF",
-            str(rapport_data['nombre_operations']),
-            f"{rapport_data['moyenne_journaliere']:,.2f} GNF"
-        ]
-        
-        for label, value in zip(info_labels, info_values):
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        # Tableau des catégories
-        row += 2
-        headers = ['Catégorie', 'Total Dépense', 'Montant Prévu', 'Écart', 'Nb Opérations']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        row += 1
-        for cat in rapport_data['categories']:
-            ws.cell(row=row, column=1, value=f"{cat['categorie_code']} - {cat['categorie_nom']}")
-            ws.cell(row=row, column=2, value=f"{cat['total_depense']:,.2f} GNF")
-            ws.cell(row=row, column=3, value=f"{cat['montant_prevu']:,.2f} GNF")
-            ws.cell(row=row, column=4, value=f"{cat['ecart']:,.2f} GNF")
-            ws.cell(row=row, column=5, value=cat['nombre_operations'])
-            row += 1
-        
-        # Ajuster la largeur des colonnes
-        ws.column_dimensions['A'].width = 30
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 15
-        
-        # Réponse
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="rapport_{mois}.xlsx"'
-        wb.save(response)
-        return response
+        from .exports.documents import reponse_document
+
+        return reponse_document('rapport_excel', request.query_params)
 
 
 # ============================================================================
 # VIEWSETS RESTAURATION / CANTINE
 # ============================================================================
 
-class PlatViewSet(viewsets.ModelViewSet):
+class PlatViewSet(ListeConditionnelleMixin, viewsets.ModelViewSet):
     """Gestion des plats (CRUD)"""
     queryset = Plat.objects.all()
     serializer_class = PlatSerializer
     permission_classes = [IsAuthenticated]
+    modeles_etag = ('depenses.Plat',)
     filterset_fields = ['categorie_restau', 'actif']
     search_fields = ['nom', 'description']
     ordering = ['categorie_restau', 'nom']
 
 
-class MenuViewSet(viewsets.ModelViewSet):
+class MenuViewSet(ListeConditionnelleMixin, viewsets.ModelViewSet):
     """Gestion des menus du jour"""
     queryset = Menu.objects.all()
     serializer_class = MenuSerializer
     permission_classes = [IsAuthenticated]
+    # Le stock restant des plats dépend des lignes de commande et de l'état des commandes
+    modeles_etag = ('depenses.Menu', 'depenses.MenuPlat', 'depenses.Plat', 'depenses.Commande', 'depenses.CommandeLigne')
     filterset_fields = ['date_menu']
     ordering = ['-date_menu']
     
@@ -1288,11 +693,7 @@ class RegleSubventionViewSet(viewsets.ModelViewSet):
         else:
             date = timezone.now().date()
         
-        regle = RegleSubvention.objects.filter(
-            actif=True,
-            effectif_de__lte=date,
-            effectif_a__gte=date
-        ).first()
+        regle = regles_subvention.regle_pour(date)
         
         if regle:
             serializer = self.get_serializer(regle)
@@ -1300,11 +701,16 @@ class RegleSubventionViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Aucune règle active pour cette date'}, status=404)
 
 
-class CommandeViewSet(viewsets.ModelViewSet):
+class CommandeViewSet(ListeConditionnelleMixin, viewsets.ModelViewSet):
     """Gestion des commandes"""
     queryset = Commande.objects.all()
     serializer_class = CommandeSerializer
     permission_classes = [IsAuthenticated]
+    # Les permissions de validation décident des commandes visibles
+    modeles_etag = (
+        'depenses.Commande', 'depenses.CommandeLigne', 'depenses.MenuPlat', 'depenses.Plat',
+        'depenses.UserPermission', 'auth.User',
+    )
     filterset_fields = ['date_commande', 'etat', 'utilisateur']
     ordering = ['-date_commande', '-created_at']
     
@@ -1319,9 +725,9 @@ class CommandeViewSet(viewsets.ModelViewSet):
             try:
                 email_result = envoyer_email_confirmation(commande)
                 if email_result and email_result.get('success'):
-                    print(f"[OK] Email de confirmation envoye a {email_result.get('email')}")
+                    print(f"[OK] Email de confirmation mis en file pour {email_result.get('email')}")
             except Exception as e:
-                print(f"[ERREUR] Erreur lors de l'envoi de l'email: {e}")
+                print(f"[ERREUR] Erreur lors de la mise en file de l'email: {e}")
     
     def get_queryset(self):
         """Filtrer par utilisateur si non-admin et sans permission de validation"""
@@ -1395,20 +801,23 @@ class CommandeViewSet(viewsets.ModelViewSet):
         
         # Si ce n'est pas un admin/staff, vérifier les fenêtres de commande
         if not est_admin_ou_staff:
+            evaluations = {}
             for ligne_data in lignes_data:
                 menu_plat_id = ligne_data['menu_plat_id']
                 try:
                     menu_plat = MenuPlat.objects.select_related('plat').get(pk=menu_plat_id)
                     categorie_restau = menu_plat.plat.categorie_restau
                     
-                    # Vérifier la fenêtre de commande (13h00 GMT pour les utilisateurs normaux)
-                    if not FenetreCommande.est_dans_fenetre(categorie_restau, date_commande, est_public=False):
-                        fenetre = FenetreCommande.objects.filter(categorie_restau=categorie_restau, actif=True).first()
-                        if fenetre:
+                    # Vérifier la fenêtre de commande (une seule évaluation par créneau)
+                    if categorie_restau not in evaluations:
+                        evaluations[categorie_restau] = FenetreCommande.evaluer(categorie_restau, date_commande, est_public=False)
+                    evaluation = evaluations[categorie_restau]
+                    if not evaluation.ouverte:
+                        if evaluation.configuree:
                             erreurs_fenetre.append(
                                 f"Fenêtre de commande fermée pour {menu_plat.plat.nom} "
                                 f"({menu_plat.plat.get_categorie_restau_display()}). "
-                                f"Heure limite: {fenetre.heure_limite.strftime('%H:%M')}"
+                                f"Heure limite: {evaluation.heure_limite.strftime('%H:%M')}"
                             )
                         else:
                             # Si pas de fenêtre configurée, appliquer la limite par défaut de 13h00 GMT
@@ -1514,15 +923,18 @@ class CommandeViewSet(viewsets.ModelViewSet):
         
         if not peut_valider_apres_limite:
             erreurs_fenetre = []
-            for ligne in commande.lignes.all():
+            evaluations = {}
+            for ligne in commande.lignes.select_related('menu_plat__plat'):
                 categorie_restau = ligne.menu_plat.plat.categorie_restau
-                if not FenetreCommande.est_dans_fenetre(categorie_restau, commande.date_commande, est_public=False):
-                    fenetre = FenetreCommande.objects.filter(categorie_restau=categorie_restau, actif=True).first()
-                    if fenetre:
+                if categorie_restau not in evaluations:
+                    evaluations[categorie_restau] = FenetreCommande.evaluer(categorie_restau, commande.date_commande, est_public=False)
+                evaluation = evaluations[categorie_restau]
+                if not evaluation.ouverte:
+                    if evaluation.configuree:
                         erreurs_fenetre.append(
                             f"Fenêtre de commande fermée pour {ligne.menu_plat.plat.nom} "
                             f"({ligne.menu_plat.plat.get_categorie_restau_display()}). "
-                            f"Heure limite: {fenetre.heure_limite.strftime('%H:%M')}"
+                            f"Heure limite: {evaluation.heure_limite.strftime('%H:%M')}"
                         )
                     else:
                         # Si pas de fenêtre configurée, appliquer la limite par défaut de 13h00 GMT
@@ -1582,22 +994,19 @@ class CommandeViewSet(viewsets.ModelViewSet):
                 # Créer l'imputation automatique
                 commande.operation.create_imputation_if_needed()
                 
-                # Générer automatiquement la facture pour ce jour
-                try:
-                    generer_facture_journaliere(commande.date_commande)
-                except Exception as e:
-                    print(f"Erreur lors de la génération de la facture: {e}")
+                # Régénérer la facture du jour en arrière-plan (après le commit)
+                planifier_facture(commande.date_commande)
                 
-                # Envoyer un email de confirmation si l'utilisateur a un email
+                # Mettre en file l'email de confirmation (envoyé après le commit)
                 try:
                     result = envoyer_email_confirmation(commande)
                     if result and result.get('error'):
-                        print(f"⚠️ Erreur lors de l'envoi de l'email: {result.get('error')}")
+                        print(f"⚠️ Email non mis en file: {result.get('error')}")
                     elif result and result.get('success'):
-                        print(f"✅ Email envoyé avec succès à {result.get('email')}")
+                        print(f"✅ Email mis en file pour {result.get('email')}")
                 except Exception as e:
                     import traceback
-                    print(f"❌ Erreur lors de l'envoi de l'email de confirmation: {e}")
+                    print(f"❌ Erreur lors de la mise en file de l'email de confirmation: {e}")
                     print(traceback.format_exc())
                     # Ne pas bloquer la validation si l'email échoue
                 
@@ -1641,37 +1050,18 @@ class CommandeViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
         
-        commandes = self.queryset.filter(
-            date_commande__gte=mois_debut,
-            date_commande__lte=mois_fin,
-            etat='validee'
-        )
-        
-        total_brut = sum(c.montant_brut for c in commandes)
-        total_subvention = sum(c.montant_subvention for c in commandes)
-        total_net = sum(c.montant_net for c in commandes)
-        nb_commandes = commandes.count()
-        nb_plats = sum(sum(l.quantite for l in c.lignes.all()) for c in commandes)
-        
-        # Top plats
-        from django.db.models import Sum
-        top_plats = CommandeLigne.objects.filter(
-            commande__in=commandes
-        ).values(
-            'menu_plat__plat__nom'
-        ).annotate(
-            total_quantite=Sum('quantite')
-        ).order_by('-total_quantite')[:10]
+        rapport = rapport_restauration(mois_debut, mois_fin)
         
         return Response({
             'mois': mois,
-            'nb_commandes': nb_commandes,
-            'nb_plats': nb_plats,
-            'total_brut': total_brut,
-            'total_subvention': total_subvention,
-            'total_net': total_net,
-            'moyenne_journaliere': total_net / mois_fin.day if mois_fin.day > 0 else 0,
-            'top_plats': list(top_plats)
+            'nb_commandes': rapport['nb_commandes'],
+            'nb_plats': rapport['nb_plats'],
+            'total_brut': rapport['total_brut'],
+            'total_subvention': rapport['total_subvention'],
+            'total_net': rapport['total_net'],
+            'moyenne_journaliere': rapport['total_net'] / mois_fin.day if mois_fin.day > 0 else 0,
+            'par_jour': rapport['par_jour'],
+            'top_plats': rapport['top_plats']
         })
 
 
@@ -1727,181 +1117,29 @@ class ExtraRestaurationViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_classes(LIMITES_MENU_PUBLIC)
 def menu_public(request, token):
     """Récupérer un menu publié via son token public ou le menu du jour si token='aujourdhui'"""
-    from datetime import date
-    
-    # Si token = "aujourdhui", chercher le menu du jour
-    if token == 'aujourdhui':
-        try:
-            menu = Menu.objects.get(
-                date_menu=date.today(),
-                publication_at__isnull=False
-            )
-            serializer = MenuSerializer(menu, context={'request': request})
-            return Response(serializer.data)
-        except Menu.DoesNotExist:
-            return Response({'error': 'Aucun menu publié pour aujourd\'hui'}, status=404)
-    
-    # Sinon, chercher par token
     try:
-        menu = Menu.objects.get(token_public=token, publication_at__isnull=False)
-        serializer = MenuSerializer(menu, context={'request': request})
-        return Response(serializer.data)
-    except Menu.DoesNotExist:
-        return Response({'error': 'Menu non trouvé ou non publié'}, status=404)
+        return Response(donnees_menu_public(token, request))
+    except ErreurCommande as e:
+        return Response({'error': str(e)}, status=e.statut)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(LIMITES_COMMANDE_PUBLIQUE)
 def commander_public(request, token):
     """Créer une commande publique via le token du menu ou le menu du jour si token='aujourdhui'
     
-    Les commandes publiques sont limitées à 13h00 GMT (heure de Conakry)
+    Restriction horaire (13h00 GMT, heure de Conakry) désactivée pour l'instant :
+    les commandes sont acceptées à tout moment. Version async : views_async.py.
     """
-    from datetime import date, time
-    from django.utils import timezone
-    
-    # Si token = "aujourdhui", chercher le menu du jour
-    if token == 'aujourdhui':
-        try:
-            menu = Menu.objects.get(
-                date_menu=date.today(),
-                publication_at__isnull=False
-            )
-        except Menu.DoesNotExist:
-            return Response({'error': 'Aucun menu publié pour aujourd\'hui'}, status=404)
-    else:
-        # Sinon, chercher par token
-        try:
-            menu = Menu.objects.get(token_public=token, publication_at__isnull=False)
-        except Menu.DoesNotExist:
-            return Response({'error': 'Menu non trouvé ou non publié'}, status=404)
-    
-    # Restriction horaire desactivee pour l'instant
-    # Les commandes sont acceptees a tout moment
-    
-    # Récupérer les données de la commande
-    nom_employe = request.data.get('nom_employe', '')
-    email_employe = request.data.get('email_employe', '')
-    lignes_data = request.data.get('lignes', [])
-    
-    if not nom_employe:
-        return Response({'error': 'Le nom de l\'employé est requis'}, status=400)
-    
-    if not lignes_data:
-        return Response({'error': 'Aucune ligne de commande'}, status=400)
-    
     try:
-        with transaction.atomic():
-            # Créer un utilisateur unique pour chaque commande (basé sur nom + email + date + timestamp)
-            from django.contrib.auth.models import User
-            import hashlib
-            import time
-            # Créer un identifiant unique basé sur le nom, email, date et timestamp
-            timestamp = int(time.time() * 1000)  # millisecondes pour plus d'unicité
-            identifiant = hashlib.md5(f"{nom_employe}_{email_employe}_{menu.date_menu}_{timestamp}".encode()).hexdigest()[:12]
-            username_unique = f'commande_{menu.date_menu.strftime("%Y%m%d")}_{identifiant}'
-            
-            # Stocker l'email réel si fourni, sinon utiliser un email généré
-            email_final = email_employe.strip() if email_employe and email_employe.strip() else f'{identifiant}@commande.local'
-            
-            user_anonyme = User.objects.create(
-                username=username_unique,
-                email=email_final,
-                first_name=nom_employe,
-                is_active=True
-            )
-            
-            # Créer la commande (plusieurs personnes peuvent commander le même jour)
-            # Les commandes publiques sont en brouillon, le gestionnaire doit valider
-            commande = Commande.objects.create(
-                utilisateur=user_anonyme,
-                date_commande=menu.date_menu,
-                etat='brouillon'  # En attente de validation par le gestionnaire
-            )
-            
-            # Variables pour calculer le supplément
-            # Subvention de 30000 GNF uniquement sur le 1er plat (1 seule unite)
-            # Les autres plats sont au prix complet
-            total_supplement = Decimal('0.00')
-            total_subvention = Decimal('0.00')
-            plats_avec_supplement = []
-            subvention_utilisee = False
-            
-            # Créer les lignes
-            for ligne_data in lignes_data:
-                menu_plat_id = ligne_data.get('menu_plat_id')
-                quantite = int(ligne_data.get('quantite', 1))
-                
-                try:
-                    menu_plat = MenuPlat.objects.get(pk=menu_plat_id, menu=menu)
-                    
-                    # Vérifier le stock
-                    stock_restant = menu_plat.get_stock_restant()
-                    if stock_restant is not None and quantite > stock_restant:
-                        raise ValueError(f"Stock insuffisant pour {menu_plat.plat.nom}")
-                    
-                    ligne = CommandeLigne.objects.create(
-                        commande=commande,
-                        menu_plat=menu_plat,
-                        quantite=quantite,
-                        prix_unitaire=menu_plat.prix_jour
-                    )
-                    
-                    # Calculer le supplement pour chaque unite
-                    for i in range(quantite):
-                        if not subvention_utilisee:
-                            # Premier plat: subvention de max 30000 GNF
-                            subvention = min(menu_plat.prix_jour, Decimal('30000.00'))
-                            total_subvention += subvention
-                            supplement_unite = menu_plat.prix_jour - subvention
-                            total_supplement += supplement_unite
-                            subvention_utilisee = True
-                        else:
-                            # Autres plats: prix complet a payer
-                            total_supplement += menu_plat.prix_jour
-                    
-                    # Ajouter aux plats avec supplement pour l'affichage
-                    if menu_plat.prix_jour > 30000 or quantite > 1 or len(lignes_data) > 1:
-                        plats_avec_supplement.append({
-                            'plat': menu_plat.plat.nom,
-                            'prix_reel': float(menu_plat.prix_jour),
-                            'quantite': quantite
-                        })
-                        
-                except MenuPlat.DoesNotExist:
-                    raise ValueError(f"MenuPlat {menu_plat_id} non trouvé")
-            
-            # Calculer les montants
-            commande.calculer_montants()
-            commande.save()
-            
-            # Générer automatiquement la facture pour ce jour
-            try:
-                generer_facture_journaliere(commande.date_commande)
-            except Exception as e:
-                print(f"Erreur lors de la génération de la facture: {e}")
-            
-            # L'email sera envoyé quand le gestionnaire validera la commande
-            # Pas d'envoi automatique à la création
-            
-            # Préparer la réponse avec les informations sur le supplément
-            serializer = CommandeSerializer(commande)
-            response_data = serializer.data
-            response_data['supplement_info'] = {
-                'total_supplement': float(total_supplement),
-                'plats_avec_supplement': plats_avec_supplement,
-                'message_supplement': f"Vous devez payer un supplément de {total_supplement:,.0f} GNF en espèces" if total_supplement > 0 else None
-            }
-            response_data['en_attente_validation'] = True
-            
-            return Response(response_data, status=201)
-    
-    except ValueError as e:
-        return Response({'error': str(e)}, status=400)
-    except Exception as e:
-        return Response({'error': f'Erreur: {str(e)}'}, status=500)
+        menu = menu_publie(token)
+        return Response(creer_commande_publique(menu, request.data), status=201)
+    except ErreurCommande as e:
+        return Response({'error': str(e)}, status=e.statut)
 
 
 def generer_facture_journaliere(date_facture):
@@ -1930,6 +1168,8 @@ def generer_facture_journaliere(date_facture):
             except:
                 pass
         
+        from .exports.pdf_restauration import generer_pdf_facture
+
         pdf_path = generer_pdf_facture(facture)
         if pdf_path and os.path.exists(pdf_path):
             # Utiliser le chemin relatif pour le FileField
@@ -1943,245 +1183,118 @@ def generer_facture_journaliere(date_facture):
     return facture
 
 
-def generer_pdf_facture(facture):
-    """Génère un PDF pour une facture"""
-    from datetime import date
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def statistiques_restauration(request):
+    """Statistiques du tableau de bord cantine pour un mois (agrégats journaliers)"""
+    mois = request.query_params.get('mois')
+    if not mois:
+        return Response({'error': 'Paramètre mois requis (format: YYYY-MM)'}, status=400)
     
-    # Créer le répertoire si nécessaire
-    media_root = settings.MEDIA_ROOT if hasattr(settings, 'MEDIA_ROOT') else 'media'
-    factures_dir = os.path.join(media_root, 'factures')
-    os.makedirs(factures_dir, exist_ok=True)
-    
-    # Nom du fichier
-    filename = f'facture_{facture.date_facture.strftime("%Y%m%d")}.pdf'
-    filepath = os.path.join(factures_dir, filename)
-    
-    # Créer le document PDF avec encodage UTF-8
-    doc = SimpleDocTemplate(filepath, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Configurer les styles pour supporter UTF-8
-    for style_name in styles.byName:
-        style = styles[style_name]
-        if hasattr(style, 'fontName'):
-            # S'assurer que les polices supportent UTF-8
-            pass  # ReportLab gère UTF-8 par défaut avec Helvetica
-    
-    # Récupérer les commandes de la date
-    commandes = Commande.objects.filter(
-        date_commande=facture.date_facture,
-        etat='validee'
-    ).select_related('utilisateur').prefetch_related('lignes__menu_plat__plat')
-    
-    # En-tête avec logo et nom de l'entreprise
-    # Chercher le logo dans plusieurs emplacements possibles
-    # BASE_DIR pointe vers backend/, donc on remonte d'un niveau pour le répertoire racine
-    project_root = settings.BASE_DIR.parent
-    logo_paths = [
-        str(project_root / 'logocsig.png'),
-        str(project_root / 'frontend' / 'src' / 'assets' / 'logocsig.png'),
-        str(settings.BASE_DIR / 'logocsig.png'),
-    ]
-    
-    logo_path = None
-    for path in logo_paths:
-        if os.path.exists(path):
-            logo_path = path
-            break
-    
-    # Créer un tableau pour l'en-tête avec logo et texte
-    if logo_path:
-        try:
-            logo = Image(logo_path, width=1.5*inch, height=1.5*inch)
-            header_data = [[logo, Paragraph("<b>CSIG</b><br/>FACTURE JOURNALIÈRE - RESTAURATION", styles['Title'])]]
-            header_table = Table(header_data, colWidths=[2*inch, 4*inch])
-            header_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-                ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            elements.append(header_table)
-        except Exception as e:
-            print(f"Erreur lors du chargement du logo: {e}")
-            # Si le logo ne peut pas être chargé, utiliser seulement le texte
-            company_name = Paragraph("<b>CSIG</b>", styles['Heading1'])
-            company_name.hAlign = 'CENTER'
-            elements.append(company_name)
-            title = Paragraph(f"<b>FACTURE JOURNALIÈRE - RESTAURATION</b>", styles['Title'])
-            title.hAlign = 'CENTER'
-            elements.append(title)
-    else:
-        # Si le logo n'existe pas, utiliser seulement le texte
-        company_name = Paragraph("<b>CSIG</b>", styles['Heading1'])
-        company_name.hAlign = 'CENTER'
-        elements.append(company_name)
-        title = Paragraph(f"<b>FACTURE JOURNALIÈRE - RESTAURATION</b>", styles['Title'])
-        title.hAlign = 'CENTER'
-        elements.append(title)
-    
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Informations de la facture
-    info_data = [
-        ['Numéro de facture:', facture.numero_facture],
-        ['Date:', facture.date_facture.strftime('%d/%m/%Y')],
-        ['Nombre de commandes:', str(facture.total_commandes)],
-    ]
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(info_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Détails des commandes - Un seul tableau pour toutes les commandes
-    elements.append(Paragraph("<b>DÉTAILS DES COMMANDES</b>", styles['Heading2']))
-    elements.append(Spacer(1, 0.1*inch))
-    
-    # Créer un seul tableau avec toutes les commandes (sans colonne supplément)
-    all_lignes_data = [['Commande', 'Plat', 'Quantité', 'Prix unitaire', 'Montant']]
-    
-    # Fonction pour nettoyer et encoder correctement les chaînes
-    def clean_text(text):
-        """Nettoie et encode correctement le texte pour le PDF"""
-        if text is None:
-            return ''
-        # Convertir en string et nettoyer
-        text = str(text)
-        # Remplacer les caractères problématiques
-        text = text.replace('\x00', '')  # Supprimer les null bytes
-        # Encoder en UTF-8 et décoder pour s'assurer que c'est valide
-        try:
-            text = text.encode('utf-8', errors='ignore').decode('utf-8')
-        except:
-            text = text.encode('ascii', errors='ignore').decode('ascii')
-        return text.strip()
-    
-    for commande in commandes:
-        # Utiliser le nom (first_name) ou username, nettoyé
-        nom_utilisateur = ''
-        if commande.utilisateur:
-            nom_utilisateur = commande.utilisateur.first_name or commande.utilisateur.username or 'Anonyme'
-        else:
-            nom_utilisateur = 'Anonyme'
-        
-        nom_utilisateur = clean_text(nom_utilisateur)
-        commande_label = f"#{commande.id} - {nom_utilisateur}"
-        
-        # Total de la commande (limité à 30 000 GNF par plat)
-        total_commande = Decimal('0.00')
-        
-        # Lignes de la commande
-        for ligne in commande.lignes.all():
-            # Limiter le prix unitaire à 30 000 GNF pour la facture
-            prix_unitaire_facture = min(ligne.prix_unitaire, Decimal('30000.00'))
-            montant_ligne_facture = prix_unitaire_facture * ligne.quantite
-            total_commande += montant_ligne_facture
-            
-            # Nettoyer le nom du plat
-            nom_plat = clean_text(ligne.menu_plat.plat.nom if ligne.menu_plat and ligne.menu_plat.plat else 'Plat inconnu')
-            
-            all_lignes_data.append([
-                clean_text(commande_label),
-                nom_plat,
-                str(ligne.quantite),
-                f"{prix_unitaire_facture:,.0f} GNF",
-                f"{montant_ligne_facture:,.0f} GNF"
-            ])
-        
-        # Ajouter la ligne TOTAL pour cette commande
-        all_lignes_data.append([
-            clean_text(f"TOTAL #{commande.id}"),
-            '',
-            '',
-            '',
-            f"{total_commande:,.0f} GNF"
-        ])
-        # Ligne vide pour séparer les commandes
-        all_lignes_data.append(['', '', '', '', ''])
-    
-    # Créer le tableau unique avec tous les styles (5 colonnes au lieu de 6)
-    table_styles = [
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-        ('ALIGN', (4, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-    ]
-    
-    # Identifier les lignes TOTAL et leur appliquer le style gras
-    # Parcourir toutes les lignes et identifier celles qui commencent par "TOTAL"
-    for row_idx in range(1, len(all_lignes_data)):
-        if len(all_lignes_data[row_idx]) > 0 and str(all_lignes_data[row_idx][0]).startswith('TOTAL'):
-            table_styles.append(('FONTNAME', (0, row_idx), (-1, row_idx), 'Helvetica-Bold'))
-            table_styles.append(('BACKGROUND', (0, row_idx), (-1, row_idx), colors.lightgrey))
-    
-    all_cmd_table = Table(all_lignes_data, colWidths=[2*inch, 2.5*inch, 0.7*inch, 1.2*inch, 1.2*inch])
-    all_cmd_table.setStyle(TableStyle(table_styles))
-    
-    elements.append(all_cmd_table)
-    elements.append(Spacer(1, 0.2*inch))
-    
-    # Totaux généraux (sans suppléments, limité à 30 000 GNF par plat)
-    elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph("<b>RÉCAPITULATIF</b>", styles['Heading2']))
-    
-    # Calculer le total facturé (limité à 30 000 GNF par plat)
-    total_facture_brut = Decimal('0.00')
-    for commande in commandes:
-        for ligne in commande.lignes.all():
-            prix_unitaire_facture = min(ligne.prix_unitaire, Decimal('30000.00'))
-            total_facture_brut += prix_unitaire_facture * ligne.quantite
-    
-    # La subvention reste la même (basée sur 30 000 GNF max)
-    total_facture_net = total_facture_brut - facture.total_subvention
-    
-    total_data = [
-        ['Total Brut (limité à 30 000 GNF/plat):', f"{total_facture_brut:,.0f} GNF"],
-        ['Total Subvention:', f"-{facture.total_subvention:,.0f} GNF"],
-        ['Total Net:', f"{total_facture_net:,.0f} GNF"],
-    ]
-    total_table = Table(total_data, colWidths=[3*inch, 3*inch])
-    total_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -2), 'Helvetica'),  # Lignes normales
-        ('FONTNAME', (1, -1), (1, -1), 'Helvetica-Bold'),  # Dernière ligne en gras
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightblue),
-    ]))
-    elements.append(total_table)
-    
-    # Pied de page (sans balises HTML)
-    elements.append(Spacer(1, 0.3*inch))
-    footer_text = f"Facture générée le {timezone.now().strftime('%d/%m/%Y à %H:%M')}"
-    # Utiliser un style simple sans HTML
-    footer_style = styles['Normal']
-    footer_style.alignment = 1  # Centré
-    footer = Paragraph(footer_text, footer_style)
-    elements.append(footer)
-    
-    # Construire le PDF
-    doc.build(elements)
-    
-    return filepath
+    try:
+        mois_debut = datetime.strptime(mois, '%Y-%m').date()
+        mois_fin = (mois_debut + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    except ValueError:
+        return Response({'error': 'Format de date invalide'}, status=400)
+    
+    # Agrégats recalculés à chaque changement de commande validée : ETag sur leur estampille
+    # et données partagées entre workers (depenses/cache.py)
+    modeles = ('depenses.RestaurationJournaliere', 'depenses.RestaurationJournaliereTotal', 'depenses.Plat')
+    return reponse_conditionnelle(
+        request,
+        modeles,
+        lambda: Response(memoriser(
+            'statistiques_restauration', [mois], modeles,
+            lambda: _statistiques_restauration(mois, mois_debut, mois_fin)
+        ))
+    )
+
+
+def _statistiques_restauration(mois, mois_debut, mois_fin):
+    rapport = rapport_restauration(mois_debut, mois_fin)
+    
+    return {
+        'mois': mois,
+        'total_commandes': rapport['nb_commandes'],
+        'total_plats': rapport['nb_plats'],
+        'montant_brut': rapport['total_brut'],
+        'montant_subvention': rapport['total_subvention'],
+        'montant_net': rapport['total_net'],
+        'montant_supplement': rapport['total_supplement'],
+        'par_jour': [
+            {
+                'date': jour['date'],
+                'count': jour['nb_commandes'],
+                'montant': jour['total_brut'],
+            }
+            for jour in rapport['par_jour']
+        ],
+        'top_plats': [
+            {'nom': plat['menu_plat__plat__nom'], 'quantite': plat['total_quantite']}
+            for plat in rapport['top_plats']
+        ],
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recherche(request):
+    """Recherche plein texte classée sur les opérations, catégories, extras et journaux d'audit
+    
+    Paramètres : q (texte), types (liste séparée par des virgules), limite (défaut 20, max 100).
+    """
+    texte = request.query_params.get('q', '').strip()
+    if not texte:
+        return Response({'error': 'Paramètre q requis'}, status=400)
+    
+    types = [t for t in request.query_params.get('types', '').split(',') if t]
+    inconnus = [t for t in types if t not in recherche_plein_texte.SOURCES]
+    if inconnus:
+        return Response({'error': f"Type(s) inconnu(s): {', '.join(inconnus)}"}, status=400)
+    
+    try:
+        limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'limite doit être un entier'}, status=400)
+    
+    documents = recherche_plein_texte.rechercher(texte, types or None, limite)
+    
+    # Une requête par type pour charger les objets trouvés
+    ids_par_type = {}
+    for type_objet, objet_id, _ in documents:
+        ids_par_type.setdefault(type_objet, []).append(objet_id)
+    objets = {
+        'operation': Operation.objects.select_related('categorie').in_bulk(ids_par_type.get('operation', [])),
+        'categorie': Categorie.objects.in_bulk(ids_par_type.get('categorie', [])),
+        'extra': ExtraRestauration.objects.in_bulk(ids_par_type.get('extra', [])),
+        'audit': AuditLog.objects.in_bulk(ids_par_type.get('audit', [])),
+    }
+    
+    def libelle_et_date(type_objet, objet):
+        if type_objet == 'operation':
+            return f"{objet.categorie.code} - {objet.description}", objet.date_operation
+        if type_objet == 'categorie':
+            return f"{objet.code} - {objet.nom}", None
+        if type_objet == 'extra':
+            return f"{objet.nom_personne} - {objet.plat_nom}", objet.date_operation
+        return f"{objet.get_action_display()} {objet.model_name}: {objet.object_repr}", objet.timestamp
+    
+    resultats = []
+    for type_objet, objet_id, score in documents:
+        objet = objets.get(type_objet, {}).get(objet_id)
+        if objet is None:
+            # Document orphelin (objet supprimé en masse) : ignoré
+            continue
+        libelle, date = libelle_et_date(type_objet, objet)
+        resultats.append({
+            'type': type_objet,
+            'id': objet_id,
+            'score': round(float(score), 4),
+            'libelle': libelle,
+            'date': date,
+        })
+    
+    return Response({'moteur': recherche_plein_texte.moteur().nom, 'resultats': resultats})
 
 
 @api_view(['GET', 'POST'])
@@ -2272,6 +1385,8 @@ def imprimer_facture(request, date_str):
                     pass
             
             # Générer un nouveau PDF
+            from .exports.pdf_restauration import generer_pdf_facture
+
             pdf_path = generer_pdf_facture(facture)
             if pdf_path and os.path.exists(pdf_path):
                 # Sauvegarder le chemin dans le modèle
@@ -2299,7 +1414,7 @@ def imprimer_facture(request, date_str):
 
 
 def envoyer_email_confirmation(commande):
-    """Envoie un email de confirmation lorsqu'une commande est validée"""
+    """Met en file l'email de confirmation lorsqu'une commande est validée"""
     print(f"[EMAIL] Tentative d'envoi d'email pour la commande #{commande.id}")
     
     # Récupérer l'email de l'utilisateur
@@ -2376,34 +1491,17 @@ def envoyer_email_confirmation(commande):
     html_message = render_to_string('emails/commande_validee.html', context)
     plain_message = strip_tags(html_message)
     
-    # Envoyer l'email
-    from django.conf import settings
-    print(f"   Configuration SMTP:")
-    print(f"      Host: {settings.EMAIL_HOST}")
-    print(f"      Port: {settings.EMAIL_PORT}")
-    print(f"      TLS: {settings.EMAIL_USE_TLS}")
-    print(f"      User: {settings.EMAIL_HOST_USER}")
-    print(f"      From: {settings.DEFAULT_FROM_EMAIL or 'support@csig.edu.gn'}")
-    
-    try:
-        print(f"   [ENVOI] Envoi de l'email en cours...")
-        send_mail(
-            subject=f'Confirmation de commande #{commande.id} - CSIG',
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL or 'support@csig.edu.gn',
-            recipient_list=[email_destinataire],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        print(f"   [OK] Email envoye avec succes a {email_destinataire}")
-        return {'success': True, 'email': email_destinataire}
-    except Exception as e:
-        import traceback
-        error_msg = f"Erreur SMTP: {str(e)}"
-        print(f"   [ERREUR] {error_msg}")
-        print(f"   Details:")
-        print(traceback.format_exc())
-        return {'success': False, 'error': error_msg, 'email': email_destinataire}
+    # Mettre l'email en file : il sera envoyé par `manage.py envoyer_emails`
+    # après validation de la transaction, sans bloquer la requête
+    mettre_en_file(
+        destinataire=email_destinataire,
+        sujet=f'Confirmation de commande #{commande.id} - CSIG',
+        message_texte=plain_message,
+        message_html=html_message,
+        commande=commande,
+    )
+    print(f"   [OK] Email mis en file pour {email_destinataire}")
+    return {'success': True, 'email': email_destinataire, 'en_file': True}
 
 
 class LotTicketsViewSet(viewsets.ModelViewSet):
@@ -2467,169 +1565,10 @@ class LotTicketsViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def imprimer(self, request, pk=None):
         """Générer un PDF avec les tickets du lot pour impression"""
-        lot = self.get_object()
-        tickets = lot.tickets.filter(statut='disponible')
-        
-        # Créer le PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="tickets_{lot.nom}_{lot.id}.pdf"'
-        
-        doc = SimpleDocTemplate(response, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Logo CSIG (si disponible via staticfiles)
-        logo_path = finders.find('depenses/assets/logocsig.png')
+        from .exports.documents import planche_tickets, reponse_fichier
 
-        # En-tête (logo + titre)
-        header_logo = ''
-        if logo_path:
-            try:
-                header_logo = Image(logo_path, width=55, height=55)
-            except Exception:
-                header_logo = ''
-
-        titre = Paragraph(f"<b>Tickets de Repas - {lot.nom}</b>", styles['Title'])
-        header = Table([[header_logo, titre]], colWidths=[70, 470])
-        header.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ('TOPPADDING', (0, 0), (-1, -1), 0),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-        ]))
-        elements.append(header)
-        elements.append(Spacer(1, 10))
-        
-        # Info du lot
-        info = Paragraph(
-            f"Date de génération: {lot.created_at.strftime('%d/%m/%Y %H:%M')}<br/>"
-            f"Nombre de tickets: {tickets.count()}<br/>"
-            f"Date de validité: {lot.date_validite.strftime('%d/%m/%Y') if lot.date_validite else 'Illimitée'}",
-            styles['Normal']
-        )
-        elements.append(info)
-        elements.append(Spacer(1, 24))
-        
-        csig_blue = colors.HexColor('#0B3D91')
-
-        # Tickets en grille (4 par ligne), fond blanc
-        ticket_data = []
-        row = []
-
-        ticket_w = 132
-        ticket_h = 132
-
-        for ticket in tickets:
-            # QR Code avec le code unique
-            qr_widget = QrCodeWidget(ticket.code_unique)
-            qr_size = 42
-            qr_drawing = Drawing(qr_size, qr_size)
-            qr_drawing.add(qr_widget)
-            bounds = qr_widget.getBounds()
-            width = bounds[2] - bounds[0]
-            height = bounds[3] - bounds[1]
-            if width and height:
-                qr_drawing.scale(qr_size / width, qr_size / height)
-
-            logo_small = ''
-            if logo_path:
-                try:
-                    logo_small = Image(logo_path, width=18, height=18)
-                except Exception:
-                    logo_small = ''
-
-            header_line = Table(
-                [[logo_small, Paragraph("<font color='#0B3D91'><b>TICKET REPAS</b></font>", styles['Normal'])]],
-                colWidths=[20, ticket_w - 20],
-            )
-            header_line.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-            ]))
-
-            code_p = Paragraph(
-                f"<font size='10'><b>{ticket.code_unique}</b></font>",
-                styles['Normal']
-            )
-            lot_p = Paragraph(
-                f"<font size='7'>Lot: {lot.nom}</font>",
-                styles['Normal']
-            )
-            exp_p = Paragraph(
-                f"<font size='7'>Valide jusqu'au: {ticket.expires_at.strftime('%d/%m/%Y %H:%M') if ticket.expires_at else '-'}</font>",
-                styles['Normal']
-            )
-
-            qr_box = Table([[qr_drawing]], colWidths=[54], rowHeights=[54])
-            qr_box.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, 0), colors.white),
-                ('VALIGN', (0, 0), (0, 0), 'MIDDLE'),
-                ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-                ('LEFTPADDING', (0, 0), (0, 0), 2),
-                ('RIGHTPADDING', (0, 0), (0, 0), 2),
-                ('TOPPADDING', (0, 0), (0, 0), 2),
-                ('BOTTOMPADDING', (0, 0), (0, 0), 2),
-            ]))
-
-            ticket_box = Table(
-                [[header_line], [code_p], [lot_p], [exp_p], [qr_box]],
-                colWidths=[ticket_w],
-                rowHeights=[18, 16, 12, 12, 60],
-            )
-            ticket_box.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 0, colors.white),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 4), (0, 4), 'CENTER'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                ('TOPPADDING', (0, 0), (-1, -1), 3),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                ('LINEBELOW', (0, 0), (0, 0), 1, csig_blue),
-            ]))
-
-            outer = Table([[ticket_box]], colWidths=[ticket_w], rowHeights=[ticket_h])
-            outer.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-                ('TOPPADDING', (0, 0), (-1, -1), 0),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-            ]))
-
-            row.append(outer)
-            if len(row) == 4:
-                ticket_data.append(row)
-                row = []
-
-        if row:
-            while len(row) < 4:
-                row.append('')
-            ticket_data.append(row)
-
-        if ticket_data:
-            tickets_table = Table(ticket_data, colWidths=[ticket_w] * 4)
-            tickets_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-            ]))
-            elements.append(tickets_table)
-        
-        doc.build(elements)
-        return response
+        lot = self.get_object()
+        return reponse_fichier(lambda fichier: planche_tickets(lot, fichier))
 
 
 class TicketRepasViewSet(viewsets.ModelViewSet):
@@ -2710,3 +1649,60 @@ class TicketRepasViewSet(viewsets.ModelViewSet):
         
         return Response(stats)
 
+
+class TacheExportViewSet(viewsets.ReadOnlyModelViewSet):
+    """Exports lourds en arrière-plan : demande, suivi et téléchargement
+    
+    POST crée la tâche (ou retourne la demande identique encore en cours),
+    exécutée ensuite en arrière-plan (tâche traiter_export, voir depenses/tasks.py).
+    """
+    serializer_class = TacheExportSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = TacheExport.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(demandeur=self.request.user)
+        return queryset
+    
+    def create(self, request):
+        """Demander un export"""
+        create_serializer = TacheExportCreateSerializer(data=request.data)
+        if not create_serializer.is_valid():
+            return Response(create_serializer.errors, status=400)
+        
+        data = create_serializer.validated_data
+        try:
+            tache, creee = demander_export(data['type_export'], data['parametres'], request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        if creee:
+            log_audit('export', request.user, tache, metadata={
+                'type': tache.type_export,
+                'mode': 'arriere_plan'
+            })
+        
+        serializer = TacheExportSerializer(tache)
+        return Response(serializer.data, status=202 if creee else 200)
+    
+    @action(detail=True, methods=['get'])
+    def telecharger(self, request, pk=None):
+        """Télécharger le fichier d'un export terminé"""
+        tache = self.get_object()
+        if tache.statut != 'termine' or not tache.fichier:
+            return Response({
+                'error': "L'export n'est pas disponible",
+                'statut': tache.statut
+            }, status=409)
+        
+        try:
+            fichier = tache.fichier.open('rb')
+        except FileNotFoundError:
+            return Response({'error': 'Fichier d\'export introuvable'}, status=404)
+        return FileResponse(
+            fichier,
+            as_attachment=True,
+            filename=tache.nom_fichier,
+            content_type=tache.type_contenu or None
+        )
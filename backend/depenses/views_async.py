@@ -0,0 +1,87 @@
+"""
+Vues async des endpoints publics, servies sous ASGI (SERVEUR_ASGI, voir asgi.py).
+
+Mêmes URL, mêmes réponses que menu_public et commander_public (views.py) :
+la logique est celle de commandes_publiques.py. DRF 3.14 n'a pas de vues
+async : ce sont des vues Django qui lisent et renvoient du JSON (le seul
+format du formulaire public). L'ORM et le sérialiseur tournent dans un
+thread (sync_to_async) ; la boucle d'événements reste libre pendant qu'une
+requête attend la base, et la facture PDF est régénérée en tâche de fond
+(tasks.py). Les emails passent déjà par la file d'envoi (emails.py).
+
+Les commandes d'un worker écrivent au plus COMMANDES_SIMULTANEES à la fois :
+SQLite n'accepte qu'un écrivain, les suivantes attendent dans la boucle
+plutôt que dans le busy_timeout (qui finit en « database is locked »).
+Les limites de débit sont celles des vues DRF (throttling.py), vérifiées
+avant toute lecture du menu ou attente d'écriture.
+"""
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import Throttled
+
+from .commandes_publiques import ErreurCommande, creer_commande_publique, donnees_menu_public, menu_publie
+from .throttling import LIMITES_COMMANDE_PUBLIQUE, LIMITES_MENU_PUBLIC, attente_limitation
+
+COMMANDES_SIMULTANEES = 4
+
+_commandes_en_cours = None
+
+
+def _reponse(donnees, statut=200):
+    return JsonResponse(donnees, status=statut, json_dumps_params={'ensure_ascii': False})
+
+
+def _limitee(attente):
+    """Réponse 429 au format du gestionnaire d'exceptions DRF (depenses/exceptions.py)"""
+    reponse = _reponse({'error': True, 'message': str(Throttled(attente).detail), 'status_code': 429}, 429)
+    reponse['Retry-After'] = str(math.ceil(attente))
+    return reponse
+
+
+def _creer_commande(token, donnees):
+    return creer_commande_publique(menu_publie(token), donnees)
+
+
+async def menu_public(request, token):
+    """Menu publié via son token public, ou menu du jour si token='aujourdhui'"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    attente = await sync_to_async(attente_limitation)(request, LIMITES_MENU_PUBLIC, token=token)
+    if attente is not None:
+        return _limitee(attente)
+    try:
+        return _reponse(await sync_to_async(donnees_menu_public)(token, request))
+    except ErreurCommande as e:
+        return _reponse({'error': str(e)}, e.statut)
+
+
+async def commander_public(request, token):
+    """Commande publique (JSON) via le token du menu, ou le menu du jour si token='aujourdhui'"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    attente = await sync_to_async(attente_limitation)(request, LIMITES_COMMANDE_PUBLIQUE, token=token)
+    if attente is not None:
+        return _limitee(attente)
+    try:
+        donnees = json.loads(request.body or b'{}')
+    except ValueError as e:
+        return _reponse({'error': f'JSON invalide: {e}'}, 400)
+    if not isinstance(donnees, dict):
+        return _reponse({'error': 'JSON invalide: objet attendu'}, 400)
+    global _commandes_en_cours
+    if _commandes_en_cours is None:
+        _commandes_en_cours = asyncio.Semaphore(COMMANDES_SIMULTANEES)
+    try:
+        async with _commandes_en_cours:
+            return _reponse(await sync_to_async(_creer_commande)(token, donnees), 201)
+    except ErreurCommande as e:
+        return _reponse({'error': str(e)}, e.statut)
+
+
+# Comme les vues DRF : ni session ni jeton CSRF pour le formulaire public
+# (csrf_exempt de Django 4.2 masquerait la coroutine)
+commander_public.csrf_exempt = True
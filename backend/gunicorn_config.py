@@ -1,7 +1,12 @@
 """
 Configuration Gunicorn pour la production
+
+WSGI (workers sync) : gunicorn suivi_depense.wsgi:application -c gunicorn_config.py
+ASGI (workers uvicorn) : GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+    gunicorn suivi_depense.asgi:application -c gunicorn_config.py
 """
 import multiprocessing
+import os
 
 # Adresse et port d'écoute
 bind = "127.0.0.1:8000"
@@ -9,8 +14,10 @@ bind = "127.0.0.1:8000"
 # Nombre de workers (généralement 2-4 x nombre de CPU)
 workers = multiprocessing.cpu_count() * 2 + 1
 
-# Type de worker
-worker_class = "sync"
+# Type de worker : un worker sync est bloqué pendant toute la requête (PDF,
+# attente d'un verrou de la base) ; un worker uvicorn sert les vues publiques
+# async (depenses/views_async.py) pendant ces attentes
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
 
 # Timeout
 timeout = 120
@@ -3,6 +3,14 @@ ASGI config for suivi_depense project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Workers uvicorn sous gunicorn (voir gunicorn_config.py) :
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn suivi_depense.asgi:application -c gunicorn_config.py
+
+ou seul : uvicorn suivi_depense.asgi:application --workers 3. Ce point d'entrée
+active SERVEUR_ASGI (vues publiques async, voir settings).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,6 +20,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'suivi_depense.settings')
+os.environ.setdefault('SERVEUR_ASGI', 'True')
 
 application = get_asgi_application()
 
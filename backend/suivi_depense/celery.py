@@ -0,0 +1,20 @@
+"""
+Application Celery des tâches en arrière-plan (voir depenses/tasks.py).
+
+Usage (CELERY_BROKER_URL défini, ex. redis://localhost:6379/1) :
+    celery -A suivi_depense worker -l info     # exécute les tâches
+    celery -A suivi_depense beat -l info       # tâches périodiques (CELERY_BEAT_SCHEDULE)
+
+Les réglages sont ceux de Django préfixés par CELERY_ (settings.py). Ce
+module n'est pas importé par suivi_depense/__init__.py : les workers web ne
+chargent Celery qu'à la première tâche planifiée.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'suivi_depense.settings')
+
+app = Celery('suivi_depense')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,22 @@
+"""
+Compression gzip des réponses JSON et CSV de l'API
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware limité aux types de COMPRESSION_TYPES (JSON et CSV par défaut)
+
+    Les PDF, classeurs Excel et images sont déjà compressés : les recompresser
+    coûte du CPU sans rien gagner. Les fichiers statiques sont servis
+    précompressés par WhiteNoise. Les réponses en flux (exports CSV) sont
+    compressées au fil de l'eau ; Django ajoute des octets aléatoires au nom de
+    fichier gzip pour limiter les attaques de type BREACH.
+    """
+
+    def process_response(self, request, response):
+        type_contenu = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if type_contenu not in getattr(settings, 'COMPRESSION_TYPES', ('application/json', 'text/csv')):
+            return response
+        return super().process_response(request, response)
@@ -1,10 +1,14 @@
 """
 Middleware personnalisé pour forcer les headers CORS
 """
+from django.utils.deprecation import MiddlewareMixin
+
+
+class CORSMiddleware(MiddlewareMixin):
+    """En-têtes CORS des origines connues (synchrone et async, via MiddlewareMixin)"""
 
-class CORSMiddleware:
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         self.allowed_origins = [
             'https://suividepenecsig.vercel.app',
             'https://bella5768.pythonanywhere.com',
@@ -18,24 +22,19 @@ class CORSMiddleware:
             'http://127.0.0.1:5173',
         ]
 
-    def __call__(self, request):
+    def process_response(self, request, response):
         origin = request.META.get('HTTP_ORIGIN', '')
         
         # Vérifier si l'origine est autorisée
         if origin in self.allowed_origins:
-            response = self.get_response(request)
-            
             # Ajouter les headers CORS
             response['Access-Control-Allow-Origin'] = origin
             response['Access-Control-Allow-Methods'] = 'DELETE, GET, OPTIONS, PATCH, POST, PUT'
-            response['Access-Control-Allow-Headers'] = 'accept, accept-encoding, authorization, content-type, dnt, origin, user-agent, x-csrftoken, x-requested-with'
+            response['Access-Control-Allow-Headers'] = 'accept, accept-encoding, authorization, content-type, dnt, origin, user-agent, x-csrftoken, x-requested-with, if-none-match'
             response['Access-Control-Allow-Credentials'] = 'true'
-            response['Access-Control-Expose-Headers'] = 'content-type, x-csrftoken'
-            
-            return response
-        else:
-            response = self.get_response(request)
-            return response
+            response['Access-Control-Expose-Headers'] = 'content-type, x-csrftoken, etag'
+        
+        return response
 
     def process_preflight(self, request):
         """Gérer les requêtes OPTIONS (preflight)"""
@@ -45,8 +44,8 @@ class CORSMiddleware:
             return {
                 'Access-Control-Allow-Origin': origin,
                 'Access-Control-Allow-Methods': 'DELETE, GET, OPTIONS, PATCH, POST, PUT',
-                'Access-Control-Allow-Headers': 'accept, accept-encoding, authorization, content-type, dnt, origin, user-agent, x-csrftoken, x-requested-with',
+                'Access-Control-Allow-Headers': 'accept, accept-encoding, authorization, content-type, dnt, origin, user-agent, x-csrftoken, x-requested-with, if-none-match',
                 'Access-Control-Allow-Credentials': 'true',
-                'Access-Control-Expose-Headers': 'content-type, x-csrftoken',
+                'Access-Control-Expose-Headers': 'content-type, x-csrftoken, etag',
             }
         return {}
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'suivi_depense.compression_middleware.CompressionMiddleware',
+    'audit.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'suivi_depense.cors_middleware.CORSMiddleware',
@@ -64,6 +66,14 @@ MIDDLEWARE = [
     'audit.middleware.AuditMiddleware',
 ]
 
+# Serveur ASGI (uvicorn, voir asgi.py) : vues publiques async (depenses/views_async.py).
+# WhiteNoise 6 n'a qu'un middleware synchrone, qui remettrait chaque requête
+# dans un thread : les fichiers statiques (STATIC_ROOT) sont alors servis par
+# le proxy (nginx).
+SERVEUR_ASGI = config('SERVEUR_ASGI', default=False, cast=bool)
+if SERVEUR_ASGI:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 ROOT_URLCONF = 'suivi_depense.urls'
 
 TEMPLATES = [
@@ -116,6 +126,63 @@ else:
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
                 'charset': 'utf8mb4',
             },
+            # Connexions persistantes : 0 = une connexion par requête.
+            # Rester sous le wait_timeout du serveur MySQL.
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        }
+    }
+
+# Sous ASGI, le code synchrone tourne dans les threads de sync_to_async : une
+# connexion persistante par thread, jamais fermée en fin de requête. Une
+# connexion par requête (CONN_MAX_AGE=0), comme le recommande Django.
+if SERVEUR_ASGI:
+    for base in DATABASES.values():
+        base['CONN_MAX_AGE'] = 0
+
+
+# Profil SQLite appliqué à chaque connexion (suivi_depense/sqlite_pragmas.py).
+# WAL seulement sur demande (SQLITE_JOURNAL_MODE=wal) : il exige un disque
+# local et corrompt la base sur un système de fichiers réseau.
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='delete')
+SQLITE_PRAGMAS = {
+    'journal_mode': SQLITE_JOURNAL_MODE,
+    # NORMAL n'est sûr qu'en WAL ; FULL en journal « rollback »
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='normal' if SQLITE_JOURNAL_MODE.lower() == 'wal' else 'full'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=20000, cast=int),  # ms
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-32000, cast=int),  # négatif: Kio
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=134217728, cast=int),  # octets
+    'temp_store': 'memory',
+}
+
+
+# Cache (depenses/cache.py) : Redis si REDIS_URL, sinon fichiers dans CACHE_DIR
+# (backend/cache par défaut hors DEBUG : partagé entre workers, comme les
+# compteurs des limitations) ; mémoire locale, propre à chaque processus,
+# seulement en développement
+REDIS_URL = config('REDIS_URL', default='')
+CACHE_DIR = config('CACHE_DIR', default='') or ('' if DEBUG else str(BASE_DIR / 'cache'))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'suivi_depense',
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'suivi_depense',
         }
     }
 
@@ -201,7 +268,17 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_THROTTLE_CLASSES': (),
-    'DEFAULT_THROTTLE_RATES': {},
+    # Endpoints publics de restauration (depenses/throttling.py), compteurs dans CACHES ;
+    # vide : pas de limite. Derrière le NAT d'un bureau, tous les employés partagent une IP :
+    # lectures du menu plafonnées pour un bureau entier, pas de limite de commandes par IP
+    # par défaut (le plafond par menu s'applique), voir benchmark_charge_publique --ip-partagee.
+    'DEFAULT_THROTTLE_RATES': {
+        'menu_public_ip': config('THROTTLE_MENU_PUBLIC_IP', default='3000/min'),
+        'commande_publique_ip': config('THROTTLE_COMMANDE_PUBLIQUE_IP', default=''),
+        'commande_publique_menu': config('THROTTLE_COMMANDE_PUBLIQUE_MENU', default='1200/min'),
+    },
+    # Proxys devant l'application (X-Forwarded-For) pour l'IP des limitations ; vide : REMOTE_ADDR ou XFF brut
+    'NUM_PROXIES': config('NUM_PROXIES', default='', cast=lambda valeur: int(valeur) if valeur else None),
     'EXCEPTION_HANDLER': 'depenses.exceptions.custom_exception_handler',
 }
 
@@ -256,10 +333,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
 ]
 CORS_EXPOSE_HEADERS = [
     'content-type',
     'x-csrftoken',
+    'etag',
 ]
 
 # Security Settings
@@ -296,3 +375,52 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='gnnthnprwdlklnfd')
 DEFAULT_FROM_EMAIL = 'support@csig.edu.gn'
 SERVER_EMAIL = 'support@csig.edu.gn'
 
+# File d'envoi des emails (voir depenses/emails.py et `manage.py envoyer_emails`)
+EMAIL_OUTBOX_MAX_TENTATIVES = config('EMAIL_OUTBOX_MAX_TENTATIVES', default=5, cast=int)
+EMAIL_OUTBOX_DELAI_BASE = config('EMAIL_OUTBOX_DELAI_BASE', default=60, cast=int)  # secondes
+EMAIL_OUTBOX_DELAI_MAX = config('EMAIL_OUTBOX_DELAI_MAX', default=3600, cast=int)  # secondes
+# Emails réservés par un envoi interrompu, remis en attente au-delà de ce délai (> durée d'un envoi de lot)
+EMAIL_OUTBOX_DELAI_BLOCAGE = config('EMAIL_OUTBOX_DELAI_BLOCAGE', default=15, cast=int)  # minutes
+
+# Référentiels en mémoire (règles de subvention, fenêtres de commande), voir depenses/referentiels.py
+REFERENTIELS_CACHE_TTL = config('REFERENTIELS_CACHE_TTL', default=60, cast=int)  # secondes
+
+# Rétention du journal d'audit (voir audit/archives.py et `manage.py archiver_audit`)
+AUDIT_RETENTION_JOURS = config('AUDIT_RETENTION_JOURS', default=365, cast=int)
+# Hors de MEDIA_ROOT (servi publiquement sous /media/) : le démarrage échoue sinon (voir audit/apps.py)
+AUDIT_ARCHIVES_DIR = config('AUDIT_ARCHIVES_DIR', default='') or str(BASE_DIR / 'audit_archives')
+
+# Exports en arrière-plan (voir depenses/exports/taches.py et `manage.py traiter_exports`)
+EXPORTS_CONSERVATION = config('EXPORTS_CONSERVATION', default=24, cast=int)  # heures
+EXPORTS_DELAI_BLOCAGE = config('EXPORTS_DELAI_BLOCAGE', default=30, cast=int)  # minutes
+# Fichiers produits, hors de MEDIA_ROOT (servi publiquement sous /media/) : le démarrage échoue sinon (voir depenses/apps.py)
+EXPORTS_DIR = config('EXPORTS_DIR', default='') or str(BASE_DIR / 'exports_prives')
+# Au-delà de ce nombre de lignes, tableaux PDF dessinés sur le canevas (voir depenses/exports/pdf_tableau.py)
+PDF_SEUIL_CANEVAS = config('PDF_SEUIL_CANEVAS', default=1000, cast=int)
+
+# Tâches en arrière-plan (Celery, voir depenses/tasks.py et suivi_depense/celery.py)
+# Sans broker, les tâches tournent dans un pool de threads du processus web ;
+# CELERY_TASK_ALWAYS_EAGER=True les exécute dans la requête (tests).
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')  # ex. redis://localhost:6379/1
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True  # tâche rejouée si le worker s'arrête pendant l'exécution
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Nouvelles tentatives des emails en échec (backoff de la file d'envoi)
+    'envoyer-emails': {'task': 'depenses.envoyer_emails', 'schedule': 60.0},
+    'maintenance-exports': {'task': 'depenses.maintenance_exports', 'schedule': 300.0},
+}
+TACHES_POOL_TAILLE = config('TACHES_POOL_TAILLE', default=2, cast=int)
+
+# Compression gzip des réponses (suivi_depense/compression_middleware.py)
+COMPRESSION_TYPES = ('application/json', 'text/csv')
+
+# Instrumentation des requêtes (audit.middleware.PerformanceMiddleware)
+PERFORMANCE_INSTRUMENTATION = config('PERFORMANCE_INSTRUMENTATION', default=True, cast=bool)
+PERFORMANCE_SEUIL_LENT_MS = config('PERFORMANCE_SEUIL_LENT_MS', default=1000, cast=int)
+PERFORMANCE_SEUIL_REQUETES = config('PERFORMANCE_SEUIL_REQUETES', default=50, cast=int)
+PERFORMANCE_ECHANTILLONS = config('PERFORMANCE_ECHANTILLONS', default=500, cast=int)  # par route
@@ -34,9 +34,27 @@ DATABASES = {
             'charset': 'utf8mb4',
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
+        # Connexions persistantes (0 = une connexion par requête), vérifiées
+        # avant réutilisation ; rester sous le wait_timeout du serveur MySQL
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
     }
 }
 
+# Pas de connexions persistantes sous ASGI (voir settings.py)
+if SERVEUR_ASGI:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Cache partagé entre workers : Redis si REDIS_URL, sinon fichiers
+if not REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR') or str(BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 # Static files (CSS, JavaScript, Images)
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -81,6 +99,12 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'performance': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': LOGGING_DIR / 'performance.log',
+            'formatter': 'verbose',
+        },
     },
     'loggers': {
         'django': {
@@ -93,6 +117,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # Requêtes lentes (audit.middleware.PerformanceMiddleware)
+        'audit.middleware': {
+            'handlers': ['performance', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
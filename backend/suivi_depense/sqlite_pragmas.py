@@ -0,0 +1,61 @@
+"""
+Profil de réglage SQLite appliqué à chaque nouvelle connexion.
+
+La production PythonAnywhere tourne sur SQLite (USE_SQLITE=True). Sans
+réglage, le journal « rollback » bloque les lectures pendant une écriture et
+une écriture concurrente échoue au bout de 5 s avec « database is locked »
+(commandes publiques de midi). SQLITE_PRAGMAS (settings) liste les PRAGMA
+exécutés à l'ouverture de chaque connexion (signal connection_created) :
+
+- journal_mode : 'delete' par défaut, sûr partout. 'wal' (à activer par
+  SQLITE_JOURNAL_MODE=wal) : lectures et écriture ne se bloquent plus
+  mutuellement ; le mode est enregistré dans le fichier. WAL exige une
+  mémoire partagée locale : jamais sur un système de fichiers réseau
+  (PythonAnywhere) ;
+- synchronous : 'normal' en WAL, un seul fsync par point de contrôle au lieu
+  d'un par transaction (une coupure peut perdre les dernières transactions,
+  jamais corrompre la base) ; 'full' dans les autres modes ;
+- busy_timeout (ms) : délai d'attente du verrou d'écriture ;
+- cache_size (négatif : Kio), mmap_size (octets), temp_store=memory.
+
+`python manage.py benchmark_sqlite_concurrence` compare ce profil aux
+réglages par défaut de Django sous écritures et lectures concurrentes.
+"""
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# PRAGMA acceptés dans SQLITE_PRAGMAS (valeurs entières ou mots-clés)
+PRAGMAS_AUTORISES = {
+    'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+    'temp_store', 'wal_autocheckpoint', 'journal_size_limit', 'foreign_keys',
+}
+VALEUR_PRAGMA = re.compile(r'^-?\w+$')
+
+
+def pragmas_configures():
+    """PRAGMA du profil (SQLITE_PRAGMAS), vérifiés"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None) or {}
+    for nom, valeur in pragmas.items():
+        if nom not in PRAGMAS_AUTORISES:
+            raise ValueError(f"PRAGMA SQLite non pris en charge: {nom}")
+        if not VALEUR_PRAGMA.match(str(valeur)):
+            raise ValueError(f"Valeur invalide pour PRAGMA {nom}: {valeur!r}")
+    return pragmas
+
+
+def appliquer_pragmas(connexion_sqlite, pragmas):
+    """Exécute les PRAGMA sur une connexion sqlite3 ouverte"""
+    for nom, valeur in pragmas.items():
+        connexion_sqlite.execute(f'PRAGMA {nom} = {valeur}')
+
+
+@receiver(connection_created)
+def regler_connexion_sqlite(sender, connection, **kwargs):
+    """Applique SQLITE_PRAGMAS à chaque nouvelle connexion SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    # Connexion sqlite3 brute : ni curseur Django ni journal des requêtes
+    appliquer_pragmas(connection.connection, pragmas_configures())